@@ -0,0 +1,24 @@
+"""add_outlook_delta_link_to_company
+
+Revision ID: 3b7c1f9a2d40
+Revises: e461cd76bdfc
+Create Date: 2026-10-19 09:12:44.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c1f9a2d40'
+down_revision = 'e461cd76bdfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('companies', sa.Column('outlook_delta_link', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'outlook_delta_link')
@@ -0,0 +1,27 @@
+"""add_reply_cache_enabled_to_ai_agent_settings
+
+Revision ID: 3c8e5a1f7b64
+Revises: 9a4f2c7e1d05
+Create Date: 2026-10-19 16:12:47.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5a1f7b64'
+down_revision = '9a4f2c7e1d05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'ai_agent_settings',
+        sa.Column('reply_cache_enabled', sa.Boolean(), server_default=sa.true(), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('ai_agent_settings', 'reply_cache_enabled')
@@ -0,0 +1,24 @@
+"""add_instagram_last_synced_at_to_company
+
+Revision ID: 5e9a0c3f7d21
+Revises: 8c2e5d7a1b93
+Create Date: 2026-10-19 11:26:53.904418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a0c3f7d21'
+down_revision = '8c2e5d7a1b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('companies', sa.Column('instagram_last_synced_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'instagram_last_synced_at')
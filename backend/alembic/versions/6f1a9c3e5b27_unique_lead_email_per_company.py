@@ -0,0 +1,57 @@
+"""unique_lead_email_per_company
+
+Revision ID: 6f1a9c3e5b27
+Revises: d4b8e2f6a913
+Create Date: 2026-10-19 14:41:09.836154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1a9c3e5b27'
+down_revision = 'd4b8e2f6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Remove duplicate emails within a company (case-insensitive) so the unique index can be
+    # built. This deletes rows for good: of each group the lead with the most recent follow-up
+    # state is kept (latest follow_up_last_sent_at, then one with email_context, then the
+    # oldest); the follow-up history of the other leads is lost. The count is reported.
+    op.execute("""
+        DO $$
+        DECLARE
+            deleted integer;
+        BEGIN
+            DELETE FROM leads
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY company_id, lower(email)
+                        ORDER BY follow_up_last_sent_at DESC NULLS LAST,
+                                 (email_context IS NOT NULL) DESC,
+                                 id
+                    ) AS position
+                    FROM leads
+                ) ranked
+                WHERE position > 1
+            );
+            GET DIAGNOSTICS deleted = ROW_COUNT;
+            RAISE NOTICE 'unique_lead_email_per_company: deleted % duplicate leads', deleted;
+        END $$;
+    """)
+    op.create_index(
+        'uq_leads_company_lower_email',
+        'leads',
+        ['company_id', sa.text('lower(email)')],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    # Only the index is dropped: the duplicate leads deleted by upgrade() (and their
+    # follow_up_last_sent_at/email_context history) cannot be restored
+    op.drop_index('uq_leads_company_lower_email', table_name='leads')
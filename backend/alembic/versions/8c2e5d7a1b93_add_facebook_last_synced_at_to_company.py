@@ -0,0 +1,24 @@
+"""add_facebook_last_synced_at_to_company
+
+Revision ID: 8c2e5d7a1b93
+Revises: 3b7c1f9a2d40
+Create Date: 2026-10-19 10:41:07.532915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2e5d7a1b93'
+down_revision = '3b7c1f9a2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('companies', sa.Column('facebook_last_synced_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'facebook_last_synced_at')
@@ -0,0 +1,47 @@
+"""add_chat_search_vector
+
+Revision ID: 9a4f2c7e1d05
+Revises: b2e6d0a4c718
+Create Date: 2026-10-19 15:38:26.104587
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f2c7e1d05'
+down_revision = 'b2e6d0a4c718'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.add_column(
+        'chat',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('norwegian', coalesce(subject, '')), 'A') || "
+                "setweight(to_tsvector('norwegian', coalesce(body_text, '')), 'B') || "
+                "setweight(to_tsvector('simple', coalesce(subject, '') || ' ' || coalesce(body_text, '')), 'D')",
+                persisted=True
+            ),
+            nullable=True
+        )
+    )
+    op.create_index(
+        'ix_chat_company_search_vector',
+        'chat',
+        ['company_id', 'search_vector'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_company_search_vector', table_name='chat')
+    op.drop_column('chat', 'search_vector')
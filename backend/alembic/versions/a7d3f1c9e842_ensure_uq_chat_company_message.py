@@ -0,0 +1,45 @@
+"""ensure_uq_chat_company_message
+
+Revision ID: a7d3f1c9e842
+Revises: 5e9a0c3f7d21
+Create Date: 2026-10-19 12:58:31.240716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f1c9e842'
+down_revision = '5e9a0c3f7d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The Chat model declares uq_chat_company_message but no earlier migration creates it.
+    # The monitors' ON CONFLICT ingest needs it, so add it when missing, removing any
+    # duplicate (company_id, message_id) rows first (the oldest row is kept).
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = 'uq_chat_company_message'
+            ) THEN
+                DELETE FROM chat a
+                USING chat b
+                WHERE a.company_id = b.company_id
+                  AND a.message_id = b.message_id
+                  AND a.id > b.id;
+
+                ALTER TABLE chat
+                    ADD CONSTRAINT uq_chat_company_message UNIQUE (company_id, message_id);
+            END IF;
+        END
+        $$;
+    """)
+
+
+def downgrade() -> None:
+    # The constraint may have existed before this revision (it is declared on the model), so leave it in place
+    pass
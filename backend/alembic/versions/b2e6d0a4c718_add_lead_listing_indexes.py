@@ -0,0 +1,48 @@
+"""add_lead_listing_indexes
+
+Revision ID: b2e6d0a4c718
+Revises: 6f1a9c3e5b27
+Create Date: 2026-10-19 15:10:52.471930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e6d0a4c718'
+down_revision = '6f1a9c3e5b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_leads_company_created_at_id',
+        'leads',
+        ['company_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_leads_name_trgm',
+        'leads',
+        ['name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_leads_email_trgm',
+        'leads',
+        ['email'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'email': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leads_email_trgm', table_name='leads')
+    op.drop_index('ix_leads_name_trgm', table_name='leads')
+    op.drop_index('ix_leads_company_created_at_id', table_name='leads')
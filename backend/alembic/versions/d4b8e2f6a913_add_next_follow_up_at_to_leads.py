@@ -0,0 +1,41 @@
+"""add_next_follow_up_at_to_leads
+
+Revision ID: d4b8e2f6a913
+Revises: a7d3f1c9e842
+Create Date: 2026-10-19 14:02:47.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a913'
+down_revision = 'a7d3f1c9e842'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('leads', sa.Column('next_follow_up_at', sa.DateTime(timezone=True), nullable=True))
+    # Backfill: the next follow-up is one cycle after the last one (or after creation)
+    op.execute("""
+        UPDATE leads
+        SET next_follow_up_at = COALESCE(leads.follow_up_last_sent_at, leads.created_at)
+            + companies.follow_up_cycle * INTERVAL '1 millisecond'
+        FROM companies
+        WHERE companies.id = leads.company_id
+          AND companies.follow_up_cycle IS NOT NULL
+    """)
+    op.create_index(
+        'ix_leads_next_follow_up_at_id',
+        'leads',
+        ['next_follow_up_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('next_follow_up_at IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leads_next_follow_up_at_id', table_name='leads')
+    op.drop_column('leads', 'next_follow_up_at')
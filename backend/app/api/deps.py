@@ -1,4 +1,4 @@
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -6,7 +6,7 @@ from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db, AsyncSessionLocal
 from app.models.user import User
 from app.schemas.token import TokenPayload
 from app.crud.crud_user import user
@@ -64,3 +64,24 @@ def get_current_active_user(
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_websocket_user(token: str) -> Optional[User]:
+    """
+    Resolve the user for a WebSocket connection from an access token.
+    Browsers cannot set headers on WebSocket requests, so the token is passed
+    as a query parameter. Returns None if the token or user is invalid.
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        if payload.get("type") == "refresh":
+            return None
+        token_data = TokenPayload(**payload)
+    except (JWTError, ValidationError):
+        return None
+    if token_data.sub is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        user_obj = await db.get(User, token_data.sub)
+    if not user_obj or not user_obj.is_active:
+        return None
+    return user_obj
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import auth, users, ai, companies, ai_agent_settings, leads, analytics, company_context, notifications, instagram, facebook
+from app.api.routes import auth, users, ai, companies, ai_agent_settings, leads, analytics, company_context, notifications, instagram, facebook, traces, event_loop
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -13,4 +13,6 @@ api_router.include_router(analytics.router, prefix="/analytics", tags=["analytic
 api_router.include_router(company_context.router, prefix="/company-context", tags=["company-context"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 api_router.include_router(instagram.router, prefix="/instagram", tags=["instagram"])
-api_router.include_router(facebook.router, prefix="/facebook", tags=["facebook"]) 
\ No newline at end of file
+api_router.include_router(facebook.router, prefix="/facebook", tags=["facebook"]) 
+api_router.include_router(traces.router, prefix="/traces", tags=["traces"])
+api_router.include_router(event_loop.router, prefix="/event-loop", tags=["event-loop"])
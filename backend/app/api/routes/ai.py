@@ -1,19 +1,22 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, File, UploadFile, Form
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, File, UploadFile, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 import os
-import io
-import base64
+import json
 import time
+import asyncio
 import logging
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_db, get_current_active_user, get_websocket_user
+from app.core.config import settings
 from app.models.user import User
 from app.models.chat import Chat
 from app.schemas.ai import AIRequest, AIResponse, InputType, AudioFormat, VoiceType
 from app.services.ai_service import SimpleAIService
+from app.services.voice_stream_service import voice_stream_service, AUDIO_MEDIA_TYPES
+from app.services.voice_session_service import VoiceSession
 from app.crud.crud_company import company
 from app.crud.crud_ai_agent_settings import ai_agent_settings
 from app.schemas.email import SendEmailRequest, SendFacebookMessageRequest, SendInstagramMessageRequest
@@ -108,8 +111,12 @@ async def process_ai_request(
             detail=f"Error processing AI request: {str(e)}",
         )
 
-@router.post("/stream-audio")
-async def stream_audio_response(
+def _sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def stream_ai_request(
     text: str = Form(None),
     audio_file: UploadFile = File(None),
     audio_format: AudioFormat = Form(AudioFormat.MP3),
@@ -119,8 +126,15 @@ async def stream_audio_response(
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Process an AI request and stream the audio response.
-    This is useful for real-time audio playback in the client.
+    Streaming variant of /chat that returns server-sent events (text/event-stream).
+    
+    Events:
+        start: {"input_type", "transcript"} once the prompt is ready
+        token: {"text"} for each text delta from the model
+        done: {"model_used", "usage", "timings"} when generation has finished
+        error: {"detail"} if generation failed after the stream started
+    
+    The reply is always text; use /stream-audio for a spoken reply.
     """
     if ai_service is None:
         raise HTTPException(
@@ -160,54 +174,184 @@ async def stream_audio_response(
             temperature=temperature
         )
         
-        if request.get_input_type() != InputType.AUDIO:
+        start_time = time.time()
+        input_type = request.get_input_type()
+        if input_type == InputType.AUDIO:
+            text = await ai_service._transcribe_audio(request.audio_file, request.audio_format)
+        else:
+            text = request.text
+        
+        calendar_context = await ai_service._get_calendar_context(db_company, text)
+        messages = ai_service.build_chat_messages(
+            text,
+            calendar_context,
+            db_settings.dialect,
+            db_company.name,
+            db_settings.goal,
+            db_company.business_category,
+            db_company.terms_of_service
+        )
+        preparation_time = time.time() - start_time
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error preparing streamed AI request: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing AI request: {str(e)}",
+        )
+    
+    async def event_stream():
+        generation_start = time.time()
+        time_to_first_token = None
+        usage = None
+        yield _sse_event("start", {
+            "input_type": input_type.value,
+            "transcript": text if input_type == InputType.AUDIO else None,
+        })
+        try:
+            async for kind, value in ai_service.stream_ai_response(messages, max_tokens, temperature):
+                if kind == "token":
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - generation_start
+                    yield _sse_event("token", {"text": value})
+                else:
+                    usage = value
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {str(e)}")
+            yield _sse_event("error", {"detail": f"Error generating AI response: {str(e)}"})
+            return
+        
+        generation_time = time.time() - generation_start
+        processing_time = time.time() - start_time
+        
+        # Log the request for analytics
+        logger.info(
+            f"AI stream processed: user_id={current_user.id}, input_type={input_type}, "
+            f"time_to_first_token={time_to_first_token or 0:.2f}s, processing_time={processing_time:.2f}s, "
+            f"model={ai_service.chat_model}"
+        )
+        
+        yield _sse_event("done", {
+            "model_used": ai_service.chat_model,
+            "usage": usage,
+            "timings": {
+                "preparation_time": preparation_time,
+                "time_to_first_token": time_to_first_token,
+                "generation_time": generation_time,
+                "processing_time": processing_time,
+            },
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable proxy buffering (nginx) so events are delivered as they are produced
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@router.post("/stream-audio")
+async def stream_audio_response(
+    text: str = Form(None),
+    audio_file: UploadFile = File(None),
+    audio_format: AudioFormat = Form(AudioFormat.MP3),
+    max_tokens: int = Form(1000),
+    temperature: float = Form(0.7),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Process an audio request and stream the spoken reply as MP3.
+    Audio for the first sentence is sent while the rest of the reply is still
+    being generated, so playback can start before the full response exists.
+    """
+    if ai_service is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is not available. Check server logs for details.",
+        )
+    
+    try:
+        # Get company information
+        if not current_user.company_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="This endpoint only supports audio input",
+                detail="User is not associated with any company",
             )
         
-        # Process the request with company context and settings
-        response = await ai_service.process_request(
-            request=request,
-            company=db_company,
-            ai_settings=db_settings
-        )
+        db_company = company.get(db=db, id=current_user.company_id)
+        if not db_company:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Company not found",
+            )
         
-        if not response.audio_data:
+        # Get company's AI agent settings
+        db_settings = ai_agent_settings.get_by_company_id(db=db, company_id=current_user.company_id)
+        if not db_settings:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to generate audio response",
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="AI agent settings not found for company",
             )
         
-        # Decode base64 audio data
-        audio_bytes = base64.b64decode(response.audio_data)
+        # Create request object
+        request = AIRequest(
+            text=text,
+            audio_file=audio_file,
+            audio_format=audio_format,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
         
-        # Create a file-like object from the bytes
-        audio_stream = io.BytesIO(audio_bytes)
+        if request.get_input_type() != InputType.AUDIO:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This endpoint only supports audio input",
+            )
         
-        # Determine content type based on audio format
-        content_type = "audio/mpeg"
-        if response.audio_format == AudioFormat.WAV:
-            content_type = "audio/wav"
-        elif response.audio_format == AudioFormat.OGG:
-            content_type = "audio/ogg"
-        elif response.audio_format == AudioFormat.WEBM:
-            content_type = "audio/webm"
+        # Transcription and calendar context are needed before the reply can start
+        start_time = time.time()
+        transcript = await ai_service._transcribe_audio(request.audio_file, request.audio_format)
+        calendar_context = await ai_service._get_calendar_context(db_company, transcript)
+        messages = ai_service.build_chat_messages(
+            transcript,
+            calendar_context,
+            db_settings.dialect,
+            db_company.name,
+            db_settings.goal,
+            db_company.business_category,
+            db_company.terms_of_service
+        )
+        preparation_time = time.time() - start_time
+        
+        # Stream the reply: LLM tokens are cut into sentences and each sentence's
+        # audio is sent as soon as it is synthesized (chunked transfer encoding)
+        audio_stream = voice_stream_service.stream_reply_audio(
+            messages,
+            voice=getattr(db_settings.voice_type, "value", db_settings.voice_type),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            response_format="mp3"
+        )
         
         # Log the request for analytics
         logger.info(
-            f"Audio stream processed: user_id={current_user.id}, "
-            f"processing_time={response.processing_time:.2f}s, model={response.model_used}"
+            f"Audio stream started: user_id={current_user.id}, "
+            f"preparation_time={preparation_time:.2f}s, model={voice_stream_service.chat_model}"
         )
         
-        # Return streaming response
         return StreamingResponse(
             audio_stream,
-            media_type=content_type,
+            media_type=AUDIO_MEDIA_TYPES["mp3"],
             headers={
-                "Content-Disposition": f"attachment; filename=response.{response.audio_format}",
-                "X-Processing-Time": str(response.processing_time),
-                "X-Model-Used": response.model_used,
+                "Content-Disposition": "inline; filename=response.mp3",
+                "Cache-Control": "no-cache",
+                "X-Preparation-Time": f"{preparation_time:.3f}",
+                "X-Model-Used": voice_stream_service.chat_model,
             }
         )
         
@@ -218,6 +362,94 @@ async def stream_audio_response(
             detail=f"Error streaming audio response: {str(e)}",
         )
 
+@router.websocket("/voice")
+async def voice_session_ws(
+    websocket: WebSocket,
+    token: str = Query(...),
+    sample_rate: int = Query(settings.VOICE_WS_SAMPLE_RATE),
+    max_tokens: int = Query(1000, ge=1, le=4000),
+    temperature: float = Query(0.7, ge=0, le=1.0),
+):
+    """
+    Real-time voice conversation.
+
+    The client sends mono little-endian PCM16 audio at `sample_rate` as binary
+    messages, continuously. An energy-based VAD detects the end of each utterance,
+    which is transcribed from memory and answered with `transcript`, `reply_text`
+    and `reply_end` JSON messages plus the spoken reply as binary MP3 chunks.
+    The client may send {"type": "end_utterance"} to end a turn early, or
+    {"type": "stop"} to close the session. A new utterance during a reply
+    cancels that reply.
+    """
+    await websocket.accept()
+    if ai_service is None:
+        await websocket.send_json({"type": "error", "detail": "AI service is not available"})
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+
+    current_user = await get_websocket_user(token)
+    if not current_user or not current_user.company_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        session = await VoiceSession.start(
+            ai_service, current_user.company_id, sample_rate, max_tokens, temperature
+        )
+    except Exception as e:
+        logger.error(f"Error starting voice session for user {current_user.id}: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+
+    logger.info(f"Voice session started: user_id={current_user.id}, company_id={current_user.company_id}")
+    await websocket.send_json({"type": "ready", "sample_rate": sample_rate})
+
+    turn_task: Optional[asyncio.Task] = None
+
+    async def run_turn(pcm: bytes) -> None:
+        try:
+            await session.run_turn(websocket, pcm)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in voice turn for user {current_user.id}: {str(e)}")
+            await websocket.send_json({"type": "error", "detail": f"Error processing voice turn: {str(e)}"})
+
+    def start_turn(pcm: bytes) -> None:
+        nonlocal turn_task
+        # The caller spoke again: drop the reply that is still being generated
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+        turn_task = asyncio.create_task(run_turn(pcm))
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                for utterance in session.vad.feed(message["bytes"]):
+                    start_turn(utterance)
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "end_utterance":
+                    utterance = session.vad.flush()
+                    if utterance:
+                        start_turn(utterance)
+                elif control.get("type") == "stop":
+                    await websocket.close()
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+        logger.info(f"Voice session ended: user_id={current_user.id}, turns={len(session.history) // 2}")
+
 @router.post("/send-email", status_code=200)
 async def send_email_api(
     request: SendEmailRequest,
@@ -1,16 +1,17 @@
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, case, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, case, extract, select
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel
 import json
 
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_async_db, get_current_active_user
 from app.models.user import User
 from app.models.chat import Chat
 from app.models.company import Company
 from app.models.channel_context import ChannelContext
+from app.utils.feedback import analyze_feedback_satisfaction, analyze_text_satisfaction
 
 router = APIRouter()
 
@@ -25,7 +26,7 @@ class AnalyticsResponse(BaseModel):
 @router.post("/ai-handled-requests", response_model=AnalyticsResponse)
 async def get_ai_handled_requests(
     request: DateRangeRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
@@ -44,7 +45,7 @@ async def get_ai_handled_requests(
             )
 
         # Get company information to identify company email addresses
-        company = db.query(Company).filter(Company.id == current_user.company_id).first()
+        company = await db.get(Company, current_user.company_id)
         if not company:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -83,7 +84,7 @@ async def get_ai_handled_requests(
             )
 
         # Count AI-handled requests (outgoing messages sent by the company)
-        ai_handled_requests = db.query(func.count(Chat.id)).filter(
+        ai_handled_requests = await db.scalar(select(func.count(Chat.id)).where(
             and_(
                 Chat.company_id == current_user.company_id,
                 Chat.sent_at >= start_date,
@@ -91,11 +92,12 @@ async def get_ai_handled_requests(
                 # Filter for outgoing messages (from company email)
                 or_(*[Chat.from_email == email for email in company_emails])
             )
-        ).scalar()
+        ))
 
         # Calculate average response time using a simpler approach
         # First, get all threads with both incoming and outgoing messages
-        threads_with_responses = db.query(Chat.channel_id).filter(
+        is_outgoing = or_(*[Chat.from_email == email for email in company_emails])
+        threads_with_responses = select(Chat.channel_id).where(
             and_(
                 Chat.company_id == current_user.company_id,
                 Chat.sent_at >= start_date,
@@ -109,27 +111,21 @@ async def get_ai_handled_requests(
             )
         ).subquery()
 
+        # Get first incoming and first outgoing message time for all these threads in one query
+        first_message_times = await db.execute(
+            select(
+                Chat.channel_id,
+                func.min(case((~is_outgoing, Chat.sent_at))),
+                func.min(case((is_outgoing, Chat.sent_at))),
+            ).where(
+                Chat.company_id == current_user.company_id,
+                Chat.channel_id.in_(select(threads_with_responses.c.channel_id))
+            ).group_by(Chat.channel_id)
+        )
+
         # Calculate response times for these threads
         response_times = []
-        for thread_result in db.query(threads_with_responses.c.channel_id).all():
-            channel_id = thread_result[0]
-            
-            # Get first incoming message time
-            first_incoming = db.query(func.min(Chat.sent_at)).filter(
-                and_(
-                    Chat.channel_id == channel_id,
-                    ~or_(*[Chat.from_email == email for email in company_emails])
-                )
-            ).scalar()
-            
-            # Get first outgoing message time
-            first_outgoing = db.query(func.min(Chat.sent_at)).filter(
-                and_(
-                    Chat.channel_id == channel_id,
-                    or_(*[Chat.from_email == email for email in company_emails])
-                )
-            ).scalar()
-            
+        for channel_id, first_incoming, first_outgoing in first_message_times.all():
             if first_incoming and first_outgoing and first_outgoing > first_incoming:
                 response_time_seconds = (first_outgoing - first_incoming).total_seconds()
                 if response_time_seconds > 0:
@@ -153,7 +149,7 @@ async def get_ai_handled_requests(
 
         # Calculate human escalation rate
         # Count total requests (incoming messages) in the date range
-        total_requests = db.query(func.count(Chat.id)).filter(
+        total_requests = await db.scalar(select(func.count(Chat.id)).where(
             and_(
                 Chat.company_id == current_user.company_id,
                 Chat.sent_at >= start_date,
@@ -161,10 +157,10 @@ async def get_ai_handled_requests(
                 # Filter for incoming messages (not from company email)
                 ~or_(*[Chat.from_email == email for email in company_emails])
             )
-        ).scalar()
+        ))
 
         # Count escalated requests (messages that require human action)
-        escalated_requests = db.query(func.count(Chat.id)).filter(
+        escalated_requests = await db.scalar(select(func.count(Chat.id)).where(
             and_(
                 Chat.company_id == current_user.company_id,
                 Chat.sent_at >= start_date,
@@ -174,7 +170,7 @@ async def get_ai_handled_requests(
                 # Filter for messages that require human action
                 Chat.action_required == True
             )
-        ).scalar()
+        ))
 
         # Calculate human escalation rate percentage
         if total_requests > 0:
@@ -184,13 +180,13 @@ async def get_ai_handled_requests(
 
         # Calculate customer satisfaction from channel context chat history
         # Get all channel contexts for the company in the date range
-        channel_contexts = db.query(ChannelContext).filter(
+        channel_contexts = (await db.execute(select(ChannelContext).where(
             and_(
                 ChannelContext.company_id == current_user.company_id,
                 ChannelContext.last_updated >= start_date,
                 ChannelContext.last_updated <= end_date
             )
-        ).all()
+        ))).scalars().all()
 
         # Analyze chat history for customer satisfaction indicators
         satisfaction_scores = []
@@ -224,7 +220,7 @@ async def get_ai_handled_requests(
         previous_start = start_date - period_duration
         previous_end = start_date
 
-        previous_requests = db.query(func.count(Chat.id)).filter(
+        previous_requests = await db.scalar(select(func.count(Chat.id)).where(
             and_(
                 Chat.company_id == current_user.company_id,
                 Chat.sent_at >= previous_start,
@@ -232,7 +228,7 @@ async def get_ai_handled_requests(
                 # Filter for outgoing messages (from company email)
                 or_(*[Chat.from_email == email for email in company_emails])
             )
-        ).scalar()
+        ))
 
         # Calculate percentage change
         if previous_requests > 0:
@@ -373,72 +369,4 @@ def analyze_conversation_satisfaction(messages: list, company_emails: list) -> f
                 break
     
     return max(0, min(100, score))
-
-def analyze_feedback_satisfaction(feedback_data: dict) -> float:
-    """
-    Analyze structured feedback data to determine satisfaction score (0-100)
-    """
-    score = 50.0  # Neutral starting point
-    
-    # Analyze friendliness feedback
-    friendliness = feedback_data.get("friendliness", "").lower()
-    if friendliness:
-        if any(word in friendliness for word in ["good", "great", "excellent", "perfect", "love", "amazing"]):
-            score += 20
-        elif any(word in friendliness for word in ["bad", "terrible", "awful", "hate", "dislike", "rude"]):
-            score -= 20
-        elif any(word in friendliness for word in ["okay", "fine", "acceptable", "decent"]):
-            score += 5
-    
-    # Analyze length feedback
-    length = feedback_data.get("length", "").lower()
-    if length:
-        if any(word in length for word in ["perfect", "good", "appropriate", "right"]):
-            score += 15
-        elif any(word in length for word in ["too long", "too short", "brief", "verbose"]):
-            score -= 10
-    
-    # Analyze emoji feedback
-    emoji = feedback_data.get("emoji", "").lower()
-    if emoji:
-        if any(word in emoji for word in ["good", "perfect", "love", "appropriate"]):
-            score += 10
-        elif any(word in emoji for word in ["too much", "less", "stop", "annoying"]):
-            score -= 10
-    
-    # Analyze other feedback
-    other = feedback_data.get("other", "").lower()
-    if other:
-        if any(word in other for word in ["good", "great", "excellent", "perfect", "love", "amazing", "helpful"]):
-            score += 15
-        elif any(word in other for word in ["bad", "terrible", "awful", "hate", "dislike", "useless", "unhelpful"]):
-            score -= 15
-    
-    return max(0, min(100, score))
-
-def analyze_text_satisfaction(text: str) -> float:
-    """
-    Analyze plain text feedback to determine satisfaction score (0-100)
-    """
-    text_lower = text.lower()
-    score = 50.0  # Neutral starting point
-    
-    # Positive indicators
-    positive_words = ["good", "great", "excellent", "perfect", "love", "amazing", "helpful", "satisfied", "happy", "pleased"]
-    for word in positive_words:
-        if word in text_lower:
-            score += 10
-    
-    # Negative indicators
-    negative_words = ["bad", "terrible", "awful", "hate", "dislike", "useless", "unhelpful", "dissatisfied", "unhappy", "disappointed"]
-    for word in negative_words:
-        if word in text_lower:
-            score -= 10
-    
-    # Neutral indicators
-    neutral_words = ["okay", "fine", "acceptable", "decent", "average"]
-    for word in neutral_words:
-        if word in text_lower:
-            score += 2
-    
-    return max(0, min(100, score)) 
\ No newline at end of file
+ 
\ No newline at end of file
@@ -371,7 +371,7 @@ def gmail_callback(
     userinfo = userinfo_res.json()
     email = userinfo.get("email", "")
     username = userinfo.get("name", "")
-    print(f"userinfo========>: {userinfo}")
+    logger.debug("Gmail user info received for %s", email)
     
     # Parse state to determine redirect location
     redirect_to = "onboarding"  # default
@@ -415,7 +415,7 @@ def outlook_callback(
         userinfo = outlook_auth_service.get_user_info(tokens['access_token'])
         email = userinfo.get("mail", userinfo.get("userPrincipalName", ""))
         username = userinfo.get("displayName", "")
-        print(f"outlook userinfo========>: {userinfo}")
+        logger.debug("Outlook user info received for %s", email)
         
         # Parse state to determine redirect location
         redirect_to = "onboarding"  # default
@@ -1,31 +1,42 @@
+import logging
 from typing import Any, List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, UploadFile, File, BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_active_user, get_db
+from app.api.deps import get_current_active_user, get_db, get_async_db
 from app.crud.crud_company import company
+from app.crud.crud_lead import lead
+from app.crud.crud_chat import chat as chat_crud
 from app.crud.crud_user import user
 from app.crud.crud_channel_auto_reply_settings import channel_auto_reply_settings
 from app.models.user import User
 from app.schemas.company import Company, CompanyCreate, CompanyUpdate, CalendarResponse, CalendarCredentials
+from app.schemas.chat import ChatSearchPage
 from app.schemas.channel_auto_reply_settings import ChannelAutoReplySettings, ChannelAutoReplySettingsCreate, ChannelAutoReplySettingsUpdate
 from app.services.calendar_service import calendar_service
 from app.services.gmail_auth_service import gmail_auth_service
 from app.services.gmail_monitor_service import gmail_monitor_service
-from googleapiclient.discovery import build
+from app.core.email import build_gmail_service
 import asyncio
 import re
 from app.services.ai_service import SimpleAIService, filter_email_with_ai
 from app.services.channel_context_service import channel_context_service
+from app.services.few_shot_service import few_shot_service
 from app.models.chat import Chat
+from app.models.channel_auto_reply_settings import ChannelAutoReplySettings as ChannelAutoReplySettingsModel
 from bs4 import BeautifulSoup
 from app.util import extract_email_address, remove_gmail_quote, clean_html_content
+from app.utils.pagination import encode_cursor, decode_cursor
 from app.models.company import Company as CompanyModel
 import time
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 def ensure_full_logo_url(logo_url: Optional[str]) -> Optional[str]:
@@ -197,8 +208,17 @@ def update_company(
                 detail="Company with this business email already exists",
             )
     
+    follow_up_cycle_changed = (
+        "follow_up_cycle" in company_in.dict(exclude_unset=True)
+        and company_in.follow_up_cycle != db_company.follow_up_cycle
+    )
+    
     updated_company = company.update(db=db, db_obj=db_company, obj_in=company_in)
     
+    # Keep the leads' follow-up schedule in line with the new cycle
+    if follow_up_cycle_changed:
+        lead.reschedule_follow_ups(db, company_id=updated_company.id, follow_up_cycle=updated_company.follow_up_cycle)
+    
     # Ensure logo_url is a full URL
     if updated_company.logo_url:
         updated_company.logo_url = ensure_full_logo_url(updated_company.logo_url)
@@ -341,7 +361,7 @@ def handle_gmail_callback(
 @router.get("/{id}/gmail/channels", response_model=dict)
 async def get_company_gmail_channels(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     id: int,
     page: int = Query(1, ge=1),
     page_size: int = Query(30, ge=1, le=100),
@@ -350,7 +370,7 @@ async def get_company_gmail_channels(
     """
     Get paginated Gmail channels (subjects and content) for a company, only those created after the company's creation date.
     Only accessible by users associated with the company.
-    Now: Only fetch page_size messages for the requested page, then filter by company.created_at.
+    Messages and auto-reply settings are loaded with one query each and grouped in memory.
     """
     if not current_user.company_id:
         raise HTTPException(
@@ -362,37 +382,36 @@ async def get_company_gmail_channels(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to access this company",
         )
-    db_company = company.get(db=db, id=id)
+    db_company = await db.get(CompanyModel, id)
     if not db_company:
         raise HTTPException(status_code=404, detail="Company not found")
-    # creds = gmail_monitor_service._get_credentials(db_company, db)
-    # if not creds:
-    #     raise HTTPException(status_code=400, detail="No Gmail credentials configured for this company")
     try:
-        # Fetch emails from database instead of Gmail API
-        from sqlalchemy import func
-        
-        # Get all chat messages for this company, grouped by channel_id
-        chat_messages = db.query(Chat).filter(
-            Chat.company_id == id
-        ).order_by(Chat.sent_at.desc()).all()
+        # Get all chat messages for this company, oldest first within each channel
+        chat_result = await db.execute(
+            select(Chat)
+            .where(Chat.company_id == id)
+            .order_by(Chat.channel_id, Chat.sent_at.asc())
+        )
         
         # Group messages by channel_id
+        channel_messages_by_id = {}
+        for chat_msg in chat_result.scalars():
+            channel_messages_by_id.setdefault(chat_msg.channel_id, []).append(chat_msg)
+        
+        # Get auto-reply settings for all channels at once
+        settings_result = await db.execute(
+            select(ChannelAutoReplySettingsModel).where(
+                ChannelAutoReplySettingsModel.channel_id.in_(list(channel_messages_by_id.keys()))
+            )
+        )
+        auto_reply_by_channel = {
+            channel_settings.channel_id: channel_settings.enable_auto_reply
+            for channel_settings in settings_result.scalars()
+        }
+        
         channel_groups = {}
         
-        for chat_msg in chat_messages:
-            channel_id = chat_msg.channel_id
-            
-            # Skip if we already processed this channel
-            if channel_id in channel_groups:
-                continue
-            
-            # Get all messages for this channel
-            channel_messages = db.query(Chat).filter(
-                Chat.company_id == id,
-                Chat.channel_id == channel_id
-            ).order_by(Chat.sent_at.asc()).all()
-            
+        for channel_id, channel_messages in channel_messages_by_id.items():
             bodies = []
             channel_should_include = False
             
@@ -420,13 +439,10 @@ async def get_company_gmail_channels(
                 continue
             
             # Get channel metadata from the first message
-            first_msg = channel_messages[0] if channel_messages else None
-            if not first_msg:
-                continue
+            first_msg = channel_messages[0]
         
             # Get auto-reply settings for this channel
-            channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=channel_id)
-            enable_auto_reply = channel_settings.enable_auto_reply if channel_settings else True
+            enable_auto_reply = auto_reply_by_channel.get(channel_id, True)
             
             # Determine email provider from the first message
             email_provider = first_msg.email_provider or 'unknown'
@@ -464,6 +480,37 @@ async def get_company_gmail_channels(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch Gmail channels: {str(e)}")
 
+@router.get("/chats/search", response_model=ChatSearchPage)
+async def search_chats(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    q: str = Query(..., min_length=1, max_length=500),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=settings.MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Full-text search over the company's messages (subject and body).
+    
+    `q` supports web search syntax ("exact phrase", -word, OR). Hits are ranked,
+    carry highlighted snippets, and are paginated with `next_cursor`.
+    """
+    if not current_user.company_id:
+        raise HTTPException(status_code=400, detail="User is not associated with any company")
+    
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after is not None and not isinstance(after[0], float):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    hits, has_more = await chat_crud.search(
+        db, company_id=current_user.company_id, query=q, limit=limit, after=after
+    )
+    next_cursor = encode_cursor(hits[-1]["rank"], hits[-1]["id"]) if has_more else None
+    return ChatSearchPage(items=hits, next_cursor=next_cursor, has_more=has_more)
+
 @router.put("/chats/{chat_id}/mark-as-read")
 def mark_chat_as_read(
     *,
@@ -496,7 +543,7 @@ def mark_chat_as_read(
         if company and company.gmail_box_credentials:
             creds = gmail_monitor_service._get_credentials(company, db)
             if creds:
-                service = build('gmail', 'v1', credentials=creds)
+                service = build_gmail_service(creds)
                 # Remove the UNREAD label from all Gmail messages in the thread
                 for db_chat in db_chats:
                     try:
@@ -505,12 +552,12 @@ def mark_chat_as_read(
                             id=db_chat.message_id,
                             body={'removeLabelIds': ['UNREAD']}
                         ).execute()
-                        print(f"[DEBUG] Marked Gmail message {db_chat.message_id} as read")
+                        logger.debug("Marked Gmail message %s as read", db_chat.message_id)
                     except Exception as e:
-                        print(f"[DEBUG] Error marking Gmail message {db_chat.message_id} as read: {str(e)}")
+                        logger.error("Error marking Gmail message %s as read: %s", db_chat.message_id, e)
                         # Continue with other messages even if one fails
     except Exception as e:
-        print(f"[DEBUG] Error accessing Gmail API: {str(e)}")
+        logger.error("Error accessing Gmail API: %s", e)
         # Continue even if Gmail API call fails
     
     return {"success": True, "message": f"Marked {len(db_chats)} chat messages as read"}
@@ -520,6 +567,7 @@ def mark_chat_as_read(
 def send_feedback(
     *,
     db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
     message_id: str,
     feedback: str = Body(..., embed=True),
     current_user: User = Depends(get_current_active_user),
@@ -543,6 +591,8 @@ def send_feedback(
         feedback=feedback,
         user_id=current_user.id
     )
+    # Index (or drop) the reply as a few-shot example after the response is sent
+    background_tasks.add_task(few_shot_service.sync_company, chat.company_id)
     
     return {"success": True, "message": "Feedback added"}
 
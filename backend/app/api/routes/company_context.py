@@ -1,11 +1,12 @@
 import logging
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app import crud, schemas
 from app.api import deps
+from app.services.context_retrieval_service import context_retrieval_service
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -36,6 +37,7 @@ def read_company_contexts(
 def create_company_context(
     *,
     db: Session = Depends(deps.get_db),
+    background_tasks: BackgroundTasks,
     company_context_in: schemas.CompanyContextCreate,
     current_user: schemas.User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -59,6 +61,10 @@ def create_company_context(
         )
     
     company_context = crud.company_context.create(db=db, obj_in=company_context_in)
+    # Rebuild the retrieval index after the response is sent
+    background_tasks.add_task(
+        context_retrieval_service.reindex_company, company_context.company_id, company_context.text_context
+    )
     return company_context
 
 @router.get("/{company_context_id}", response_model=schemas.CompanyContext)
@@ -101,6 +107,7 @@ def read_company_context_by_company_id(
 def update_company_context(
     *,
     db: Session = Depends(deps.get_db),
+    background_tasks: BackgroundTasks,
     company_context_id: int,
     company_context_in: schemas.CompanyContextUpdate,
     current_user: schemas.User = Depends(deps.get_current_active_user),
@@ -125,12 +132,17 @@ def update_company_context(
             )
     
     company_context = crud.company_context.update(db=db, db_obj=company_context, obj_in=company_context_in)
+    # Rebuild the retrieval index after the response is sent
+    background_tasks.add_task(
+        context_retrieval_service.reindex_company, company_context.company_id, company_context.text_context
+    )
     return company_context
 
 @router.put("/company/{company_id}/text-context", response_model=schemas.CompanyContext)
 def update_text_context(
     *,
     db: Session = Depends(deps.get_db),
+    background_tasks: BackgroundTasks,
     company_id: int,
     text_context_data: TextContextRequest,
     current_user: schemas.User = Depends(deps.get_current_active_user),
@@ -148,6 +160,11 @@ def update_text_context(
         text_context=text_context_data.text_context
     )
     
+    # Rebuild the retrieval index after the response is sent
+    background_tasks.add_task(
+        context_retrieval_service.reindex_company, company_id, company_context.text_context
+    )
+    
     logger.info(f"API: Successfully updated company context id: {company_context.id}")
     logger.debug(f"API: Final result - text_context: {bool(company_context.text_context)}")
     return company_context
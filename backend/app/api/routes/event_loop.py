@@ -0,0 +1,22 @@
+from typing import Any
+from fastapi import APIRouter, Depends, Query
+
+from app.api.deps import get_current_active_user
+from app.core.loop_watchdog import loop_watchdog
+from app.models.user import User
+from app.schemas.event_loop import EventLoopStallsResponse
+
+router = APIRouter()
+
+@router.get("/stalls", response_model=EventLoopStallsResponse)
+async def get_event_loop_stalls(
+    *,
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the call sites that blocked the event loop the longest since startup,
+    with the blocking library frames and the stack of the longest stall.
+    Counts are per server process.
+    """
+    return EventLoopStallsResponse(**loop_watchdog.summary(), sites=loop_watchdog.top_sites(limit))
@@ -1,13 +1,20 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Any, Optional
+from datetime import datetime
+import logging
+from fastapi import APIRouter, Depends, HTTPException, File, Query, UploadFile
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app import crud, models
 from app.models.user import User
-from app.schemas.lead import Lead, LeadCreate, LeadUpdate, LeadBulkCreate
+from app.schemas.lead import Lead, LeadCreate, LeadUpdate, LeadBulkCreate, LeadImportResult, LeadPage
+from app.core.config import settings
 from app.api import deps
+from app.utils.lead_import import LeadImportStats, detect_format, iter_lead_rows
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/", response_model=List[Lead])
 def read_leads(
@@ -27,6 +34,36 @@ def read_leads(
     )
     return leads
 
+@router.get("/page", response_model=LeadPage)
+def read_leads_page(
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    q: Optional[str] = Query(None, max_length=255),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve a page of the current user's company's leads, newest first.
+    
+    Pass `next_cursor` from the previous page as `cursor` to continue; `q`
+    filters on a substring of the name or email.
+    """
+    if not current_user.company_id:
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+    
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after is not None and not isinstance(after[0], datetime):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    leads, has_more = crud.lead.get_page(
+        db=db, company_id=current_user.company_id, limit=limit, after=after, search=q
+    )
+    next_cursor = encode_cursor(leads[-1].created_at, leads[-1].id) if has_more else None
+    return LeadPage(items=leads, next_cursor=next_cursor, has_more=has_more)
+
 @router.post("/", response_model=Lead)
 def create_lead(
     *,
@@ -40,17 +77,13 @@ def create_lead(
     if not current_user.company_id:
         raise HTTPException(status_code=400, detail="User not associated with any company")
     
-    # Check if lead with same email already exists
-    lead = crud.lead.get_by_email(
-        db=db, email=lead_in.email, company_id=current_user.company_id
-    )
-    if lead:
+    # Returns None if a lead with the same email already exists
+    lead = crud.lead.create(db=db, obj_in=lead_in, company_id=current_user.company_id)
+    if not lead:
         raise HTTPException(
             status_code=400,
             detail="A lead with this email already exists for this company",
         )
-    
-    lead = crud.lead.create(db=db, obj_in=lead_in, company_id=current_user.company_id)
     return lead
 
 @router.post("/bulk", response_model=List[Lead])
@@ -62,6 +95,7 @@ def create_leads_bulk(
 ) -> Any:
     """
     Create multiple leads in bulk.
+    Emails the company already has are skipped; only the created leads are returned.
     """
     if not current_user.company_id:
         raise HTTPException(status_code=400, detail="User not associated with any company")
@@ -69,6 +103,50 @@ def create_leads_bulk(
     leads = crud.lead.create_bulk(db=db, leads=leads_in.leads, company_id=current_user.company_id)
     return leads
 
+@router.post("/import", response_model=LeadImportResult)
+def import_leads(
+    *,
+    db: Session = Depends(deps.get_db),
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Import leads from a CSV or NDJSON file.
+    
+    CSV files may have a `name,email` header; NDJSON lines are {"name", "email"}
+    objects. The format is taken from `format`, else from the file name/content type.
+    The file is parsed and loaded incrementally (Postgres COPY), emails are
+    normalized, and emails the company already has are skipped. Returns counts
+    rather than the created leads.
+    """
+    if not current_user.company_id:
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+    
+    file_format = format or detect_format(file.filename, file.content_type)
+    stats = LeadImportStats()
+    try:
+        counts = crud.lead.import_rows(
+            db=db,
+            company_id=current_user.company_id,
+            rows=iter_lead_rows(file.file, file_format, stats)
+        )
+    except Exception as e:
+        logger.error(f"Lead import failed for company {current_user.company_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Lead import failed: {str(e)}")
+    
+    logger.info(
+        f"Imported leads for company {current_user.company_id}: received={stats.received}, "
+        f"inserted={counts['inserted']}, invalid={stats.invalid}"
+    )
+    return LeadImportResult(
+        received=stats.received,
+        invalid=stats.invalid,
+        inserted=counts["inserted"],
+        duplicates_in_file=counts["duplicates_in_file"],
+        already_existing=counts["already_existing"],
+    )
+
 @router.put("/{lead_id}", response_model=Lead)
 def update_lead(
     *,
@@ -89,7 +167,14 @@ def update_lead(
     if lead.company_id != current_user.company_id:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     
-    lead = crud.lead.update(db=db, db_obj=lead, obj_in=lead_in)
+    try:
+        lead = crud.lead.update(db=db, db_obj=lead, obj_in=lead_in)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="A lead with this email already exists for this company",
+        )
     return lead
 
 @router.delete("/{lead_id}", response_model=Lead)
@@ -1,8 +1,9 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_async_db, get_current_active_user
 from app.models.user import User
 from app.models.chat import Chat
 from app.schemas.notification import (
@@ -17,9 +18,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.put("/{message_id}/mark-read", response_model=NotificationReadResponse)
-def mark_notification_as_read(
+async def mark_notification_as_read(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     message_id: str,
     notification_update: NotificationUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -28,7 +29,8 @@ def mark_notification_as_read(
     Mark a notification as read/unread for a specific message.
     """
     # Find the chat message
-    chat_message = db.query(Chat).filter(Chat.message_id == message_id).first()
+    result = await db.execute(select(Chat).where(Chat.message_id == message_id).limit(1))
+    chat_message = result.scalars().first()
     if not chat_message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -45,8 +47,7 @@ def mark_notification_as_read(
     # Update the notification_read status
     chat_message.notification_read = notification_update.notification_read
     db.add(chat_message)
-    db.commit()
-    db.refresh(chat_message)
+    await db.commit()
     
     logger.info(f"Marked notification as {'read' if notification_update.notification_read else 'unread'} for message {message_id}")
     
@@ -57,9 +58,9 @@ def mark_notification_as_read(
     )
 
 @router.put("/bulk-mark-read", response_model=NotificationReadResponse)
-def mark_multiple_notifications_as_read(
+async def mark_multiple_notifications_as_read(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bulk_update: BulkNotificationUpdate,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
@@ -73,25 +74,26 @@ def mark_multiple_notifications_as_read(
         )
     
     # Find all chat messages for the given message IDs that belong to the user's company
-    chat_messages = db.query(Chat).filter(
-        Chat.message_id.in_(bulk_update.message_ids),
-        Chat.company_id == current_user.company_id
-    ).all()
+    # Update them in a single statement instead of loading every row
+    result = await db.execute(
+        update(Chat)
+        .where(
+            Chat.message_id.in_(bulk_update.message_ids),
+            Chat.company_id == current_user.company_id
+        )
+        .values(notification_read=bulk_update.notification_read)
+        .execution_options(synchronize_session=False)
+    )
+    updated_count = result.rowcount
     
-    if not chat_messages:
+    if not updated_count:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No chat messages found for the provided message IDs",
         )
     
-    # Update the notification_read status for all found messages
-    updated_count = 0
-    for chat_message in chat_messages:
-        chat_message.notification_read = bulk_update.notification_read
-        db.add(chat_message)
-        updated_count += 1
-    
-    db.commit()
+    await db.commit()
     
     logger.info(f"Marked {updated_count} notifications as {'read' if bulk_update.notification_read else 'unread'}")
     
@@ -102,9 +104,9 @@ def mark_multiple_notifications_as_read(
     )
 
 @router.get("/unread-count")
-def get_unread_notifications_count(
+async def get_unread_notifications_count(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
@@ -117,10 +119,12 @@ def get_unread_notifications_count(
         )
     
     # Count unread notifications for the company
-    unread_count = db.query(Chat).filter(
-        Chat.company_id == current_user.company_id,
-        Chat.notification_read == False
-    ).count()
+    unread_count = await db.scalar(
+        select(func.count(Chat.id)).where(
+            Chat.company_id == current_user.company_id,
+            Chat.notification_read == False
+        )
+    )
     
     return {
         "unread_count": unread_count,
@@ -128,9 +132,9 @@ def get_unread_notifications_count(
     }
 
 @router.get("/unread")
-def get_unread_notifications(
+async def get_unread_notifications(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     limit: int = 50,
 ) -> Any:
@@ -144,10 +148,13 @@ def get_unread_notifications(
         )
     
     # Get unread notifications for the company
-    unread_notifications = db.query(Chat).filter(
-        Chat.company_id == current_user.company_id,
-        Chat.notification_read == False
-    ).order_by(Chat.sent_at.desc()).limit(limit).all()
+    result = await db.execute(
+        select(Chat).where(
+            Chat.company_id == current_user.company_id,
+            Chat.notification_read == False
+        ).order_by(Chat.sent_at.desc()).limit(limit)
+    )
+    unread_notifications = result.scalars().all()
     
     # Format the response
     notifications = []
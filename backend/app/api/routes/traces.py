@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.deps import get_current_active_user
+from app.core.tracing import trace_exporter
+from app.models.user import User
+from app.schemas.trace import MessageTraceResponse
+
+router = APIRouter()
+
+@router.get("/{message_id}", response_model=MessageTraceResponse)
+async def get_message_trace(
+    *,
+    message_id: str,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get the pipeline traces (fetch, filter, classify, store, context append,
+    generate, send, broadcast) recorded for a message, newest first.
+    `message_id` is the provider message ID stored as `Chat.message_id`.
+    """
+    if not current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is not associated with any company",
+        )
+
+    if trace_exporter.in_memory(message_id):
+        traces = trace_exporter.find(message_id)
+    else:
+        # Older traces are read back from the trace files
+        traces = await asyncio.to_thread(trace_exporter.find, message_id)
+    traces = [trace for trace in traces if trace["attributes"].get("company.id") == current_user.company_id]
+    if not traces:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No trace found for this message",
+        )
+    return MessageTraceResponse(message_id=message_id, traces=traces)
@@ -1,7 +1,10 @@
 import json
 import logging
+import time
 from starlette.websockets import WebSocketState
 
+from app.core.metrics import WS_BROADCAST_MESSAGES, WS_BROADCAST_SECONDS
+
 logger = logging.getLogger(__name__)
 
 async def broadcast_new_email(company_email_ws_clients, company_id: int, email_data: dict):
@@ -12,6 +15,7 @@ async def broadcast_new_email(company_email_ws_clients, company_id: int, email_d
         logger.debug("No clients connected for company %s", company_id)
         return
 
+    started = time.perf_counter()
     # Make a stable copy so we can safely remove from the original
     client_list = list(clients)
     message = json.dumps({"type": "new_email", "data": email_data})
@@ -46,4 +50,9 @@ async def broadcast_new_email(company_email_ws_clients, company_id: int, email_d
         except Exception as e:
             logger.warning("Failed pruning dead clients: %s", e)
 
+    WS_BROADCAST_SECONDS.observe(time.perf_counter() - started)
+    if len(client_list) > len(dead):
+        WS_BROADCAST_MESSAGES.labels("sent").inc(len(client_list) - len(dead))
+    if dead:
+        WS_BROADCAST_MESSAGES.labels("pruned").inc(len(dead))
     logger.debug("Broadcast done for company %s (sent=%d, pruned=%d)", company_id, len(client_list) - len(dead), len(dead))
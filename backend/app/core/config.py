@@ -44,6 +44,48 @@ class Settings(BaseSettings):
 
     # AI
     OPENAI_API_KEY: str = ""
+    # Alternative API base URL (a proxy or a local fake); None uses the SDK default
+    OPENAI_BASE_URL: Optional[str] = None
+    VOICE_STREAM_MIN_CHUNK_CHARS: int = 30
+    VOICE_STREAM_MAX_PENDING_TTS: int = 2
+    VOICE_WS_SAMPLE_RATE: int = 16000
+    VOICE_VAD_ENERGY_THRESHOLD: int = 500
+    VOICE_VAD_SILENCE_MS: int = 700
+    VOICE_VAD_MIN_SPEECH_MS: int = 250
+    VOICE_VAD_MAX_UTTERANCE_SECONDS: int = 30
+    VOICE_SESSION_MAX_TURNS: int = 10
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: str = "tts_cache"
+    TTS_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    CONTEXT_INDEX_DIR: str = "context_index"
+    CONTEXT_CHUNK_CHARS: int = 1200
+    CONTEXT_CHUNK_OVERLAP_CHARS: int = 200
+    CONTEXT_RETRIEVAL_TOP_K: int = 4
+    CONTEXT_RETRIEVAL_MIN_CHARS: int = 4000
+    FEW_SHOT_INDEX_DIR: str = "few_shot_index"
+    FEW_SHOT_EXAMPLES: int = 3
+    FEW_SHOT_MIN_SIMILARITY: float = 0.5
+    FEW_SHOT_MIN_SATISFACTION: float = 60.0
+    REPLY_CACHE_ENABLED: bool = True
+    REPLY_CACHE_TTL_SECONDS: int = 6 * 3600
+    REPLY_CACHE_MIN_SIMILARITY: float = 0.93
+    REPLY_CACHE_REUSE_SIMILARITY: float = 0.98
+    REPLY_CACHE_MAX_ENTRIES: int = 200
+
+    # Calendar
+    CALENDAR_TIMEZONE: str = "Europe/Oslo"
+    CALENDAR_CACHE_TTL_SECONDS: int = 300
+    CALENDAR_CACHE_WINDOW_DAYS: int = 30
+
+    # Follow-up
+    FOLLOW_UP_PAGE_SIZE: int = 200
+    FOLLOW_UP_GENERATION_CONCURRENCY: int = 10
+    FOLLOW_UP_MAILBOX_SENDS_PER_MINUTE: int = 20
+    FOLLOW_UP_MAILBOX_BURST: int = 5
+    FOLLOW_UP_RETRY_MINUTES: int = 60
+    FOLLOW_UP_SAVE_BATCH_SIZE: int = 10
+    FOLLOW_UP_SAVE_RETRIES: int = 3
 
     # Pagination
     DEFAULT_PAGE_SIZE: int = 10
@@ -51,6 +93,8 @@ class Settings(BaseSettings):
 
     # SQLAlchemy
     SQLALCHEMY_ECHO: bool = False
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
 
     # Google OAuth
     GOOGLE_CLIENT_ID: str = ""
@@ -75,6 +119,62 @@ class Settings(BaseSettings):
     FACEBOOK_APP_SECRET: str = ""
     FACEBOOK_REDIRECT_URI: str = ""
 
+    # Outlook monitor
+    OUTLOOK_DELTA_INITIAL_LOOKBACK_MINUTES: int = 60
+
+    # Facebook monitor
+    FACEBOOK_INITIAL_LOOKBACK_MINUTES: int = 60
+    FACEBOOK_PAGE_SIZE: int = 25
+
+    # Instagram monitor
+    INSTAGRAM_INITIAL_LOOKBACK_MINUTES: int = 60
+    INSTAGRAM_PAGE_SIZE: int = 25
+    INSTAGRAM_CONVERSATION_CONCURRENCY: int = 5
+
+    # Provider API base URLs (pointed at local fakes by the benchmarks)
+    GMAIL_API_ENDPOINT: Optional[str] = None  # None uses the endpoint from the discovery document
+    MICROSOFT_GRAPH_BASE_URL: str = "https://graph.microsoft.com"
+    FACEBOOK_GRAPH_BASE_URL: str = "https://graph.facebook.com"
+    INSTAGRAM_GRAPH_BASE_URL: str = "https://graph.instagram.com"
+
+    # Provider HTTP client (Graph, Facebook, Instagram)
+    PROVIDER_HTTP_TIMEOUT_SECONDS: float = 30.0
+    PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 100
+    PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    PROVIDER_HTTP_MAX_CONNECTIONS_PER_HOST: int = 10
+    PROVIDER_HTTP_MAX_RETRIES: int = 3
+    PROVIDER_HTTP_BACKOFF_BASE_SECONDS: float = 0.5
+    PROVIDER_HTTP_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_FILE: Optional[str] = "app.log"
+    # Per-logger levels, e.g. "app.services.gmail_monitor_service=DEBUG,httpx=WARNING"
+    LOG_LEVELS: str = ""
+    # Fraction of DEBUG records kept per logger, e.g. "app.services.gmail_monitor_service=0.1"
+    LOG_DEBUG_SAMPLING: str = ""
+
+    # Tracing
+    TRACING_ENABLED: bool = True
+    TRACE_SERVICE_NAME: str = "ciri-backend"
+    # Finished traces are appended as OTLP/JSON lines; None keeps them in memory only
+    TRACE_FILE: Optional[str] = "traces.jsonl"
+    TRACE_FILE_MAX_BYTES: int = 50 * 1024 * 1024
+    TRACE_FILE_BACKUPS: int = 3
+    # Recent traces kept in memory for the trace API
+    TRACE_MEMORY_TRACES: int = 2000
+
+    # Event loop watchdog
+    LOOP_WATCHDOG_ENABLED: bool = True
+    LOOP_WATCHDOG_INTERVAL_SECONDS: float = 0.1  # Heartbeat period on the loop
+    LOOP_WATCHDOG_SAMPLE_SECONDS: float = 0.05  # How often the watchdog thread checks the heartbeat
+    LOOP_STALL_THRESHOLD_SECONDS: float = 0.25
+    LOOP_STALL_STACK_DEPTH: int = 40
+    LOOP_STALL_MAX_SITES: int = 500
+
     class Config:
         env_file = ".env"
         case_sensitive = True
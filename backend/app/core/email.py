@@ -18,6 +18,8 @@ from email.mime.text import MIMEText
 import base64
 import uuid
 
+logger = logging.getLogger(__name__)
+
 # Configure FastMail
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.MAIL_USERNAME,
@@ -85,6 +87,11 @@ async def send_verification_code(email_to: EmailStr, code: str, expires_in_minut
         body=body,
     )
 
+def build_gmail_service(credentials: Credentials):
+    """Build a Gmail API client; GMAIL_API_ENDPOINT overrides the endpoint (used for local fakes)."""
+    client_options = {"api_endpoint": settings.GMAIL_API_ENDPOINT} if settings.GMAIL_API_ENDPOINT else None
+    return build('gmail', 'v1', credentials=credentials, client_options=client_options)
+
 async def send_email_via_gmail_api(
     email_to: str,
     subject: str,
@@ -144,7 +151,7 @@ async def send_email_via_gmail_api(
             creds.refresh(Request())
         
         # Build Gmail service
-        service = build('gmail', 'v1', credentials=creds)
+        service = build_gmail_service(creds)
         
         # Create the email message
         message = MIMEText(body)
@@ -159,7 +166,7 @@ async def send_email_via_gmail_api(
             message['Message-ID'] = new_message_id
             message['In-Reply-To'] = original_message_id
             message['References'] = original_message_id
-            print(f"Sending email via Gmail API to {email_to} with thread_id: {thread_id}, original_message_id: {original_message_id}")
+            logger.debug("Sending email via Gmail API to %s with thread_id: %s, original_message_id: %s", email_to, thread_id, original_message_id)
             
             # Send the message with retry logic
             def send_message():
@@ -330,7 +337,6 @@ async def send_plain_email(
                 VALIDATE_CERTS=settings.MAIL_VALIDATE_CERTS,
                 TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates" / "email"
             )
-            print(f"custom_conf================>: {custom_conf}")
             fm = FastMail(custom_conf)
         else:
             # Use default configuration from settings
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import observe_provider_request
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Status codes that are worth retrying; 429 and 503 usually carry Retry-After
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Methods that can be replayed safely after the request may have reached the server
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class ProviderHTTPClient:
+    """
+    Shared pooled async HTTP client for the Graph (Outlook), Facebook and Instagram APIs.
+
+    One httpx.AsyncClient is kept per event loop so connections are reused across
+    companies and sweeps. Concurrency towards a single host is capped with a
+    per-host semaphore, and transient failures are retried with exponential
+    backoff (honouring Retry-After). Non-idempotent requests (POST/PATCH) are only
+    retried when the server cannot have acted on them: connection failures and 429.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    settings.PROVIDER_HTTP_TIMEOUT_SECONDS,
+                    connect=settings.PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+            self._loop = loop
+            self._host_semaphores = {}
+            logger.info(f"Created provider HTTP client (http2={HTTP2_AVAILABLE})")
+        return self._client
+
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.PROVIDER_HTTP_MAX_CONNECTIONS_PER_HOST)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    @staticmethod
+    def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def _backoff_seconds(attempt: int) -> float:
+        delay = settings.PROVIDER_HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt)
+        delay = min(delay, settings.PROVIDER_HTTP_BACKOFF_MAX_SECONDS)
+        return delay + random.uniform(0, delay / 2)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> httpx.Response:
+        """
+        Send a request and return the final response.
+
+        Non-2xx responses are returned to the caller (after retries are exhausted)
+        so each service can keep its own error handling. Transport errors are raised
+        as httpx exceptions once retries are exhausted.
+        """
+        method = method.upper()
+        retries = settings.PROVIDER_HTTP_MAX_RETRIES if max_retries is None else max_retries
+        idempotent = method in IDEMPOTENT_METHODS
+        client = self._get_client()
+        semaphore = self._get_host_semaphore(url)
+        request_kwargs: Dict[str, Any] = {"params": params, "json": json, "data": data, "headers": headers}
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
+
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    with span(f"{method} {host}", attempt=attempt) as http_span:
+                        started = time.perf_counter()
+                        try:
+                            response = await client.request(method, url, **request_kwargs)
+                        except httpx.TransportError:
+                            observe_provider_request(host, method, "error", time.perf_counter() - started)
+                            raise
+                        observe_provider_request(host, method, str(response.status_code), time.perf_counter() - started)
+                        if http_span is not None:
+                            http_span.set_attribute("http.status_code", response.status_code)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached the server, so any method can be retried
+                if attempt >= retries:
+                    raise
+                delay = self._backoff_seconds(attempt)
+                logger.warning(f"{method} {url} connection failed ({e!r}), retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+            except httpx.TransportError as e:
+                if not idempotent or attempt >= retries:
+                    raise
+                delay = self._backoff_seconds(attempt)
+                logger.warning(f"{method} {url} transport error ({e!r}), retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES and (
+                    idempotent or response.status_code == 429
+                )
+                if not retryable or attempt >= retries:
+                    return response
+                delay = self._retry_after_seconds(response)
+                if delay is None:
+                    delay = self._backoff_seconds(attempt)
+                delay = min(delay, settings.PROVIDER_HTTP_BACKOFF_MAX_SECONDS)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+                await response.aclose()
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the pooled client (called on application shutdown)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+        self._host_semaphores = {}
+
+
+# Create a singleton instance
+provider_http_client = ProviderHTTPClient()
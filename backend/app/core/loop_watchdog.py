@@ -0,0 +1,222 @@
+import asyncio
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LOOP_BLOCKED_SECONDS, LOOP_LAG_SECONDS, LOOP_STALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# (filename, line number, function)
+Frame = Tuple[str, int, str]
+
+# Frames under this directory are application code; the innermost one is the call site
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_PROJECT_DIR = os.path.dirname(_APP_DIR.rstrip(os.sep)) + os.sep
+
+
+def _walk(frame: Optional[FrameType], limit: int) -> List[Frame]:
+    """Stack of `frame`, innermost first, without reading source lines."""
+    frames = []
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        frames.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return frames
+
+
+def _label(frame: Frame) -> str:
+    filename, lineno, name = frame
+    if filename.startswith(_PROJECT_DIR):
+        filename = filename[len(_PROJECT_DIR):]
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    return f"{filename}:{lineno} in {name}"
+
+
+def _call_site(stack: List[Frame]) -> Tuple[str, str]:
+    """The innermost application frame (where to fix it) and the innermost frame (what blocked)."""
+    leaf = _label(stack[0]) if stack else "unknown"
+    for frame in stack:
+        if frame[0].startswith(_APP_DIR):
+            return _label(frame), leaf
+    return leaf, leaf
+
+
+def _format_stack(stack: List[Frame]) -> List[str]:
+    """Outermost first, like a traceback."""
+    lines = []
+    for frame in reversed(stack):
+        source = linecache.getline(frame[0], frame[1]).strip()
+        lines.append(f"{_label(frame)}: {source}" if source else _label(frame))
+    return lines
+
+
+class _Stall:
+    """Stack samples of the loop thread taken while the loop was stalled."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.samples: Counter = Counter()
+        self.leaves: Dict[str, Counter] = {}
+        self.stacks: Dict[str, List[Frame]] = {}
+
+    def add(self, stack: List[Frame]) -> None:
+        site, leaf = _call_site(stack)
+        self.samples[site] += 1
+        self.leaves.setdefault(site, Counter())[leaf] += 1
+        self.stacks.setdefault(site, stack)
+
+
+class LoopWatchdog:
+    """
+    Detects event loop stalls and finds the code causing them.
+
+    A heartbeat task on the loop wakes every LOOP_WATCHDOG_INTERVAL_SECONDS and
+    records how late it ran (ciri_event_loop_lag_seconds). A daemon thread
+    checks the heartbeat; once it is overdue by LOOP_STALL_THRESHOLD_SECONDS it
+    samples the loop thread's stack with sys._current_frames() until the loop
+    runs again. The stall's duration is split over the sampled call sites (the
+    innermost frame under app/), which are logged, counted in
+    ciri_event_loop_blocked_seconds{site} and kept for the stalls API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._stalls = 0
+        self._blocked_seconds = 0.0
+        self._started_at: Optional[datetime] = None
+        self._last_beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start watching the running loop. Call from a coroutine on that loop."""
+        if not settings.LOOP_WATCHDOG_ENABLED or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._started_at = datetime.now(timezone.utc)
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 1.0)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        interval = settings.LOOP_WATCHDOG_INTERVAL_SECONDS
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._last_beat = now
+            LOOP_LAG_SECONDS.observe(max(0.0, now - expected))
+
+    def _watch(self) -> None:
+        interval = settings.LOOP_WATCHDOG_INTERVAL_SECONDS
+        threshold = settings.LOOP_STALL_THRESHOLD_SECONDS
+        stall: Optional[_Stall] = None
+        while not self._stop.wait(settings.LOOP_WATCHDOG_SAMPLE_SECONDS):
+            beat = self._last_beat
+            if time.monotonic() - beat - interval >= threshold:
+                if stall is None:
+                    stall = _Stall(started=beat + interval)
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    stall.add(_walk(frame, settings.LOOP_STALL_STACK_DEPTH))
+                del frame
+            elif stall is not None:
+                # The heartbeat ran again: the stall ended when it did
+                self._finish(stall, max(0.0, beat - stall.started))
+                stall = None
+
+    def _finish(self, stall: _Stall, duration: float) -> None:
+        total = sum(stall.samples.values())
+        if not total:
+            return
+        LOOP_STALL_SECONDS.observe(duration)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._stalls += 1
+            self._blocked_seconds += duration
+            for site, samples in stall.samples.items():
+                share = duration * samples / total
+                LOOP_BLOCKED_SECONDS.labels(site).inc(share)
+                entry = self._sites.get(site)
+                if entry is None:
+                    if len(self._sites) >= settings.LOOP_STALL_MAX_SITES:
+                        # Make room by dropping the site that blocked least
+                        del self._sites[min(self._sites, key=lambda key: self._sites[key]["blocked_seconds"])]
+                    entry = self._sites[site] = {
+                        "site": site, "stalls": 0, "samples": 0, "blocked_seconds": 0.0,
+                        "max_stall_seconds": 0.0, "blocking_calls": Counter(), "stack": [],
+                    }
+                entry["stalls"] += 1
+                entry["samples"] += samples
+                entry["blocked_seconds"] += share
+                entry["last_seen"] = now
+                entry["blocking_calls"].update(stall.leaves[site])
+                if duration >= entry["max_stall_seconds"]:
+                    entry["max_stall_seconds"] = duration
+                    entry["stack"] = stall.stacks[site]
+
+        site, samples = stall.samples.most_common(1)[0]
+        stack = _format_stack(stall.stacks[site])
+        logger.warning(
+            "Event loop blocked for %.3fs, mostly at %s (%d/%d samples)", duration, site, samples, total,
+            extra={"stall_seconds": round(duration, 3), "call_site": site, "stack": stack},
+        )
+
+    def top_sites(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Call sites ordered by total time they blocked the loop."""
+        with self._lock:
+            entries = sorted(self._sites.values(), key=lambda entry: entry["blocked_seconds"], reverse=True)[:limit]
+            return [
+                {
+                    **{key: value for key, value in entry.items() if key not in ("blocking_calls", "stack")},
+                    "blocked_seconds": round(entry["blocked_seconds"], 3),
+                    "max_stall_seconds": round(entry["max_stall_seconds"], 3),
+                    "blocking_calls": [
+                        {"frame": frame, "samples": samples} for frame, samples in entry["blocking_calls"].most_common(5)
+                    ],
+                    "stack": _format_stack(entry["stack"]),
+                }
+                for entry in entries
+            ]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self._task is not None,
+                "since": self._started_at,
+                "threshold_seconds": settings.LOOP_STALL_THRESHOLD_SECONDS,
+                "stalls": self._stalls,
+                "blocked_seconds": round(self._blocked_seconds, 3),
+            }
+
+
+# Create a singleton instance
+loop_watchdog = LoopWatchdog()
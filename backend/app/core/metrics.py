@@ -0,0 +1,245 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.tracing import Span, span
+
+T = TypeVar("T")
+
+# Buckets are chosen per metric so the interesting range has resolution
+SWEEP_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+COMPANY_POLL_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+HTTP_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+BROADCAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOOP_STALL_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+POLL_SWEEP_SECONDS = Histogram(
+    "ciri_poll_sweep_seconds", "Duration of one polling sweep over all companies", ["provider"],
+    buckets=SWEEP_BUCKETS,
+)
+COMPANY_POLL_SECONDS = Histogram(
+    "ciri_company_poll_seconds", "Duration of polling one company", ["provider"],
+    buckets=COMPANY_POLL_BUCKETS,
+)
+PROVIDER_API_SECONDS = Histogram(
+    "ciri_provider_api_seconds", "Latency of provider API requests (per attempt)", ["host", "method", "status"],
+    buckets=HTTP_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "ciri_llm_seconds", "Latency of OpenAI calls", ["method", "status"],
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "ciri_llm_tokens", "Tokens used by OpenAI calls", ["method", "kind"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "ciri_db_query_seconds", "Database statement execution time", ["route"],
+    buckets=DB_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "ciri_http_request_seconds", "HTTP request duration", ["method", "route", "status"],
+    buckets=HTTP_BUCKETS,
+)
+WS_CONNECTIONS = Gauge(
+    "ciri_ws_connections", "Open email notification WebSocket connections",
+)
+WS_BROADCAST_SECONDS = Histogram(
+    "ciri_ws_broadcast_seconds", "Duration of broadcasting one event to a company's WebSockets",
+    buckets=BROADCAST_BUCKETS,
+)
+WS_BROADCAST_MESSAGES = Counter(
+    "ciri_ws_broadcast_messages", "WebSocket broadcast deliveries", ["outcome"],
+)
+MESSAGES_INGESTED = Counter(
+    "ciri_messages_ingested", "Incoming messages stored", ["provider"],
+)
+MESSAGES_REPLIED = Counter(
+    "ciri_messages_replied", "Automatic replies stored", ["provider"],
+)
+MESSAGES_ESCALATED = Counter(
+    "ciri_messages_escalated", "Incoming messages flagged as requiring action", ["provider"],
+)
+LOOP_LAG_SECONDS = Histogram(
+    "ciri_event_loop_lag_seconds", "How late the event loop ran a timer callback",
+    buckets=LOOP_LAG_BUCKETS,
+)
+LOOP_STALL_SECONDS = Histogram(
+    "ciri_event_loop_stall_seconds", "Duration of event loop stalls over the threshold",
+    buckets=LOOP_STALL_BUCKETS,
+)
+LOOP_BLOCKED_SECONDS = Counter(
+    "ciri_event_loop_blocked_seconds", "Event loop time blocked in stalls, by application call site", ["site"],
+)
+
+# The ASGI scope of the request being handled; the route is resolved lazily
+# because routing happens after the middleware runs.
+_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metrics_request_scope", default=None)
+# Label for work outside a request (polling tasks)
+_task_label: ContextVar[str] = ContextVar("metrics_task_label", default="background")
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def current_route_label() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return _task_label.get()
+    return _route_label(scope)
+
+
+@contextmanager
+def task_label(name: str) -> Iterator[None]:
+    """Attribute database time in the block to `name` instead of a route."""
+    token = _task_label.set(name)
+    try:
+        yield
+    finally:
+        _task_label.reset(token)
+
+
+def time_each(items: Iterable[T], provider: str) -> Iterator[T]:
+    """
+    Iterate over companies, observing COMPANY_POLL_SECONDS for each one: the time
+    from handing out an item until the loop asks for the next one (so `continue`
+    is measured too).
+    """
+    histogram = COMPANY_POLL_SECONDS.labels(provider)
+    for item in items:
+        started = time.perf_counter()
+        yield item
+        histogram.observe(time.perf_counter() - started)
+
+
+def record_ingested(provider: str, chats: Iterable[Any]) -> None:
+    """Count stored incoming messages, and those flagged as requiring action."""
+    count = escalated = 0
+    for chat in chats:
+        count += 1
+        if getattr(chat, "action_required", False):
+            escalated += 1
+    if count:
+        MESSAGES_INGESTED.labels(provider).inc(count)
+    if escalated:
+        MESSAGES_ESCALATED.labels(provider).inc(escalated)
+
+
+class LLMCall:
+    """Handle passed to an `llm_call` block; record token usage on it."""
+
+    __slots__ = ("method", "span")
+
+    def __init__(self, method: str, span: Optional[Span] = None):
+        self.method = method
+        self.span = span
+
+    def record_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt, completion = getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+        if prompt:
+            LLM_TOKENS.labels(self.method, "prompt").inc(prompt)
+        if completion:
+            LLM_TOKENS.labels(self.method, "completion").inc(completion)
+        if self.span is not None:
+            self.span.set_attribute("llm.prompt_tokens", prompt)
+            self.span.set_attribute("llm.completion_tokens", completion)
+
+
+@contextmanager
+def llm_call(method: str) -> Iterator[LLMCall]:
+    """
+    Time an OpenAI call; the status label is "error" if the block raises. Inside a
+    traced pipeline the call is also a span of the current trace.
+    """
+    started = time.perf_counter()
+    status = "error"
+    with span(f"openai.{method}") as llm_span:
+        try:
+            yield LLMCall(method, llm_span)
+            status = "ok"
+        finally:
+            LLM_SECONDS.labels(method, status).observe(time.perf_counter() - started)
+
+
+def observe_provider_request(host: str, method: str, status: str, seconds: float) -> None:
+    PROVIDER_API_SECONDS.labels(host, method, status).observe(seconds)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Observe DB_QUERY_SECONDS for every statement, labelled with the current route."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(current_route_label()).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that makes the request's route available to the DB timing
+    hooks and observes HTTP_REQUEST_SECONDS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        if scope["type"] == "websocket":
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _request_scope.reset(token)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_scope.reset(token)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], _route_label(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+def render_latest() -> bytes:
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
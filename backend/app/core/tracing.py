@@ -0,0 +1,379 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.logging_config import DeferredQueueHandler
+
+logger = logging.getLogger(__name__)
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+_STATUS_NAMES = {STATUS_UNSET: "unset", STATUS_OK: "ok", STATUS_ERROR: "error"}
+
+# The span new spans are attached to; None outside a traced pipeline
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # int64 is a string in OTLP/JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _from_otlp_attributes(attributes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    result = {}
+    for attribute in attributes or []:
+        value = attribute.get("value", {})
+        if "intValue" in value:
+            result[attribute["key"]] = int(value["intValue"])
+        else:
+            result[attribute["key"]] = next(iter(value.values()), None)
+    return result
+
+
+class Span:
+    """One timed step of a trace."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(
+        self,
+        trace: "Trace",
+        name: str,
+        parent_id: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: Any) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = str(error)[:500]
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class Trace:
+    """
+    The path of one incoming message through the pipeline (fetch, filter, classify,
+    store, context append, generate, send, broadcast).
+
+    The root span covers the whole trace; steps are child spans, added with
+    `trace.span(...)` or, in code called while the trace is current (`use_trace`),
+    with the module-level `span(...)`. Steps shared by a batch of messages are
+    timed once and added to each trace with `record`. Nothing is exported until
+    `end()` is called.
+    """
+
+    def __init__(self, name: str, start_ns: Optional[int] = None, **attributes: Any):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(self, name, start_ns=start_ns, attributes=attributes)
+        self.spans: List[Span] = [self.root]
+        self.ended = False
+
+    @property
+    def message_id(self) -> Optional[str]:
+        return self.root.attributes.get("message.id")
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.root.set_attribute(key, value)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        with use_trace(self), span(name, **attributes) as current:
+            yield current
+
+    def record(self, name: str, start_ns: int, end_ns: int, **attributes: Any) -> Span:
+        """Add a step that has already happened (e.g. a fetch or insert shared by a batch)."""
+        step = Span(self, name, parent_id=self.root.span_id, start_ns=start_ns, attributes=attributes)
+        step.end_ns = end_ns
+        self.spans.append(step)
+        return step
+
+    def end(self, error: Any = None, **attributes: Any) -> None:
+        """Finish the trace and hand it to the exporter. Later calls do nothing."""
+        if self.ended:
+            return
+        self.ended = True
+        self.root.attributes.update(attributes)
+        if error is not None:
+            self.root.set_error(error)
+        elif self.root.status == STATUS_UNSET:
+            self.root.status = STATUS_OK
+        self.root.end_ns = time.time_ns()
+        if settings.TRACING_ENABLED:
+            trace_exporter.export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": settings.TRACE_SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    # Spans still open when the trace ended (e.g. a failed step) are dropped
+                    "spans": [step.to_otlp() for step in self.spans if step.end_ns is not None],
+                }],
+            }]
+        }
+
+
+def start_trace(message_id: str, provider: str, company_id: int, start_ns: Optional[int] = None, **attributes: Any) -> Trace:
+    """Start the trace of an incoming message; `start_ns` backdates it to when its fetch began."""
+    return Trace(
+        f"{provider}.message",
+        start_ns=start_ns,
+        **{"message.id": message_id, "provider": provider, "company.id": company_id},
+        **attributes,
+    )
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make `trace` current in the block, so `span()` calls in code it runs are added to it."""
+    if trace is None:
+        yield None
+        return
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(token)
+
+
+def set_trace_attribute(key: str, value: Any) -> None:
+    """Set an attribute on the current trace's root span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.trace.set_attribute(key, value)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time the block as a child of the current span. Outside a trace this does
+    nothing and yields None. An exception marks the span as failed.
+    """
+    parent = _current_span.get()
+    if parent is None or parent.trace.ended:
+        yield None
+        return
+    current = Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+    parent.trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(str(e) or type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+
+
+def summarize(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Turn an exported OTLP/JSON trace into the shape returned by the trace API."""
+    spans = [
+        step
+        for resource_spans in payload.get("resourceSpans", [])
+        for scope_spans in resource_spans.get("scopeSpans", [])
+        for step in scope_spans.get("spans", [])
+    ]
+    root = next((step for step in spans if not step.get("parentSpanId")), None)
+    if root is None:
+        return None
+    root_start = int(root["startTimeUnixNano"])
+
+    def describe(step: Dict[str, Any]) -> Dict[str, Any]:
+        start, end = int(step["startTimeUnixNano"]), int(step["endTimeUnixNano"])
+        status = step.get("status", {})
+        return {
+            "name": step["name"],
+            "span_id": step["spanId"],
+            "parent_span_id": step.get("parentSpanId"),
+            "offset_ms": round((start - root_start) / 1e6, 3),
+            "duration_ms": round((end - start) / 1e6, 3),
+            "status": _STATUS_NAMES.get(status.get("code", STATUS_UNSET), "unset"),
+            "status_message": status.get("message"),
+            "attributes": _from_otlp_attributes(step.get("attributes")),
+        }
+
+    summary = describe(root)
+    return {
+        "trace_id": root["traceId"],
+        "name": summary["name"],
+        "start_time": datetime.fromtimestamp(root_start / 1e9, timezone.utc),
+        "duration_ms": summary["duration_ms"],
+        "status": summary["status"],
+        "status_message": summary["status_message"],
+        "attributes": summary["attributes"],
+        "spans": sorted(
+            (describe(step) for step in spans if step is not root),
+            key=lambda step: step["offset_ms"],
+        ),
+    }
+
+
+class _OTLPLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, separators=(",", ":"))
+
+
+class TraceExporter:
+    """
+    Keeps recently finished traces in memory, indexed by message id, and appends
+    each one as an OTLP/JSON line to TRACE_FILE (the format of the OpenTelemetry
+    collector's file exporter, so the file can be replayed into any OTLP backend).
+    Lines are written by a listener thread behind a queue, like application logs,
+    so ending a trace only costs an enqueue on the event loop.
+    """
+
+    def __init__(self):
+        self._recent: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._logger: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def _file_logger(self) -> logging.Logger:
+        if self._logger is None:
+            trace_logger = logging.getLogger("app.traces")
+            trace_logger.propagate = False
+            trace_logger.setLevel(logging.INFO)
+            trace_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            handler = logging.handlers.RotatingFileHandler(
+                settings.TRACE_FILE,
+                maxBytes=settings.TRACE_FILE_MAX_BYTES,
+                backupCount=settings.TRACE_FILE_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(_OTLPLineFormatter())
+            trace_logger.addHandler(DeferredQueueHandler(trace_queue))
+            self._listener = logging.handlers.QueueListener(trace_queue, handler)
+            self._listener.start()
+            atexit.register(self.stop)
+            self._logger = trace_logger
+        return self._logger
+
+    def export(self, trace: Trace) -> None:
+        payload = trace.to_otlp()
+        message_id = trace.message_id
+        if message_id:
+            self._recent.setdefault(message_id, []).append(payload)
+            self._recent.move_to_end(message_id)
+            while len(self._recent) > settings.TRACE_MEMORY_TRACES:
+                self._recent.popitem(last=False)
+        if settings.TRACE_FILE:
+            try:
+                self._file_logger().info(payload)
+            except OSError as e:
+                logger.warning("Could not write trace %s: %s", trace.trace_id, e)
+
+    def stop(self) -> None:
+        """Flush queued traces to the file and stop the writer thread."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _scan_files(self, message_id: str) -> List[Dict[str, Any]]:
+        paths = [settings.TRACE_FILE] + [f"{settings.TRACE_FILE}.{i}" for i in range(1, settings.TRACE_FILE_BACKUPS + 1)]
+        needle = json.dumps(message_id, ensure_ascii=False)
+        found = []
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        # Cheap substring check before parsing
+                        if needle not in line:
+                            continue
+                        try:
+                            payload = json.loads(line)
+                        except ValueError:
+                            continue
+                        summary = summarize(payload)
+                        if summary and summary["attributes"].get("message.id") == message_id:
+                            found.append(summary)
+            except FileNotFoundError:
+                continue
+        return found
+
+    def find(self, message_id: str) -> List[Dict[str, Any]]:
+        """
+        Traces recorded for a message, newest first. Recent traces are served from
+        memory; older ones are read back from the trace files (blocking, so call it
+        in a worker thread when it may hit the files).
+        """
+        payloads = self._recent.get(message_id)
+        if payloads:
+            traces = [summary for summary in map(summarize, list(payloads)) if summary]
+        elif settings.TRACE_FILE:
+            traces = self._scan_files(message_id)
+        else:
+            traces = []
+        return sorted(traces, key=lambda trace: trace["start_time"], reverse=True)
+
+    def in_memory(self, message_id: str) -> bool:
+        return message_id in self._recent
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Every trace kept in memory, summarized, oldest message first."""
+        return [
+            summary
+            for payloads in list(self._recent.values())
+            for summary in map(summarize, payloads)
+            if summary
+        ]
+
+    def clear(self) -> None:
+        """Forget the in-memory traces (files are left alone)."""
+        self._recent.clear()
+
+
+# Create a singleton instance
+trace_exporter = TraceExporter()
@@ -4,3 +4,4 @@ from .crud_user import user
 from .crud_company import company
 from .crud_lead import lead
 from .crud_company_context import company_context
+from .crud_chat import chat
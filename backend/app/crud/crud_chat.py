@@ -0,0 +1,163 @@
+import html
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from pydantic import BaseModel
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.crud.base import CRUDBase
+from app.models.chat import Chat
+
+logger = logging.getLogger(__name__)
+
+# ts_headline delimiters (private-use characters). Messages are attacker-controlled,
+# so snippets are HTML-escaped before the delimiters are turned into <mark> tags.
+_MARK_START = "\ue000"
+_MARK_STOP = "\ue001"
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    """HTML-escape a ts_headline snippet and mark its matches with <mark>."""
+    return html.escape(snippet or "").replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+class CRUDChat(CRUDBase[Chat, BaseModel, BaseModel]):
+    """
+    Ingest repository for messages fetched by the channel monitors.
+
+    Monitors first call get_existing_message_ids once per batch so they can skip
+    the AI filtering/analysis for messages that are already stored, then hand the
+    normalized rows of the remaining messages to ingest_batch.
+    """
+
+    async def get_existing_message_ids(
+        self, db: AsyncSession, *, company_id: int, message_ids: Iterable[str]
+    ) -> Set[str]:
+        """Return the subset of message_ids already stored for the company (one IN query)."""
+        ids = {message_id for message_id in message_ids if message_id}
+        if not ids:
+            return set()
+        result = await db.execute(
+            select(Chat.message_id).where(
+                Chat.company_id == company_id,
+                Chat.message_id.in_(ids)
+            )
+        )
+        return set(result.scalars().all())
+
+    async def get_by_message_ids(
+        self, db: AsyncSession, *, company_id: int, message_ids: Iterable[str]
+    ) -> Dict[str, Chat]:
+        """Return stored chats for the given message ids, keyed by message_id (one IN query)."""
+        ids = {message_id for message_id in message_ids if message_id}
+        if not ids:
+            return {}
+        result = await db.execute(
+            select(Chat).where(
+                Chat.company_id == company_id,
+                Chat.message_id.in_(ids)
+            )
+        )
+        return {chat.message_id: chat for chat in result.scalars().all()}
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        company_id: int,
+        query: str,
+        limit: int = 20,
+        after: Optional[Tuple[float, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Full-text search over a company's messages (subject and body).
+
+        The query uses web search syntax ("quoted phrases", -exclusions, OR) and is
+        matched both stemmed (norwegian) and verbatim (simple). Hits are ordered by
+        ts_rank, then id, and keyset-paginated on (rank, id): pass the last hit's
+        (rank, id) as `after`. Highlighted snippets are only built for the
+        returned page; they are HTML-escaped with matches wrapped in <mark>.
+
+        Returns:
+            tuple: (hits, has_more)
+        """
+        params: Dict[str, Any] = {
+            "company_id": company_id, "query": query, "limit": limit + 1,
+            "subject_options": f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, HighlightAll=true",
+            "body_options": f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxFragments=2, MaxWords=25, MinWords=8",
+        }
+        after_clause = ""
+        if after is not None:
+            after_clause = "AND (ts_rank(c.search_vector, q.tsq), c.id) < (CAST(:after_rank AS real), :after_id)"
+            params.update(after_rank=after[0], after_id=after[1])
+
+        result = await db.execute(text(f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery('norwegian', :query) || websearch_to_tsquery('simple', :query) AS tsq
+            ),
+            page AS (
+                SELECT c.id, ts_rank(c.search_vector, q.tsq) AS rank
+                FROM chat c, q
+                WHERE c.company_id = :company_id
+                  AND c.search_vector @@ q.tsq
+                  {after_clause}
+                ORDER BY rank DESC, c.id DESC
+                LIMIT :limit
+            )
+            SELECT
+                c.id, c.channel_id, c.message_id, c.from_email, c.subject, c.sent_at,
+                c.email_provider, c.is_read, page.rank,
+                ts_headline('norwegian', coalesce(c.subject, ''), q.tsq, :subject_options) AS subject_highlight,
+                ts_headline('norwegian', coalesce(c.body_text, ''), q.tsq, :body_options) AS body_highlight
+            FROM page
+            JOIN chat c ON c.id = page.id
+            CROSS JOIN q
+            ORDER BY page.rank DESC, page.id DESC
+        """), params)
+        hits = [dict(row) for row in result.mappings().all()]
+        for hit in hits:
+            hit["subject_highlight"] = _highlight(hit["subject_highlight"])
+            hit["body_highlight"] = _highlight(hit["body_highlight"])
+        return hits[:limit], len(hits) > limit
+
+    async def ingest_batch(self, db: AsyncSession, *, rows: List[Dict[str, Any]]) -> List[Chat]:
+        """
+        Insert normalized chat rows in one statement and commit once.
+
+        Each row is a dict of Chat column values and must include company_id and
+        message_id. Rows that collide on uq_chat_company_message (already stored,
+        or stored by a concurrent sweep) are skipped by ON CONFLICT DO NOTHING.
+
+        Returns:
+            The Chat rows that were actually inserted (detached), in input order.
+        """
+        # Drop duplicates within the batch; ON CONFLICT cannot resolve two rows in one statement
+        unique_rows: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            unique_rows.setdefault((row['company_id'], row['message_id']), row)
+        if not unique_rows:
+            return []
+
+        stmt = (
+            pg_insert(Chat)
+            .values(list(unique_rows.values()))
+            .on_conflict_do_nothing(constraint='uq_chat_company_message')
+            .returning(Chat)
+        )
+        inserted = (await db.scalars(stmt)).all()
+        await db.commit()
+        # Detach the new rows: a rollback while handling one of them (which expires
+        # every instance in the session) must not invalidate the rest of the batch
+        for obj in inserted:
+            db.expunge(obj)
+
+        skipped = len(unique_rows) - len(inserted)
+        if skipped:
+            logger.info(f"Skipped {skipped} chat rows that were already stored")
+
+        order = {key: i for i, key in enumerate(unique_rows)}
+        return sorted(inserted, key=lambda chat: order[(chat.company_id, chat.message_id)])
+
+
+chat = CRUDChat(Chat)
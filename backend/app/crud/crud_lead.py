@@ -1,9 +1,24 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Interval, func, literal, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from app.crud.base import CRUDBase
+from app.models.company import Company
 from app.models.lead import Lead
 from app.schemas.lead import LeadCreate, LeadUpdate
+from app.utils.lead_import import IteratorReader, iter_csv_chunks
+
+
+def follow_up_due_at(reference: datetime, follow_up_cycle_ms: Optional[int]) -> Optional[datetime]:
+    """Return when the next follow-up is due, one cycle after `reference` (None without a cycle)."""
+    if not follow_up_cycle_ms or reference is None:
+        return None
+    return reference + timedelta(milliseconds=follow_up_cycle_ms)
+
 
 class CRUDLead(CRUDBase[Lead, LeadCreate, LeadUpdate]):
     def get_by_company(
@@ -12,19 +27,66 @@ class CRUDLead(CRUDBase[Lead, LeadCreate, LeadUpdate]):
         return (
             db.query(self.model)
             .filter(Lead.company_id == company_id)
+            .order_by(Lead.created_at.desc(), Lead.id.desc())
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_page(
+        self,
+        db: Session,
+        *,
+        company_id: int,
+        limit: int = 50,
+        after: Optional[Tuple[datetime, int]] = None,
+        search: Optional[str] = None
+    ) -> Tuple[List[Lead], bool]:
+        """
+        Return one page of a company's leads, newest first, and whether more follow.
+
+        Pages are keyset-paginated on (created_at, id): pass the last lead's
+        (created_at, id) of the previous page as `after`, so each page costs the
+        same however deep it is. `search` matches a substring of name or email
+        (case-insensitive, served by the pg_trgm indexes).
+        """
+        query = db.query(self.model).filter(Lead.company_id == company_id)
+        if search:
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", search.strip()) + "%"
+            query = query.filter(or_(Lead.name.ilike(pattern), Lead.email.ilike(pattern)))
+        if after is not None:
+            query = query.filter(tuple_(Lead.created_at, Lead.id) < tuple_(*after))
+        rows = (
+            query.order_by(Lead.created_at.desc(), Lead.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        return rows[:limit], len(rows) > limit
+
+    def _get_follow_up_cycle(self, db: Session, company_id: int) -> Optional[int]:
+        return db.query(Company.follow_up_cycle).filter(Company.id == company_id).scalar()
+
     def create_bulk(
         self, db: Session, *, leads: List[LeadCreate], company_id: int
     ) -> List[Lead]:
-        db_leads = [Lead(**lead.dict(), company_id=company_id) for lead in leads]
-        db.add_all(db_leads)
+        """
+        Insert leads in one statement, skipping emails the company already has.
+        Returns the inserted leads (via RETURNING, no per-row refresh).
+        """
+        if not leads:
+            return []
+        next_follow_up_at = follow_up_due_at(datetime.now(timezone.utc), self._get_follow_up_cycle(db, company_id))
+        stmt = (
+            pg_insert(Lead)
+            .values([
+                {**lead.dict(), "company_id": company_id, "next_follow_up_at": next_follow_up_at}
+                for lead in leads
+            ])
+            .on_conflict_do_nothing(index_elements=[Lead.company_id, func.lower(Lead.email)])
+            .returning(Lead)
+        )
+        db_leads = list(db.scalars(stmt).all())
         db.commit()
-        for lead in db_leads:
-            db.refresh(lead)
         return db_leads
 
     def get_by_email(
@@ -38,12 +100,136 @@ class CRUDLead(CRUDBase[Lead, LeadCreate, LeadUpdate]):
 
     def create(
         self, db: Session, *, obj_in: LeadCreate, company_id: int
-    ) -> Lead:
-        obj_in_data = obj_in.dict()
-        db_obj = self.model(**obj_in_data, company_id=company_id)
-        db.add(db_obj)
+    ) -> Optional[Lead]:
+        """
+        Insert a lead; returns None if the company already has a lead with this
+        email (case-insensitive), without a separate lookup.
+        """
+        stmt = (
+            pg_insert(Lead)
+            .values(
+                **obj_in.dict(),
+                company_id=company_id,
+                next_follow_up_at=follow_up_due_at(datetime.now(timezone.utc), self._get_follow_up_cycle(db, company_id))
+            )
+            .on_conflict_do_nothing(index_elements=[Lead.company_id, func.lower(Lead.email)])
+            .returning(Lead)
+        )
+        db_obj = db.scalars(stmt).first()
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
-lead = CRUDLead(Lead) 
\ No newline at end of file
+    def import_rows(
+        self, db: Session, *, company_id: int, rows: Iterable[Tuple[str, str]]
+    ) -> Dict[str, int]:
+        """
+        Bulk import (name, email) rows with COPY into a temporary staging table,
+        then merge into leads with ON CONFLICT (company_id, lower(email)) DO NOTHING.
+
+        Rows are streamed to Postgres as they are produced, so memory use does not
+        depend on the number of rows. Within the file the first row for an email wins.
+
+        Returns:
+            dict: staged, inserted, duplicates_in_file and already_existing counts
+        """
+        next_follow_up_at = follow_up_due_at(datetime.now(timezone.utc), self._get_follow_up_cycle(db, company_id))
+        try:
+            db.execute(text(
+                "CREATE TEMP TABLE lead_import_staging (line bigint, name text, email text) ON COMMIT DROP"
+            ))
+            numbered_rows = ((line, name, email) for line, (name, email) in enumerate(rows))
+            cursor = db.connection().connection.cursor()
+            try:
+                cursor.copy_expert(
+                    "COPY lead_import_staging (line, name, email) FROM STDIN WITH (FORMAT csv)",
+                    IteratorReader(iter_csv_chunks(numbered_rows))
+                )
+            finally:
+                cursor.close()
+
+            counts = db.execute(text(
+                "SELECT count(*), count(DISTINCT email) FROM lead_import_staging"
+            )).one()
+            result = db.execute(
+                text("""
+                    INSERT INTO leads (name, email, company_id, next_follow_up_at)
+                    SELECT DISTINCT ON (email) name, email, :company_id, :next_follow_up_at
+                    FROM lead_import_staging
+                    ORDER BY email, line
+                    ON CONFLICT (company_id, lower(email)) DO NOTHING
+                """),
+                {"company_id": company_id, "next_follow_up_at": next_follow_up_at}
+            )
+            inserted = result.rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        staged, distinct = counts
+        return {
+            "staged": staged,
+            "inserted": inserted,
+            "duplicates_in_file": staged - distinct,
+            "already_existing": distinct - inserted,
+        }
+
+    def reschedule_follow_ups(
+        self, db: Session, *, company_id: int, follow_up_cycle: Optional[int]
+    ) -> int:
+        """
+        Recompute next_follow_up_at for all of a company's leads after its
+        follow-up cycle changed (one UPDATE). Returns the number of leads updated.
+        """
+        if follow_up_cycle:
+            next_follow_up_at = func.coalesce(Lead.follow_up_last_sent_at, Lead.created_at) + literal(
+                timedelta(milliseconds=follow_up_cycle), Interval
+            )
+        else:
+            next_follow_up_at = None
+        result = db.execute(
+            update(Lead)
+            .where(Lead.company_id == company_id)
+            .values(next_follow_up_at=next_follow_up_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    async def get_due_page(
+        self,
+        db: AsyncSession,
+        *,
+        now: datetime,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: int = 200
+    ) -> List[Lead]:
+        """
+        Return the next page of leads whose follow-up is due, across all companies.
+
+        Pages are keyset-paginated on (next_follow_up_at, id) using
+        ix_leads_next_follow_up_at_id; pass the last lead's
+        (next_follow_up_at, id) of the previous page as `after`.
+        The lead's company is loaded with each page.
+        """
+        stmt = (
+            select(Lead)
+            .where(Lead.next_follow_up_at.isnot(None), Lead.next_follow_up_at <= now)
+            .options(selectinload(Lead.company))
+            .order_by(Lead.next_follow_up_at, Lead.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(Lead.next_follow_up_at, Lead.id) > tuple_(*after))
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def save_follow_up_results(self, db: AsyncSession, results: List[Dict]) -> None:
+        """
+        Save a batch of follow-up results in one short transaction. Each dict holds
+        the lead's `id` and the columns to set (one bulk UPDATE by primary key).
+        """
+        await db.execute(update(Lead), results)
+        await db.commit()
+
+lead = CRUDLead(Lead)
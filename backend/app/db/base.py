@@ -7,3 +7,5 @@ from app.models.chat import Chat
 from app.models.channel_auto_reply_settings import ChannelAutoReplySettings
 from app.models.channel_context import ChannelContext
 from app.models.company_context import CompanyContext
+from app.models.lead import Lead
+from app.models.ai_agent_settings import AIAgentSettings
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, true
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -13,6 +13,8 @@ class AIAgentSettings(Base):
     voice_type = Column(String, nullable=False, default=VoiceType.ALLOY)
     dialect = Column(String, nullable=False)
     goal = Column(String, nullable=False, default="Book appointments and collect customer emails")
+    # Reuse replies to near-identical first messages (see reply_cache_service)
+    reply_cache_enabled = Column(Boolean, nullable=False, default=True, server_default=true())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
@@ -26,7 +28,21 @@ class Chat(Base):
     email_provider = Column(String(50))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Full-text search document: stemmed Norwegian (subject weighted above body) plus
+    # unstemmed 'simple' tokens so names, addresses and non-Norwegian words still match.
+    # Deferred: it is only used inside search queries, never loaded with the row.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('norwegian', coalesce(subject, '')), 'A') || "
+            "setweight(to_tsvector('norwegian', coalesce(body_text, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(subject, '') || ' ' || coalesce(body_text, '')), 'D')",
+            persisted=True
+        )
+    ))
 
     __table_args__ = (
         UniqueConstraint('company_id', 'message_id', name='uq_chat_company_message'),
+        # Company-scoped full-text search (company_id in the GIN index needs btree_gin)
+        Index('ix_chat_company_search_vector', 'company_id', 'search_vector', postgresql_using='gin'),
     )
@@ -25,17 +25,20 @@ class Company(Base):
     outlook_box_credentials = Column(JSON, nullable=True)  # Internal field for Outlook credentials
     outlook_box_email = Column(String(100), nullable=True)  # Linked Outlook address
     outlook_box_username = Column(String(200), nullable=True)  # Outlook username/display name
+    outlook_delta_link = Column(Text, nullable=True)  # Graph inbox @odata.deltaLink from the last sync
     
     # Instagram fields (using existing migration field names)
     instagram_credentials = Column(JSON, nullable=True)  # Internal field for Instagram credentials
     instagram_username = Column(String(100), nullable=True)  # Instagram username
     instagram_account_id = Column(String(100), nullable=True)  # Instagram account ID
     instagram_page_id = Column(String(100), nullable=True)  # Connected Facebook page ID
+    instagram_last_synced_at = Column(DateTime(timezone=True), nullable=True)  # Newest conversation updated_time already processed
     
     # Facebook fields
     facebook_box_credentials = Column(JSON, nullable=True)  # Internal field for Facebook credentials
     facebook_box_page_id = Column(String(100), nullable=True)  # Facebook page ID
     facebook_box_page_name = Column(String(200), nullable=True)  # Facebook page name
+    facebook_last_synced_at = Column(DateTime(timezone=True), nullable=True)  # Newest conversation/post updated_time already processed
     
     goal = Column(String(500), nullable=False, default="Book appointments and collect customer emails")  # Company's primary goal
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -15,6 +15,25 @@ class Lead(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     follow_up_last_sent_at = Column(DateTime(timezone=True), nullable=True)
     email_context = Column(Text, nullable=True)  # Store the context of sent emails
+    # When the next follow-up is due; NULL while the company has no follow-up cycle
+    next_follow_up_at = Column(DateTime(timezone=True), nullable=True)
 
     # Relationship with Company
-    company = relationship("Company", back_populates="leads")
\ No newline at end of file
+    company = relationship("Company", back_populates="leads")
+
+    __table_args__ = (
+        # Keyset scan of due leads across all companies, ordered by (next_follow_up_at, id)
+        Index(
+            'ix_leads_next_follow_up_at_id',
+            'next_follow_up_at',
+            'id',
+            postgresql_where=text('next_follow_up_at IS NOT NULL')
+        ),
+        # One lead per email per company; also the ON CONFLICT target of the lead import
+        Index('uq_leads_company_lower_email', 'company_id', func.lower(email), unique=True),
+        # Keyset pagination of a company's leads, newest first
+        Index('ix_leads_company_created_at_id', 'company_id', created_at.desc(), id.desc()),
+        # Substring search on name/email (pg_trgm)
+        Index('ix_leads_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_leads_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
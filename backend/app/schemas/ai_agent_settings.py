@@ -6,6 +6,7 @@ class AIAgentSettingsBase(BaseModel):
     voice_type: VoiceType = VoiceType.ALLOY
     dialect: str
     goal: str = "Book appointments and collect customer emails"
+    reply_cache_enabled: bool = True
 
 class AIAgentSettingsCreate(AIAgentSettingsBase):
     """Schema for creating AI agent settings. Company ID will be taken from user context."""
@@ -15,6 +16,7 @@ class AIAgentSettingsUpdate(AIAgentSettingsBase):
     voice_type: Optional[VoiceType] = None
     dialect: Optional[str] = None
     goal: Optional[str] = None
+    reply_cache_enabled: Optional[bool] = None
 
 class AIAgentSettingsInDB(AIAgentSettingsBase):
     id: int
@@ -0,0 +1,23 @@
+from typing import Optional, List
+from pydantic import BaseModel
+from datetime import datetime
+
+# A full-text search hit; highlights are HTML-escaped, with matched terms wrapped in <mark></mark>
+class ChatSearchHit(BaseModel):
+    id: int
+    channel_id: Optional[str] = None
+    message_id: Optional[str] = None
+    from_email: Optional[str] = None
+    subject: Optional[str] = None
+    sent_at: datetime
+    email_provider: Optional[str] = None
+    is_read: Optional[bool] = None
+    rank: float
+    subject_highlight: str
+    body_highlight: str
+
+# A keyset-paginated page of search hits
+class ChatSearchPage(BaseModel):
+    items: List[ChatSearchHit]
+    next_cursor: Optional[str] = None
+    has_more: bool
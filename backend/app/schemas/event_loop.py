@@ -0,0 +1,28 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+# Innermost frame a stall was spent in (often library code)
+class BlockingCall(BaseModel):
+    frame: str
+    samples: int
+
+# Application call site that blocked the event loop
+class BlockingSite(BaseModel):
+    site: str
+    stalls: int
+    samples: int
+    blocked_seconds: float
+    max_stall_seconds: float
+    last_seen: datetime
+    blocking_calls: List[BlockingCall] = []
+    stack: List[str] = []  # Stack of the longest stall, outermost first
+
+# Response for the event loop stall report
+class EventLoopStallsResponse(BaseModel):
+    enabled: bool
+    since: Optional[datetime] = None
+    threshold_seconds: float
+    stalls: int
+    blocked_seconds: float
+    sites: List[BlockingSite]
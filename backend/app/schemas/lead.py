@@ -34,6 +34,20 @@ class Lead(LeadInDBBase):
 class LeadInDB(LeadInDBBase):
     pass
 
+# A keyset-paginated page of leads
+class LeadPage(BaseModel):
+    items: List[Lead]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
 # For bulk creation
 class LeadBulkCreate(BaseModel):
-    leads: List[LeadCreate] 
\ No newline at end of file
+    leads: List[LeadCreate]
+
+# Result of a file import
+class LeadImportResult(BaseModel):
+    received: int
+    invalid: int
+    inserted: int
+    duplicates_in_file: int
+    already_existing: int
@@ -0,0 +1,30 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+# One step of a message's trace
+class TraceSpan(BaseModel):
+    name: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    offset_ms: float  # Start relative to the start of the trace
+    duration_ms: float
+    status: str
+    status_message: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+
+# One pass of a message through the pipeline
+class MessageTrace(BaseModel):
+    trace_id: str
+    name: str
+    start_time: datetime
+    duration_ms: float
+    status: str
+    status_message: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+    spans: List[TraceSpan] = []
+
+# Response for the traces of a message
+class MessageTraceResponse(BaseModel):
+    message_id: str
+    traces: List[MessageTrace]
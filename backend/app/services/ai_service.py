@@ -2,19 +2,25 @@ import time
 import base64
 import logging
 import asyncio
-from typing import Optional, Tuple, Dict, Any
-import tempfile
-import os
+from typing import Optional, Tuple, Dict, Any, List, AsyncIterator
+import io
 from fastapi import UploadFile
 from datetime import datetime, timedelta
 import json
 import pytz
+from sqlalchemy import select
 
 from app.schemas.ai import InputType, AudioFormat, VoiceType, AIRequest, AIResponse
 from app.core.config import settings
+from app.core.metrics import llm_call
 from app.models.company import Company
 from app.models.ai_agent_settings import AIAgentSettings
 from app.services.calendar_service import calendar_service
+from app.services.tts_cache_service import tts_cache
+from app.services.context_retrieval_service import context_retrieval_service
+from app.services.few_shot_service import few_shot_service
+from app.services.reply_cache_service import reply_cache_service
+from app.utils.time_range import parse_time_range, mentions_time
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +29,8 @@ class SimpleAIService:
         """Initialize the OpenAI service."""
         try:
             import openai
-            self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+            self.async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
             self.tts_model = "tts-1"
             self.chat_model = "gpt-4o-mini"
             self.transcription_model = "whisper-1"
@@ -107,29 +114,33 @@ class SimpleAIService:
             Transcribed text
         """
         try:
-            # Save uploaded file to temporary file
-            with tempfile.NamedTemporaryFile(suffix=f".{audio_format}", delete=False) as temp_file:
-                content = await audio_file.read()
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Transcribe with OpenAI Whisper
-                with open(temp_file_path, "rb") as audio_file:
-                    transcription = self.client.audio.transcriptions.create(
-                        model=self.transcription_model,
-                        file=audio_file
-                    )
-                return transcription.text
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    
+            content = await audio_file.read()
+            return await self.transcribe_bytes(content, getattr(audio_format, "value", audio_format))
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             return f"Error transcribing audio: {str(e)}"
     
+    async def transcribe_bytes(self, content: bytes, audio_format: str = "wav") -> str:
+        """
+        Transcribe an in-memory audio buffer with OpenAI Whisper (no temp file).
+        
+        Args:
+            content: Encoded audio (e.g. a WAV built by app.utils.audio.pcm16_to_wav)
+            audio_format: File extension Whisper uses to detect the container
+            
+        Returns:
+            Transcribed text
+        """
+        buffer = io.BytesIO(content)
+        buffer.name = f"audio.{audio_format}"
+        with llm_call("transcribe"):
+            transcription = await asyncio.to_thread(
+                self.client.audio.transcriptions.create,
+                model=self.transcription_model,
+                file=buffer
+            )
+        return transcription.text
+    
     async def _get_calendar_context(self, company: Company, user_query: str) -> str:
         """
         Get calendar context for the company.
@@ -142,21 +153,89 @@ class SimpleAIService:
             Calendar context as a string
         """
         try:
-            # Get current date in UTC
-            current_date = datetime.now(pytz.UTC)
-            
-            # First, use AI to determine appropriate time range based on user's query
-            time_range_prompt = (
-                f"Current date is {current_date.strftime('%Y-%m-%d')}. "
-                f"Based on this user query: '{user_query}', determine the appropriate time range for calendar events. "
-                "Return the response in JSON format with 'start_time' and 'end_time' in ISO format. "
-                "For example: {\"start_time\": \"2024-03-20T00:00:00Z\", \"end_time\": \"2024-03-27T23:59:59Z\"}. "
-                "If no specific time range is mentioned, default to the next 7 days from the current date. "
-                "Consider natural language time references like 'today', 'tomorrow', 'next week', etc. "
-                "Make sure to use the current date as the reference point for all time calculations."
-            )
+            time_range = await self.resolve_calendar_range(user_query)
+            if time_range:
+                start_time, end_time = time_range
+            else:
+                # Default to the next 7 days
+                start_time = datetime.now(pytz.UTC)
+                end_time = start_time + timedelta(days=7)
+            
+            return await self.get_calendar_context_for_range(company, start_time, end_time)
+            
+        except Exception as e:
+            logger.error(f"Error getting calendar context: {str(e)}")
+            return "Unable to fetch calendar events."
+    
+    async def resolve_calendar_range(self, user_query: str) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Resolve the time range a query refers to.
+        
+        Common relative phrases are resolved locally; only unusual time references go to the LLM.
+        
+        Returns:
+            tuple: (start_time, end_time), or None if the query does not refer to a specific time
+        """
+        current_date = datetime.now(pytz.UTC)
+        time_range = parse_time_range(user_query, now=current_date, timezone_name=settings.CALENDAR_TIMEZONE)
+        if time_range is None and mentions_time(user_query):
+            time_range = await self._get_time_range_from_llm(user_query, current_date)
+        return time_range
+    
+    async def get_calendar_context_for_range(self, company: Company, start_time: datetime, end_time: datetime) -> str:
+        """
+        Format the company's calendar events in a time range as prompt context.
+        
+        Args:
+            company: Company model instance
+            start_time: Start of the range
+            end_time: End of the range
             
-            time_range_response = self.client.chat.completions.create(
+        Returns:
+            Calendar context as a string
+        """
+        # Get calendar events for the determined time range
+        calendar_response = await calendar_service.get_company_calendar_events(
+            None,  # No DB session needed as we're using stored credentials
+            company,
+            start_time=start_time,
+            end_time=end_time,
+            max_results=5  # Limit to 5 upcoming events
+        )
+        
+        if not calendar_response.events:
+            return "No upcoming calendar events found."
+        
+        # Format calendar events into a context string
+        context = "Upcoming calendar events:\n"
+        for event in calendar_response.events:
+            context += f"- {event.summary} on {event.start.strftime('%Y-%m-%d %H:%M')}"
+            if event.location:
+                context += f" at {event.location}"
+            context += "\n"
+        
+        return context
+    
+    async def _get_time_range_from_llm(self, user_query: str, current_date: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Ask the LLM for a calendar time range when the local parser could not resolve the query.
+        
+        Returns:
+            tuple: (start_time, end_time), or None if the response was invalid
+        """
+        time_range_prompt = (
+            f"Current date is {current_date.strftime('%Y-%m-%d')}. "
+            f"Based on this user query: '{user_query}', determine the appropriate time range for calendar events. "
+            "Return the response in JSON format with 'start_time' and 'end_time' in ISO format. "
+            "For example: {\"start_time\": \"2024-03-20T00:00:00Z\", \"end_time\": \"2024-03-27T23:59:59Z\"}. "
+            "If no specific time range is mentioned, default to the next 7 days from the current date. "
+            "Consider natural language time references like 'today', 'tomorrow', 'next week', etc. "
+            "Make sure to use the current date as the reference point for all time calculations."
+        )
+        
+        with llm_call("time_range") as call:
+            time_range_response = await asyncio.to_thread(
+                self.client.chat.completions.create,
                 model=self.chat_model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that determines time ranges for calendar queries. Always use the provided current date as the reference point."},
@@ -164,41 +243,54 @@ class SimpleAIService:
                 ],
                 response_format={"type": "json_object"}
             )
-            
-            try:
-                time_range = json.loads(time_range_response.choices[0].message.content)
-                start_time = datetime.fromisoformat(time_range["start_time"].replace('Z', '+00:00'))
-                end_time = datetime.fromisoformat(time_range["end_time"].replace('Z', '+00:00'))
-            except (json.JSONDecodeError, KeyError, ValueError):
-                # Fallback to default time range if AI response is invalid
-                start_time = current_date
-                end_time = start_time + timedelta(days=7)
-            
-            # Get calendar events for the determined time range
-            calendar_response = await calendar_service.get_company_calendar_events(
-                None,  # No DB session needed as we're using stored credentials
-                company,
-                start_time=start_time,
-                end_time=end_time,
-                max_results=5  # Limit to 5 upcoming events
-            )
-            
-            if not calendar_response.events:
-                return "No upcoming calendar events found."
-            
-            # Format calendar events into a context string
-            context = "Upcoming calendar events:\n"
-            for event in calendar_response.events:
-                context += f"- {event.summary} on {event.start.strftime('%Y-%m-%d %H:%M')}"
-                if event.location:
-                    context += f" at {event.location}"
-                context += "\n"
-            
-            return context
-            
-        except Exception as e:
-            logger.error(f"Error getting calendar context: {str(e)}")
-            return "Unable to fetch calendar events."
+            call.record_usage(time_range_response.usage)
+        
+        try:
+            time_range = json.loads(time_range_response.choices[0].message.content)
+            start_time = datetime.fromisoformat(time_range["start_time"].replace('Z', '+00:00'))
+            end_time = datetime.fromisoformat(time_range["end_time"].replace('Z', '+00:00'))
+            return start_time, end_time
+        except (json.JSONDecodeError, KeyError, ValueError):
+            return None
+    
+    def build_chat_messages(
+        self,
+        text: str,
+        calendar_context: str,
+        dialect: str = "Southern dialect",
+        company_name: str = "",
+        goal: str = "Book appointments and collect customer emails",
+        business_category: str = "",
+        terms_of_service: str = ""
+    ) -> List[Dict[str, str]]:
+        """
+        Build the receptionist chat messages (system prompt + user turn).
+        Shared by the blocking and the streaming response paths.
+        """
+        # Create system message with calendar context, dialect, company name, and business details
+        system_message = (
+            f"You are a professional and engaging AI receptionist for {company_name}, "
+            f"a {business_category} business. "
+            "Always respond in Norwegian (Bokmål), keeping your responses concise, professional, and friendly. "
+            "Be efficient in your communication while maintaining a warm and approachable tone. "
+            f"Your primary goal is to: {goal}. "
+            "You have access to the company's calendar information to help answer questions about scheduling and events. "
+            f"Here is the current calendar context:\n{calendar_context}\n\n"
+            f"Company Terms of Service:\n{terms_of_service}\n\n"
+            "Important: When a customer shows interest in booking an appointment or using our services, "
+            "always ask for their email address. This is necessary for: "
+            "1. Sending appointment confirmations "
+            "2. Following up on their inquiries "
+            "3. Sending important updates about their service "
+            "4. Maintaining communication records "
+            "Ask for their email in a natural way, for example: "
+            "'For å sende deg bekreftelse og viktige oppdateringer, trenger jeg e-postadressen din. Kan du dele den med meg?'"
+        )
+        
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": text}
+        ]
     
     async def _generate_ai_response(
         self, 
@@ -230,35 +322,18 @@ class SimpleAIService:
             Tuple containing the AI response text and model used
         """
         try:
-            # Create system message with calendar context, dialect, company name, and business details
-            system_message = (
-                f"You are a professional and engaging AI receptionist for {company_name}, "
-                f"a {business_category} business. "
-                "Always respond in Norwegian (Bokmål), keeping your responses concise, professional, and friendly. "
-                "Be efficient in your communication while maintaining a warm and approachable tone. "
-                f"Your primary goal is to: {goal}. "
-                "You have access to the company's calendar information to help answer questions about scheduling and events. "
-                f"Here is the current calendar context:\n{calendar_context}\n\n"
-                f"Company Terms of Service:\n{terms_of_service}\n\n"
-                "Important: When a customer shows interest in booking an appointment or using our services, "
-                "always ask for their email address. This is necessary for: "
-                "1. Sending appointment confirmations "
-                "2. Following up on their inquiries "
-                "3. Sending important updates about their service "
-                "4. Maintaining communication records "
-                "Ask for their email in a natural way, for example: "
-                "'For å sende deg bekreftelse og viktige oppdateringer, trenger jeg e-postadressen din. Kan du dele den med meg?'"
+            messages = self.build_chat_messages(
+                text, calendar_context, dialect, company_name, goal, business_category, terms_of_service
             )
             
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": text}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+            with llm_call("chat_response") as call:
+                response = self.client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+                call.record_usage(response.usage)
             
             return response.choices[0].message.content, self.chat_model
             
@@ -266,6 +341,46 @@ class SimpleAIService:
             logger.error(f"Error generating AI response: {str(e)}")
             return f"Error generating AI response: {str(e)}", self.chat_model
     
+    async def stream_ai_response(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 1000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a chat completion as it is generated.
+        
+        Args:
+            messages: Chat messages (see build_chat_messages)
+            max_tokens: Maximum tokens for the response
+            temperature: Temperature for response generation
+            
+        Yields:
+            ("token", str) for each text delta, then ("usage", dict) with the
+            prompt/completion/total token counts once the stream has finished
+        """
+        with llm_call("stream_chat") as call:
+            stream = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            usage = None
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield "token", chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens,
+                    }
+            call.record_usage(usage)
+        yield "usage", usage
+    
     async def _text_to_speech(self, text: str, voice: VoiceType = VoiceType.ALLOY) -> Tuple[str, AudioFormat]:
         """
         Convert text to speech using OpenAI TTS.
@@ -278,14 +393,23 @@ class SimpleAIService:
             Tuple containing base64 encoded audio data and format
         """
         try:
-            response = self.client.audio.speech.create(
-                model=self.tts_model,
-                voice=voice,
-                input=text
-            )
+            voice_name = getattr(voice, "value", voice)
+            
+            async def synthesize() -> bytes:
+                with llm_call("tts"):
+                    response = await asyncio.to_thread(
+                        self.client.audio.speech.create,
+                        model=self.tts_model,
+                        voice=voice_name,
+                        input=text
+                    )
+                return response.content
+            
+            # Repeated phrases (greetings, confirmations) are served from the disk cache
+            audio = await tts_cache.get_or_synthesize(text, voice_name, self.tts_model, AudioFormat.MP3.value, synthesize)
             
             # Convert audio to base64
-            audio_data = base64.b64encode(response.content).decode('utf-8')
+            audio_data = base64.b64encode(audio).decode('utf-8')
             
             return audio_data, AudioFormat.MP3
             
@@ -304,14 +428,16 @@ class SimpleAIService:
             Generated text response
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates professional email content."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
+            with llm_call("generate_text") as call:
+                response = await self.async_client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that generates professional email content."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"}
+                )
+                call.record_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error generating text: {str(e)}")
@@ -319,14 +445,16 @@ class SimpleAIService:
 
     async def generate_free_text(self, prompt: str) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates professional email replies."},
-                    {"role": "user", "content": prompt}
-                ]
-                # Do NOT set response_format here!
-            )
+            with llm_call("generate_free_text") as call:
+                response = self.client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that generates professional email replies."},
+                        {"role": "user", "content": prompt}
+                    ]
+                    # Do NOT set response_format here!
+                )
+                call.record_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error generating free text: {str(e)}")
@@ -347,55 +475,88 @@ class SimpleAIService:
         """
         try:
             # Get company information from database
-            from app.db.session import SessionLocal
+            from app.db.session import AsyncSessionLocal
             from app.models.company import Company
             from app.models.company_context import CompanyContext
             from app.services.channel_context_service import channel_context_service
             
-            db = SessionLocal()
-            try:
+            async with AsyncSessionLocal() as db:
                 # Get company details
-                company = db.query(Company).filter(Company.id == company_id).first()
+                company = await db.get(Company, company_id)
                 if not company:
                     logger.error(f"Company not found for ID: {company_id}")
                     return "Takk for din henvendelse. Vi vil svare deg så snart som mulig."
                 
                 # Get company context
-                company_context = db.query(CompanyContext).filter(CompanyContext.company_id == company_id).first()
+                company_context = (await db.execute(
+                    select(CompanyContext).where(CompanyContext.company_id == company_id).limit(1)
+                )).scalars().first()
+                ai_settings = (await db.execute(
+                    select(AIAgentSettings).where(AIAgentSettings.company_id == company_id).limit(1)
+                )).scalars().first()
                 
                 # Get channel context
-                channel_context = channel_context_service.get_channel_context(db, company_id, channel_id)
-                
-                # Prepare context information - only company info and company context
-                company_goal = getattr(company, 'goal', '')
-                company_category = getattr(company, 'business_category', '')
-                terms_of_service = getattr(company, 'terms_of_service', '')
-                text_context = company_context.text_context if company_context else ''
-                flow_context = company_context.flow_context if company_context else ''
-                
-                
-                prompt = f"""
-                Don't show your name.
-                Company name is {company.name}, Company category is {company_category}, phone number is {company.phone_numbers}, Company goal is {company.goal}, Terms of service is {company.terms_of_service}
+                channel_context = await db.run_sync(
+                    channel_context_service.get_channel_context, channel_id=channel_id, company_id=company_id
+                )
                 
-                Please reference below context when generating the email reply.
+            # Prepare context information - only company info and company context.
+            # Done after the session block so no connection is held during the completion call.
+            company_goal = getattr(company, 'goal', '')
+            company_category = getattr(company, 'business_category', '')
+            terms_of_service = getattr(company, 'terms_of_service', '')
+            text_context = company_context.text_context if company_context else ''
+            flow_context = company_context.flow_context if company_context else ''
 
-                Chat History: {channel_context}
-                Text Context: {text_context}
-                Flow Instructions: {flow_context}
-                
-                Reply to the following email in a professional, helpful, and friendly manner.
-                Sender email: {sender}
-                Email content: {content}
-                
-                Generate a professional email reply in Norwegian (Bokmål). Keep it concise, relevant, and helpful.
-                The reply should be appropriate for the business context and address the sender's inquiry professionally.
-                Use the provided company context to personalize the response appropriately.
-                """
+            # A first message that closely matches a recently answered one reuses that reply
+            context_version = None
+            history = (channel_context or {}).get("messages", [])
+            if (
+                settings.REPLY_CACHE_ENABLED
+                and len(history) <= 1
+                and getattr(ai_settings, 'reply_cache_enabled', True)
+            ):
+                context_version = reply_cache_service.context_version(
+                    company.name, company_goal, company_category, company.phone_numbers,
+                    terms_of_service, text_context, flow_context
+                )
+                cached_reply = await self._get_cached_reply(company_id, context_version, sender, content)
+                if cached_reply:
+                    return cached_reply
 
-                print(f"[DEBUG] Prompt length: {prompt}")
-                
-                response = self.client.chat.completions.create(
+            # Only the parts of the knowledge base relevant to this message go into the prompt
+            text_context = await context_retrieval_service.get_relevant_context(company_id, text_context, content)
+            # Replies to similar messages that the company rated well
+            examples = await few_shot_service.get_examples(company_id, content)
+            examples_text = "\n\n".join(
+                f"Incoming message: {example['incoming']}\nReply: {example['reply']}" for example in examples
+            )
+            
+            
+            prompt = f"""
+            Don't show your name.
+            Company name is {company.name}, Company category is {company_category}, phone number is {company.phone_numbers}, Company goal is {company.goal}, Terms of service is {company.terms_of_service}
+            
+            Please reference below context when generating the email reply.
+
+            Chat History: {channel_context}
+            Text Context: {text_context}
+            Flow Instructions: {flow_context}
+            Examples of earlier replies to similar messages that the company was happy with (match their tone and level of detail, but do not copy facts that do not apply): {examples_text or 'None'}
+            
+            Reply to the following email in a professional, helpful, and friendly manner.
+            Sender email: {sender}
+            Email content: {content}
+            
+            Generate a professional email reply in Norwegian (Bokmål). Keep it concise, relevant, and helpful.
+            The reply should be appropriate for the business context and address the sender's inquiry professionally.
+            Use the provided company context to personalize the response appropriately.
+            """
+
+            logger.debug("Email reply prompt length: %d", len(prompt))
+            
+            with llm_call("email_reply") as call:
+                response = await self.async_client.chat.completions.create(
                     model=self.chat_model,
                     messages=[
                         {"role": "system", "content": prompt},
@@ -404,17 +565,60 @@ class SimpleAIService:
                     max_tokens=500,
                     temperature=0.7
                 )
-                
-                return response.choices[0].message.content
-                
-            finally:
-                db.close()
+                call.record_usage(response.usage)
+            
+            reply = response.choices[0].message.content
+            if context_version and reply:
+                await reply_cache_service.store(company_id, context_version, sender, content, reply)
+            return reply
             
         except Exception as e:
             logger.error(f"Error generating email reply: {str(e)}")
             # Return a fallback reply if AI generation fails
             return f"Takk for din henvendelse. Vi vil svare deg så snart som mulig. Med vennlig hilsen, {company_category if 'company_category' in locals() else 'teamet'}."
 
+    async def _get_cached_reply(self, company_id: int, context_version: str, sender: str, content: str) -> Optional[str]:
+        """
+        Return a reply based on a cached answer to a near-identical message, or None.
+        A very close match from the same sender reuses the reply as is; otherwise it is
+        adapted to the new sender with a short completion instead of a full generation
+        with the company context, so no earlier customer's name or details are sent on.
+        """
+        try:
+            match = await reply_cache_service.lookup(company_id, context_version, content)
+            if match is None:
+                return None
+            if match.reusable_for(sender):
+                logger.info(f"Reusing cached reply for company {company_id} (similarity {match.similarity:.3f})")
+                return match.entry.reply
+
+            prompt = f"""
+            Below is an earlier reply to a customer message, followed by a new, very similar message.
+            Adjust the earlier reply so it answers the new message. Change as little as possible:
+            keep the facts, tone and language, and only adapt names, greetings and details that differ.
+            Never keep the earlier customer's name, email address or personal details.
+            If the earlier reply already fits, return it unchanged. Return only the reply text.
+
+            Earlier message from {match.entry.sender}: {match.entry.content}
+            Earlier reply: {match.entry.reply}
+
+            New message from {sender}: {content}
+            """
+            with llm_call("email_reply_adapt") as call:
+                response = await self.async_client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=500,
+                    temperature=0.2
+                )
+                call.record_usage(response.usage)
+            reply = response.choices[0].message.content
+            logger.info(f"Adapted cached reply for company {company_id} (similarity {match.similarity:.3f})")
+            return reply or match.entry.reply
+        except Exception as e:
+            logger.warning(f"Reply cache lookup failed for company {company_id}: {str(e)}")
+            return None
+
     async def analyze_message_for_action_requirement(self, sender: str, content: str, company_goals: str, company_category: str, company_id: int = None) -> Dict[str, Any]:
         """
         Analyze incoming message to determine if it requires human action.
@@ -427,17 +631,18 @@ class SimpleAIService:
             flow_context = ""
             
             if company_id:
-                from app.db.session import SessionLocal
+                from app.db.session import AsyncSessionLocal
                 from app.models.company_context import CompanyContext
                 
-                db = SessionLocal()
-                try:
-                    company_context = db.query(CompanyContext).filter(CompanyContext.company_id == company_id).first()
+                async with AsyncSessionLocal() as db:
+                    company_context = (await db.execute(
+                        select(CompanyContext).where(CompanyContext.company_id == company_id).limit(1)
+                    )).scalars().first()
                     if company_context:
                         text_context = company_context.text_context or ""
                         flow_context = company_context.flow_context or ""
-                finally:
-                    db.close()
+                
+                text_context = await context_retrieval_service.get_relevant_context(company_id, text_context, content)
             
             prompt = f"""
             You are an AI agent that analyzes incoming messages to determine if human action is required.
@@ -475,13 +680,15 @@ class SimpleAIService:
                 "urgency": "low|medium|high|none"
             }}
             """
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-0125",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-                max_tokens=400,
-                temperature=0.1
-            )
+            with llm_call("action_analysis") as call:
+                response = self.client.chat.completions.create(
+                    model="gpt-3.5-turbo-0125",
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"},
+                    max_tokens=400,
+                    temperature=0.1
+                )
+                call.record_usage(response.usage)
             
             result = json.loads(response.choices[0].message.content)
             return {
@@ -492,7 +699,7 @@ class SimpleAIService:
             }
             
         except Exception as e:
-            print(f"Error analyzing message for action requirement: {str(e)}")
+            logger.error("Error analyzing message for action requirement: %s", e)
             # Default to no action required if AI fails
             return {
                 "action_required": False,
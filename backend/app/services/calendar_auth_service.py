@@ -7,6 +7,7 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
 from app.models.company import Company
+from app.services.calendar_service import calendar_service
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +94,8 @@ class CalendarAuthService:
                 with open(token_path, 'w') as token:
                     token.write(creds.to_json())
                 logger.info(f"Successfully saved token for company {company.id}")
+                # Events cached for a previously connected calendar are no longer valid
+                calendar_service.invalidate(company.id)
             except Exception as e:
                 logger.error(f"Error saving token file for company {company.id}: {str(e)}")
                 raise ValueError(f"Failed to save credentials: {str(e)}")
@@ -114,6 +117,7 @@ class CalendarAuthService:
             if token_path.exists():
                 token_path.unlink()
                 logger.info(f"Removed token file for company {company.id}")
+            calendar_service.invalidate(company.id)
 
             # Clear calendar credentials from company
             company.calendar_credentials = None
@@ -1,5 +1,7 @@
+import asyncio
 import logging
-from typing import List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 import pytz
@@ -7,20 +9,35 @@ from pathlib import Path
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
+from app.core.config import settings
 from app.models.company import Company
 from app.schemas.company import CalendarEvent, CalendarResponse
+from app.utils.datetime_utils import make_aware
 
 logger = logging.getLogger(__name__)
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
+class CalendarCacheEntry:
+    """Cached events for one company plus the state needed for incremental sync."""
+
+    def __init__(self):
+        self.events: Dict[str, CalendarEvent] = {}
+        self.sync_token: Optional[str] = None
+        self.window_start: Optional[datetime] = None
+        self.window_end: Optional[datetime] = None
+        self.synced_at: float = 0.0
+        self.lock = asyncio.Lock()
+
 class CalendarService:
     def __init__(self):
         """Initialize the calendar service."""
         self.token_dir = Path("tokens")
         self.token_dir.mkdir(exist_ok=True)
+        self._cache: Dict[int, CalendarCacheEntry] = {}  # company_id -> cached events
 
     def _get_token_path(self, company_id: int) -> Path:
         """Get the path for a company's token file."""
@@ -63,6 +80,109 @@ class CalendarService:
             logger.error(f"Error getting credentials for company {company.id}: {str(e)}")
             return None
 
+    def _to_calendar_event(self, event: Dict[str, Any]) -> Optional[CalendarEvent]:
+        """Convert a Google Calendar API event into a CalendarEvent."""
+        try:
+            # Parse start and end times; all-day events only carry a date
+            start = event['start'].get('dateTime', event['start'].get('date'))
+            end = event['end'].get('dateTime', event['end'].get('date'))
+
+            return CalendarEvent(
+                id=event['id'],
+                summary=event.get('summary', ''),
+                start=make_aware(datetime.fromisoformat(start.replace('Z', '+00:00'))),
+                end=make_aware(datetime.fromisoformat(end.replace('Z', '+00:00'))),
+                description=event.get('description', ''),
+                location=event.get('location', '')
+            )
+        except Exception as e:
+            logger.error(f"Error processing event {event.get('id')}: {str(e)}")
+            return None
+
+    def _list_events(self, service, **params) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Page through events.list and return (items, nextSyncToken)."""
+        items: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            result = service.events().list(
+                calendarId='primary',
+                singleEvents=True,
+                maxResults=250,
+                pageToken=page_token,
+                **params
+            ).execute()
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    @staticmethod
+    def _in_window(event: CalendarEvent, entry: CalendarCacheEntry) -> bool:
+        return event.end > entry.window_start and event.start < entry.window_end
+
+    def _full_sync(self, company: Company, entry: CalendarCacheEntry, window_start: datetime, window_end: datetime) -> bool:
+        """
+        Load all events and keep those in the window, storing the sync token for later
+        incremental syncs. The list is not bounded by timeMin/timeMax because Google
+        does not return a sync token for bounded lists; the window is applied locally.
+        """
+        credentials = self._get_credentials(company)
+        if not credentials:
+            logger.error(f"No valid credentials found for company {company.id}")
+            return False
+
+        service = build('calendar', 'v3', credentials=credentials)
+        items, sync_token = self._list_events(service)
+
+        entry.window_start = window_start
+        entry.window_end = window_end
+        events: Dict[str, CalendarEvent] = {}
+        for item in items:
+            if item.get('status') == 'cancelled':
+                continue
+            calendar_event = self._to_calendar_event(item)
+            if calendar_event and self._in_window(calendar_event, entry):
+                events[calendar_event.id] = calendar_event
+
+        entry.events = events
+        entry.sync_token = sync_token
+        entry.synced_at = time.monotonic()
+        logger.info(f"Full calendar sync for company {company.id}: {len(events)} events")
+        return True
+
+    def _incremental_sync(self, company: Company, entry: CalendarCacheEntry) -> bool:
+        """Apply the changes since the last sync; falls back to a full sync when the token has expired."""
+        credentials = self._get_credentials(company)
+        if not credentials:
+            logger.error(f"No valid credentials found for company {company.id}")
+            return False
+
+        service = build('calendar', 'v3', credentials=credentials)
+        try:
+            items, sync_token = self._list_events(service, syncToken=entry.sync_token)
+        except HttpError as e:
+            if e.resp.status == 410:
+                logger.info(f"Calendar sync token expired for company {company.id}, running a full sync")
+                return self._full_sync(company, entry, entry.window_start, entry.window_end)
+            raise
+
+        for item in items:
+            entry.events.pop(item.get('id'), None)
+            if item.get('status') == 'cancelled':
+                continue
+            calendar_event = self._to_calendar_event(item)
+            if calendar_event and self._in_window(calendar_event, entry):
+                entry.events[calendar_event.id] = calendar_event
+
+        entry.sync_token = sync_token or entry.sync_token
+        entry.synced_at = time.monotonic()
+        logger.debug(f"Incremental calendar sync for company {company.id}: {len(items)} changes")
+        return True
+
+    def invalidate(self, company_id: int) -> None:
+        """Drop a company's cached events (e.g. after the calendar is reconnected)."""
+        self._cache.pop(company_id, None)
+
     async def get_company_calendar_events(
         self,
         db: Session,
@@ -73,6 +193,12 @@ class CalendarService:
     ) -> CalendarResponse:
         """
         Get calendar events for a company using their Google Calendar.
+
+        Events are served from a per-company cache covering a window of
+        CALENDAR_CACHE_WINDOW_DAYS. The cache is refreshed at most every
+        CALENDAR_CACHE_TTL_SECONDS, with Google incremental sync (syncToken) when
+        the full sync returned a token and with another full sync otherwise. A
+        full sync is also needed when a request falls outside the window.
         
         Args:
             db: Database session
@@ -85,12 +211,6 @@ class CalendarService:
             CalendarResponse containing events and next page token
         """
         try:
-            # Get credentials for this company
-            credentials = self._get_credentials(company)
-            if not credentials:
-                logger.error(f"No valid credentials found for company {company.id}")
-                return CalendarResponse(events=[], next_page_token=None)
-
             # Set default time range if not provided
             if not start_time:
                 start_time = datetime.now(pytz.UTC)
@@ -103,43 +223,33 @@ class CalendarService:
             if end_time.tzinfo is None:
                 end_time = pytz.UTC.localize(end_time)
 
-            # Create Google Calendar API service
-            service = build('calendar', 'v3', credentials=credentials)
+            entry = self._cache.setdefault(company.id, CalendarCacheEntry())
+            async with entry.lock:
+                covered = (
+                    entry.window_start is not None
+                    and entry.window_start <= start_time
+                    and end_time <= entry.window_end
+                )
+                stale = time.monotonic() - entry.synced_at > settings.CALENDAR_CACHE_TTL_SECONDS
+                if not covered or (stale and entry.sync_token is None):
+                    now = datetime.now(pytz.UTC)
+                    window_start = min(start_time, now - timedelta(days=1))
+                    window_end = max(end_time, now + timedelta(days=settings.CALENDAR_CACHE_WINDOW_DAYS))
+                    synced = await asyncio.to_thread(self._full_sync, company, entry, window_start, window_end)
+                elif stale:
+                    synced = await asyncio.to_thread(self._incremental_sync, company, entry)
+                else:
+                    synced = True
 
-            # Get events
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=start_time.isoformat(),
-                timeMax=end_time.isoformat(),
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+                if not synced:
+                    return CalendarResponse(events=[], next_page_token=None)
 
-            events = []
-            for event in events_result.get('items', []):
-                try:
-                    # Parse start and end times
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    end = event['end'].get('dateTime', event['end'].get('date'))
-
-                    calendar_event = CalendarEvent(
-                        id=event['id'],
-                        summary=event.get('summary', ''),
-                        start=datetime.fromisoformat(start.replace('Z', '+00:00')),
-                        end=datetime.fromisoformat(end.replace('Z', '+00:00')),
-                        description=event.get('description', ''),
-                        location=event.get('location', '')
-                    )
-                    events.append(calendar_event)
-                except Exception as e:
-                    logger.error(f"Error processing event {event.get('id')}: {str(e)}")
-                    continue
+                events = sorted(
+                    (event for event in entry.events.values() if event.end > start_time and event.start < end_time),
+                    key=lambda event: event.start
+                )
 
-            return CalendarResponse(
-                events=events,
-                next_page_token=events_result.get('nextPageToken')
-            )
+            return CalendarResponse(events=events[:max_results], next_page_token=None)
 
         except Exception as e:
             logger.error(f"Error accessing calendar for company {company.id}: {str(e)}")
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Paragraph breaks first, then sentence ends, then any whitespace
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_text(text: str, max_chars: int = 1200, overlap_chars: int = 200) -> List[str]:
+    """
+    Split a knowledge-base text into chunks of at most `max_chars`.
+
+    Paragraphs are kept together where they fit; longer paragraphs are split at
+    sentence boundaries (and, for very long sentences, at whitespace). Consecutive
+    chunks share up to `overlap_chars` of trailing text so a fact that straddles a
+    boundary is retrievable from either side.
+    """
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        chunks.append(current)
+        tail = current[-overlap_chars:] if overlap_chars else ""
+        tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+        current = f"{tail} {piece}".strip() if tail and len(tail) + len(piece) + 1 <= max_chars else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ContextIndex:
+    """A company's chunk embeddings (memory-mapped float32 matrix) and chunk texts."""
+
+    def __init__(self, version: str, vectors: np.ndarray, chunks: List[str]):
+        self.version = version
+        self.vectors = vectors
+        self.chunks = chunks
+
+
+class ContextRetrievalService:
+    """
+    Retrieval over each company's text_context.
+
+    On update the context is chunked and embedded, and the unit-normalized vectors
+    are written as one float32 .npy matrix per company under CONTEXT_INDEX_DIR.
+    Each build is a new version directory named after the content hash; a
+    `current` pointer is swapped atomically once it is complete, so readers never
+    see a half-written index. At request time the matrix is memory-mapped and the
+    top-k chunks by cosine similarity to the message are put in the prompt instead
+    of the whole text, so prompt size no longer grows with the knowledge base.
+    Short contexts (below CONTEXT_RETRIEVAL_MIN_CHARS) are still used whole.
+    """
+
+    def __init__(self):
+        self.index_dir = settings.CONTEXT_INDEX_DIR
+        self.embedding_model = settings.EMBEDDING_MODEL
+        self._client = None
+        self._indexes: Dict[int, ContextIndex] = {}
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._reindexing: Set[int] = set()
+        # Strong references so running reindex tasks are not garbage-collected
+        self._reindex_tasks: Set[asyncio.Task] = set()
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+        return self._client
+
+    def content_version(self, text_context: str) -> str:
+        material = f"{self.embedding_model}\x1f{settings.CONTEXT_CHUNK_CHARS}\x1f{settings.CONTEXT_CHUNK_OVERLAP_CHARS}\x1f{text_context}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+    def _company_dir(self, company_id: int) -> str:
+        return os.path.join(self.index_dir, str(company_id))
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches and return unit-normalized float32 rows."""
+        vectors = []
+        for start in range(0, len(texts), 100):
+            response = await self._get_client().embeddings.create(
+                model=self.embedding_model,
+                input=texts[start:start + 100]
+            )
+            vectors.extend(item.embedding for item in response.data)
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        # The same message is usually embedded for both the reply and the action analysis
+        key = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            return cached
+        vector = (await self.embed([query]))[0]
+        self._query_cache[key] = vector
+        if len(self._query_cache) > 256:
+            self._query_cache.popitem(last=False)
+        return vector
+
+    def _write_index(self, company_id: int, version: str, vectors: np.ndarray, chunks: List[str]) -> None:
+        company_dir = self._company_dir(company_id)
+        version_dir = os.path.join(company_dir, version)
+        os.makedirs(version_dir, exist_ok=True)
+        np.save(os.path.join(version_dir, "vectors.npy"), vectors)
+        with open(os.path.join(version_dir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump({"model": self.embedding_model, "chunks": chunks}, f, ensure_ascii=False)
+
+        pointer = os.path.join(company_dir, "current")
+        tmp_pointer = f"{pointer}.tmp"
+        with open(tmp_pointer, "w") as f:
+            f.write(version)
+        os.replace(tmp_pointer, pointer)
+
+        # Old versions are no longer referenced; open memory maps keep working on POSIX
+        for name in os.listdir(company_dir):
+            path = os.path.join(company_dir, name)
+            if name != version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _load_index(self, company_id: int) -> Optional[ContextIndex]:
+        company_dir = self._company_dir(company_id)
+        try:
+            with open(os.path.join(company_dir, "current")) as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        cached = self._indexes.get(company_id)
+        if cached and cached.version == version:
+            return cached
+        try:
+            version_dir = os.path.join(company_dir, version)
+            vectors = np.load(os.path.join(version_dir, "vectors.npy"), mmap_mode="r")
+            with open(os.path.join(version_dir, "chunks.json"), encoding="utf-8") as f:
+                chunks = json.load(f)["chunks"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load context index for company {company_id}: {e}")
+            return None
+        index = ContextIndex(version, vectors, chunks)
+        self._indexes[company_id] = index
+        return index
+
+    async def reindex_company(self, company_id: int, text_context: Optional[str]) -> None:
+        """
+        Chunk and embed a company's text_context and publish it as the current index.
+        Intended to run in the background after the context is updated.
+        """
+        try:
+            if not text_context or not text_context.strip():
+                shutil.rmtree(self._company_dir(company_id), ignore_errors=True)
+                self._indexes.pop(company_id, None)
+                return
+            version = self.content_version(text_context)
+            current = await asyncio.to_thread(self._load_index, company_id)
+            if current and current.version == version:
+                return
+            chunks = chunk_text(text_context, settings.CONTEXT_CHUNK_CHARS, settings.CONTEXT_CHUNK_OVERLAP_CHARS)
+            vectors = await self.embed(chunks)
+            await asyncio.to_thread(self._write_index, company_id, version, vectors, chunks)
+            logger.info(f"Context index for company {company_id} rebuilt: {len(chunks)} chunks (version {version})")
+        except Exception as e:
+            logger.error(f"Error reindexing context for company {company_id}: {str(e)}")
+
+    def _schedule_reindex(self, company_id: int, text_context: str) -> None:
+        if company_id in self._reindexing:
+            return
+        self._reindexing.add(company_id)
+
+        async def run():
+            try:
+                await self.reindex_company(company_id, text_context)
+            finally:
+                self._reindexing.discard(company_id)
+
+        task = asyncio.create_task(run())
+        self._reindex_tasks.add(task)
+        task.add_done_callback(self._reindex_tasks.discard)
+
+    @staticmethod
+    def _top_k(vectors: np.ndarray, query_vector: np.ndarray, k: int) -> List[int]:
+        scores = vectors @ query_vector
+        if len(scores) <= k:
+            top = np.argsort(-scores)
+        else:
+            top = np.argpartition(-scores, k)[:k]
+        # Keep the chunks in document order so the excerpt reads naturally
+        return sorted(int(i) for i in top)
+
+    async def get_relevant_context(
+        self, company_id: Optional[int], text_context: Optional[str], query: str, k: Optional[int] = None
+    ) -> str:
+        """
+        Return the part of a company's text_context relevant to `query`.
+
+        Args:
+            company_id: The company ID
+            text_context: The company's full text_context (used to check the index is current)
+            query: The incoming message
+            k: Number of chunks (defaults to CONTEXT_RETRIEVAL_TOP_K)
+
+        Returns:
+            str: The whole context when it is short, otherwise the top-k chunks.
+            While an index is missing or stale, a rebuild is started and a truncated
+            prefix of the context is used.
+        """
+        if not text_context:
+            return ""
+        if company_id is None or len(text_context) <= settings.CONTEXT_RETRIEVAL_MIN_CHARS:
+            return text_context
+        k = k or settings.CONTEXT_RETRIEVAL_TOP_K
+        fallback = text_context[:settings.CONTEXT_CHUNK_CHARS * k]
+
+        try:
+            index = await asyncio.to_thread(self._load_index, company_id)
+            if index is None or index.version != self.content_version(text_context):
+                self._schedule_reindex(company_id, text_context)
+                if index is None:
+                    return fallback
+            query_vector = await self.embed_query(query[:8000])
+            selected = await asyncio.to_thread(self._top_k, index.vectors, query_vector, k)
+            return "\n\n---\n\n".join(index.chunks[i] for i in selected)
+        except Exception as e:
+            logger.error(f"Error retrieving context for company {company_id}: {str(e)}")
+            return fallback
+
+
+# Create a singleton instance
+context_retrieval_service = ContextRetrievalService()
@@ -1,11 +1,26 @@
-import logging,anyio
-import requests
+import logging
+import httpx
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.http_client import provider_http_client
 
 logger = logging.getLogger(__name__)
 
+
+def parse_graph_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Facebook/Instagram Graph timestamp such as 2024-05-01T12:00:00+0000."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+
 class FacebookAuthService:
     def __init__(self):
         self.facebook_app_id = settings.FACEBOOK_APP_ID
@@ -33,7 +48,7 @@ class FacebookAuthService:
         Exchange Facebook authorization code for access token.
         """
         try:
-            url = "https://graph.facebook.com/v18.0/oauth/access_token"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/oauth/access_token"
             params = {
                 "client_id": self.facebook_app_id,
                 "client_secret": self.facebook_app_secret,
@@ -41,39 +56,35 @@ class FacebookAuthService:
                 "code": code
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             token_data = response.json()
             logger.info(f"Successfully exchanged Facebook code for token")
             return token_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error exchanging Facebook code for token: {str(e)}")
             return None
     
     async def get_facebook_user_info(self, access_token: str) -> Optional[Dict[str, Any]]:
         """
         Get Facebook user information using access token.
-        Stays async, but executes blocking `requests.get` in a worker thread.
         """
         try:
-            url = "https://graph.facebook.com/me"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/me"
             params = {
                 "fields": "id,name,email",
                 "access_token": access_token
             }
 
-            def _do_request():
-                r = requests.get(url, params=params, timeout=20)
-                r.raise_for_status()
-                return r.json()
-
-            user_info = await anyio.to_thread.run_sync(_do_request)
+            response = await provider_http_client.get(url, params=params)
+            response.raise_for_status()
+            user_info = response.json()
             logger.info(f"Successfully retrieved Facebook user info: {user_info.get('name')}")
             return user_info
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Facebook user info: {str(e)}")
             return None
 
@@ -82,20 +93,20 @@ class FacebookAuthService:
         Get Facebook pages that the user manages.
         """
         try:
-            url = "https://graph.facebook.com/me/accounts"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/me/accounts"
             params = {
                 "access_token": access_token,
                 "fields": "id,name,access_token,category,fan_count"
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             pages_data = response.json()
             logger.info(f"Found {len(pages_data.get('data', []))} Facebook pages")
             return pages_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Facebook pages: {str(e)}")
             return None
 
@@ -104,7 +115,7 @@ class FacebookAuthService:
         Page through a single conversation's messages.
         """
         try:
-            url = f"https://graph.facebook.com/v18.0/{conversation_id}/messages"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{conversation_id}/messages"
             params = {
                 "access_token": page_access_token,
                 "fields": "id,message,from,created_time",
@@ -113,14 +124,14 @@ class FacebookAuthService:
             if after:
                 params["after"] = after
 
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             if response.status_code == 200:
                 return response.json()
             else:
                 logger.warning(f"Could not page conversation {conversation_id}: {response.status_code} - {response.text}")
                 return None
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error paging conversation {conversation_id}: {str(e)}")
             return None
 
@@ -130,13 +141,13 @@ class FacebookAuthService:
         Returns conversations with a first page of nested messages.
         """
         try:
-            url = f"https://graph.facebook.com/v18.0/{page_id}/conversations"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{page_id}/conversations"
             params = {
                 "access_token": page_access_token,
                 "fields": "id,participants,messages{id,message,from,created_time}",  # first page of messages
                 "limit": limit
             }
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             if response.status_code == 200:
                 conversations_data = response.json()
                 logger.info(f"Retrieved {len(conversations_data.get('data', []))} conversations")
@@ -146,7 +157,7 @@ class FacebookAuthService:
                 logger.warning(f"Could not retrieve page messages: {response.status_code} - {response.text}")
                 return None
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Facebook page messages: {str(e)}")
             return None
 
@@ -156,30 +167,74 @@ class FacebookAuthService:
         Get posts from a Facebook page.
         """
         try:
-            url = f"https://graph.facebook.com/v18.0/{page_id}/posts"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{page_id}/posts"
             params = {
                 "access_token": page_access_token,
                 "fields": "id,message,created_time,comments{id,message,from,created_time}",
                 "limit": limit
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             posts_data = response.json()
             logger.info(f"Retrieved {len(posts_data.get('data', []))} posts")
             return posts_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Facebook page posts: {str(e)}")
             return None
 
+    async def get_page_inbox(self, page_id: str, page_access_token: str, page_size: int = 25) -> Optional[Dict[str, Any]]:
+        """
+        Get a page's conversations (with messages) and posts (with comments) in one
+        field-expanded request. Nested edges carry their own paging cursors; follow
+        them with get_next_page.
+        """
+        try:
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{page_id}"
+            params = {
+                "access_token": page_access_token,
+                "fields": (
+                    f"conversations.limit({page_size}){{id,updated_time,participants,"
+                    f"messages.limit({page_size}){{id,message,from,created_time}}}},"
+                    f"posts.limit({page_size}){{id,updated_time,"
+                    f"comments.order(reverse_chronological).limit({page_size}){{id,message,from,created_time}}}}"
+                ),
+            }
+            response = await provider_http_client.get(url, params=params)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.warning(f"Could not retrieve page inbox for {page_id}: {response.status_code} - {response.text}")
+                return None
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error getting Facebook page inbox: {str(e)}")
+            return None
+
+    async def get_next_page(self, next_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Follow a Graph `paging.next` URL (it already carries the access token and cursor).
+        """
+        try:
+            response = await provider_http_client.get(next_url)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.warning(f"Could not follow Facebook paging link: {response.status_code} - {response.text}")
+                return None
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error following Facebook paging link: {str(e)}")
+            return None
+
     async def refresh_facebook_token(self, access_token: str) -> Optional[Dict[str, Any]]:
         """
         Refresh Facebook access token.
         """
         try:
-            url = "https://graph.facebook.com/v18.0/oauth/access_token"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/oauth/access_token"
             params = {
                 "grant_type": "fb_exchange_token",
                 "client_id": self.facebook_app_id,
@@ -187,14 +242,14 @@ class FacebookAuthService:
                 "fb_exchange_token": access_token
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             token_data = response.json()
             logger.info("Successfully refreshed Facebook token")
             return token_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error refreshing Facebook token: {str(e)}")
             return None
 
@@ -203,14 +258,14 @@ class FacebookAuthService:
         Send a message from a Facebook page (requires pages_messaging permission).
         """
         try:
-            url = f"https://graph.facebook.com/v18.0/{page_id}/messages"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{page_id}/messages"
             data = {
                 "recipient": {"id": recipient_id},
                 "message": {"text": message},
                 "access_token": page_access_token
             }
             
-            response = requests.post(url, json=data, timeout=20)
+            response = await provider_http_client.post(url, json=data)
             if response.status_code == 200:
                 result = response.json()
                 logger.info(f"Successfully sent Facebook message to {recipient_id}")
@@ -219,7 +274,7 @@ class FacebookAuthService:
                 logger.warning(f"Could not send Facebook message: {response.status_code}")
                 return None
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error sending Facebook message: {str(e)}")
             return None
 
@@ -1,8 +1,11 @@
 import logging
 import asyncio
-import requests
+import time
+import httpx
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pathlib import Path
 import json
@@ -10,18 +13,30 @@ import sys
 
 sys.path.append('.')
 from app.models.company import Company
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.core.config import settings
 from app.core.ws_clients import company_email_ws_clients
 from app.core.broadcast import broadcast_new_email
+from app.core.metrics import MESSAGES_REPLIED, record_ingested, time_each
+from app.core.tracing import set_trace_attribute, span, start_trace, use_trace
 from app.services.ai_service import SimpleAIService, filter_email_with_ai
 from app.models.chat import Chat
 from app.crud.crud_channel_auto_reply_settings import channel_auto_reply_settings
+from app.crud.crud_chat import chat as chat_crud
 from app.services.channel_context_service import channel_context_service
-from app.services.facebook_auth_service import facebook_auth_service
+from app.services.facebook_auth_service import facebook_auth_service, parse_graph_time
 
 logger = logging.getLogger(__name__)
 
+
+class PagingError(Exception):
+    """A Graph `paging.next` link could not be followed."""
+
+
+# Returned by _prepare_facebook_chat when preparing an item failed (as opposed to filtering it out)
+PREPARE_FAILED = object()
+
+
 def should_reply_to_facebook_message(sender: str, content: str, settings, company_facebook_page_id: str = None) -> bool:
     """
     Check if a Facebook message should be replied to based on filtering criteria.
@@ -50,21 +65,17 @@ def should_reply_to_facebook_message(sender: str, content: str, settings, compan
     return True
 
 class FacebookMonitorService:
-    def __init__(self):
-        self.last_seen_message_ids = {}  # company_id -> last seen Facebook message ID
-        self.last_seen_comment_ids = {}  # company_id -> last seen Facebook comment ID
-
     def _get_credentials(self, company: Company, db: Session = None) -> Optional[Dict[str, Any]]:
         """Get Facebook credentials for a company."""
         if not company.facebook_box_credentials:
-            logger.warning(f"No Facebook credentials found for company {company.id}")
+            logger.warning("No Facebook credentials found for company %s", company.id)
             return None
         
         try:
             credentials = json.loads(company.facebook_box_credentials) if isinstance(company.facebook_box_credentials, str) else company.facebook_box_credentials
             return credentials
         except (json.JSONDecodeError, TypeError) as e:
-            logger.error(f"Error parsing Facebook credentials for company {company.id}: {str(e)}")
+            logger.error("Error parsing Facebook credentials for company %s: %s", company.id, e)
             return None
 
     async def _refresh_token_if_needed(self, credentials: Dict[str, Any], company_id: int) -> Optional[Dict[str, Any]]:
@@ -75,16 +86,15 @@ class FacebookMonitorService:
                 expires_datetime = datetime.fromtimestamp(expires_at, tz=timezone.utc)
                 # Refresh if token expires in less than 1 hour
                 if expires_datetime - datetime.now(timezone.utc) < timedelta(hours=1):
-                    logger.info(f"Refreshing Facebook token for company {company_id}")
+                    logger.info("Refreshing Facebook token for company %s", company_id)
                     
                     new_token_data = await facebook_auth_service.refresh_facebook_token(
                         credentials.get('access_token')
                     )
                     if new_token_data:
                         # Update credentials in database
-                        db = SessionLocal()
-                        try:
-                            company = db.query(Company).filter(Company.id == company_id).first()
+                        async with AsyncSessionLocal() as db:
+                            company = await db.get(Company, company_id)
                             if company:
                                 updated_credentials = {
                                     **credentials,
@@ -92,117 +102,219 @@ class FacebookMonitorService:
                                     'expires_at': new_token_data.get('expires_at', expires_at)
                                 }
                                 company.facebook_box_credentials = updated_credentials
-                                db.commit()
-                                logger.info(f"Updated Facebook credentials for company {company_id}")
+                                await db.commit()
+                                logger.info("Updated Facebook credentials for company %s", company_id)
                                 return updated_credentials
-                        finally:
-                            db.close()
                     
             return credentials
             
         except Exception as e:
-            logger.error(f"Error refreshing Facebook token for company {company_id}: {str(e)}")
+            logger.error("Error refreshing Facebook token for company %s: %s", company_id, e)
             return credentials
 
-    async def _get_facebook_messages(self, credentials: Dict[str, Any], page_id: str) -> List[Dict[str, Any]]:
+    async def _iter_edge_pages(self, edge: Optional[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield each page of a Graph edge, following `paging.next` links until exhausted.
+        Raises PagingError if a link cannot be followed, so a failed page is not mistaken
+        for the end of the edge.
+        """
+        while edge:
+            data = edge.get('data') or []
+            if data:
+                yield data
+            next_url = (edge.get('paging') or {}).get('next')
+            if not next_url:
+                return
+            edge = await facebook_auth_service.get_next_page(next_url)
+            if edge is None:
+                raise PagingError(next_url)
+
+    async def _get_facebook_items(
+        self, credentials: Dict[str, Any], page_id: str, since: datetime
+    ) -> Tuple[Optional[List[Dict[str, Any]]], datetime]:
         """
-        Fetch conversations from a page and FLATTEN to message-level dicts.
-        Each returned dict contains:
-        - id, message, from, created_time (original fields)
-        - conversation_id (thread id)
-        - participants (list of {id, name, email} for the thread)
+        Fetch every message and comment created after `since` on a page.
+
+        Starts from one field-expanded request (conversations{messages}, posts{comments})
+        and only follows cursors into conversations and posts whose updated_time moved
+        past the watermark. Message dicts carry conversation_id and participants, comment
+        dicts carry post_id and type='comment'.
+
+        Returns:
+            tuple: (items oldest first, or None if the page or one of its paging links
+                could not be fetched; new watermark)
         """
+        page_access_token = credentials.get('page_access_token')
+        if not page_access_token:
+            logger.warning("No page access token for Facebook page %s", page_id)
+            return None, since
+
+        page = await facebook_auth_service.get_page_inbox(page_id, page_access_token, page_size=settings.FACEBOOK_PAGE_SIZE)
+        if page is None:
+            return None, since
+
         try:
-            page_access_token = credentials.get('page_access_token')
-            if not page_access_token:
-                logger.warning(f"No page access token for Facebook page {page_id}")
-                return []
-
-            # Keep the conversations page small for performance; you can bump if desired.
-            conversations = await facebook_auth_service.get_page_messages(
-                page_id, page_access_token, limit=5
-            )
-            if not conversations or not conversations.get('data'):
-                return []
+            return await self._collect_items(page, page_id, since)
+        except PagingError:
+            # Keep the watermark so the next sweep fetches everything after `since` again
+            logger.warning("Could not follow a paging link for Facebook page %s; retrying next sweep", page_id)
+            return None, since
+
+    async def _collect_items(
+        self, page: Dict[str, Any], page_id: str, since: datetime
+    ) -> Tuple[List[Dict[str, Any]], datetime]:
+        """Walk the page inbox response and its paging links; see `_get_facebook_items`."""
+        items: List[Dict[str, Any]] = []
+        watermark = since
+
+        # Conversations come back most recently updated first, so stop at the first unchanged one
+        conversations_done = False
+        async for conversations in self._iter_edge_pages(page.get('conversations')):
+            for conv in conversations:
+                updated_time = parse_graph_time(conv.get('updated_time'))
+                if updated_time and updated_time <= since:
+                    conversations_done = True
+                    break
+                if updated_time:
+                    watermark = max(watermark, updated_time)
 
-            flattened: List[Dict[str, Any]] = []
-            for conv in conversations.get('data', []):
                 conv_id = conv.get('id')
                 participants = (conv.get('participants') or {}).get('data', []) or []
-
-                # Messages included in the conversation payload (first page)
-                msgs = (conv.get('messages') or {}).get('data', []) or []
-                for m in msgs:
-                    # Attach context so downstream code knows the thread + participants
-                    enriched = {
-                        **m,
-                        "conversation_id": conv_id,
-                        "participants": participants,
-                    }
-                    flattened.append(enriched)
-
-                # If you want to page deeper within EACH conversation, uncomment this block:
-                # after = ((conv.get('messages') or {}).get('paging') or {}).get('cursors', {}).get('after')
-                # pulls = 1
-                # MAX_PULLS_PER_CONV = 2  # keep it light; tune as needed
-                # while after and pulls <= MAX_PULLS_PER_CONV:
-                #     more = await facebook_auth_service.get_conversation_messages(conv_id, page_access_token, after=after, limit=25)
-                #     data = (more or {}).get('data', [])
-                #     for m in data:
-                #         enriched = {**m, "conversation_id": conv_id, "participants": participants}
-                #         flattened.append(enriched)
-                #     after = ((more or {}).get('paging') or {}).get('cursors', {}).get('after')
-                #     pulls += 1
-
-            logger.info(f"Flattened {len(flattened)} messages from {len(conversations.get('data', []))} conversations")
-            return flattened
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error getting Facebook messages: {str(e)}")
-            return []
-
-    
-    async def _get_facebook_comments(self, credentials: Dict[str, Any], page_id: str) -> List[Dict[str, Any]]:
-        """Get Facebook comments for a page with performance limits."""
+                # Messages are newest first as well
+                messages_done = False
+                async for messages in self._iter_edge_pages(conv.get('messages')):
+                    for m in messages:
+                        created_time = parse_graph_time(m.get('created_time'))
+                        if created_time and created_time <= since:
+                            messages_done = True
+                            break
+                        items.append({**m, "conversation_id": conv_id, "participants": participants})
+                    if messages_done:
+                        break
+            if conversations_done:
+                break
+
+        # Posts are ordered by creation time, not updated_time, so walk until a whole
+        # page of posts has no new comments
+        async for posts in self._iter_edge_pages(page.get('posts')):
+            page_changed = False
+            for post in posts:
+                updated_time = parse_graph_time(post.get('updated_time'))
+                if updated_time and updated_time <= since:
+                    continue
+                page_changed = True
+                if updated_time:
+                    watermark = max(watermark, updated_time)
+
+                comments_done = False
+                async for comments in self._iter_edge_pages(post.get('comments')):
+                    for comment in comments:
+                        created_time = parse_graph_time(comment.get('created_time'))
+                        if created_time and created_time <= since:
+                            comments_done = True
+                            break
+                        items.append({**comment, "post_id": post['id'], "type": 'comment'})
+                    if comments_done:
+                        break
+            if not page_changed:
+                break
+
+        items.sort(key=lambda item: item.get('created_time') or '')
+        logger.info("Fetched %s new Facebook messages and comments for page %s", len(items), page_id)
+        return items, watermark
+
+    async def _poll_company(self, company: Company, db: AsyncSession) -> int:
+        """Fetch and process everything new on a company's page, then advance its watermark."""
+        company_id = company.id
+        credentials = self._get_credentials(company, db)
+        if not credentials:
+            logger.warning("No Facebook credentials for company %s", company_id)
+            return 0
+
+        # Refresh token if needed
+        refreshed_credentials = await self._refresh_token_if_needed(credentials, company_id)
+        if not refreshed_credentials:
+            logger.error("Could not refresh Facebook token for company %s", company_id)
+            return 0
+
+        # Get Facebook page ID
+        page_id = company.facebook_box_page_id
+        if not page_id:
+            logger.warning("No Facebook page ID for company %s", company_id)
+            return 0
+
+        since = company.facebook_last_synced_at or (
+            datetime.now(timezone.utc) - timedelta(minutes=settings.FACEBOOK_INITIAL_LOOKBACK_MINUTES)
+        )
+        fetch_started = time.time_ns()
+        items, watermark = await self._get_facebook_items(refreshed_credentials, page_id, since)
+        fetch_ended = time.time_ns()
+        if items is None:
+            return 0
+
+        # Skip items that are already stored with one lookup for the whole batch
+        existing_ids = await chat_crud.get_existing_message_ids(
+            db, company_id=company_id, message_ids=[item.get('id') for item in items]
+        )
+        traces = {}  # Item ID -> trace
         try:
-            page_access_token = credentials.get('page_access_token')
-            if not page_access_token:
-                logger.warning(f"No page access token for Facebook page {page_id}")
-                return []
-
-            # Limit to 5 comments for performance
-            posts = await facebook_auth_service.get_page_posts(page_id, page_access_token, limit=5)
-            if posts and posts.get('data'):
-                all_comments = []
-                for post in posts['data']:
-                    if post.get('comments') and post['comments'].get('data'):
-                        # Limit to 3 comments per post for performance
-                        post_comments = post['comments']['data'][:3]
-                        for comment in post_comments:
-                            comment['post_id'] = post['id']
-                            comment['type'] = 'comment'
-                        all_comments.extend(post_comments)
-                return all_comments
-            return []
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error getting Facebook comments: {str(e)}")
-            return []
-
-    async def _process_facebook_message(self, message: Dict[str, Any], company: Company, db: Session) -> None:
-        """Process a Facebook message and send AI reply if needed."""
+            prepared = []
+            prepare_failed = False
+            for item in items:
+                if item.get('id') and item['id'] not in existing_ids:
+                    trace = start_trace(item['id'], "facebook", company_id, start_ns=fetch_started, **{"item.type": item.get('type', 'message')})
+                    trace.record("fetch", fetch_started, fetch_ended, batch_size=len(items))
+                    traces[item['id']] = trace
+                    with use_trace(trace):
+                        row = await self._prepare_facebook_chat(item, company)
+                    if row is PREPARE_FAILED:
+                        prepare_failed = True
+                        trace.end(outcome="failed")
+                    elif row:
+                        prepared.append((item, row))
+                    else:
+                        trace.end(outcome="skipped")
+
+            # Store all new items in one insert, then reply and broadcast for the ones that were stored
+            store_started = time.time_ns()
+            stored = await chat_crud.ingest_batch(db, rows=[row for _, row in prepared])
+            store_ended = time.time_ns()
+            record_ingested("facebook", stored)
+            stored_by_id = {chat.message_id: chat for chat in stored}
+            for item, _ in prepared:
+                trace = traces[item['id']]
+                chat = stored_by_id.get(item['id'])
+                if not chat:
+                    # Stored concurrently by another sweep
+                    trace.end(outcome="duplicate")
+                    continue
+                trace.record("store", store_started, store_ended, batch_size=len(prepared))
+                with use_trace(trace):
+                    await self._handle_stored_facebook_message(item, chat, company, db)
+                trace.end(outcome="stored")
+        except Exception as e:
+            for trace in traces.values():
+                trace.end(error=e)
+            raise
+
+        # Only advance the watermark once everything up to it has been handled. If an item
+        # could not be prepared (e.g. an OpenAI timeout), keep it so the next sweep fetches the
+        # item again; items stored in this sweep are skipped by the existing-ID lookup.
+        if prepare_failed:
+            logger.warning("Keeping the Facebook watermark for company %s: some items could not be prepared", company_id)
+            watermark = since
+        company.facebook_last_synced_at = watermark
+        await db.commit()
+        return len(items)
+
+    async def _prepare_facebook_chat(self, message: Dict[str, Any], company: Company) -> Union[Dict[str, Any], None, object]:
+        """
+        Filter and analyze a new Facebook message or comment.
+        Returns the chat row to store, None if the item should be skipped, or
+        PREPARE_FAILED if it could not be processed and should be retried.
+        """
         try:
             message_id = message.get('id')
-            if not message_id:
-                return
-        
-            # Check if message already exists
-            existing_chat = db.query(Chat).filter(
-                Chat.message_id == message_id,
-                Chat.company_id == company.id
-            ).first()
-            if existing_chat:
-                return
             
             # Determine message type and content
             message_type = message.get('type', 'message')
@@ -217,35 +329,31 @@ class FacebookMonitorService:
 
             # Apply filtering
             if not should_reply_to_facebook_message(sender, content, settings, company.facebook_box_page_id):
-                return
+                return None
 
             # AI filtering
-            if not await filter_email_with_ai(sender, content):
-                logger.info(f"Facebook message filtered out by AI: {message_id}")
-                return
+            with span("filter"):
+                passed = await filter_email_with_ai(sender, content)
+            if not passed:
+                logger.info("Facebook message filtered out by AI: %s", message_id)
+                return None
 
             # AI action analysis
             ai_service = SimpleAIService()
-            action_analysis = await ai_service.analyze_message_for_action_requirement(
-                sender=sender,
-                content=content,
-                company_goals=company.goal,
-                company_category=company.business_category,
-                company_id=company.id
-            )
+            with span("classify"):
+                action_analysis = await ai_service.analyze_message_for_action_requirement(
+                    sender=sender,
+                    content=content,
+                    company_goals=company.goal,
+                    company_category=company.business_category,
+                    company_id=company.id
+                )
+            set_trace_attribute("action_required", action_analysis.get('action_required', False))
 
             # Parse timestamp
-            created_time = message.get('created_time')
-            if created_time:
-                try:
-                    sent_at = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
-                except ValueError:
-                    sent_at = datetime.now(timezone.utc)
-            else:
-                sent_at = datetime.now(timezone.utc)
+            sent_at = parse_graph_time(message.get('created_time')) or datetime.now(timezone.utc)
 
-            # Store message in database
-            chat = Chat(
+            return dict(
                 company_id=company.id,
                 channel_id=conversation_id,
                 message_id=message_id,
@@ -265,58 +373,73 @@ class FacebookMonitorService:
                 email_provider='facebook'
             )
 
-            db.add(chat)
-            db.commit()
+        except Exception as e:
+            logger.error("Error processing Facebook message %s: %s", message.get('id'), e)
+            return PREPARE_FAILED
+
+    async def _handle_stored_facebook_message(self, message: Dict[str, Any], chat: Chat, company: Company, db: AsyncSession) -> None:
+        """Send an AI reply if needed and broadcast a newly stored Facebook message."""
+        try:
+            message_type = message.get('type', 'message')
+            conversation_id = chat.channel_id
+            sender = chat.from_email
+            content = chat.body_text
 
             # Check if we should send AI reply
-            if not action_analysis.get('action_required', False):
+            if not chat.action_required:
                 # Check channel auto-reply settings
-                channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=conversation_id)
+                channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=conversation_id)
                 if channel_settings and not channel_settings.enable_auto_reply:
-                    logger.info(f"Auto-reply disabled for Facebook channel {conversation_id}")
+                    logger.info("Auto-reply disabled for Facebook channel %s", conversation_id)
                 else:
                     # Check if we should reply (no recent outgoing message)
-                    last_outgoing = db.query(Chat).filter_by(
-                        company_id=company.id, 
-                        channel_id=conversation_id,
-                        from_email=company.facebook_box_page_name
-                    ).order_by(Chat.sent_at.desc()).first()
+                    last_outgoing = (await db.execute(
+                        select(Chat).where(
+                            Chat.company_id == company.id,
+                            Chat.channel_id == conversation_id,
+                            Chat.from_email == company.facebook_box_page_name
+                        ).order_by(Chat.sent_at.desc()).limit(1)
+                    )).scalars().first()
                     
-                    should_reply = not last_outgoing or (last_outgoing and last_outgoing.sent_at < sent_at)
+                    should_reply = not last_outgoing or (last_outgoing and last_outgoing.sent_at < chat.sent_at)
                     if should_reply:
                         await self._send_ai_reply_to_facebook(message, company, db, conversation_id, sender, content)
 
             # Broadcast to frontend
-            await broadcast_new_email(company_email_ws_clients, company.id, {
-                'type': 'new_facebook_message',
-                'message': {
-                    'id': chat.id,
-                    'from': sender,
-                    'text': content,
-                    'created_time': sent_at.isoformat(),
-                    'message_type': message_type,
-                    'notification_read': False
-                }
-            })
-
-            logger.info(f"Processed Facebook message {message_id} for company {company.id}")
+            with span("broadcast"):
+                await broadcast_new_email(company_email_ws_clients, company.id, {
+                    'type': 'new_facebook_message',
+                    'message': {
+                        'id': chat.id,
+                        'from': sender,
+                        'text': content,
+                        'created_time': chat.sent_at.isoformat(),
+                        'message_type': message_type,
+                        'notification_read': False
+                    }
+                })
+
+            logger.info("Processed Facebook message %s for company %s", chat.message_id, company.id)
 
         except Exception as e:
-            logger.error(f"Error processing Facebook message: {str(e)}")
-            db.rollback()
+            logger.error("Error processing Facebook message: %s", e)
+            await db.rollback()
+            # The rollback expires loaded objects; reload the company so the caller can keep using it
+            await db.refresh(company)
 
-    async def _send_ai_reply_to_facebook(self, message: Dict[str, Any], company: Company, db: Session, conversation_id: str, sender: str, content: str) -> None:
+    async def _send_ai_reply_to_facebook(self, message: Dict[str, Any], company: Company, db: AsyncSession, conversation_id: str, sender: str, content: str) -> None:
         """Send AI-generated reply to Facebook message."""
         try:
             ai_service = SimpleAIService()
             
             # Generate AI reply
-            reply_text = await ai_service.generate_email_reply(
-                sender=sender,
-                content=content,
-                company_id=company.id,
-                channel_id=conversation_id
-            )
+            with span("generate"):
+                reply_text = await ai_service.generate_email_reply(
+                    sender=sender,
+                    content=content,
+                    company_id=company.id,
+                    channel_id=conversation_id
+                )
 
             # Send reply via Facebook API
             page_id = company.facebook_box_page_id
@@ -331,19 +454,22 @@ class FacebookMonitorService:
                 recipient_id = message.get('from', {}).get('id')
                 if recipient_id:
                     # Send message via Facebook API
-                    result = await facebook_auth_service.send_page_message(
-                        page_id=page_id,
-                        page_access_token=page_access_token,
-                        recipient_id=recipient_id,
-                        message=reply_text
-                    )
+                    with span("send"):
+                        result = await facebook_auth_service.send_page_message(
+                            page_id=page_id,
+                            page_access_token=page_access_token,
+                            recipient_id=recipient_id,
+                            message=reply_text
+                        )
                     
                     if result:
                         # Mark original message as replied
-                        original_chat = db.query(Chat).filter(
-                            Chat.message_id == message.get('id'),
-                            Chat.company_id == company.id
-                        ).first()
+                        original_chat = (await db.execute(
+                            select(Chat).where(
+                                Chat.message_id == message.get('id'),
+                                Chat.company_id == company.id
+                            ).limit(1)
+                        )).scalars().first()
                         if original_chat:
                             original_chat.replied = True
                             db.add(original_chat)
@@ -368,120 +494,71 @@ class FacebookMonitorService:
                             urgency='',
                             email_provider='facebook'
                         )
-                        db.add(reply_chat)
-                        db.commit()
+                        with span("store_reply"):
+                            db.add(reply_chat)
+                            await db.commit()
+                        MESSAGES_REPLIED.labels("facebook").inc()
+                        set_trace_attribute("replied", True)
 
                         # Store in channel context
-                        channel_context_service.store_message_in_context(db, reply_chat)
+                        await db.run_sync(channel_context_service.store_message_in_context, reply_chat)
                         
-                        logger.info(f"Sent AI reply to Facebook message {message.get('id')}")
+                        logger.info("Sent AI reply to Facebook message %s", message.get('id'))
                     else:
-                        logger.error(f"Failed to send Facebook reply to message {message.get('id')}")
+                        logger.error("Failed to send Facebook reply to message %s", message.get('id'))
                 else:
-                    logger.warning(f"No recipient ID found for Facebook message {message.get('id')}")
+                    logger.warning("No recipient ID found for Facebook message %s", message.get('id'))
             else:
-                logger.warning(f"No Facebook page access token for company {company.id}")
+                logger.warning("No Facebook page access token for company %s", company.id)
 
         except Exception as e:
-            logger.error(f"Error sending AI reply to Facebook: {str(e)}")
+            logger.error("Error sending AI reply to Facebook: %s", e)
 
     async def poll_facebook_messages(self, company_id: int) -> None:
-        """Poll Facebook messages for a specific company with performance limits."""
-        db = None
+        """Poll Facebook messages and comments for a specific company."""
         try:
-            db = SessionLocal()
-            company = db.query(Company).filter(Company.id == company_id).first()
-            if not company:
-                logger.warning(f"Company {company_id} not found")
-                return
+            async with AsyncSessionLocal() as db:
+                company = await db.get(Company, company_id)
+                if not company:
+                    logger.warning("Company %s not found", company_id)
+                    return
 
-            credentials = self._get_credentials(company, db)
-            if not credentials:
-                logger.warning(f"No Facebook credentials for company {company_id}")
-                return
-
-            # Refresh token if needed
-            refreshed_credentials = await self._refresh_token_if_needed(credentials, company_id)
-            if not refreshed_credentials:
-                logger.error(f"Could not refresh Facebook token for company {company_id}")
-                return
-
-            # Get Facebook page ID
-            page_id = company.facebook_box_page_id
-            if not page_id:
-                logger.warning(f"No Facebook page ID for company {company_id}")
-                return
-
-            # Get messages (flattened from conversations) and comments with limits
-            messages = await self._get_facebook_messages(refreshed_credentials, page_id)  # flattened
-            comments = await self._get_facebook_comments(refreshed_credentials, page_id)
-
-            all_items = messages + comments
-
-            # Process new items
-            for item in all_items:
-                await self._process_facebook_message(item, company, db)
-
-            logger.info(f"Polled {len(all_items)} Facebook items for company {company_id}")
+                count = await self._poll_company(company, db)
+                logger.info("Polled %s Facebook items for company %s", count, company_id)
 
         except Exception as e:
-            logger.error(f"Error polling Facebook messages for company {company_id}: {str(e)}")
-        finally:
-            if db is not None:
-                db.close()
+            logger.error("Error polling Facebook messages for company %s: %s", company_id, e)
 
 
     async def poll_facebook_messages_from_companies(self) -> None:
-        """Poll Facebook messages for all companies with performance limits."""
+        """Poll Facebook messages and comments for all companies."""
         try:
-            db = SessionLocal()
-            companies = db.query(Company).filter(Company.facebook_box_credentials.isnot(None)).all()
-            
-            for company in companies:
-                company_id = company.id
-                credentials = self._get_credentials(company, db)
-                if not credentials:
-                    logger.warning(f"No Facebook credentials for company {company_id}")
-                    continue
-
-                # Refresh token if needed
-                refreshed_credentials = await self._refresh_token_if_needed(credentials, company_id)
-                if not refreshed_credentials:
-                    logger.error(f"Could not refresh Facebook token for company {company_id}")
-                    continue
-
-                # Get Facebook page ID
-                page_id = company.facebook_box_page_id
-                if not page_id:
-                    logger.warning(f"No Facebook page ID for company {company_id}")
-                    continue
-
-                # Get messages and comments with limits
-                messages = await self._get_facebook_messages(refreshed_credentials, page_id)
-                comments = await self._get_facebook_comments(refreshed_credentials, page_id)
+            async with AsyncSessionLocal() as db:
+                company_ids = (await db.execute(
+                    select(Company.id).where(Company.facebook_box_credentials.isnot(None))
+                )).scalars().all()
                 
-                all_messages = messages + comments
-
-                # Process new messages
-                for message in all_messages:
-                    await self._process_facebook_message(message, company, db)
-
-                logger.info(f"Polled {len(all_messages)} Facebook messages for company {company_id}")
+                for company_id in time_each(company_ids, "facebook"):
+                    company = await db.get(Company, company_id)
+                    try:
+                        count = await self._poll_company(company, db)
+                        logger.info("Polled %s Facebook messages for company %s", count, company_id)
+                    except Exception as e:
+                        logger.error("Error polling Facebook messages for company %s: %s", company_id, e)
+                        await db.rollback()
 
         except Exception as e:
-            logger.error(f"Error polling Facebook messages for companies : {str(e)}")
-        finally:
-            db.close()
+            logger.error("Error polling Facebook messages for companies : %s", e)
 
     async def start_monitoring(self, company_id: int, interval_seconds: int = 60) -> None:
         """Start monitoring Facebook messages for a company."""
-        logger.info(f"Starting Facebook monitoring for company {company_id}")
+        logger.info("Starting Facebook monitoring for company %s", company_id)
         
         while True:
             try:
                 await self.poll_facebook_messages(company_id)
             except Exception as e:
-                logger.error(f"Error in Facebook monitoring loop for company {company_id}: {str(e)}")
+                logger.error("Error in Facebook monitoring loop for company %s: %s", company_id, e)
             await asyncio.sleep(interval_seconds)
 
 # Singleton instance
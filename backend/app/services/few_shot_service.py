@@ -0,0 +1,279 @@
+import asyncio
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.chat import Chat
+from app.services.context_retrieval_service import context_retrieval_service
+from app.utils.feedback import feedback_satisfaction
+
+logger = logging.getLogger(__name__)
+
+# Feedback rows scanned per query while catching up
+SYNC_BATCH_SIZE = 500
+# Embedding input limit for an incoming message
+MAX_MESSAGE_CHARS = 8000
+
+
+class FewShotIndex:
+    """
+    A company's well-rated (incoming message, sent reply) pairs.
+
+    Row i of `vectors` is the unit-normalized embedding of the incoming message of
+    `chat_ids[i]` (the reply's chat id). `watermark` is the (changed_at, id) of the
+    last feedback row that has been processed.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        vectors: Optional[np.ndarray] = None,
+        chat_ids: Optional[List[int]] = None,
+        examples: Optional[Dict[int, Dict[str, str]]] = None,
+        watermark: Optional[Tuple[datetime, int]] = None,
+    ):
+        self.model = model
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        self.chat_ids = chat_ids or []
+        self.examples = examples or {}
+        self.watermark = watermark
+
+    def __len__(self) -> int:
+        return len(self.chat_ids)
+
+    def add(self, chat_ids: List[int], vectors: np.ndarray, examples: List[Dict[str, str]]) -> None:
+        """Append new rows; existing rows are kept as they are."""
+        if not chat_ids:
+            return
+        self.vectors = vectors if not len(self) else np.vstack([self.vectors, vectors])
+        self.chat_ids.extend(chat_ids)
+        for chat_id, example in zip(chat_ids, examples):
+            self.examples[chat_id] = example
+
+    def remove(self, chat_ids: List[int]) -> int:
+        """Drop rows by chat id; returns how many were indexed."""
+        drop = set(chat_ids) & set(self.examples)
+        if not drop:
+            return 0
+        keep = [i for i, chat_id in enumerate(self.chat_ids) if chat_id not in drop]
+        self.vectors = self.vectors[keep]
+        self.chat_ids = [self.chat_ids[i] for i in keep]
+        for chat_id in drop:
+            self.examples.pop(chat_id, None)
+        return len(drop)
+
+
+class FewShotService:
+    """
+    Nearest-neighbour index of past replies the company rated well, used as
+    few-shot examples when drafting a new reply.
+
+    A pair is a chat row with positive feedback (FEW_SHOT_MIN_SATISFACTION) and the
+    latest message from the other party before it in the same channel. Only the
+    incoming message is embedded, since that is what a new message is compared with.
+    The index is kept in memory and saved per company as one .npz file under
+    FEW_SHOT_INDEX_DIR, together with a watermark on (updated_at, id) of the
+    feedback rows already processed. Each sync only reads feedback changed since
+    the watermark and embeds only pairs that are not indexed yet; pairs whose
+    feedback turned negative are dropped without touching the rest.
+    """
+
+    def __init__(self):
+        self.index_dir = settings.FEW_SHOT_INDEX_DIR
+        self._indexes: Dict[int, FewShotIndex] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._syncing: Dict[int, asyncio.Task] = {}
+
+    def _path(self, company_id: int) -> str:
+        return os.path.join(self.index_dir, f"{company_id}.npz")
+
+    def _save(self, company_id: int, index: FewShotIndex) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        meta = {
+            "model": index.model,
+            "examples": {str(chat_id): example for chat_id, example in index.examples.items()},
+            "watermark": [index.watermark[0].isoformat(), index.watermark[1]] if index.watermark else None,
+        }
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            vectors=index.vectors,
+            chat_ids=np.asarray(index.chat_ids, dtype=np.int64),
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+        path = self._path(company_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    def _load(self, company_id: int) -> Optional[FewShotIndex]:
+        try:
+            with np.load(self._path(company_id)) as data:
+                vectors = data["vectors"].astype(np.float32)
+                chat_ids = [int(i) for i in data["chat_ids"]]
+                meta = json.loads(str(data["meta"]))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load few-shot index for company {company_id}: {e}")
+            return None
+        if meta.get("model") != context_retrieval_service.embedding_model:
+            # Vectors from another embedding model are not comparable; start over
+            return None
+        watermark = meta.get("watermark")
+        return FewShotIndex(
+            model=meta["model"],
+            vectors=vectors,
+            chat_ids=chat_ids,
+            examples={int(chat_id): example for chat_id, example in meta["examples"].items()},
+            watermark=(datetime.fromisoformat(watermark[0]), watermark[1]) if watermark else None,
+        )
+
+    async def _get_index(self, company_id: int) -> FewShotIndex:
+        index = self._indexes.get(company_id)
+        if index is None:
+            index = await asyncio.to_thread(self._load, company_id)
+            if index is None:
+                index = FewShotIndex(model=context_retrieval_service.embedding_model)
+            self._indexes[company_id] = index
+        return index
+
+    async def _fetch_changed_feedback(
+        self, company_id: int, after: Optional[Tuple[datetime, int]]
+    ) -> List[Tuple]:
+        incoming = aliased(Chat)
+        changed_at = func.coalesce(Chat.updated_at, Chat.created_at)
+        # The message being answered: the other party's latest message before the reply
+        incoming_text = (
+            select(incoming.body_text)
+            .where(
+                incoming.company_id == Chat.company_id,
+                incoming.channel_id == Chat.channel_id,
+                incoming.sent_at < Chat.sent_at,
+                incoming.from_email.is_distinct_from(Chat.from_email),
+            )
+            .order_by(incoming.sent_at.desc())
+            .limit(1)
+            .correlate(Chat)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(Chat.id, changed_at, Chat.feedback, Chat.body_text, incoming_text)
+            .where(Chat.company_id == company_id, Chat.feedback.isnot(None))
+            .order_by(changed_at, Chat.id)
+            .limit(SYNC_BATCH_SIZE)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(changed_at, Chat.id) > tuple_(*after))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            return list(result.all())
+
+    async def sync_company(self, company_id: int) -> None:
+        """
+        Bring a company's index up to date with feedback given since the last sync.
+        Called in the background after feedback is stored.
+        """
+        lock = self._locks.setdefault(company_id, asyncio.Lock())
+        async with lock:
+            try:
+                index = await self._get_index(company_id)
+                added = removed = 0
+                while True:
+                    rows = await self._fetch_changed_feedback(company_id, index.watermark)
+                    if not rows:
+                        break
+
+                    new_ids: List[int] = []
+                    new_examples: List[Dict[str, str]] = []
+                    stale_ids: List[int] = []
+                    for chat_id, _, feedback, reply, incoming in rows:
+                        score = feedback_satisfaction(feedback)
+                        if score is None or score < settings.FEW_SHOT_MIN_SATISFACTION or not reply or not incoming:
+                            stale_ids.append(chat_id)
+                            continue
+                        example = {"incoming": incoming.strip(), "reply": reply.strip()}
+                        if index.examples.get(chat_id) == example:
+                            continue
+                        # Re-rated or edited pairs are replaced, everything else is left alone
+                        stale_ids.append(chat_id)
+                        new_ids.append(chat_id)
+                        new_examples.append(example)
+
+                    removed += index.remove(stale_ids)
+                    if new_ids:
+                        vectors = await context_retrieval_service.embed(
+                            [example["incoming"][:MAX_MESSAGE_CHARS] for example in new_examples]
+                        )
+                        index.add(new_ids, vectors, new_examples)
+                    added += len(new_ids)
+                    index.watermark = (rows[-1][1], rows[-1][0])
+                    if len(rows) < SYNC_BATCH_SIZE:
+                        break
+
+                await asyncio.to_thread(self._save, company_id, index)
+                if added or removed:
+                    logger.info(
+                        f"Few-shot index for company {company_id} updated: {added} embedded, {removed} dropped ({len(index)} examples)"
+                    )
+            except Exception as e:
+                logger.error(f"Error syncing few-shot index for company {company_id}: {str(e)}")
+
+    def _schedule_sync(self, company_id: int) -> None:
+        task = self._syncing.get(company_id)
+        if task is not None and not task.done():
+            return
+        self._syncing[company_id] = asyncio.create_task(self.sync_company(company_id))
+
+    async def get_examples(
+        self, company_id: Optional[int], content: str, k: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Return up to k well-rated past (incoming, reply) pairs most similar to `content`.
+
+        Args:
+            company_id: The company ID
+            content: The incoming message being answered
+            k: Number of examples (defaults to FEW_SHOT_EXAMPLES)
+
+        Returns:
+            list: {"incoming", "reply"} dicts, most similar first. Empty until the
+            company's index has been built (the first call starts a sync).
+        """
+        if company_id is None or not content:
+            return []
+        k = k or settings.FEW_SHOT_EXAMPLES
+        try:
+            if company_id not in self._indexes:
+                # Catch up on feedback given while this process was not running
+                await self._get_index(company_id)
+                self._schedule_sync(company_id)
+            index = self._indexes[company_id]
+            if not len(index):
+                return []
+            query_vector = await context_retrieval_service.embed_query(content[:MAX_MESSAGE_CHARS])
+            vectors, chat_ids = index.vectors, list(index.chat_ids)
+            scores = vectors @ query_vector
+            top = np.argsort(-scores)[:k]
+            return [
+                index.examples[chat_ids[i]]
+                for i in top
+                if scores[i] >= settings.FEW_SHOT_MIN_SIMILARITY and chat_ids[i] in index.examples
+            ]
+        except Exception as e:
+            logger.error(f"Error retrieving few-shot examples for company {company_id}: {str(e)}")
+            return []
+
+
+# Create a singleton instance
+few_shot_service = FewShotService()
@@ -1,7 +1,10 @@
 import json
+import logging
 from typing import Dict, Any, List, Optional
 from app.services.ai_service import SimpleAIService
 
+logger = logging.getLogger(__name__)
+
 class FlowAnalyzerService:
     def __init__(self):
         self.ai_service = SimpleAIService()
@@ -16,9 +19,8 @@ class FlowAnalyzerService:
                 return "No flow structure found."
             
             flow_description = self._create_flow_description(nodes, edges)
-            print("flow_description===========>", flow_description)
+            logger.debug("Flow description: %d chars", len(flow_description))
             prompt = self._create_analysis_prompt(flow_description)
-            print("prompt===========>", prompt)
             
             # Use asyncio to run the async method
             import asyncio
@@ -27,7 +29,7 @@ class FlowAnalyzerService:
             return response.strip()
             
         except Exception as e:
-            print(f"Error analyzing flow data: {e}")
+            logger.error("Error analyzing flow data: %s", e)
             return "Unable to analyze flow structure."
     
     def _create_flow_description(self, nodes: List[Dict], edges: List[Dict]) -> str:
@@ -88,12 +90,12 @@ class FlowAnalyzerService:
         try:
             flow_data = json.loads(flow_builder_data)
             flow_context = self.analyze_flow_builder_data(flow_data)
-            print("flow_context===========>", flow_context)
+            logger.debug("Generated flow context for company %s: %d chars", company_id, len(flow_context))
             return flow_context
             
         except json.JSONDecodeError:
-            print("Invalid JSON in flow_builder_data")
+            logger.warning("Invalid JSON in flow_builder_data for company %s", company_id)
             return None
         except Exception as e:
-            print(f"Error updating flow context: {e}")
+            logger.error("Error updating flow context: %s", e)
             return None 
\ No newline at end of file
@@ -1,57 +1,182 @@
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Tuple
-from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.email import send_email, send_plain_email
 from app.models.company import Company
 from app.models.lead import Lead
-from app.crud.crud_lead import lead
+from app.crud.crud_lead import lead as lead_crud, follow_up_due_at
+from app.db.session import AsyncSessionLocal
 from app.services.ai_service import SimpleAIService
 
 logger = logging.getLogger(__name__)
 
+
+class TokenBucket:
+    """
+    Async token bucket: `rate_per_minute` sends on average, with bursts of up to `burst`.
+    acquire() waits until a token is available.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class FollowUpService:
     def __init__(self):
         """Initialize the follow-up service."""
         self.ai_service = SimpleAIService()
 
-    async def send_follow_up_emails(self, db: Session) -> None:
+    async def send_follow_up_emails(self, db: AsyncSession) -> None:
         """
-        Send follow-up emails to all leads based on their company's follow-up cycle.
+        Send follow-up emails to all leads whose follow-up is due.
         This should be called periodically (e.g., via a cron job).
+        
+        Due leads are read across all companies in keyset pages ordered by
+        next_follow_up_at. Within a page, AI generation runs concurrently
+        (FOLLOW_UP_GENERATION_CONCURRENCY) and sends are paced per sending mailbox
+        by a token bucket. Results are saved as sends finish, in batches of
+        FOLLOW_UP_SAVE_BATCH_SIZE, so a failed save can only re-send that batch.
         """
+        now = datetime.now(timezone.utc)
+        generation_semaphore = asyncio.Semaphore(settings.FOLLOW_UP_GENERATION_CONCURRENCY)
+        mailbox_buckets: Dict[str, TokenBucket] = {}
+        after: Optional[Tuple[datetime, int]] = None
+        sent = failed = 0
+        started = time.monotonic()
+        
+        async def dispatch(lead_obj: Lead) -> Tuple[Lead, object]:
+            try:
+                return lead_obj, await self._dispatch_follow_up(lead_obj, generation_semaphore, mailbox_buckets)
+            except Exception as e:
+                return lead_obj, e
+        
         try:
-            # Get all companies with follow-up cycle set
-            companies = db.query(Company).filter(Company.follow_up_cycle.isnot(None)).all()
-            
-            for company in companies:
-                # Get all leads for this company
-                leads = lead.get_by_company(db, company_id=company.id)
+            while True:
+                leads = await lead_crud.get_due_page(
+                    db, now=now, after=after, limit=settings.FOLLOW_UP_PAGE_SIZE
+                )
+                if not leads:
+                    break
+                after = (leads[-1].next_follow_up_at, leads[-1].id)
+                
+                tasks = [asyncio.create_task(dispatch(lead_obj)) for lead_obj in leads]
+                batch: List[Dict] = []
+                try:
+                    for finished in asyncio.as_completed(tasks):
+                        lead_obj, result = await finished
+                        finished_at = datetime.now(timezone.utc)
+                        if isinstance(result, Exception):
+                            failed += 1
+                            # Retry later instead of on every sweep
+                            batch.append({
+                                "id": lead_obj.id,
+                                "next_follow_up_at": finished_at + timedelta(minutes=settings.FOLLOW_UP_RETRY_MINUTES),
+                            })
+                        else:
+                            sent += 1
+                            # Store the sent body as the lead's email context and schedule the next follow-up
+                            batch.append({
+                                "id": lead_obj.id,
+                                "email_context": result,
+                                "follow_up_last_sent_at": finished_at,
+                                "next_follow_up_at": follow_up_due_at(finished_at, lead_obj.company.follow_up_cycle),
+                            })
+                        if len(batch) >= settings.FOLLOW_UP_SAVE_BATCH_SIZE:
+                            await self._save_results(batch)
+                            batch = []
+                    if batch:
+                        await self._save_results(batch)
+                finally:
+                    for task in tasks:
+                        task.cancel()
                 
-                for lead_obj in leads:
-                    # Calculate if it's time to send a follow-up
-                    if self._should_send_follow_up(lead_obj, company.follow_up_cycle):
-                        await self._send_follow_up_email(lead_obj, company, db)
+                if len(leads) < settings.FOLLOW_UP_PAGE_SIZE:
+                    break
+            
+            logger.info(f"Follow-up sweep finished: sent={sent}, failed={failed} in {time.monotonic() - started:.1f}s")
                         
         except Exception as e:
             logger.error(f"Error in send_follow_up_emails: {str(e)}")
             raise
 
-    def _should_send_follow_up(self, lead: Lead, follow_up_cycle_ms: int) -> bool:
+    async def _save_results(self, results: List[Dict]) -> None:
+        """
+        Save a batch of follow-up results, retrying with backoff.
+
+        Uses its own short-lived session, so a failed commit never rolls back (and
+        expires) the leads the sweep is still sending to.
+        """
+        for attempt in range(settings.FOLLOW_UP_SAVE_RETRIES + 1):
+            try:
+                async with AsyncSessionLocal() as session:
+                    await lead_crud.save_follow_up_results(session, results)
+                return
+            except Exception as e:
+                if attempt >= settings.FOLLOW_UP_SAVE_RETRIES:
+                    # These leads will be followed up again on the next sweep
+                    logger.error(
+                        f"Failed to save follow-up results for leads {[result['id'] for result in results]}: {str(e)}"
+                    )
+                    return
+                delay = 2 ** attempt
+                logger.warning(f"Saving follow-up results failed ({e!r}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _sending_mailbox(company: Company) -> Optional[str]:
+        if getattr(company, 'gmail_box_credentials', None) and company.gmail_box_email:
+            return company.gmail_box_email
+        if getattr(company, 'outlook_box_credentials', None) and company.outlook_box_email:
+            return company.outlook_box_email
+        return None
+
+    async def _dispatch_follow_up(
+        self,
+        lead: Lead,
+        generation_semaphore: asyncio.Semaphore,
+        mailbox_buckets: Dict[str, TokenBucket]
+    ) -> str:
         """
-        Determine if it's time to send a follow-up email to a lead.
+        Generate and send one follow-up. Returns the sent body (the lead's new email context).
         """
-        # Convert milliseconds to days for easier comparison
-        follow_up_cycle_days = follow_up_cycle_ms / (1000 * 60 * 60 * 24)
+        company = lead.company
+        mailbox = self._sending_mailbox(company)
+        if not mailbox:
+            logger.error(f"Failed to send follow-up email to {lead.email}: no email credentials configured for company {company.id}")
+            raise Exception("No email credentials configured for this company")
         
-        # Calculate the time since the last follow-up or creation
-        current_time = datetime.now(timezone.utc)
-        reference_time = lead.follow_up_last_sent_at or lead.created_at
-        time_since_last_follow_up = current_time - reference_time
+        # Generate email content using AI
+        async with generation_semaphore:
+            subject, body = await self._generate_email_content(lead, company)
+        
+        bucket = mailbox_buckets.get(mailbox)
+        if bucket is None:
+            bucket = TokenBucket(settings.FOLLOW_UP_MAILBOX_SENDS_PER_MINUTE, settings.FOLLOW_UP_MAILBOX_BURST)
+            mailbox_buckets[mailbox] = bucket
+        await bucket.acquire()
         
-        # Send follow-up if enough time has passed
-        return time_since_last_follow_up.days >= follow_up_cycle_days
+        await self._send_follow_up_email(lead, company, subject, body)
+        return body
 
     async def _generate_email_content(self, lead: Lead, company: Company) -> Tuple[str, str]:
         """
@@ -107,14 +232,11 @@ class FollowUpService:
         """
         return subject, body
 
-    async def _send_follow_up_email(self, lead: Lead, company: Company, db: Session) -> None:
+    async def _send_follow_up_email(self, lead: Lead, company: Company, subject: str, body: str) -> None:
         """
         Send a follow-up email to a lead using Gmail or Outlook credentials.
         """
         try:
-            # Generate email content using AI
-            subject, body = await self._generate_email_content(lead, company)
-
             # Determine which email service to use
             gmail_credentials = getattr(company, 'gmail_box_credentials', None)
             outlook_credentials = getattr(company, 'outlook_box_credentials', None)
@@ -152,11 +274,6 @@ class FollowUpService:
             else:
                 raise Exception("No email credentials configured for this company")
 
-            # Update the lead's email context and last sent timestamp
-            lead.email_context = body  # Store the latest email content as context
-            lead.follow_up_last_sent_at = datetime.now(timezone.utc)
-            db.commit()
-
         except Exception as e:
             logger.error(f"Failed to send follow-up email to {lead.email}: {str(e)}")
             raise
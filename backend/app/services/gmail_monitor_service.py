@@ -1,10 +1,12 @@
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pathlib import Path
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 import sys
 import asyncio
@@ -19,12 +21,15 @@ from app.db.session import SessionLocal
 from app.core.config import settings
 from app.core.ws_clients import company_email_ws_clients
 from app.core.broadcast import broadcast_new_email
+from app.core.metrics import MESSAGES_REPLIED, record_ingested, time_each
+from app.core.tracing import span, start_trace, use_trace
 from app.services.ai_service import SimpleAIService, filter_email_with_ai
 import base64
 from email.mime.text import MIMEText
-from app.core.email import send_plain_email
+from app.core.email import build_gmail_service, send_plain_email
 from app.models.chat import Chat
 from app.crud.crud_channel_auto_reply_settings import channel_auto_reply_settings
+from app.crud.crud_chat import chat as chat_crud
 from app.services.channel_context_service import channel_context_service
 from bs4 import BeautifulSoup
 from app.util import extract_email_address, remove_gmail_quote, clean_html_content
@@ -135,41 +140,44 @@ class GmailMonitorService:
                 return None
         return creds
 
-    async def poll_new_emails(self, db: Session):
-        print("[DEBUG] poll_new_emails called")
-        logger.info("[DEBUG] poll_new_emails called")
-        companies = db.query(Company).filter(Company.gmail_box_credentials.isnot(None)).all()
-        print(f"[DEBUG] Found {len(companies)} companies with Gmail credentials")
-        for company in companies:
-            print(f"[DEBUG] Polling company {company.id} - {company.name}")
-            logger.info(f"[DEBUG] Polling company {company.id} - {company.name}")
-            creds = self._get_credentials(company, db)
+    async def poll_new_emails(self, db: AsyncSession):
+        logger.debug("poll_new_emails called")
+        company_ids = (await db.execute(
+            select(Company.id).where(Company.gmail_box_credentials.isnot(None))
+        )).scalars().all()
+        logger.debug("Found %s companies with Gmail credentials", len(company_ids))
+        for company_id in time_each(company_ids, "gmail"):
+            # Re-fetch each company: a rollback in a previous iteration expires loaded objects
+            company = await db.get(Company, company_id)
+            logger.debug("Polling company %s - %s", company.id, company.name)
+            creds = await db.run_sync(lambda session: self._get_credentials(company, session))
             if creds == 'REAUTH_NEEDED':
                 # Optionally, notify user/admin here (e.g., send alert, log, etc.)
                 logger.warning(f"Company {company.id} ({company.name}) must reconnect their Gmail account.")
-                print(f"[DEBUG] Company {company.id} needs re-authentication")
+                logger.debug("Company %s needs re-authentication", company.id)
                 continue
             if not creds:
-                print(f"[DEBUG] No credentials for company {company.id}")
+                logger.debug("No credentials for company %s", company.id)
                 continue
+            traces = {}  # Gmail message ID -> trace of a new message
             try:
-                service = build('gmail', 'v1', credentials=creds)
+                service = build_gmail_service(creds)
                 results = service.users().messages().list(userId='me', maxResults=5, q='is:inbox').execute()
                 messages = results.get('messages', [])
-                print(f"[DEBUG] Found {len(messages)} total messages in inbox for company {company.id}")
+                logger.debug("Found %s total messages in inbox for company %s", len(messages), company.id)
                 last_seen_id = self.last_seen_message_ids.get(company.id)
-                print(f"[DEBUG] Last seen message ID for company {company.id}: {last_seen_id}")
+                logger.debug("Last seen message ID for company %s: %s", company.id, last_seen_id)
                 new_messages = []
                 for msg in messages:
                     if msg['id'] == last_seen_id:
-                        print(f"[DEBUG] Reached last seen message ID, stopping at: {last_seen_id}")
+                        logger.debug("Reached last seen message ID, stopping at: %s", last_seen_id)
                         break
                     
                     # Get message details to check sender and content
                     msg_detail = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
                     headers = msg_detail.get('payload', {}).get('headers', [])
                     sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), None)
-                    print(f"[DEBUG] Processing message {msg['id']} from: {sender}")
+                    logger.debug("Processing message %s from: %s", msg['id'], sender)
                     
                     # Get message content for filtering
                     def get_body_parts(payload):
@@ -183,7 +191,6 @@ class GmailMonitorService:
                                 elif part.get('mimeType') == 'text/html' and 'data' in part.get('body', {}):
                                     import base64
                                     html = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
-                                    print(f"[DEBUG] Processing part: {base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')}")
                             for part in payload['parts']:
                                 t, h = get_body_parts(part)
                                 if t and not text:
@@ -201,44 +208,46 @@ class GmailMonitorService:
                     
                     text_body, html_body = get_body_parts(msg_detail.get('payload', {}))
                     main_content = text_body or html_body or ''
-                    print(f"[DEBUG] Message {msg['id']} content length: {len(main_content)}")
+                    logger.debug("Message %s content length: %s", msg['id'], len(main_content))
                     
                     # Apply filtering rules
                     # 1. Skip if email content contains an unsubscribe link
                     if 'unsubscribe' in main_content.lower():
-                        print(f"[DEBUG] Skipping message {msg['id']} - contains unsubscribe link")
+                        logger.debug("Skipping message %s - contains unsubscribe link", msg['id'])
                         continue
                     
                     # 2. Skip if sender address contains 'no-reply' or 'noreply'
                     if sender and ('no-reply' in sender.lower() or 'noreply' in sender.lower()):
-                        print(f"[DEBUG] Skipping message {msg['id']} - no-reply sender: {sender}")
+                        logger.debug("Skipping message %s - no-reply sender: %s", msg['id'], sender)
                         continue
                     
                     # 3. Skip if email is from settings.MAIL_FROM
                     if sender and settings.MAIL_FROM and settings.MAIL_FROM.lower() in extract_email_address(sender).lower():
-                        print(f"[DEBUG] Skipping message {msg['id']} - from settings.MAIL_FROM: {sender}")
+                        logger.debug("Skipping message %s - from settings.MAIL_FROM: %s", msg['id'], sender)
                         continue
                     
                     # 4. Skip if message is sent by the company's own Gmail box email
                     if sender and company.gmail_box_email:
                         sender_email = extract_email_address(sender)
                         if company.gmail_box_email.lower() in sender_email.lower():
-                            print(f"[DEBUG] Skipping message {msg['id']} - sent by company itself: {sender}")
+                            logger.debug("Skipping message %s - sent by company itself: %s", msg['id'], sender)
                             continue  # Skip messages sent by the company itself
                     
-                    print(f"[DEBUG] Message {msg['id']} passed all filters, adding to new_messages")
+                    logger.debug("Message %s passed all filters, adding to new_messages", msg['id'])
                     new_messages.append(msg)
                 if new_messages:
-                    print(f"[DEBUG] New messages found for company {company.id}: {[m['id'] for m in new_messages]}")
+                    logger.debug("New messages found for company %s: %d", company.id, len(new_messages))
                     self.last_seen_message_ids[company.id] = new_messages[0]['id']
                 for msg in reversed(new_messages):  # Oldest first
-                    print(f"[DEBUG] Processing new message: {msg['id']}")
+                    logger.debug("Processing new message: %s", msg['id'])
+                    fetch_started = time.time_ns()
                     msg_detail = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
                     thread_id = msg_detail.get('threadId')
-                    print(f"[DEBUG] Thread ID: {thread_id}")
+                    logger.debug("Thread ID: %s", thread_id)
                     thread = service.users().threads().get(userId='me', id=thread_id, format='full').execute()
                     thread_messages = thread.get('messages', [])
-                    print(f"[DEBUG] Thread has {len(thread_messages)} messages")
+                    fetch_ended = time.time_ns()
+                    logger.debug("Thread has %s messages", len(thread_messages))
                     bodies = []
                     # Use the last message in the thread for top-level fields
                     last_msg = thread_messages[-1] if thread_messages else msg_detail
@@ -246,23 +255,41 @@ class GmailMonitorService:
                     subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), '(No Subject)')
                     sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), '(Unknown)')
                     date = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
-                    print(f"[DEBUG] Thread subject: {subject}, sender: {sender}")
+                    logger.debug("Thread subject: %s, sender: %s", subject, sender)
                     # Store all incoming messages and collect the latest incoming per thread
                     latest_incoming_msg = None
                     latest_incoming_date = None
                     has_new_messages = False  # Track if this thread has new messages
                     
+                    # One lookup for every message in the thread
+                    existing_chats = await chat_crud.get_by_message_ids(
+                        db, company_id=company.id, message_ids=[m.get('id') for m in thread_messages]
+                    )
+                    new_rows = []
+                    new_bodies = {}
+                    thread_chats = []  # Stored chats in thread order
+                    header_message_ids = {}  # Gmail message ID -> Message-ID header
+                    
                     for m in thread_messages:
-                        print(f"[DEBUG] Processing thread message: {m.get('id')}")
+                        logger.debug("Processing thread message: %s", m.get('id'))
                         headers = m.get('payload', {}).get('headers', [])
+                        # Extract the actual Message-ID from headers for proper threading
+                        message_id_from_headers = extract_message_id_from_headers(headers)
+                        header_message_ids[m.get('id')] = message_id_from_headers
+                        db_msg = existing_chats.get(m.get('id'))
+                        if db_msg:
+                            logger.debug("Message %s already in database", m.get('id'))
+                            thread_chats.append(db_msg)
+                            continue
+                        trace = start_trace(m.get('id'), "gmail", company.id, start_ns=fetch_started, **{"channel.id": thread_id})
+                        trace.record("fetch", fetch_started, fetch_ended, thread_messages=len(thread_messages))
+                        traces[m.get('id')] = trace
                         sender = extract_email_address(next((h['value'] for h in headers if h['name'].lower() == 'from'), None))
                         date_str = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
                         label_ids = m.get('labelIds', [])
                         is_read = 'UNREAD' not in label_ids
                         
-                        # Extract the actual Message-ID from headers for proper threading
-                        message_id_from_headers = extract_message_id_from_headers(headers)
-                        print(f"[DEBUG] Thread message {m.get('id')} from: {sender}, read: {is_read}, Message-ID: {message_id_from_headers}")
+                        logger.debug("Thread message %s from: %s, read: %s, Message-ID: %s", m.get('id'), sender, is_read, message_id_from_headers)
                         def get_body_parts(payload):
                             text = None
                             html = None
@@ -295,30 +322,32 @@ class GmailMonitorService:
                         if html_body:
                             html_body = remove_gmail_quote(html_body)
                             html_body = clean_html_content(html_body)
-                            print(f"[DEBUG] Cleaned HTML content: {html_body}")
-                        print(f"[DEBUG] Thread message {m.get('id')} content length: {len(main_content)}")
+                            logger.debug("Cleaned HTML content length: %s", len(html_body))
+                        logger.debug("Thread message %s content length: %s", m.get('id'), len(main_content))
                         # Use shared AI filter
-                        ai_filter_result = await filter_email_with_ai(sender, main_content)
-                        print(f"[DEBUG] AI filter result for message {m.get('id')}: {ai_filter_result}")
+                        with trace.span("filter"):
+                            ai_filter_result = await filter_email_with_ai(sender, main_content)
+                        logger.debug("AI filter result for message %s: %s", m.get('id'), ai_filter_result)
                         if not ai_filter_result:
-                            print(f"[DEBUG] Skipping message {m.get('id')} - failed AI filter")
+                            logger.debug("Skipping message %s - failed AI filter", m.get('id'))
+                            trace.end(outcome="filtered")
                             continue
-                        # Store incoming message in chat table if not already present
-                        db_msg = db.query(Chat).filter_by(message_id=m.get('id')).first()
                         # Ensure sender is not the company's own Gmail box email
                         sender_email = extract_email_address(sender)
-                        if not db_msg and sender_email.lower() != company.gmail_box_email.lower():
-                            print(f"[DEBUG] Message {m.get('id')} not in database and not sent by company, storing...")
-                            has_new_messages = True  # This is a new message
-                            # Use timezone-aware datetime for sent_at
-                            sent_at = None
-                            try:
-                                sent_at = datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z') if date_str else datetime.now(timezone.utc)
-                            except Exception:
-                                sent_at = datetime.now(timezone.utc)
-                            
-                            # Analyze message for action requirement before storing
-                            ai_service = SimpleAIService()
+                        if sender_email.lower() == company.gmail_box_email.lower():
+                            trace.end(outcome="own_message")
+                            continue
+                        logger.debug("Message %s not in database and not sent by company, storing...", m.get('id'))
+                        # Use timezone-aware datetime for sent_at
+                        sent_at = None
+                        try:
+                            sent_at = datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z') if date_str else datetime.now(timezone.utc)
+                        except Exception:
+                            sent_at = datetime.now(timezone.utc)
+                        
+                        # Analyze message for action requirement before storing
+                        ai_service = SimpleAIService()
+                        with trace.span("classify"):
                             action_analysis = await ai_service.analyze_message_for_action_requirement(
                                 sender=sender,
                                 content=main_content,
@@ -326,165 +355,186 @@ class GmailMonitorService:
                                 company_category=company.business_category,
                                 company_id=company.id
                             )
-                            
-                            action_required = action_analysis.get('action_required', False)
-                            action_reason = action_analysis.get('reason', '')
-                            action_type = action_analysis.get('action_type', 'none')
-                            urgency = action_analysis.get('urgency', 'none')
-                            
-                            print(f"[DEBUG] Action analysis for message {m.get('id')}: action_required={action_required}, type={action_type}, urgency={urgency}")
-                            
-                            db_msg = Chat(
-                                company_id=company.id,
-                                channel_id=thread_id,  # Gmail thread_id becomes channel_id
-                                message_id=m.get('id'),
-                                from_email=sender_email,
-                                to_email=company.gmail_box_email if hasattr(company, 'gmail_box_email') else None,
-                                subject=subject,
-                                body_text=main_content,
-                                body_html=html_body,
-                                sent_at=sent_at,
-                                is_read=is_read,
-                                action_required=action_required,
-                                action_reason=action_reason,
-                                action_type=action_type,
-                                urgency=urgency,
-                                email_provider='gmail'
-                            )
-                            db.add(db_msg)
-                            db.commit()
-                            
-                            # Store message in channel context
-                            channel_context_service.store_message_in_context(db, db_msg)
-                            
-                            print(f"[DEBUG] Stored message {m.get('id')} in database with action_required={action_required}")
-                            # Add new incoming message to bodies
-                            bodies.append({
-                                'from': sender, 
-                                'date': date_str, 
-                                'content': main_content, 
-                                'html': html_body, 
-                                'read': is_read,
-                                'message_id': m.get('id'),
-                                'action_required': action_required,
-                                'action_reason': action_reason,
-                                'action_type': action_type,
-                                'urgency': urgency
-                            })
-                        else:
-                            print(f"[DEBUG] Message {m.get('id')} already in database")
-                        # Track the latest incoming message in this thread
-                        if db_msg and (not latest_incoming_date or db_msg.sent_at > latest_incoming_date):
+                        
+                        action_required = action_analysis.get('action_required', False)
+                        action_reason = action_analysis.get('reason', '')
+                        action_type = action_analysis.get('action_type', 'none')
+                        urgency = action_analysis.get('urgency', 'none')
+                        trace.set_attribute("action_required", action_required)
+                        
+                        logger.debug("Action analysis for message %s: action_required=%s, type=%s, urgency=%s", m.get('id'), action_required, action_type, urgency)
+                        
+                        new_rows.append(dict(
+                            company_id=company.id,
+                            channel_id=thread_id,  # Gmail thread_id becomes channel_id
+                            message_id=m.get('id'),
+                            from_email=sender_email,
+                            to_email=company.gmail_box_email if hasattr(company, 'gmail_box_email') else None,
+                            subject=subject,
+                            body_text=main_content,
+                            body_html=html_body,
+                            sent_at=sent_at,
+                            is_read=is_read,
+                            notification_read=False,
+                            replied=False,
+                            action_required=action_required,
+                            action_reason=action_reason,
+                            action_type=action_type,
+                            urgency=urgency,
+                            email_provider='gmail'
+                        ))
+                        new_bodies[m.get('id')] = {
+                            'from': sender, 
+                            'date': date_str, 
+                            'content': main_content, 
+                            'html': html_body, 
+                            'read': is_read,
+                            'message_id': m.get('id'),
+                            'action_required': action_required,
+                            'action_reason': action_reason,
+                            'action_type': action_type,
+                            'urgency': urgency
+                        }
+                    
+                    # Store the thread's new messages in one insert
+                    store_started = time.time_ns()
+                    stored = await chat_crud.ingest_batch(db, rows=new_rows)
+                    store_ended = time.time_ns()
+                    record_ingested("gmail", stored)
+                    for db_msg in stored:
+                        has_new_messages = True  # This is a new message
+                        trace = traces[db_msg.message_id]
+                        trace.record("store", store_started, store_ended, batch_size=len(new_rows))
+                        # Store message in channel context
+                        with trace.span("context_append"):
+                            await db.run_sync(channel_context_service.store_message_in_context, db_msg)
+                        logger.debug("Stored message %s in database with action_required=%s", db_msg.message_id, db_msg.action_required)
+                        # Add new incoming message to bodies
+                        bodies.append(new_bodies[db_msg.message_id])
+                    thread_chats.extend(stored)
+                    stored_ids = {db_msg.message_id for db_msg in stored}
+                    for row in new_rows:
+                        if row['message_id'] not in stored_ids:
+                            # Stored concurrently by another sweep
+                            traces[row['message_id']].end(outcome="duplicate")
+                    
+                    # Track the latest incoming message in this thread
+                    for db_msg in thread_chats:
+                        if not latest_incoming_date or db_msg.sent_at > latest_incoming_date:
                             latest_incoming_msg = db_msg
                             latest_incoming_date = db_msg.sent_at
-                            print(f"[DEBUG] Updated latest incoming message: {db_msg.id} from {db_msg.from_email}, Message-ID: {message_id_from_headers}")
+                            logger.debug("Updated latest incoming message: %s from %s", db_msg.id, db_msg.from_email)
                     
                     # Only send AI reply if no outgoing message exists for this thread after the latest incoming
                     if latest_incoming_msg:
-                        print(f"[DEBUG] Checking if should send AI reply for message {latest_incoming_msg.id}")
+                        logger.debug("Checking if should send AI reply for message %s", latest_incoming_msg.id)
                         # Check if this incoming message has already been replied to
                         if not latest_incoming_msg.replied:
-                            print(f"[DEBUG] Message {latest_incoming_msg.id} not replied yet")
+                            logger.debug("Message %s not replied yet", latest_incoming_msg.id)
                             
                             # Check if action is required - if so, skip AI reply
                             if latest_incoming_msg.action_required:
-                                print(f"[DEBUG] Action required for message {latest_incoming_msg.id}, skipping AI reply")
-                                logger.info(f"Action required for message {latest_incoming_msg.id}, skipping AI reply")
+                                logger.debug("Action required for message %s, skipping AI reply", latest_incoming_msg.id)
                             else:
                                 # Check channel auto-reply settings
-                                channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=thread_id)
+                                channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=thread_id)
                                 if channel_settings and not channel_settings.enable_auto_reply:
-                                    print(f"[DEBUG] Auto-reply disabled for channel {thread_id}, skipping AI reply")
-                                    logger.info(f"Auto-reply disabled for channel {thread_id}, skipping AI reply")
+                                    logger.debug("Auto-reply disabled for channel %s, skipping AI reply", thread_id)
                                 else:
                                     # Check for outgoing messages (messages sent by the company)
-                                    last_outgoing = db.query(Chat).filter_by(
-                                        company_id=company.id, 
-                                        channel_id=thread_id,
-                                        from_email=company.gmail_box_email
-                                    ).order_by(Chat.sent_at.desc()).first()
+                                    last_outgoing = (await db.execute(
+                                        select(Chat).where(
+                                            Chat.company_id == company.id,
+                                            Chat.channel_id == thread_id,
+                                            Chat.from_email == company.gmail_box_email
+                                        ).order_by(Chat.sent_at.desc()).limit(1)
+                                    )).scalars().first()
                                     
                                     # Ensure last_outgoing is not None before accessing sent_at
                                     should_reply = not last_outgoing or (last_outgoing and last_outgoing.sent_at < latest_incoming_msg.sent_at)
-                                    print(f"[DEBUG] Should reply: {should_reply}, last_outgoing: {last_outgoing.id if last_outgoing else None}")
+                                    logger.debug("Should reply: %s, last_outgoing: %s", should_reply, last_outgoing.id if last_outgoing else None)
                                     if should_reply:
-                                        print(f"[DEBUG] Preparing to send AI reply")
+                                        logger.debug("Preparing to send AI reply")
                                         # Additional filtering: Check if we should reply to this email
                                         reply_filter_result = should_reply_to_email(latest_incoming_msg.from_email, latest_incoming_msg.body_text, settings, company.gmail_box_email)
-                                        print(f"[DEBUG] Reply filter result: {reply_filter_result}")
+                                        logger.debug("Reply filter result: %s", reply_filter_result)
                                         if not reply_filter_result:
                                             logger.info(f"Skipping AI reply for email from {latest_incoming_msg.from_email} due to filtering criteria")
-                                            print(f"[DEBUG] Skipping AI reply due to filtering criteria")
+                                            logger.debug("Skipping AI reply due to filtering criteria")
                                         else:
                                             ai_service = SimpleAIService()
                                             company_goal = getattr(company, 'goal', '')
                                             company_category = getattr(company, 'business_category', '')
+                                            # Only a message fetched in this sweep has a trace
+                                            reply_trace = traces.get(latest_incoming_msg.message_id)
                                             
                                             # Use the generate_email_reply method instead of generate_free_text
-                                            print(f"[DEBUG] Generating AI email reply for message from: {latest_incoming_msg.from_email}")
-                                            reply_text = await ai_service.generate_email_reply(
-                                                sender=latest_incoming_msg.from_email,
-                                                content=latest_incoming_msg.body_text,
-                                                company_id=company.id,
-                                                channel_id=thread_id
-                                            )
-                                            print(f"[DEBUG] Generated AI email reply length: {len(reply_text)}")
+                                            logger.debug("Generating AI email reply for message from: %s", latest_incoming_msg.from_email)
+                                            with use_trace(reply_trace), span("generate"):
+                                                reply_text = await ai_service.generate_email_reply(
+                                                    sender=latest_incoming_msg.from_email,
+                                                    content=latest_incoming_msg.body_text,
+                                                    company_id=company.id,
+                                                    channel_id=thread_id
+                                                )
+                                            logger.debug("Generated AI email reply length: %s", len(reply_text))
                                             try:
                                                 # Try to use Gmail API if OAuth2 credentials are available
-                                                print(f"[DEBUG] Sending email to: {latest_incoming_msg.from_email}")
+                                                logger.debug("Sending email to: %s", latest_incoming_msg.from_email)
                                                 # Use the Message-ID from headers for proper threading
-                                                original_message_id = message_id_from_headers if message_id_from_headers else latest_incoming_msg.message_id
+                                                original_message_id = header_message_ids.get(latest_incoming_msg.message_id) or latest_incoming_msg.message_id
                                                 
                                                 # Determine which email service to use for auto-reply
                                                 gmail_credentials = getattr(company, 'gmail_box_credentials', None)
                                                 outlook_credentials = getattr(company, 'outlook_box_credentials', None)
                                                 
-                                                if gmail_credentials and company.gmail_box_email:
-                                                    # Use Gmail for auto-reply
-                                                    sent_message_id = await send_plain_email(
-                                                        email_to=latest_incoming_msg.from_email,
-                                                        subject=latest_incoming_msg.subject,
-                                                        body=reply_text,
-                                                        from_email=company.gmail_box_email,
-                                                        mail_username=company.gmail_box_email,
-                                                        mail_password=company.gmail_box_app_password,
-                                                        mail_from_name=company.gmail_box_username,
-                                                        gmail_api_credentials=gmail_credentials,
-                                                        outlook_api_credentials=None,
-                                                        thread_id=thread_id,
-                                                        original_message_id=original_message_id
-                                                    )
-                                                elif outlook_credentials and company.outlook_box_email:
-                                                    # Use Outlook for auto-reply
-                                                    sent_message_id = await send_plain_email(
-                                                        email_to=latest_incoming_msg.from_email,
-                                                        subject=latest_incoming_msg.subject,
-                                                        body=reply_text,
-                                                        from_email=company.outlook_box_email,
-                                                        mail_username=company.outlook_box_email,
-                                                        mail_password=None,  # Outlook doesn't use app password
-                                                        mail_from_name=company.outlook_box_username,
-                                                        gmail_api_credentials=None,
-                                                        outlook_api_credentials=outlook_credentials,
-                                                        thread_id=thread_id,
-                                                        original_message_id=original_message_id
-                                                    )
-                                                else:
-                                                    # Fall back to Gmail if no Outlook credentials
-                                                    sent_message_id = await send_plain_email(
-                                                        email_to=latest_incoming_msg.from_email,
-                                                        subject=latest_incoming_msg.subject,
-                                                        body=reply_text,
-                                                        from_email=getattr(company, 'gmail_box_email', None),
-                                                        mail_username=getattr(company, 'gmail_box_email', None),
-                                                        mail_password=getattr(company, 'gmail_box_app_password', None),
-                                                        mail_from_name=getattr(company, 'gmail_box_username', None),
-                                                        gmail_api_credentials=getattr(company, 'gmail_box_credentials', None),
-                                                        outlook_api_credentials=None,
-                                                        thread_id=thread_id,
-                                                        original_message_id=original_message_id
-                                                    )
-                                                print(f"[DEBUG] Email sent successfully, message ID: {sent_message_id}")
+                                                with use_trace(reply_trace), span("send"):
+                                                    if gmail_credentials and company.gmail_box_email:
+                                                        # Use Gmail for auto-reply
+                                                        sent_message_id = await send_plain_email(
+                                                            email_to=latest_incoming_msg.from_email,
+                                                            subject=latest_incoming_msg.subject,
+                                                            body=reply_text,
+                                                            from_email=company.gmail_box_email,
+                                                            mail_username=company.gmail_box_email,
+                                                            mail_password=company.gmail_box_app_password,
+                                                            mail_from_name=company.gmail_box_username,
+                                                            gmail_api_credentials=gmail_credentials,
+                                                            outlook_api_credentials=None,
+                                                            thread_id=thread_id,
+                                                            original_message_id=original_message_id
+                                                        )
+                                                    elif outlook_credentials and company.outlook_box_email:
+                                                        # Use Outlook for auto-reply
+                                                        sent_message_id = await send_plain_email(
+                                                            email_to=latest_incoming_msg.from_email,
+                                                            subject=latest_incoming_msg.subject,
+                                                            body=reply_text,
+                                                            from_email=company.outlook_box_email,
+                                                            mail_username=company.outlook_box_email,
+                                                            mail_password=None,  # Outlook doesn't use app password
+                                                            mail_from_name=company.outlook_box_username,
+                                                            gmail_api_credentials=None,
+                                                            outlook_api_credentials=outlook_credentials,
+                                                            thread_id=thread_id,
+                                                            original_message_id=original_message_id
+                                                        )
+                                                    else:
+                                                        # Fall back to Gmail if no Outlook credentials
+                                                        sent_message_id = await send_plain_email(
+                                                            email_to=latest_incoming_msg.from_email,
+                                                            subject=latest_incoming_msg.subject,
+                                                            body=reply_text,
+                                                            from_email=getattr(company, 'gmail_box_email', None),
+                                                            mail_username=getattr(company, 'gmail_box_email', None),
+                                                            mail_password=getattr(company, 'gmail_box_app_password', None),
+                                                            mail_from_name=getattr(company, 'gmail_box_username', None),
+                                                            gmail_api_credentials=getattr(company, 'gmail_box_credentials', None),
+                                                            outlook_api_credentials=None,
+                                                            thread_id=thread_id,
+                                                            original_message_id=original_message_id
+                                                        )
+                                                logger.debug("Email sent successfully, message ID: %s", sent_message_id)
                                                 # Mark the incoming message as replied to
                                                 latest_incoming_msg.replied = True
                                                 db.add(latest_incoming_msg)
@@ -506,13 +556,17 @@ class GmailMonitorService:
                                                     action_type='',
                                                     urgency=''
                                                 )
-                                                db.add(db_reply)
-                                                db.commit()
+                                                with use_trace(reply_trace), span("store_reply"):
+                                                    db.add(db_reply)
+                                                    await db.commit()
+                                                MESSAGES_REPLIED.labels("gmail").inc()
+                                                if reply_trace:
+                                                    reply_trace.set_attribute("replied", True)
                                                 
                                                 # Store AI reply in channel context
-                                                channel_context_service.store_message_in_context(db, db_reply)
+                                                await db.run_sync(channel_context_service.store_message_in_context, db_reply)
                                                 
-                                                print(f"[DEBUG] Stored AI reply in database with ID: {sent_message_id}")
+                                                logger.debug("Stored AI reply in database with ID: %s", sent_message_id)
                                                 # Add the replied message to bodies array for frontend
                                                 bodies.append({
                                                     'from': db_reply.from_email,
@@ -527,28 +581,32 @@ class GmailMonitorService:
                                                     'urgency': ''
                                                 })
                                             except Exception as e:
-                                                logger.error(f"Failed to send or broadcast AI reply: {str(e)}")
-                                                print(f"[DEBUG] Error sending AI reply: {str(e)}")
+                                                logger.error("Failed to send or broadcast AI reply: %s", e)
                                                 # Rollback the replied flag if sending failed
-                                                db.rollback()
+                                                await db.rollback()
+                                                # The rollback expires loaded objects; reload the company so the caller can keep using it
+                                                await db.refresh(company)
                         else:
-                            print(f"[DEBUG] Message {latest_incoming_msg.id} already replied")
+                            logger.debug("Message %s already replied", latest_incoming_msg.id)
                     else:
-                        print(f"[DEBUG] No latest incoming message found")
+                        logger.debug("No latest incoming message found")
                     
                     # Only broadcast if there were new messages in this thread
                     if has_new_messages:
-                        print(f"[DEBUG] Broadcasting new email data to frontend")
+                        logger.debug("Broadcasting new email data to frontend")
+                        broadcast_started = time.time_ns()
                         
                         # Get auto-reply settings for this channel
-                        channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=thread_id)
+                        channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=thread_id)
                         enable_auto_reply = channel_settings.enable_auto_reply if channel_settings else True
                         
                         # Get all messages for this thread
-                        thread_messages = db.query(Chat).filter(
-                            Chat.channel_id == thread_id,
-                            Chat.company_id == company.id
-                        ).order_by(Chat.sent_at.asc()).all()
+                        thread_messages = (await db.execute(
+                            select(Chat).where(
+                                Chat.channel_id == thread_id,
+                                Chat.company_id == company.id
+                            ).order_by(Chat.sent_at.asc())
+                        )).scalars().all()
                         
                         bodies = []
                         has_new_messages = False
@@ -585,17 +643,20 @@ class GmailMonitorService:
                             'enable_auto_reply': enable_auto_reply,
                             'email_provider': 'gmail'
                         }
-                        print(f"[DEBUG] Broadcasting new email for company {company.id}: {email_data}")
-                        logger.info(f"[DEBUG] Broadcasting new email for company {company.id}: {email_data}")
-                        print(f"[DEBUG] broadcast_new_email function: {broadcast_new_email}")
-                        print(f"[DEBUG] company_email_ws_clients: {company_email_ws_clients}")
+                        logger.debug("Broadcasting new email for company %s: thread %s, %s messages", company.id, thread_id, len(bodies))
                         await broadcast_new_email(company_email_ws_clients, company.id, email_data)
+                        broadcast_ended = time.time_ns()
+                        for db_msg in stored:
+                            trace = traces.pop(db_msg.message_id)
+                            trace.record("broadcast", broadcast_started, broadcast_ended, messages=len(bodies))
+                            trace.end(outcome="stored")
                     else:
-                        print(f"[DEBUG] No new messages to broadcast")
+                        logger.debug("No new messages to broadcast")
 
             except Exception as e:
-                print(f"[DEBUG] Error polling Gmail for company {company.id}: {e}")
-                logger.error(f"Error polling Gmail for company {company.id}: {str(e)}")
+                logger.error("Error polling Gmail for company %s: %s", company.id, e)
+                for trace in traces.values():
+                    trace.end(error=e)
 
 gmail_monitor_service = GmailMonitorService() 
 
@@ -3,7 +3,9 @@ import requests
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.core.http_client import provider_http_client
 import asyncio
+import httpx
 from urllib.parse import urlencode
 import secrets
 
@@ -74,7 +76,7 @@ class InstagramAuthService:
 
             # ---- Step 2 (optional): exchange for long-lived token ----
             # Comment out this whole block if you only need the short-lived token.
-            long_url = "https://graph.instagram.com/access_token"
+            long_url = f"{settings.INSTAGRAM_GRAPH_BASE_URL}/access_token"
             long_resp = await asyncio.to_thread(
                 requests.get,
                 long_url,
@@ -103,7 +105,7 @@ class InstagramAuthService:
         
     def ig_exchange_short_to_long(short_token: str, app_secret: str) -> dict:
         r = requests.get(
-            "https://graph.instagram.com/access_token",
+            f"{settings.INSTAGRAM_GRAPH_BASE_URL}/access_token",
             params={
                 "grant_type": "ig_exchange_token",
                 "client_secret": app_secret,
@@ -119,20 +121,20 @@ class InstagramAuthService:
         Get Instagram user information using access token.
         """
         try:
-            url = "https://graph.instagram.com/v23.0/me"
+            url = f"{settings.INSTAGRAM_GRAPH_BASE_URL}/v23.0/me"
             params = {
                 "fields": "id,username,account_type,name,profile_picture_url",
                 "access_token": access_token
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             user_info = response.json()
             logger.info(f"Successfully retrieved Instagram user info: {user_info.get('username')}")
             return user_info
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Instagram user info: {str(e)}")
             return None
 
@@ -141,20 +143,20 @@ class InstagramAuthService:
         Get Instagram page information using access token and page ID.
         """
         try:
-            url = f"https://graph.facebook.com/{page_id}"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/{page_id}"
             params = {
                 "fields": "id,name,username",
                 "access_token": access_token
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             user_info = response.json()
             logger.info(f"Successfully retrieved Instagram user info: {user_info}")
             return user_info
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Instagram user info: {str(e)}")
             return None
         
@@ -163,20 +165,20 @@ class InstagramAuthService:
         Get Instagram user accounts using access token.
         """
         try:
-            url = "https://graph.facebook.com/me/accounts"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/me/accounts"
             params = {
                 "fields": "connected_instagram_account,name,access_token",
                 "access_token": access_token
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             user_accounts_info = response.json()
             logger.info(f"Successfully retrieved Instagram user accounts info: {user_accounts_info}")
             return user_accounts_info
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting Instagram user info: {str(e)}")
             return None
 
@@ -185,20 +187,20 @@ class InstagramAuthService:
         Refresh Instagram access token using refresh token.
         """
         try:
-            url = "https://graph.instagram.com/refresh_access_token"
+            url = f"{settings.INSTAGRAM_GRAPH_BASE_URL}/refresh_access_token"
             params = {
                 "grant_type": "ig_refresh_token",
                 "access_token": refresh_token
             }
             
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             
             token_data = response.json()
             logger.info("Successfully refreshed Instagram token")
             return token_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error refreshing Instagram token: {str(e)}")
             return None
 
@@ -208,17 +210,17 @@ class InstagramAuthService:
         Tries instagram_business_account first, then connected_instagram_account.
         """
         try:
-            url = f"https://graph.facebook.com/v18.0/{page_id}"
+            url = f"{settings.FACEBOOK_GRAPH_BASE_URL}/v18.0/{page_id}"
             params = {
                 "fields": "instagram_business_account{id,username},connected_instagram_account{id,username}",
                 "access_token": page_access_token,
             }
-            response = requests.get(url, params=params, timeout=20)
+            response = await provider_http_client.get(url, params=params)
             response.raise_for_status()
             data = response.json()
             ig = data.get("instagram_business_account") or data.get("connected_instagram_account")
             return ig
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error getting linked Instagram account for page {page_id}: {e}")
             return None
 
@@ -1,27 +1,37 @@
 import logging
 import asyncio
-import requests
+import time
+import httpx
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import json
 import sys
 
 sys.path.append('.')
 from app.models.company import Company
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.core.config import settings
+from app.core.http_client import provider_http_client
 from app.core.ws_clients import company_email_ws_clients
 from app.core.broadcast import broadcast_new_email
+from app.core.metrics import MESSAGES_REPLIED, record_ingested, time_each
+from app.core.tracing import set_trace_attribute, span, start_trace, use_trace
 from app.services.ai_service import SimpleAIService, filter_email_with_ai
 from app.models.chat import Chat
 from app.services.instagram_auth_service import instagram_auth_service
-from app.services.facebook_auth_service import facebook_auth_service
+from app.services.facebook_auth_service import facebook_auth_service, parse_graph_time
 from app.services.channel_context_service import channel_context_service
 from app.crud.crud_channel_auto_reply_settings import channel_auto_reply_settings 
+from app.crud.crud_chat import chat as chat_crud
 logger = logging.getLogger(__name__)
 
-GRAPH = "https://graph.instagram.com/v23.0"
+# Returned by _prepare_instagram_chat when preparing a DM failed (as opposed to filtering it out)
+PREPARE_FAILED = object()
+
+GRAPH = f"{settings.INSTAGRAM_GRAPH_BASE_URL}/v23.0"
 
 
 def should_reply_to_instagram_message(sender: str, content: str, settings, company_instagram_username: str = None) -> bool:
@@ -34,18 +44,14 @@ def should_reply_to_instagram_message(sender: str, content: str, settings, compa
 
 
 class InstagramMonitorService:
-    def __init__(self):
-        # if you later de-dupe by conversation, keep a map here
-        self.last_seen_message_ids: Dict[int, str] = {}  # company_id -> last seen message id
-
     def _get_credentials(self, company: Company, db: Session = None) -> Optional[Dict[str, Any]]:
         if not company.instagram_credentials:
-            logger.warning(f"No Instagram credentials found for company {company.id}")
+            logger.warning("No Instagram credentials found for company %s", company.id)
             return None
         try:
             return json.loads(company.instagram_credentials) if isinstance(company.instagram_credentials, str) else company.instagram_credentials
         except (json.JSONDecodeError, TypeError) as e:
-            logger.error(f"Error parsing Instagram credentials for company {company.id}: {e}")
+            logger.error("Error parsing Instagram credentials for company %s: %s", company.id, e)
             return None
 
     async def _refresh_token_if_needed(self, credentials: Dict[str, Any], company_id: int) -> Optional[Dict[str, Any]]:
@@ -59,135 +65,183 @@ class InstagramMonitorService:
             if expires_at:
                 expires_datetime = datetime.fromtimestamp(expires_at, tz=timezone.utc)
                 if expires_datetime - datetime.now(timezone.utc) < timedelta(hours=1):
-                    logger.info(f"Refreshing Instagram token for company {company_id}")
+                    logger.info("Refreshing Instagram token for company %s", company_id)
                     new_token_data = await instagram_auth_service.refresh_instagram_token(credentials.get('access_token'))
                     if new_token_data and new_token_data.get('access_token'):
-                        db = SessionLocal()
-                        try:
-                            company = db.query(Company).filter(Company.id == company_id).first()
+                        async with AsyncSessionLocal() as db:
+                            company = await db.get(Company, company_id)
                             if company:
                                 updated = {**credentials,
                                            'access_token': new_token_data['access_token'],
                                            # if your auth service returns absolute expiry, persist it; else keep old
                                            'expires_at': new_token_data.get('expires_at', expires_at)}
                                 company.instagram_credentials = updated
-                                db.commit()
-                                logger.info(f"Updated Instagram credentials for company {company_id}")
+                                await db.commit()
+                                logger.info("Updated Instagram credentials for company %s", company_id)
                                 return updated
-                        finally:
-                            db.close()
-                    logger.warning(f"Could not refresh Instagram token for company {company_id}")
+                    logger.warning("Could not refresh Instagram token for company %s", company_id)
                     return None
             return credentials
         except Exception as e:
-            logger.error(f"Error refreshing Instagram token for company {company_id}: {e}")
+            logger.error("Error refreshing Instagram token for company %s: %s", company_id, e)
             return None
 
-    # ---------- NEW: conversations instead of comments ----------
-    async def get_instagram_conversations(self, credentials: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+    # ---------- DM conversations ----------
+    async def _get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        response = await provider_http_client.get(url, params=params)
+        if not response.is_success:
+            logger.warning("Instagram Graph request failed: %s - %s", response.status_code, response.text)
+            return None
+        return response.json()
+
+    async def _get_conversation_messages(self, conv_id: str, access_token: str, since: datetime) -> List[Dict[str, Any]]:
+        """Page through one conversation's messages (newest first) until they are older than `since`."""
+        detail = await self._get_json(f"{GRAPH}/{conv_id}", params={
+            "fields": f"messages.limit({settings.INSTAGRAM_PAGE_SIZE}){{id,from,to,created_time,message,attachments}}",
+            "access_token": access_token
+        })
+        if detail is None:
+            raise Exception(f"Failed to fetch Instagram conversation {conv_id}")
+
+        messages: List[Dict[str, Any]] = []
+        edge = detail.get("messages")
+        while edge:
+            for m in edge.get("data", []):
+                created_time = parse_graph_time(m.get("created_time"))
+                if created_time and created_time <= since:
+                    return messages
+                text = m.get("message") or m.get("text") or ""
+                sender = (m.get("from") or {}).get("username") or (m.get("from") or {}).get("id")
+                messages.append({
+                    "id": m.get("id"),
+                    "text": text,
+                    "from": sender,
+                    "from_id": (m.get("from") or {}).get("id"),
+                    "created_time": m.get("created_time"),
+                    "conversation_id": conv_id,
+                    "type": "dm"
+                })
+            next_url = (edge.get("paging") or {}).get("next")
+            if not next_url:
+                break
+            edge = await self._get_json(next_url)
+            if edge is None:
+                raise Exception(f"Failed to page Instagram conversation {conv_id}")
+        return messages
+
+    async def get_instagram_conversations(
+        self, credentials: Dict[str, Any], since: datetime
+    ) -> Tuple[Optional[List[Dict[str, Any]]], datetime]:
         """
-        Fetch **DM conversations** + messages using Instagram Login (graph.instagram.com).
-        - 1) Resolve IG user id via /me
-        - 2) GET /{IG_ID}/conversations
-        - 3) For each conversation, GET messages via fields=messages{...}
-        Returns a flat list of message dicts (conversation-aware).
+        Fetch every DM received after `since` using Instagram Login (graph.instagram.com).
+        - 1) GET /me/conversations (most recently updated first), stopping at the
+             first conversation whose updated_time is not past `since`
+        - 2) Fetch the changed conversations concurrently (bounded by
+             INSTAGRAM_CONVERSATION_CONCURRENCY), paging through all new messages
+        Returns (flat list of message dicts oldest first, or None if listing failed; new watermark).
         """
         access_token = credentials.get('access_token')
         if not access_token:
             logger.error("No access token found in Instagram credentials")
-            return []
+            return None, since
 
         try:
-          
-            # 2) List conversations with performance limits
-            conv_res = requests.get(f"{GRAPH}/me/conversations", params={
+            # 1) List conversations that changed since the watermark
+            changed: List[Tuple[str, Optional[datetime]]] = []
+            page = await self._get_json(f"{GRAPH}/me/conversations", params={
+                "fields": "id,updated_time",
                 "access_token": access_token,
-                "limit": max(1, min(5, limit))  # Limit to 5 conversations for performance
-            }, timeout=20)
-            conv_res.raise_for_status()
-            conversations = conv_res.json().get("data", [])
+                "limit": settings.INSTAGRAM_PAGE_SIZE
+            })
+            if page is None:
+                return None, since
+            while True:
+                done = False
+                for conv in page.get("data", []):
+                    updated_time = parse_graph_time(conv.get("updated_time"))
+                    if updated_time and updated_time <= since:
+                        done = True
+                        break
+                    if conv.get("id"):
+                        changed.append((conv["id"], updated_time))
+                next_url = (page.get("paging") or {}).get("next")
+                if done or not next_url:
+                    break
+                page = await self._get_json(next_url)
+                if page is None:
+                    # Older changed conversations would fall behind the watermark; retry next sweep
+                    return None, since
+
+            # 2) Load messages for the changed conversations concurrently
+            semaphore = asyncio.Semaphore(settings.INSTAGRAM_CONVERSATION_CONCURRENCY)
+
+            async def fetch(conv_id: str) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    return await self._get_conversation_messages(conv_id, access_token, since)
+
+            results = await asyncio.gather(*(fetch(conv_id) for conv_id, _ in changed), return_exceptions=True)
 
             messages: List[Dict[str, Any]] = []
-
-            # 3) Load messages for each conversation
-            for conv in conversations:
-                conv_id = conv.get("id")
-                if not conv_id:
+            watermark = since
+            failed = False
+            for (conv_id, updated_time), result in zip(changed, results):
+                if isinstance(result, BaseException):
+                    logger.warning("Skipping Instagram conversation %s this sweep: %s", conv_id, result)
+                    failed = True
                     continue
+                messages.extend(result)
+                if updated_time:
+                    watermark = max(watermark, updated_time)
 
-                # You can use the Graph Conversation node to pull messages
-                # Either /{conversation_id}/messages or ?fields=messages{...}
-                detail = requests.get(f"{GRAPH}/{conv_id}", params={
-                    "fields": "updated_time,participants,messages.limit(3){id,from,to,created_time,message,attachments}",  # Limit to 3 messages per conversation
-                    "access_token": access_token
-                }, timeout=20)
-                if not detail.ok:
-                    logger.warning("Failed to fetch conversation %s: %s", conv_id, detail.text)
-                    continue
-                detail_json = detail.json()
-                msgs = (detail_json.get("messages") or {}).get("data", [])
-
-                for m in msgs:
-                    text = m.get("message") or m.get("text") or ""
-                    sender = (m.get("from") or {}).get("username") or (m.get("from") or {}).get("id")
-                    messages.append({
-                        "id": m.get("id"),
-                        "text": text,
-                        "from": sender,
-                        "from_id": (m.get("from") or {}).get("id"),
-                        "created_time": m.get("created_time"),
-                        "conversation_id": conv_id,
-                        "type": "dm"
-                    })
-
-            return messages
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error getting Instagram conversations: {e}")
-            return []
-
-    async def _process_instagram_message(self, message: Dict[str, Any], company: Company, db: Session) -> None:
+            # A failed conversation has to be read again from `since`, or its older new
+            # messages would fall behind the watermark. Conversations that succeeded are
+            # fetched again too; their stored messages are skipped by the existing-ID check.
+            if failed:
+                watermark = since
+
+            messages.sort(key=lambda m: m.get("created_time") or "")
+            logger.info("Fetched %s new Instagram DMs from %s changed conversations", len(messages), len(changed))
+            return messages, watermark
+
+        except httpx.HTTPError as e:
+            logger.error("Error getting Instagram conversations: %s", e)
+            return None, since
+
+    async def _prepare_instagram_chat(self, message: Dict[str, Any], company: Company) -> Union[Dict[str, Any], None, object]:
+        """
+        Filter and analyze a new Instagram DM.
+        Returns the chat row to store, None if the DM should be skipped, or
+        PREPARE_FAILED if it could not be processed and should be retried.
+        """
         try:
             message_id = message.get('id')
-            if not message_id:
-                return
-
-            existing_chat = db.query(Chat).filter(
-                Chat.message_id == message_id,
-                Chat.company_id == company.id
-            ).first()
-            if existing_chat:
-                return
 
             if not should_reply_to_instagram_message(message.get('from'), message.get('text', ''), settings, company.instagram_username):
-                return
+                return None
 
             sender = message.get('from', 'Unknown')
             content = message.get('text', '')
 
-            if not await filter_email_with_ai(sender, content):
-                logger.info(f"Instagram DM filtered out by AI: {message_id}")
-                return
+            with span("filter"):
+                passed = await filter_email_with_ai(sender, content)
+            if not passed:
+                logger.info("Instagram DM filtered out by AI: %s", message_id)
+                return None
 
             ai_service = SimpleAIService()
-            action_analysis = await ai_service.analyze_message_for_action_requirement(
-                sender=sender,
-                content=content,
-                company_goals=company.goal,
-                company_category=company.business_category,
-                company_id=company.id
-            )
-
-            created_time = message.get('created_time')
-            if created_time:
-                try:
-                    sent_at = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
-                except ValueError:
-                    sent_at = datetime.now(timezone.utc)
-            else:
-                sent_at = datetime.now(timezone.utc)
-
-            chat = Chat(
+            with span("classify"):
+                action_analysis = await ai_service.analyze_message_for_action_requirement(
+                    sender=sender,
+                    content=content,
+                    company_goals=company.goal,
+                    company_category=company.business_category,
+                    company_id=company.id
+                )
+            set_trace_attribute("action_required", action_analysis.get('action_required', False))
+
+            sent_at = parse_graph_time(message.get('created_time')) or datetime.now(timezone.utc)
+
+            return dict(
                 company_id=company.id,
                 channel_id=message.get('conversation_id', 'instagram'),
                 message_id=message_id,
@@ -207,46 +261,58 @@ class InstagramMonitorService:
                 email_provider='instagram'
             )
 
-            db.add(chat)
-            db.commit()
+        except Exception as e:
+            logger.error("Error processing Instagram DM %s: %s", message.get('id'), e)
+            return PREPARE_FAILED
+
+    async def _handle_stored_instagram_message(self, message: Dict[str, Any], chat: Chat, company: Company, db: AsyncSession) -> None:
+        """Send an AI reply if needed and broadcast a newly stored Instagram DM."""
+        try:
+            sender = chat.from_email
+            content = chat.body_text
 
             # Check if we should send AI reply
-            if not action_analysis.get('action_required', False):
+            if not chat.action_required:
                 # Check channel auto-reply settings
-                channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=message.get('conversation_id', 'instagram'))
+                channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=chat.channel_id)
                 if channel_settings and not channel_settings.enable_auto_reply:
-                    logger.info(f"Auto-reply disabled for Instagram channel {message.get('conversation_id', 'instagram')}")
+                    logger.info("Auto-reply disabled for Instagram channel %s", chat.channel_id)
                 else:
                     # Check if we should reply (no recent outgoing message)
-                    last_outgoing = db.query(Chat).filter_by(
-                        company_id=company.id, 
-                        channel_id=message.get('conversation_id', 'instagram'),
-                        from_email=company.instagram_username
-                    ).order_by(Chat.sent_at.desc()).first()
+                    last_outgoing = (await db.execute(
+                        select(Chat).where(
+                            Chat.company_id == company.id,
+                            Chat.channel_id == chat.channel_id,
+                            Chat.from_email == company.instagram_username
+                        ).order_by(Chat.sent_at.desc()).limit(1)
+                    )).scalars().first()
                     
-                    should_reply = not last_outgoing or (last_outgoing and last_outgoing.sent_at < sent_at)
+                    should_reply = not last_outgoing or (last_outgoing and last_outgoing.sent_at < chat.sent_at)
                     if should_reply:
                         await self._send_ai_reply_to_instagram(message, company, db, sender, content)
 
-            await broadcast_new_email(company_email_ws_clients, company.id, {
-                'type': 'new_instagram_message',
-                'message': {
-                    'id': chat.id,
-                    'from': sender,
-                    'text': content,
-                    'created_time': sent_at.isoformat(),
-                    'message_type': 'dm',
-                    'notification_read': False
-                }
-            })
-
-            logger.info(f"Processed Instagram DM {message_id} for company {company.id}")
+            with span("broadcast"):
+                await broadcast_new_email(company_email_ws_clients, company.id, {
+                    'type': 'new_instagram_message',
+                    'message': {
+                        'id': chat.id,
+                        'from': sender,
+                        'text': content,
+                        'created_time': chat.sent_at.isoformat(),
+                        'message_type': 'dm',
+                        'notification_read': False
+                    }
+                })
+
+            logger.info("Processed Instagram DM %s for company %s", chat.message_id, company.id)
 
         except Exception as e:
-            logger.error(f"Error processing Instagram DM: {e}")
-            db.rollback()
+            logger.error("Error processing Instagram DM: %s", e)
+            await db.rollback()
+            # The rollback expires loaded objects; reload the company so the caller can keep using it
+            await db.refresh(company)
 
-    async def _send_ai_reply_to_instagram(self, message: Dict[str, Any], company: Company, db: Session, sender: str, content: str) -> None:
+    async def _send_ai_reply_to_instagram(self, message: Dict[str, Any], company: Company, db: AsyncSession, sender: str, content: str) -> None:
         """Send AI-generated reply to Instagram message.
         Attempts to send via the connected Facebook Page's Send API (Instagram Messaging).
         Falls back to storing the AI reply if sending fails or configuration is missing."""
@@ -254,12 +320,13 @@ class InstagramMonitorService:
             ai_service = SimpleAIService()
             
             # Generate AI reply
-            reply_text = await ai_service.generate_email_reply(
-                sender=sender,
-                content=content,
-                company_id=company.id,
-                channel_id=message.get('conversation_id', 'instagram')
-            )
+            with span("generate"):
+                reply_text = await ai_service.generate_email_reply(
+                    sender=sender,
+                    content=content,
+                    company_id=company.id,
+                    channel_id=message.get('conversation_id', 'instagram')
+                )
 
             # Attempt to send via the connected Facebook Page (Instagram Messaging Send API)
             sent_successfully = False
@@ -283,26 +350,29 @@ class InstagramMonitorService:
                 recipient_id = message.get('from_id') or (message.get('from') or {}).get('id')
 
                 if page_id and page_access_token and recipient_id:
-                    result = await facebook_auth_service.send_page_message(
-                        page_id=page_id,
-                        page_access_token=page_access_token,
-                        recipient_id=recipient_id,
-                        message=reply_text
-                    )
+                    with span("send"):
+                        result = await facebook_auth_service.send_page_message(
+                            page_id=page_id,
+                            page_access_token=page_access_token,
+                            recipient_id=recipient_id,
+                            message=reply_text
+                        )
                     if result:
                         sent_successfully = True
                         sent_message_id = (result.get('message_id') if isinstance(result, dict) else None) or f"reply-{message.get('id')}"
-                        logger.info(f"Instagram reply sent via Page API to recipient {recipient_id}")
+                        logger.info("Instagram reply sent via Page API to recipient %s", recipient_id)
                 else:
                     logger.warning("Instagram send skipped: missing page_id, page_access_token, or recipient_id")
             except Exception as send_err:
-                logger.error(f"Error sending Instagram reply via Page API: {send_err}")
+                logger.error("Error sending Instagram reply via Page API: %s", send_err)
 
             # Mark original message as replied
-            original_chat = db.query(Chat).filter(
-                Chat.message_id == message.get('id'),
-                Chat.company_id == company.id
-            ).first()
+            original_chat = (await db.execute(
+                select(Chat).where(
+                    Chat.message_id == message.get('id'),
+                    Chat.company_id == company.id
+                ).limit(1)
+            )).scalars().first()
             if original_chat:
                 original_chat.replied = True
                 db.add(original_chat)
@@ -327,74 +397,129 @@ class InstagramMonitorService:
                 urgency='',
                 email_provider='instagram'
             )
-            db.add(reply_chat)
-            db.commit()
+            with span("store_reply"):
+                db.add(reply_chat)
+                await db.commit()
+            if sent_successfully:
+                MESSAGES_REPLIED.labels("instagram").inc()
+            set_trace_attribute("replied", sent_successfully)
 
             # Store in channel context
-            channel_context_service.store_message_in_context(db, reply_chat)
+            await db.run_sync(channel_context_service.store_message_in_context, reply_chat)
             
             if sent_successfully:
-                logger.info(f"Sent AI reply for Instagram message {message.get('id')}")
+                logger.info("Sent AI reply for Instagram message %s", message.get('id'))
             else:
-                logger.info(f"Prepared AI reply for Instagram message {message.get('id')} (not sent automatically)")
+                logger.info("Prepared AI reply for Instagram message %s (not sent automatically)", message.get('id'))
 
         except Exception as e:
-            logger.error(f"Error generating AI reply for Instagram: {str(e)}")
+            logger.error("Error generating AI reply for Instagram: %s", e)
 
     async def poll_instagram_messages(self, company_id: int) -> None:
         """Poll Instagram **DMs** for a specific company."""
-        db = None
         try:
-            db = SessionLocal()
-            company = db.query(Company).filter(Company.id == company_id).first()
-            if not company:
-                logger.warning(f"Company {company_id} not found")
-                return
-
-            credentials = self._get_credentials(company, db)
-            if not credentials:
-                logger.warning(f"No Instagram credentials for company {company_id}")
-                return
-
-            refreshed_credentials = await self._refresh_token_if_needed(credentials, company_id)
-            if not refreshed_credentials:
-                logger.error(f"Could not refresh Instagram token for company {company_id}")
-                return
-
-            # Fetch **conversations/messages** with performance limits
-            messages = await self.get_instagram_conversations(refreshed_credentials, limit=5)
-
-            for message in messages:
-                await self._process_instagram_message(message, company, db)
-
-            logger.info(f"Polled {len(messages)} Instagram DMs for company {company_id}")
+            async with AsyncSessionLocal() as db:
+                company = await db.get(Company, company_id)
+                if not company:
+                    logger.warning("Company %s not found", company_id)
+                    return
+
+                credentials = self._get_credentials(company, db)
+                if not credentials:
+                    logger.warning("No Instagram credentials for company %s", company_id)
+                    return
+
+                refreshed_credentials = await self._refresh_token_if_needed(credentials, company_id)
+                if not refreshed_credentials:
+                    logger.error("Could not refresh Instagram token for company %s", company_id)
+                    return
+
+                since = company.instagram_last_synced_at or (
+                    datetime.now(timezone.utc) - timedelta(minutes=settings.INSTAGRAM_INITIAL_LOOKBACK_MINUTES)
+                )
+                fetch_started = time.time_ns()
+                messages, watermark = await self.get_instagram_conversations(refreshed_credentials, since)
+                fetch_ended = time.time_ns()
+                if messages is None:
+                    return
+
+                # Skip DMs that are already stored with one lookup for the whole batch
+                existing_ids = await chat_crud.get_existing_message_ids(
+                    db, company_id=company_id, message_ids=[m.get('id') for m in messages]
+                )
+                traces = {}  # DM ID -> trace
+                try:
+                    prepared = []
+                    prepare_failed = False
+                    for message in messages:
+                        if message.get('id') and message['id'] not in existing_ids:
+                            trace = start_trace(message['id'], "instagram", company_id, start_ns=fetch_started, **{"channel.id": message.get('conversation_id')})
+                            trace.record("fetch", fetch_started, fetch_ended, batch_size=len(messages))
+                            traces[message['id']] = trace
+                            with use_trace(trace):
+                                row = await self._prepare_instagram_chat(message, company)
+                            if row is PREPARE_FAILED:
+                                prepare_failed = True
+                                trace.end(outcome="failed")
+                            elif row:
+                                prepared.append((message, row))
+                            else:
+                                trace.end(outcome="skipped")
+
+                    # Store all new DMs in one insert, then reply and broadcast for the ones that were stored
+                    store_started = time.time_ns()
+                    stored = await chat_crud.ingest_batch(db, rows=[row for _, row in prepared])
+                    store_ended = time.time_ns()
+                    record_ingested("instagram", stored)
+                    stored_by_id = {chat.message_id: chat for chat in stored}
+                    for message, _ in prepared:
+                        trace = traces[message['id']]
+                        chat = stored_by_id.get(message['id'])
+                        if not chat:
+                            # Stored concurrently by another sweep
+                            trace.end(outcome="duplicate")
+                            continue
+                        trace.record("store", store_started, store_ended, batch_size=len(prepared))
+                        with use_trace(trace):
+                            await self._handle_stored_instagram_message(message, chat, company, db)
+                        trace.end(outcome="stored")
+                except Exception as e:
+                    for trace in traces.values():
+                        trace.end(error=e)
+                    raise
+
+                # Only advance the watermark once everything up to it has been handled; a DM that
+                # could not be prepared is fetched again next sweep (stored ones are skipped by ID)
+                if prepare_failed:
+                    logger.warning("Keeping the Instagram watermark for company %s: some DMs could not be prepared", company_id)
+                    watermark = since
+                company.instagram_last_synced_at = watermark
+                await db.commit()
+
+                logger.info("Polled %s Instagram DMs for company %s", len(messages), company_id)
 
         except Exception as e:
-            logger.error(f"Error polling Instagram DMs for company {company_id}: {e}")
-        finally:
-            if db:
-                db.close()
+            logger.error("Error polling Instagram DMs for company %s: %s", company_id, e)
 
     async def poll_instagram_messages_from_companies(self) -> None:
-        """Poll Instagram DMs for all companies."""
-        db = None
+        """Poll Instagram DMs for all companies with Instagram credentials."""
         try:
-            db = SessionLocal()
-            for company in db.query(Company).all():
-                await self.poll_instagram_messages(company.id)
+            async with AsyncSessionLocal() as db:
+                company_ids = (await db.execute(
+                    select(Company.id).where(Company.instagram_credentials.isnot(None))
+                )).scalars().all()
+            for company_id in time_each(company_ids, "instagram"):
+                await self.poll_instagram_messages(company_id)
         except Exception as e:
-            logger.error(f"Error polling Instagram DMs from companies: {e}")
-        finally:
-            if db:
-                db.close()
+            logger.error("Error polling Instagram DMs from companies: %s", e)
 
     async def start_monitoring(self, company_id: int, interval_seconds: int = 60) -> None:
-        logger.info(f"Starting Instagram DM monitoring for company {company_id}")
+        logger.info("Starting Instagram DM monitoring for company %s", company_id)
         while True:
             try:
                 await self.poll_instagram_messages(company_id)
             except Exception as e:
-                logger.error(f"Error in Instagram monitoring loop for company {company_id}: {e}")
+                logger.error("Error in Instagram monitoring loop for company %s: %s", company_id, e)
             await asyncio.sleep(interval_seconds)
 
 
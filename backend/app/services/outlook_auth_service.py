@@ -38,7 +38,7 @@ class OutlookAuthService:
         self.client_secret = settings.OUTLOOK_CLIENT_SECRET
         self.redirect_uri = settings.OUTLOOK_OAUTH_REDIRECT_URI
         self.token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        self.userinfo_url = "https://graph.microsoft.com/v1.0/me"
+        self.userinfo_url = f"{settings.MICROSOFT_GRAPH_BASE_URL}/v1.0/me"
         
         # Create a session with retry strategy
         self.session = requests.Session()
@@ -1,59 +1,32 @@
 import logging
 import asyncio
 import uuid
-from datetime import datetime, timezone
-from typing import Optional, Dict, Any
-import requests
-from email.mime.text import MIMEText
-import base64
-import re
-import urllib3
-import ssl
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
+import httpx
 
 from app.core.config import settings
+from app.core.http_client import provider_http_client
 from app.services.outlook_auth_service import outlook_auth_service
 
 logger = logging.getLogger(__name__)
 
-# Configure urllib3 to be less strict about SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Fields the Outlook monitor's parser actually uses
+MESSAGE_SELECT_FIELDS = "id,subject,from,toRecipients,receivedDateTime,body,isRead,conversationId,internetMessageId"
 
-class CustomHTTPAdapter(HTTPAdapter):
-    """Custom HTTP adapter with relaxed SSL context for Outlook API"""
-    
-    def init_poolmanager(self, *args, **kwargs):
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        kwargs['ssl_context'] = context
-        return super().init_poolmanager(*args, **kwargs)
-    
-    def proxy_manager_for(self, *args, **kwargs):
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        kwargs['ssl_context'] = context
-        return super().proxy_manager_for(*args, **kwargs)
+# Graph JSON batching accepts at most 20 requests per call
+GRAPH_BATCH_LIMIT = 20
 
-def create_outlook_session():
-    """Create a requests session with robust SSL handling for Outlook API"""
-    session = requests.Session()
-    
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    
-    # Add custom adapter with relaxed SSL
-    adapter = CustomHTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    
-    return session
+# Ask Graph for IDs that stay the same when a message moves between folders (Drafts -> Sent Items)
+IMMUTABLE_ID_HEADERS = {"Prefer": 'IdType="ImmutableId"'}
+
+
+class OutlookAPIError(Exception):
+    """Non-2xx response from Microsoft Graph."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
 
 def is_valid_jwt_token(token: str) -> bool:
     """
@@ -79,24 +52,74 @@ class OutlookEmailService:
     """Service for sending emails via Microsoft Graph API"""
     
     def __init__(self):
-        self.base_url = "https://graph.microsoft.com/v1.0"
+        self.base_url = f"{settings.MICROSOFT_GRAPH_BASE_URL}/v1.0"
     
-    async def _retry_outlook_api_call(self, func, max_retries=3, delay=1):
-        """Retry Outlook API calls with exponential backoff - handles SSL, timeout, and connection errors"""
-        for attempt in range(max_retries):
+    async def _get_access_token(self, credentials_data: dict) -> Tuple[str, bool]:
+        """
+        Return a usable access token, refreshing it when a refresh token is available.
+        Updates credentials_data in place with refreshed tokens.
+        
+        Returns:
+            tuple: (access token, whether tokens were refreshed)
+        """
+        access_token = credentials_data.get("access_token")
+        refresh_token = credentials_data.get("refresh_token")
+        
+        if not access_token:
+            raise Exception("No access token provided")
+        
+        # Validate JWT token format
+        if not is_valid_jwt_token(access_token):
+            logger.warning("Invalid JWT token format detected, attempting to refresh")
+            if not refresh_token:
+                raise Exception("Invalid access token and no refresh token available")
+            try:
+                refreshed_tokens = await asyncio.to_thread(outlook_auth_service.refresh_access_token, refresh_token)
+            except Exception as e:
+                logger.error(f"Failed to refresh invalid Outlook token: {str(e)}")
+                raise Exception("Invalid access token and failed to refresh")
+            credentials_data.update(refreshed_tokens)
+            logger.info("Successfully refreshed Outlook access token")
+            return refreshed_tokens["access_token"], True
+        
+        # If we have a refresh token, try to refresh the access token
+        if refresh_token:
             try:
-                return await func()
-            except (requests.exceptions.SSLError, requests.exceptions.Timeout, requests.exceptions.RequestException) as e:
-                if "EOF occurred in violation of protocol" in str(e) or "SSL" in str(e) or "timeout" in str(e).lower():
-                    if attempt < max_retries - 1:
-                        logging.warning(f"Outlook API connection error, retrying in {delay}s (attempt {attempt + 1}/{max_retries}): {str(e)}")
-                        await asyncio.sleep(delay)
-                        delay *= 2  # Exponential backoff
-                        continue
-                raise e
+                refreshed_tokens = await asyncio.to_thread(outlook_auth_service.refresh_access_token, refresh_token)
+                credentials_data.update(refreshed_tokens)
+                logger.info("Successfully refreshed Outlook access token")
+                return refreshed_tokens["access_token"], True
             except Exception as e:
-                raise e
-        return None
+                logger.warning(f"Failed to refresh Outlook token: {str(e)}")
+                # Continue with existing token
+        
+        return access_token, False
+    
+    async def _graph_request(self, method: str, path: str, access_token: str, **kwargs) -> httpx.Response:
+        """
+        Call a Graph endpoint through the shared provider HTTP client.
+        `path` is relative to base_url unless it is already an absolute URL (e.g. a nextLink).
+        Raises an Exception for non-2xx responses.
+        """
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+            **kwargs.pop("headers", {}),
+        }
+        try:
+            response = await provider_http_client.request(method, url, headers=headers, **kwargs)
+        except httpx.TimeoutException as timeout_error:
+            logger.error(f"Timeout error with Outlook API: {timeout_error}")
+            raise Exception(f"Timeout connecting to Outlook API: {timeout_error}")
+        except httpx.HTTPError as req_error:
+            logger.error(f"Request error with Outlook API: {req_error}")
+            raise Exception(f"Failed to connect to Outlook API: {req_error}")
+        
+        if not response.is_success:
+            raise OutlookAPIError(response.status_code, f"Outlook API error: {response.status_code} - {response.text}")
+        
+        return response
     
     async def send_email_via_outlook_api(
         self,
@@ -111,150 +134,62 @@ class OutlookEmailService:
         """
         Send an email using Microsoft Graph API and return the message ID.
         
+        The message is created as a draft and then sent by ID, so the ID is known
+        without searching Sent Items afterwards. Replies (original_message_id set)
+        are created with createReply so Outlook threads them with the original.
+        
         Args:
             email_to: Recipient email address
             subject: Email subject
             body: Email body (plain text)
             from_email: Sender email address
             credentials_data: Outlook OAuth2 credentials data
-            thread_id: Thread ID to reply to (optional)
+            thread_id: Conversation ID of the thread (optional, for logging only)
             original_message_id: Original message ID to reply to (optional)
             
         Returns:
             str: The message ID of the sent email
         """
-        
-        async def retry_outlook_api_call(func, max_retries=3, delay=1):
-            """Retry Outlook API calls with exponential backoff"""
-            for attempt in range(max_retries):
-                try:
-                    return await func()
-                except Exception as e:
-                    if "EOF occurred in violation of protocol" in str(e) or "SSL" in str(e):
-                        if attempt < max_retries - 1:
-                            logging.warning(f"Outlook API SSL error, retrying in {delay}s (attempt {attempt + 1}/{max_retries})")
-                            await asyncio.sleep(delay)
-                            delay *= 2  # Exponential backoff
-                            continue
-                    raise e
-            return None
-        
         try:
-            # Check if access token is expired and refresh if needed
-            access_token = credentials_data.get("access_token")
-            refresh_token = credentials_data.get("refresh_token")
-            
-            if not access_token:
-                raise Exception("No access token provided")
-            
-            # If we have a refresh token, try to refresh the access token
-            if refresh_token:
-                try:
-                    refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                    access_token = refreshed_tokens["access_token"]
-                    # Update the credentials data with new tokens
-                    credentials_data.update(refreshed_tokens)
-                except Exception as e:
-                    logging.warning(f"Failed to refresh Outlook token: {str(e)}")
-                    # Continue with existing token
+            access_token, _ = await self._get_access_token(credentials_data)
+            
+            # Client-generated Message-ID, used to find the message if the send outcome is unknown
+            internet_message_id = self._new_internet_message_id(from_email)
             
             # Prepare the email message
             message_data = {
-                "message": {
-                    "subject": subject,
-                    "body": {
-                        "contentType": "Text",
-                        "content": body
-                    },
-                    "toRecipients": [
-                        {
-                            "emailAddress": {
-                                "address": email_to
-                            }
+                "subject": subject,
+                "body": {
+                    "contentType": "Text",
+                    "content": body
+                },
+                "toRecipients": [
+                    {
+                        "emailAddress": {
+                            "address": email_to
                         }
-                    ]
-                }
+                    }
+                ],
+                "internetMessageId": internet_message_id
             }
             
-            # If this is a reply, add proper headers
-            if thread_id and original_message_id:
-                # Generate a new Message-ID for this reply
-                new_message_id = f"<{uuid.uuid4()}@{from_email.split('@')[1]}>"
-                message_data["message"]["internetMessageId"] = new_message_id
-                # Add conversationId for threading (thread_id parameter is the conversationId for Outlook)
-                message_data["message"]["conversationId"] = thread_id
-                # Threading is handled automatically by the API based on conversationId
-                
-                logging.info(f"Sending email via Outlook API to {email_to} with conversationId: {thread_id}")
+            # Create the draft, then send it. conversationId is read-only, so a reply
+            # draft has to come from createReply on the original message to be threaded.
+            if original_message_id:
+                logging.info("Replying via Outlook API to message %s (conversation %s)", original_message_id, thread_id)
+                response = await self._graph_request(
+                    "POST", f"/me/messages/{original_message_id}/createReply", access_token,
+                    json={"message": message_data}, headers=IMMUTABLE_ID_HEADERS
+                )
             else:
-                # For new messages, generate a new Message-ID
-                new_message_id = f"<{uuid.uuid4()}@{from_email.split('@')[1]}>"
-                message_data["message"]["internetMessageId"] = new_message_id
-                
-                logging.info(f"Sending new email via Outlook API to {email_to}")
-            
-            # Send the message
-            async def send_message():
-                headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                }
-                
-                # Use robust session with SSL handling
-                session = create_outlook_session()
-                
-                try:
-                    response = session.post(
-                        f"{self.base_url}/me/sendMail",
-                        json=message_data,
-                        headers=headers,
-                        timeout=30
-                    )
-                except requests.exceptions.SSLError as ssl_error:
-                    logger.warning(f"SSL error with Outlook API, trying with fallback: {ssl_error}")
-                    # Fallback to regular session if SSL fails
-                    response = requests.post(
-                        f"{self.base_url}/me/sendMail",
-                        json=message_data,
-                        headers=headers,
-                        timeout=30,
-                        verify=False
-                    )
-                except requests.exceptions.Timeout as timeout_error:
-                    logger.error(f"Timeout error with Outlook API: {timeout_error}")
-                    raise Exception(f"Timeout connecting to Outlook API: {timeout_error}")
-                except requests.exceptions.RequestException as req_error:
-                    logger.error(f"Request error with Outlook API: {req_error}")
-                    raise Exception(f"Failed to connect to Outlook API: {req_error}")
-                
-                if not response.ok:
-                    raise Exception(f"Outlook API error: {response.status_code} - {response.text}")
-                
-                return response
-            
-            sent_response = await self._retry_outlook_api_call(send_message)
-            
-            if not sent_response:
-                raise Exception("Failed to send email after all retry attempts")
-            
-            # Get the real message ID by polling for the sent message
-            # Microsoft Graph API doesn't return message ID immediately from sendMail
-            # We need to search for the message we just sent
-            real_message_id = await self._get_sent_message_id(
-                credentials_data, 
-                email_to, 
-                subject, 
-                from_email
-            )
+                logging.info("Sending new email via Outlook API")
+                response = await self._graph_request(
+                    "POST", "/me/messages", access_token, json=message_data, headers=IMMUTABLE_ID_HEADERS
+                )
+            message_id = await self._send_draft(access_token, response.json()["id"], internet_message_id)
             
-            if real_message_id:
-                logging.info(f"Email sent via Outlook API successfully to {email_to} with real message ID: {real_message_id}")
-                return real_message_id
-            else:
-                # Fallback to generated ID if we can't find the real one
-                message_id = f"outlook-{uuid.uuid4()}"
-                logging.warning(f"Could not find real message ID, using generated ID: {message_id}")
-                return message_id
+            logging.info(f"Email sent via Outlook API successfully to {email_to} with message ID: {message_id}")
+            return message_id
             
         except Exception as e:
             error_msg = f"Failed to send email via Outlook API: {str(e)}"
@@ -278,52 +213,10 @@ class OutlookEmailService:
         Returns:
             tuple: (List of message objects, Whether tokens were refreshed)
         """
-        tokens_refreshed = False
         try:
-            # Check if access token is expired and refresh if needed
-            access_token = credentials_data.get("access_token")
-            refresh_token = credentials_data.get("refresh_token")
-            
-            if not access_token:
-                raise Exception("No access token provided")
-            
-            # Validate JWT token format
-            if not is_valid_jwt_token(access_token):
-                logger.warning("Invalid JWT token format detected, attempting to refresh")
-                if refresh_token:
-                    try:
-                        refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                        access_token = refreshed_tokens["access_token"]
-                        # Update the credentials data with new tokens
-                        credentials_data.update(refreshed_tokens)
-                        tokens_refreshed = True
-                        logger.info("Successfully refreshed Outlook access token")
-                    except Exception as e:
-                        logger.error(f"Failed to refresh invalid Outlook token: {str(e)}")
-                        raise Exception("Invalid access token and failed to refresh")
-                else:
-                    raise Exception("Invalid access token and no refresh token available")
-            
-            # If we have a refresh token, try to refresh the access token
-            elif refresh_token:
-                try:
-                    refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                    access_token = refreshed_tokens["access_token"]
-                    # Update the credentials data with new tokens
-                    credentials_data.update(refreshed_tokens)
-                    tokens_refreshed = True
-                    logger.info("Successfully refreshed Outlook access token")
-                except Exception as e:
-                    logger.warning(f"Failed to refresh Outlook token: {str(e)}")
-                    # Continue with existing token
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+            access_token, tokens_refreshed = await self._get_access_token(credentials_data)
             
             # Build the API URL with query parameters
-            url = f"{self.base_url}/me/messages"
             params = {
                 "$top": max_results,
                 "$select": "id,subject,from,receivedDateTime,body,isRead,conversationId,internetMessageId",
@@ -333,24 +226,7 @@ class OutlookEmailService:
             if query:
                 params["$filter"] = query
             
-            # Use robust session with SSL handling
-            session = create_outlook_session()
-            
-            try:
-                response = session.get(url, headers=headers, params=params, timeout=30)
-            except requests.exceptions.SSLError as ssl_error:
-                logger.warning(f"SSL error with Outlook API, trying with fallback: {ssl_error}")
-                # Fallback to regular session if SSL fails
-                response = requests.get(url, headers=headers, params=params, timeout=30, verify=False)
-            except requests.exceptions.Timeout as timeout_error:
-                logger.error(f"Timeout error with Outlook API: {timeout_error}")
-                raise Exception(f"Timeout connecting to Outlook API: {timeout_error}")
-            except requests.exceptions.RequestException as req_error:
-                logger.error(f"Request error with Outlook API: {req_error}")
-                raise Exception(f"Failed to connect to Outlook API: {req_error}")
-            
-            if not response.ok:
-                raise Exception(f"Outlook API error: {response.status_code} - {response.text}")
+            response = await self._graph_request("GET", "/me/messages", access_token, params=params)
             
             data = response.json()
             return data.get("value", []), tokens_refreshed
@@ -376,69 +252,13 @@ class OutlookEmailService:
             dict: Message details
         """
         try:
-            # Check if access token is expired and refresh if needed
-            access_token = credentials_data.get("access_token")
-            refresh_token = credentials_data.get("refresh_token")
-            
-            if not access_token:
-                raise Exception("No access token provided")
-            
-            # Validate JWT token format
-            if not is_valid_jwt_token(access_token):
-                logger.warning("Invalid JWT token format detected, attempting to refresh")
-                if refresh_token:
-                    try:
-                        refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                        access_token = refreshed_tokens["access_token"]
-                        # Update the credentials data with new tokens
-                        credentials_data.update(refreshed_tokens)
-                        logger.info("Successfully refreshed Outlook access token")
-                    except Exception as e:
-                        logger.error(f"Failed to refresh invalid Outlook token: {str(e)}")
-                        raise Exception("Invalid access token and failed to refresh")
-                else:
-                    raise Exception("Invalid access token and no refresh token available")
-            
-            # If we have a refresh token, try to refresh the access token
-            elif refresh_token:
-                try:
-                    refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                    access_token = refreshed_tokens["access_token"]
-                    # Update the credentials data with new tokens
-                    credentials_data.update(refreshed_tokens)
-                    logger.info("Successfully refreshed Outlook access token")
-                except Exception as e:
-                    logger.warning(f"Failed to refresh Outlook token: {str(e)}")
-                    # Continue with existing token
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+            access_token, _ = await self._get_access_token(credentials_data)
             
-            url = f"{self.base_url}/me/messages/{message_id}"
             params = {
-                "$select": "id,subject,from,toRecipients,receivedDateTime,body,isRead,conversationId,internetMessageId"
+                "$select": MESSAGE_SELECT_FIELDS
             }
             
-            # Use robust session with SSL handling
-            session = create_outlook_session()
-            
-            try:
-                response = session.get(url, headers=headers, params=params, timeout=30)
-            except requests.exceptions.SSLError as ssl_error:
-                logger.warning(f"SSL error with Outlook API, trying with fallback: {ssl_error}")
-                # Fallback to regular session if SSL fails
-                response = requests.get(url, headers=headers, params=params, timeout=30, verify=False)
-            except requests.exceptions.Timeout as timeout_error:
-                logger.error(f"Timeout error with Outlook API: {timeout_error}")
-                raise Exception(f"Timeout connecting to Outlook API: {timeout_error}")
-            except requests.exceptions.RequestException as req_error:
-                logger.error(f"Request error with Outlook API: {req_error}")
-                raise Exception(f"Failed to connect to Outlook API: {req_error}")
-            
-            if not response.ok:
-                raise Exception(f"Outlook API error: {response.status_code} - {response.text}")
+            response = await self._graph_request("GET", f"/me/messages/{message_id}", access_token, params=params)
             
             return response.json()
             
@@ -447,299 +267,216 @@ class OutlookEmailService:
             logging.error(error_msg)
             raise Exception(error_msg)
 
-    async def reply_to_message_via_outlook_api(
+    async def get_inbox_delta(
         self,
-        message_id: str,
-        reply_body: str,
         credentials_data: dict,
-        from_email: str = None
-    ) -> str:
+        delta_link: Optional[str] = None,
+        page_size: int = 50
+    ) -> Tuple[List[dict], Optional[str], bool]:
         """
-        Reply to a specific message using Microsoft Graph API reply endpoint.
+        Get inbox messages added or changed since the last sync using Graph delta query.
+        
+        Without a delta link an initial sync is started, limited to messages received in the
+        last OUTLOOK_DELTA_INITIAL_LOOKBACK_MINUTES so connecting a mailbox does not replay
+        its whole history. An expired delta link (410) also falls back to an initial sync.
         
         Args:
-            message_id: The ID of the message to reply to
-            reply_body: The reply content
             credentials_data: Outlook OAuth2 credentials data
-            from_email: Sender email address (optional, used for getting real message ID)
+            delta_link: The @odata.deltaLink returned by the previous sync (optional)
+            page_size: Preferred number of messages per delta page
             
         Returns:
-            str: The message ID of the sent reply
+            tuple: (Changed messages, new delta link, whether tokens were refreshed)
         """
-        
-        async def retry_outlook_api_call(func, max_retries=3, delay=1):
-            """Retry Outlook API calls with exponential backoff"""
-            for attempt in range(max_retries):
-                try:
-                    return await func()
-                except Exception as e:
-                    if "EOF occurred in violation of protocol" in str(e) or "SSL" in str(e):
-                        if attempt < max_retries - 1:
-                            logging.warning(f"Outlook API SSL error, retrying in {delay}s (attempt {attempt + 1}/{max_retries})")
-                            await asyncio.sleep(delay)
-                            delay *= 2  # Exponential backoff
-                            continue
-                    raise e
-            return None
-        
         try:
-            # Check if access token is expired and refresh if needed
-            access_token = credentials_data.get("access_token")
-            refresh_token = credentials_data.get("refresh_token")
-            
-            if not access_token:
-                raise Exception("No access token provided")
-            
-            # If we have a refresh token, try to refresh the access token
-            if refresh_token:
-                try:
-                    refreshed_tokens = outlook_auth_service.refresh_access_token(refresh_token)
-                    access_token = refreshed_tokens["access_token"]
-                    # Update the credentials data with new tokens
-                    credentials_data.update(refreshed_tokens)
-                except Exception as e:
-                    logging.warning(f"Failed to refresh Outlook token: {str(e)}")
-                    # Continue with existing token
-            
-            # Prepare the reply data
-            reply_data = {
-                "comment": reply_body
-            }
+            access_token, tokens_refreshed = await self._get_access_token(credentials_data)
+            headers = {"Prefer": f"odata.maxpagesize={page_size}"}
             
-            logging.info(f"Replying to Outlook message {message_id} with content: {reply_body[:50]}...")
-            
-            # Send the reply using the reply endpoint
-            async def send_reply():
-                headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                }
-                
-                # Use robust session with SSL handling
-                session = create_outlook_session()
-                
-                try:
-                    response = session.post(
-                        f"{self.base_url}/me/messages/{message_id}/reply",
-                        json=reply_data,
-                        headers=headers,
-                        timeout=30
-                    )
-                except requests.exceptions.SSLError as ssl_error:
-                    logger.warning(f"SSL error with Outlook API, trying with fallback: {ssl_error}")
-                    # Fallback to regular session if SSL fails
-                    response = requests.post(
-                        f"{self.base_url}/me/messages/{message_id}/reply",
-                        json=reply_data,
-                        headers=headers,
-                        timeout=30,
-                        verify=False
-                    )
-                except requests.exceptions.Timeout as timeout_error:
-                    logger.error(f"Timeout error with Outlook API: {timeout_error}")
-                    raise Exception(f"Timeout connecting to Outlook API: {timeout_error}")
-                except requests.exceptions.RequestException as req_error:
-                    logger.error(f"Request error with Outlook API: {req_error}")
-                    raise Exception(f"Failed to connect to Outlook API: {req_error}")
-                
-                if not response.ok:
-                    raise Exception(f"Outlook API error: {response.status_code} - {response.text}")
-                
-                return response
-            
-            sent_response = await self._retry_outlook_api_call(send_reply)
-            
-            if not sent_response:
-                raise Exception("Failed to send reply after all retry attempts")
-            
-            # Get the real message ID of the reply by polling for the sent message
-            # The reply endpoint doesn't return a message ID, so we need to find it
-            real_reply_message_id = await self._get_reply_message_id(
-                credentials_data,
-                message_id,  # Original message ID
-                reply_body,
-                from_email
-            )
+            try:
+                messages, new_delta_link = await self._follow_delta_pages(access_token, delta_link, headers)
+            except OutlookAPIError as e:
+                if not delta_link or e.status_code != 410:
+                    raise
+                logger.warning("Outlook delta link expired, starting a new initial sync")
+                messages, new_delta_link = await self._follow_delta_pages(access_token, None, headers)
             
-            if real_reply_message_id:
-                logging.info(f"Reply sent via Outlook API successfully to message {message_id} with real reply ID: {real_reply_message_id}")
-                return real_reply_message_id
-            else:
-                # Fallback to generated ID if we can't find the real one
-                reply_message_id = f"reply-{message_id}-{uuid.uuid4()}"
-                logging.warning(f"Could not find real reply message ID, using generated ID: {reply_message_id}")
-                return reply_message_id
+            return messages, new_delta_link, tokens_refreshed
             
         except Exception as e:
-            error_msg = f"Failed to reply to message via Outlook API: {str(e)}"
+            error_msg = f"Failed to get message delta from Outlook API: {str(e)}"
             logging.error(error_msg)
             raise Exception(error_msg)
-
-    async def _get_sent_message_id(
+    
+    async def _follow_delta_pages(
         self,
-        credentials_data: dict,
-        email_to: str,
-        subject: str,
-        from_email: str,
-        max_attempts: int = 5,
-        delay_seconds: int = 2
-    ) -> str:
+        access_token: str,
+        delta_link: Optional[str],
+        headers: Dict[str, str]
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Follow @odata.nextLink pages until Graph hands back a new @odata.deltaLink."""
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            since = datetime.now(timezone.utc) - timedelta(minutes=settings.OUTLOOK_DELTA_INITIAL_LOOKBACK_MINUTES)
+            url = "/me/mailFolders/inbox/messages/delta"
+            params = {
+                "$select": MESSAGE_SELECT_FIELDS,
+                "$filter": f"receivedDateTime ge {since.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+            }
+        
+        messages: List[dict] = []
+        while True:
+            response = await self._graph_request("GET", url, access_token, params=params, headers=headers)
+            data = response.json()
+            # Deleted or moved-out messages come back as {"id": ..., "@removed": {...}}
+            messages.extend(m for m in data.get("value", []) if "@removed" not in m)
+            next_link = data.get("@odata.nextLink")
+            if not next_link:
+                return messages, data.get("@odata.deltaLink")
+            url, params = next_link, None
+    
+    async def get_messages_batch(
+        self,
+        message_ids: List[str],
+        credentials_data: dict
+    ) -> Dict[str, dict]:
         """
-        Get the real message ID of a sent message by polling the sent items folder.
+        Get several messages with Graph JSON batching (20 messages per request).
         
         Args:
+            message_ids: The message IDs to fetch
             credentials_data: Outlook OAuth2 credentials data
-            email_to: Recipient email address
-            subject: Email subject
-            from_email: Sender email address
-            max_attempts: Maximum number of polling attempts
-            delay_seconds: Delay between polling attempts
             
         Returns:
-            str: The real message ID if found, None otherwise
+            dict: message ID -> message details, for the messages that could be fetched
         """
+        if not message_ids:
+            return {}
         try:
-            access_token = credentials_data.get("access_token")
-            if not access_token:
-                return None
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+            access_token, _ = await self._get_access_token(credentials_data)
+            
+            results: Dict[str, dict] = {}
+            for start in range(0, len(message_ids), GRAPH_BATCH_LIMIT):
+                chunk = message_ids[start:start + GRAPH_BATCH_LIMIT]
+                batch = {
+                    "requests": [
+                        {"id": str(i), "method": "GET", "url": f"/me/messages/{message_id}?$select={MESSAGE_SELECT_FIELDS}"}
+                        for i, message_id in enumerate(chunk)
+                    ]
+                }
+                response = await self._graph_request("POST", "/$batch", access_token, json=batch)
+                for item in response.json().get("responses", []):
+                    message_id = chunk[int(item.get("id"))]
+                    if 200 <= item.get("status", 0) < 300:
+                        results[message_id] = item.get("body", {})
+                    else:
+                        logger.warning(f"Batch fetch of Outlook message {message_id} failed: {item.get('status')} - {item.get('body')}")
             
-            # Use robust session with SSL handling
-            session = create_outlook_session()
-            
-            # Poll for the sent message
-            for attempt in range(max_attempts):
-                try:
-                    # Search for the message in sent items
-                    # Use a filter to find the message we just sent
-                    query_params = {
-                        "$top": 10,
-                        "$select": "id,subject,toRecipients,from,receivedDateTime",
-                        "$filter": f"subject eq '{subject}' and from/emailAddress/address eq '{from_email}'",
-                        "$orderby": "receivedDateTime desc"
-                    }
-                    
-                    response = session.get(
-                        f"{self.base_url}/me/mailFolders/SentItems/messages",
-                        headers=headers,
-                        params=query_params,
-                        timeout=30
-                    )
-                    
-                    if response.ok:
-                        messages = response.json().get('value', [])
-                        
-                        # Look for the most recent message that matches our criteria
-                        for message in messages:
-                            to_recipients = message.get('toRecipients', [])
-                            if any(recipient.get('emailAddress', {}).get('address') == email_to for recipient in to_recipients):
-                                message_id = message.get('id')
-                                if message_id:
-                                    logging.info(f"Found real message ID: {message_id} after {attempt + 1} attempts")
-                                    return message_id
-                    
-                    # Wait before next attempt
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(delay_seconds)
-                        
-                except Exception as e:
-                    logging.warning(f"Error polling for sent message (attempt {attempt + 1}): {e}")
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(delay_seconds)
-            
-            logging.warning(f"Could not find real message ID after {max_attempts} attempts")
-            return None
+            return results
             
         except Exception as e:
-            logging.error(f"Error in _get_sent_message_id: {e}")
-            return None
-    
-    async def _get_reply_message_id(
+            error_msg = f"Failed to batch fetch messages from Outlook API: {str(e)}"
+            logging.error(error_msg)
+            raise Exception(error_msg)
+
+    async def reply_to_message_via_outlook_api(
         self,
-        credentials_data: dict,
-        original_message_id: str,
+        message_id: str,
         reply_body: str,
-        from_email: str,
-        max_attempts: int = 5,
-        delay_seconds: int = 2
+        credentials_data: dict,
+        from_email: str = None
     ) -> str:
         """
-        Get the real message ID of a reply by polling the sent items folder.
+        Reply to a specific message using a Microsoft Graph API createReply draft.
         
         Args:
+            message_id: The ID of the message to reply to
+            reply_body: The reply content
             credentials_data: Outlook OAuth2 credentials data
-            original_message_id: ID of the original message being replied to
-            reply_body: Content of the reply
-            from_email: Sender email address
-            max_attempts: Maximum number of polling attempts
-            delay_seconds: Delay between polling attempts
+            from_email: Sender email address (optional, used for the reply's Message-ID domain)
             
         Returns:
-            str: The real message ID if found, None otherwise
+            str: The message ID of the sent reply
         """
         try:
-            access_token = credentials_data.get("access_token")
-            if not access_token:
-                return None
+            access_token, _ = await self._get_access_token(credentials_data)
+            
+            internet_message_id = self._new_internet_message_id(from_email)
             
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
+            # Prepare the reply data
+            reply_data = {
+                "comment": reply_body,
+                "message": {
+                    "internetMessageId": internet_message_id
+                }
             }
             
-            # Use robust session with SSL handling
-            session = create_outlook_session()
-            
-            # Poll for the reply message
-            for attempt in range(max_attempts):
-                try:
-                    # Search for the reply in sent items
-                    # Look for recent messages from the sender
-                    query_params = {
-                        "$top": 10,
-                        "$select": "id,subject,body,from,receivedDateTime,conversationId",
-                        "$filter": f"from/emailAddress/address eq '{from_email}'",
-                        "$orderby": "receivedDateTime desc"
-                    }
-                    
-                    response = session.get(
-                        f"{self.base_url}/me/mailFolders/SentItems/messages",
-                        headers=headers,
-                        params=query_params,
-                        timeout=30
-                    )
-                    
-                    if response.ok:
-                        messages = response.json().get('value', [])
-                        
-                        # Look for the most recent message that could be our reply
-                        for message in messages:
-                            # Check if this message contains our reply content
-                            message_body = message.get('body', {}).get('content', '')
-                            if reply_body in message_body:
-                                message_id = message.get('id')
-                                if message_id:
-                                    logging.info(f"Found real reply message ID: {message_id} after {attempt + 1} attempts")
-                                    return message_id
-                    
-                    # Wait before next attempt
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(delay_seconds)
-                        
-                except Exception as e:
-                    logging.warning(f"Error polling for reply message (attempt {attempt + 1}): {e}")
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(delay_seconds)
-            
-            logging.warning(f"Could not find real reply message ID after {max_attempts} attempts")
-            return None
+            logging.info("Replying to Outlook message %s (%d characters)", message_id, len(reply_body))
+            
+            # Create the reply draft, then send it
+            response = await self._graph_request(
+                "POST", f"/me/messages/{message_id}/createReply", access_token,
+                json=reply_data, headers=IMMUTABLE_ID_HEADERS
+            )
+            reply_message_id = await self._send_draft(access_token, response.json()["id"], internet_message_id)
             
+            logging.info(f"Reply sent via Outlook API successfully to message {message_id} with reply ID: {reply_message_id}")
+            return reply_message_id
+            
+        except Exception as e:
+            error_msg = f"Failed to reply to message via Outlook API: {str(e)}"
+            logging.error(error_msg)
+            raise Exception(error_msg)
+
+    def _new_internet_message_id(self, from_email: Optional[str]) -> str:
+        """Generate an RFC 2822 Message-ID for an outgoing message."""
+        domain = from_email.split('@')[1] if from_email and '@' in from_email else "outlook.com"
+        return f"<{uuid.uuid4()}@{domain}>"
+
+    async def _send_draft(self, access_token: str, draft_id: str, internet_message_id: str) -> str:
+        """
+        Send a draft and return the ID of the sent message.
+        
+        Drafts are created with immutable IDs, which do not change when the message
+        moves from Drafts to Sent Items, so the draft ID is the sent message ID.
+        If the send call ends without a response (timeout or dropped connection),
+        Sent Items is checked once by internetMessageId to see whether it went out.
+        If Graph rejects the send, the draft is deleted so it is not left in Drafts.
+        """
+        try:
+            await self._graph_request("POST", f"/me/messages/{draft_id}/send", access_token)
+            return draft_id
+        except OutlookAPIError:
+            try:
+                await self._graph_request("DELETE", f"/me/messages/{draft_id}", access_token)
+            except Exception as delete_error:
+                logging.warning(f"Failed to delete unsent Outlook draft {draft_id}: {delete_error}")
+            raise
+        except Exception as e:
+            logging.warning(f"Send of Outlook draft {draft_id} ended without a response ({e}), checking Sent Items")
+            sent_message_id = await self._find_sent_message_id(access_token, internet_message_id)
+            if sent_message_id:
+                return sent_message_id
+            raise
+
+    async def _find_sent_message_id(self, access_token: str, internet_message_id: str) -> Optional[str]:
+        """
+        Look up a sent message by its internetMessageId (single request, no polling).
+        
+        Returns:
+            str: The message ID if found, None otherwise
+        """
+        escaped_id = internet_message_id.replace("'", "''")
+        try:
+            response = await self._graph_request(
+                "GET", "/me/mailFolders/SentItems/messages", access_token,
+                params={"$filter": f"internetMessageId eq '{escaped_id}'", "$select": "id", "$top": 1},
+                headers=IMMUTABLE_ID_HEADERS
+            )
+            messages = response.json().get('value', [])
+            return messages[0].get('id') if messages else None
         except Exception as e:
-            logging.error(f"Error in _get_reply_message_id: {e}")
+            logging.warning(f"Error looking up sent message {internet_message_id}: {e}")
             return None
 
 # Create a singleton instance
@@ -1,8 +1,10 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple
-from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dateutil import parser
 
 from app.core.config import settings
@@ -12,41 +14,47 @@ from app.services.outlook_email_service import outlook_email_service
 from app.services.ai_service import SimpleAIService, filter_email_with_ai
 from app.services.channel_context_service import channel_context_service
 from app.crud.crud_channel_auto_reply_settings import channel_auto_reply_settings
+from app.crud.crud_chat import chat as chat_crud
 from app.core.email import send_plain_email
 from app.util import extract_email_address, clean_html_content
 from app.core.broadcast import broadcast_new_email
+from app.core.metrics import MESSAGES_REPLIED, record_ingested, time_each
+from app.core.tracing import set_trace_attribute, span, start_trace, use_trace
 from app.core.ws_clients import company_email_ws_clients
 
 logger = logging.getLogger(__name__)
 
+# Returned by _prepare_outlook_chat when preparing a message failed (as opposed to filtering it out)
+PREPARE_FAILED = object()
+
 def should_reply_to_outlook_email(sender: str, content: str, settings, company_outlook_box_email: str = None) -> bool:
     """Check if we should reply to this Outlook email based on filtering rules."""
     try:
         # 1. Skip if email content contains an unsubscribe link
         if 'unsubscribe' in content.lower():
-            print(f"[DEBUG] Skipping Outlook email - contains unsubscribe link")
+            logger.debug("Skipping Outlook email - contains unsubscribe link")
             return False
         
         # 2. Skip if sender address contains 'no-reply' or 'noreply'
         if sender and ('no-reply' in sender.lower() or 'noreply' in sender.lower()):
-            print(f"[DEBUG] Skipping Outlook email - no-reply sender: {sender}")
+            logger.debug("Skipping Outlook email - no-reply sender: %s", sender)
             return False
         
         # 3. Skip if email is from settings.MAIL_FROM
         if sender and settings.MAIL_FROM and settings.MAIL_FROM.lower() in extract_email_address(sender).lower():
-            print(f"[DEBUG] Skipping Outlook email - from settings.MAIL_FROM: {sender}")
+            logger.debug("Skipping Outlook email - from settings.MAIL_FROM: %s", sender)
             return False
         
         # 4. Skip if message is sent by the company's own Outlook box email
         if sender and company_outlook_box_email:
             sender_email = extract_email_address(sender)
             if company_outlook_box_email.lower() in sender_email.lower():
-                print(f"[DEBUG] Skipping Outlook email - sent by company itself: {sender}")
+                logger.debug("Skipping Outlook email - sent by company itself: %s", sender)
                 return False
         
         return True
     except Exception as e:
-        print(f"[DEBUG] Error in should_reply_to_outlook_email: {e}")
+        logger.error("Error in should_reply_to_outlook_email: %s", e)
         return False
 
 def parse_outlook_message_content(msg_detail: dict) -> Tuple[str, str]:
@@ -79,7 +87,7 @@ def parse_outlook_message_content(msg_detail: dict) -> Tuple[str, str]:
         return text_content or '', html_content or ''
         
     except Exception as e:
-        print(f"[DEBUG] Error parsing Outlook message content: {e}")
+        logger.error("Error parsing Outlook message content: %s", e)
         return '', ''
 
 def remove_outlook_quotes(html_content: str) -> str:
@@ -106,7 +114,7 @@ def remove_outlook_quotes(html_content: str) -> str:
         
         return str(soup)
     except Exception as e:
-        print(f"[DEBUG] Error removing Outlook quotes: {e}")
+        logger.error("Error removing Outlook quotes: %s", e)
         return html_content
 
 def extract_text_from_html(html_content: str) -> str:
@@ -118,84 +126,76 @@ def extract_text_from_html(html_content: str) -> str:
         soup = BeautifulSoup(html_content, 'html.parser')
         return soup.get_text(separator=' ', strip=True)
     except Exception as e:
-        print(f"[DEBUG] Error extracting text from HTML: {e}")
+        logger.error("Error extracting text from HTML: %s", e)
         return html_content
 
 class OutlookMonitorService:
-    def __init__(self):
-        self.last_seen_message_ids = {}  # company_id -> last seen Outlook message ID
-
-    async def poll_new_emails(self, db: Session):
-        """Poll for new emails from Outlook for all companies with Outlook credentials."""
-        print("[DEBUG] poll_new_outlook_emails called")
-        logger.info("[DEBUG] poll_new_outlook_emails called")
+    async def poll_new_emails(self, db: AsyncSession):
+        """
+        Poll for new emails from Outlook for all companies with Outlook credentials.
+        Uses Graph delta sync per mailbox, so read messages are seen too and a quiet
+        mailbox costs a single request per sweep.
+        """
+        logger.debug("poll_new_outlook_emails called")
         
-        companies = db.query(Company).filter(Company.outlook_box_credentials.isnot(None)).all()
-        print(f"[DEBUG] Found {len(companies)} companies with Outlook credentials")
+        company_ids = (await db.execute(
+            select(Company.id).where(Company.outlook_box_credentials.isnot(None))
+        )).scalars().all()
+        logger.debug("Found %s companies with Outlook credentials", len(company_ids))
         
-        for company in companies:
-            print(f"[DEBUG] Polling Outlook for company {company.id} - {company.name}")
-            logger.info(f"[DEBUG] Polling Outlook for company {company.id} - {company.name}")
+        for company_id in time_each(company_ids, "outlook"):
+            # Re-fetch each company: a rollback in a previous iteration expires loaded objects
+            company = await db.get(Company, company_id)
+            logger.debug("Polling Outlook for company %s - %s", company.id, company.name)
             
+            traces = []
             try:
-                # Get messages from Outlook API
-                messages, tokens_refreshed = await outlook_email_service.get_user_messages(
-                    credentials_data=company.outlook_box_credentials,
-                    max_results=10,
-                    query="isRead eq false"
+                # Get inbox changes since the last sweep
+                fetch_started = time.time_ns()
+                credentials_data = dict(company.outlook_box_credentials)
+                messages, delta_link, tokens_refreshed = await outlook_email_service.get_inbox_delta(
+                    credentials_data=credentials_data,
+                    delta_link=company.outlook_delta_link
                 )
                 
                 # Save refreshed tokens back to database if they were refreshed
                 if tokens_refreshed:
-                    try:
-                        from app.crud.crud_company import company as company_crud
-                        company_crud.update(
-                            db=db,
-                            db_obj=company,
-                            obj_in={"outlook_box_credentials": company.outlook_box_credentials}
-                        )
-                        logger.info(f"Updated Outlook credentials for company {company.id}")
-                    except Exception as e:
-                        logger.warning(f"Failed to update Outlook credentials for company {company.id}: {str(e)}")
+                    company.outlook_box_credentials = credentials_data
+                    await db.commit()
+                    logger.info(f"Updated Outlook credentials for company {company.id}")
                 
-                print(f"[DEBUG] Found {len(messages)} unread messages in Outlook for company {company.id}")
+                logger.debug("Delta returned %s new or changed messages for company %s", len(messages), company.id)
                 
-                last_seen_id = self.last_seen_message_ids.get(company.id)
-                print(f"[DEBUG] Last seen message ID for company {company.id}: {last_seen_id}")
+                # Delta pages normally carry the selected fields; fetch any that came back partial in one batch
+                missing_ids = [m['id'] for m in messages if 'body' not in m or 'from' not in m]
+                if missing_ids:
+                    details = await outlook_email_service.get_messages_batch(missing_ids, credentials_data)
+                    messages = [details.get(m['id'], m) if m['id'] in missing_ids else m for m in messages]
+                fetch_ended = time.time_ns()
                 
                 new_messages = []
-                for msg in messages:
-                    if msg['id'] == last_seen_id:
-                        print(f"[DEBUG] Reached last seen message ID, stopping at: {last_seen_id}")
-                        break
-                    
-                    # Get detailed message information
-                    msg_detail = await outlook_email_service.get_message_details(
-                        message_id=msg['id'],
-                        credentials_data=company.outlook_box_credentials
-                    )
-                    
+                for msg_detail in messages:
                     sender = msg_detail.get('from', {}).get('emailAddress', {}).get('address', '')
                     subject = msg_detail.get('subject', '(No Subject)')
                     received_date = msg_detail.get('receivedDateTime', '')
                     is_read = msg_detail.get('isRead', False)
-                    conversation_id = msg_detail.get('conversationId', msg['id'])
+                    conversation_id = msg_detail.get('conversationId', msg_detail['id'])
                     
-                    print(f"[DEBUG] Processing Outlook message {msg['id']} from: {sender}")
+                    logger.debug("Processing Outlook message %s from: %s", msg_detail['id'], sender)
                     
                     # Get message content
                     text_content, html_content = parse_outlook_message_content(msg_detail)
                     
-                    print(f"[DEBUG] Outlook message {msg['id']} content length: {len(text_content)}")
+                    logger.debug("Outlook message %s content length: %s", msg_detail['id'], len(text_content))
                     
                     # Apply filtering rules
                     if not should_reply_to_outlook_email(sender, text_content, settings, company.outlook_box_email):
-                        print(f"[DEBUG] Skipping Outlook message {msg['id']} - failed filtering rules")
+                        logger.debug("Skipping Outlook message %s - failed filtering rules", msg_detail['id'])
                         continue
                     
-                    print(f"[DEBUG] Outlook message {msg['id']} passed all filters, adding to new_messages")
+                    logger.debug("Outlook message %s passed all filters, adding to new_messages", msg_detail['id'])
                     new_messages.append({
-                        'id': msg['id'],
+                        'id': msg_detail['id'],
                         'detail': msg_detail,
                         'sender': sender,
                         'subject': subject,
@@ -205,20 +205,70 @@ class OutlookMonitorService:
                         'conversation_id': conversation_id
                     })
                 
-                if new_messages:
-                    print(f"[DEBUG] New Outlook messages found for company {company.id}: {[m['id'] for m in new_messages]}")
-                    self.last_seen_message_ids[company.id] = new_messages[0]['id']
+                # Skip messages that are already stored with one lookup for the whole batch
+                existing_ids = await chat_crud.get_existing_message_ids(
+                    db, company_id=company.id, message_ids=[m['id'] for m in new_messages]
+                )
+                new_messages = [m for m in new_messages if m['id'] not in existing_ids]
+                for msg_data in new_messages:
+                    trace = start_trace(msg_data['id'], "outlook", company.id, start_ns=fetch_started, **{"channel.id": msg_data['conversation_id']})
+                    trace.record("fetch", fetch_started, fetch_ended, batch_size=len(messages))
+                    msg_data['trace'] = trace
+                    traces.append(trace)
+                
+                # Filter and analyze new messages, oldest first, then store them in one insert
+                new_messages.sort(key=lambda m: m['received_date'] or '')
+                prepared = []
+                prepare_failed = False
+                for msg_data in new_messages:
+                    with use_trace(msg_data['trace']):
+                        row = await self._prepare_outlook_chat(msg_data, company)
+                    if row is PREPARE_FAILED:
+                        prepare_failed = True
+                        msg_data['trace'].end(outcome="failed")
+                    elif row:
+                        prepared.append((msg_data, row))
+                    else:
+                        msg_data['trace'].end(outcome="skipped")
+                store_started = time.time_ns()
+                stored = await chat_crud.ingest_batch(db, rows=[row for _, row in prepared])
+                store_ended = time.time_ns()
+                record_ingested("outlook", stored)
+                stored_by_id = {db_msg.message_id: db_msg for db_msg in stored}
                 
-                # Process new messages
-                for msg_data in reversed(new_messages):  # Oldest first
-                    await self._process_outlook_message(msg_data, company, db)
+                for msg_data, _ in prepared:
+                    trace = msg_data['trace']
+                    db_msg = stored_by_id.get(msg_data['id'])
+                    if not db_msg:
+                        # Stored concurrently by another sweep
+                        trace.end(outcome="duplicate")
+                        continue
+                    trace.record("store", store_started, store_ended, batch_size=len(prepared))
+                    with use_trace(trace):
+                        await self._handle_stored_outlook_message(msg_data, db_msg, company, db)
+                    trace.end(outcome="stored")
+                
+                # Only advance the delta link once the changes have been processed. If a message
+                # could not be prepared (e.g. an OpenAI timeout), keep the old link so the next
+                # sweep sees it again; messages stored in this sweep are skipped by the ID lookup.
+                if prepare_failed:
+                    logger.warning("Keeping the Outlook delta link for company %s: some messages could not be prepared", company.id)
+                elif delta_link:
+                    company.outlook_delta_link = delta_link
+                    await db.commit()
                     
             except Exception as e:
-                print(f"[DEBUG] Error polling Outlook for company {company.id}: {e}")
-                logger.error(f"Error polling Outlook for company {company.id}: {str(e)}")
+                logger.error("Error polling Outlook for company %s: %s", company.id, e)
+                for trace in traces:
+                    trace.end(error=e)
+                await db.rollback()
 
-    async def _process_outlook_message(self, msg_data: dict, company: Company, db: Session):
-        """Process a single Outlook message."""
+    async def _prepare_outlook_chat(self, msg_data: dict, company: Company) -> Union[dict, None, object]:
+        """
+        Run the AI filter and action analysis for a new Outlook message.
+        Returns the chat row to store, None if the message should be skipped, or
+        PREPARE_FAILED if it could not be processed and should be retried.
+        """
         try:
             msg_id = msg_data['id']
             msg_detail = msg_data['detail']
@@ -229,7 +279,7 @@ class OutlookMonitorService:
             is_read = msg_data['is_read']
             conversation_id = msg_data['conversation_id']
             
-            print(f"[DEBUG] Processing new Outlook message: {msg_id}")
+            logger.debug("Processing new Outlook message: %s", msg_id)
             
             # Parse received date
             sent_at = None
@@ -239,25 +289,24 @@ class OutlookMonitorService:
                 sent_at = datetime.now(timezone.utc)
             
             # Use shared AI filter
-            ai_filter_result = await filter_email_with_ai(sender, content)
-            print(f"[DEBUG] AI filter result for Outlook message {msg_id}: {ai_filter_result}")
+            with span("filter"):
+                ai_filter_result = await filter_email_with_ai(sender, content)
+            logger.debug("AI filter result for Outlook message %s: %s", msg_id, ai_filter_result)
             
             if not ai_filter_result:
-                print(f"[DEBUG] Skipping Outlook message {msg_id} - failed AI filter")
-                return
+                logger.debug("Skipping Outlook message %s - failed AI filter", msg_id)
+                return None
             
-            # Store incoming message in chat table if not already present
-            db_msg = db.query(Chat).filter_by(message_id=msg_id).first()
             sender_email = extract_email_address(sender)
+            if sender_email.lower() == company.outlook_box_email.lower():
+                return None
             
-            if not db_msg and sender_email.lower() != company.outlook_box_email.lower():
-                print(f"[DEBUG] Outlook message {msg_id} not in database and not sent by company, storing...")
-                
-                # Parse content again to get both text and HTML
-                text_content, html_content = parse_outlook_message_content(msg_detail)
-                
-                # Analyze message for action requirement
-                ai_service = SimpleAIService()
+            # Parse content again to get both text and HTML
+            text_content, html_content = parse_outlook_message_content(msg_detail)
+            
+            # Analyze message for action requirement
+            ai_service = SimpleAIService()
+            with span("classify"):
                 action_analysis = await ai_service.analyze_message_for_action_requirement(
                     sender=sender,
                     content=text_content,  # Use text content for analysis
@@ -265,102 +314,112 @@ class OutlookMonitorService:
                     company_category=company.business_category,
                     company_id=company.id
                 )
+            
+            action_required = action_analysis.get('action_required', False)
+            action_reason = action_analysis.get('reason', '')
+            action_type = action_analysis.get('action_type', 'none')
+            urgency = action_analysis.get('urgency', 'none')
+            set_trace_attribute("action_required", action_required)
+            
+            logger.debug("Action analysis for Outlook message %s: action_required=%s, type=%s, urgency=%s", msg_id, action_required, action_type, urgency)
+            
+            return dict(
+                company_id=company.id,
+                channel_id=conversation_id,  # Outlook conversationId becomes channel_id
+                message_id=msg_id,
+                from_email=sender_email,
+                to_email=company.outlook_box_email,
+                subject=subject,
+                body_text=text_content,  # Store text content
+                body_html=html_content,  # Store HTML content
+                sent_at=sent_at,
+                is_read=is_read,
+                notification_read=False,
+                replied=False,
+                action_required=action_required,
+                action_reason=action_reason,
+                action_type=action_type,
+                urgency=urgency,
+                email_provider='outlook'
+            )
                 
-                action_required = action_analysis.get('action_required', False)
-                action_reason = action_analysis.get('reason', '')
-                action_type = action_analysis.get('action_type', 'none')
-                urgency = action_analysis.get('urgency', 'none')
-                
-                print(f"[DEBUG] Action analysis for Outlook message {msg_id}: action_required={action_required}, type={action_type}, urgency={urgency}")
-                
-                db_msg = Chat(
-                    company_id=company.id,
-                    channel_id=conversation_id,  # Outlook conversationId becomes channel_id
-                    message_id=msg_id,
-                    from_email=sender_email,
-                    to_email=company.outlook_box_email,
-                    subject=subject,
-                    body_text=text_content,  # Store text content
-                    body_html=html_content,  # Store HTML content
-                    sent_at=sent_at,
-                    is_read=is_read,
-                    action_required=action_required,
-                    action_reason=action_reason,
-                    action_type=action_type,
-                    urgency=urgency,
-                    email_provider='outlook'
-                )
-                db.add(db_msg)
-                db.commit()
-                
-                # Store message in channel context
-                channel_context_service.store_message_in_context(db, db_msg)
-                
-                print(f"[DEBUG] Stored Outlook message {msg_id} in database with action_required={action_required}")
-                
-                # Check for auto-reply settings and send reply if needed
-                auto_reply_data = await self._handle_outlook_auto_reply(msg_data, company, db)
-                
-                # Broadcast new email to frontend (including auto-reply if sent)
-                await self._broadcast_outlook_email(msg_data, company, db, auto_reply_data)
+        except Exception as e:
+            logger.error("Error processing Outlook message %s: %s", msg_data.get('id', 'unknown'), e)
+            return PREPARE_FAILED
+
+    async def _handle_stored_outlook_message(self, msg_data: dict, db_msg: Chat, company: Company, db: AsyncSession):
+        """Update channel context, auto-reply and broadcast for a newly stored Outlook message."""
+        try:
+            # Store message in channel context
+            with span("context_append"):
+                await db.run_sync(channel_context_service.store_message_in_context, db_msg)
+            
+            logger.debug("Stored Outlook message %s in database with action_required=%s", db_msg.message_id, db_msg.action_required)
+            
+            # Check for auto-reply settings and send reply if needed
+            auto_reply_data = await self._handle_outlook_auto_reply(msg_data, company, db)
+            
+            # Broadcast new email to frontend (including auto-reply if sent)
+            await self._broadcast_outlook_email(msg_data, company, db, auto_reply_data)
                 
         except Exception as e:
-            print(f"[DEBUG] Error processing Outlook message {msg_data.get('id', 'unknown')}: {e}")
-            logger.error(f"Error processing Outlook message: {str(e)}")
+            logger.error("Error processing Outlook message %s: %s", msg_data.get('id', 'unknown'), e)
 
-    async def _handle_outlook_auto_reply(self, msg_data: dict, company: Company, db: Session):
+    async def _handle_outlook_auto_reply(self, msg_data: dict, company: Company, db: AsyncSession):
         """Handle auto-reply for Outlook messages."""
         try:
             # Get auto-reply settings for this channel
-            channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=msg_data['conversation_id'])
+            channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=msg_data['conversation_id'])
             enable_auto_reply = channel_settings.enable_auto_reply if channel_settings else True
             
             if not enable_auto_reply:
-                print(f"[DEBUG] Auto-reply disabled for Outlook thread {msg_data['conversation_id']}")
+                logger.debug("Auto-reply disabled for Outlook thread %s", msg_data['conversation_id'])
                 return
             
             # Generate AI reply using text content
             ai_service = SimpleAIService()
-            reply_text = await ai_service.generate_email_reply(
-                sender=msg_data['sender'],
-                content=msg_data['content'],  # Use text content for reply generation
-                company_id=company.id,
-                channel_id=msg_data["conversation_id"]
-            )
+            with span("generate"):
+                reply_text = await ai_service.generate_email_reply(
+                    sender=msg_data['sender'],
+                    content=msg_data['content'],  # Use text content for reply generation
+                    company_id=company.id,
+                    channel_id=msg_data["conversation_id"]
+                )
             
             if reply_text:
-                print(f"[DEBUG] Sending auto-reply to Outlook message {msg_data['id']}")
+                logger.debug("Sending auto-reply to Outlook message %s", msg_data['id'])
                 
                 # Send reply via Outlook API using reply endpoint
                 from app.services.outlook_email_service import outlook_email_service
                 
-                try:
-                    # Try to use the proper reply endpoint first
-                    sent_message_id = await outlook_email_service.reply_to_message_via_outlook_api(
-                        message_id=msg_data['id'],
-                        reply_body=reply_text,
-                        credentials_data=company.outlook_box_credentials,
-                        from_email=company.outlook_box_email
-                    )
-                    print(f"[DEBUG] Outlook auto-reply sent via reply endpoint, message ID: {sent_message_id}")
-                except Exception as reply_error:
-                    print(f"[DEBUG] Reply endpoint failed, falling back to send email: {reply_error}")
-                    # Fallback to sending a new email if reply endpoint fails
-                    sent_message_id = await send_plain_email(
-                        email_to=msg_data['sender'],
-                        subject=f"Re: {msg_data['subject']}",
-                        body=reply_text,
-                        from_email=company.outlook_box_email,
-                        mail_username=company.outlook_box_email,
-                        mail_password=company.outlook_box_password,  # Use Outlook password for SMTP fallback
-                        mail_from_name=company.outlook_box_username,
-                        gmail_api_credentials=None,
-                        outlook_api_credentials=company.outlook_box_credentials,
-                        thread_id=msg_data['conversation_id'],
-                        original_message_id=msg_data['id']
-                    )
+                with span("send"):
+                    try:
+                        # Try to use the proper reply endpoint first
+                        sent_message_id = await outlook_email_service.reply_to_message_via_outlook_api(
+                            message_id=msg_data['id'],
+                            reply_body=reply_text,
+                            credentials_data=company.outlook_box_credentials,
+                            from_email=company.outlook_box_email
+                        )
+                        logger.debug("Outlook auto-reply sent via reply endpoint, message ID: %s", sent_message_id)
+                    except Exception as reply_error:
+                        logger.warning("Reply endpoint failed, falling back to send email: %s", reply_error)
+                        # Fallback to sending a new email if reply endpoint fails
+                        sent_message_id = await send_plain_email(
+                            email_to=msg_data['sender'],
+                            subject=f"Re: {msg_data['subject']}",
+                            body=reply_text,
+                            from_email=company.outlook_box_email,
+                            mail_username=company.outlook_box_email,
+                            mail_password=company.outlook_box_password,  # Use Outlook password for SMTP fallback
+                            mail_from_name=company.outlook_box_username,
+                            gmail_api_credentials=None,
+                            outlook_api_credentials=company.outlook_box_credentials,
+                            thread_id=msg_data['conversation_id'],
+                            original_message_id=msg_data['id']
+                        )
                 
-                print(f"[DEBUG] Outlook auto-reply sent successfully, message ID: {sent_message_id}")
+                logger.debug("Outlook auto-reply sent successfully, message ID: %s", sent_message_id)
                 
                 # Store outgoing auto-reply message in chat table
                 from app.models.chat import Chat
@@ -384,13 +443,16 @@ class OutlookMonitorService:
                     action_type='',
                     urgency=''
                 )
-                db.add(db_reply)
-                db.commit()
+                with span("store_reply"):
+                    db.add(db_reply)
+                    await db.commit()
+                MESSAGES_REPLIED.labels("outlook").inc()
+                set_trace_attribute("replied", True)
                 
                 # Store AI reply in channel context
-                channel_context_service.store_message_in_context(db, db_reply)
+                await db.run_sync(channel_context_service.store_message_in_context, db_reply)
                 
-                print(f"[DEBUG] Stored Outlook auto-reply in database with ID: {sent_message_id}")
+                logger.debug("Stored Outlook auto-reply in database with ID: %s", sent_message_id)
                 
                 # Return the reply data for broadcasting
                 return {
@@ -407,15 +469,14 @@ class OutlookMonitorService:
                 }
                 
         except Exception as e:
-            print(f"[DEBUG] Error handling Outlook auto-reply: {e}")
-            logger.error(f"Error handling Outlook auto-reply: {str(e)}")
+            logger.error("Error handling Outlook auto-reply: %s", e)
             return None
 
-    async def _broadcast_outlook_email(self, msg_data: dict, company: Company, db: Session, auto_reply_data: dict = None):
+    async def _broadcast_outlook_email(self, msg_data: dict, company: Company, db: AsyncSession, auto_reply_data: dict = None):
         """Broadcast new Outlook email to frontend."""
         try:
             # Get auto-reply settings for this channel
-            channel_settings = channel_auto_reply_settings.get_by_channel_id(db, channel_id=msg_data['conversation_id'])
+            channel_settings = await db.run_sync(channel_auto_reply_settings.get_by_channel_id, channel_id=msg_data['conversation_id'])
             enable_auto_reply = channel_settings.enable_auto_reply if channel_settings else True
             
             # Parse content to get both text and HTML for broadcast
@@ -453,11 +514,11 @@ class OutlookMonitorService:
                 'email_provider': 'outlook'
             }
             
-            await broadcast_new_email(company_email_ws_clients, company.id, email_data)
+            with span("broadcast"):
+                await broadcast_new_email(company_email_ws_clients, company.id, email_data)
             
         except Exception as e:
-            print(f"[DEBUG] Error broadcasting Outlook email: {e}")
-            logger.error(f"Error broadcasting Outlook email: {str(e)}")
+            logger.error("Error broadcasting Outlook email: %s", e)
 
 # Create a singleton instance
 outlook_monitor_service = OutlookMonitorService()
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.context_retrieval_service import context_retrieval_service
+
+logger = logging.getLogger(__name__)
+
+# Embedding input limit for a cached message
+MAX_MESSAGE_CHARS = 8000
+
+
+class CachedReply:
+    """A generated reply and the (embedded) first message it answered."""
+
+    def __init__(self, sender: str, content: str, reply: str, vector: np.ndarray, context_version: str):
+        self.sender = sender
+        self.content = content
+        self.reply = reply
+        self.vector = vector
+        self.context_version = context_version
+        self.created_at = time.monotonic()
+
+
+class ReplyCacheMatch:
+    def __init__(self, entry: CachedReply, similarity: float):
+        self.entry = entry
+        self.similarity = similarity
+
+    def reusable_for(self, sender: str) -> bool:
+        """
+        Close enough to send the earlier reply unchanged. Replies are personalized
+        from the sender, so only the same sender may get one back as is.
+        """
+        return (
+            self.similarity >= settings.REPLY_CACHE_REUSE_SIMILARITY
+            and (self.entry.sender or "").strip().lower() == (sender or "").strip().lower()
+        )
+
+
+class ReplyCacheService:
+    """
+    Per-company cache of recent replies to first messages, keyed by meaning.
+
+    Tenants get the same few questions ("opening hours?", "price?") many times a
+    day. A new message within REPLY_CACHE_MIN_SIMILARITY (cosine) of a message
+    answered in the last REPLY_CACHE_TTL_SECONDS reuses that reply instead of a
+    full generation. Entries are tied to a context version (a hash of the company
+    details and context the reply was generated from), so editing the company's
+    context invalidates them. Only replies to messages without earlier history in
+    the channel are cached; replies inside a thread depend on that thread.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, List[CachedReply]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def context_version(*parts: Optional[str]) -> str:
+        material = "\x1f".join(str(part or "") for part in parts)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+    def _live_entries(self, company_id: int, context_version: str) -> List[CachedReply]:
+        cutoff = time.monotonic() - settings.REPLY_CACHE_TTL_SECONDS
+        entries = [
+            entry for entry in self._entries.get(company_id, [])
+            if entry.created_at >= cutoff and entry.context_version == context_version
+        ]
+        if entries:
+            self._entries[company_id] = entries
+        else:
+            self._entries.pop(company_id, None)
+        return entries
+
+    async def lookup(self, company_id: int, context_version: str, content: str) -> Optional[ReplyCacheMatch]:
+        """Return the most similar live cached reply above the threshold, if any."""
+        entries = self._live_entries(company_id, context_version)
+        if not entries:
+            self.misses += 1
+            return None
+        query_vector = await context_retrieval_service.embed_query(content[:MAX_MESSAGE_CHARS])
+        scores = np.stack([entry.vector for entry in entries]) @ query_vector
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < settings.REPLY_CACHE_MIN_SIMILARITY:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ReplyCacheMatch(entries[best], similarity)
+
+    async def store(self, company_id: int, context_version: str, sender: str, content: str, reply: str) -> None:
+        """Remember a freshly generated reply (the message embedding is usually cached already)."""
+        try:
+            vector = await context_retrieval_service.embed_query(content[:MAX_MESSAGE_CHARS])
+        except Exception as e:
+            logger.warning(f"Failed to embed message for reply cache (company {company_id}): {e}")
+            return
+        entries = self._live_entries(company_id, context_version)
+        entries.append(CachedReply(sender, content, reply, vector, context_version))
+        self._entries[company_id] = entries[-settings.REPLY_CACHE_MAX_ENTRIES:]
+
+
+# Create a singleton instance
+reply_cache_service = ReplyCacheService()
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """
+    Content-addressed disk cache for synthesized speech.
+
+    Audio is stored under sha256(text, voice, model, format), so the greetings,
+    fallbacks and confirmations the receptionist repeats are synthesized once and
+    then served from disk without an API call. The directory is capped at
+    `max_bytes`; the least recently used files are evicted first (recency is kept
+    in memory and seeded from file mtimes on first use). Concurrent misses for the
+    same key share one synthesis.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, voice: str, model: str, response_format: str) -> str:
+        # Whitespace differences do not change the spoken audio
+        normalized = re.sub(r"\s+", " ", text).strip()
+        material = "\x1f".join([normalized, str(voice), str(model), str(response_format)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, response_format: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{response_format}")
+
+    def _load_index(self) -> None:
+        # Called with the lock held
+        if self._loaded:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.startswith(".") or name.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name.split(".", 1)[0], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._loaded = True
+        logger.info(f"TTS cache loaded: {len(self._index)} files, {self._total_bytes} bytes")
+
+    def _read(self, key: str, response_format: str) -> Optional[bytes]:
+        path = self._path(key, response_format)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+        except OSError:
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return audio
+
+    def _write(self, key: str, response_format: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        path = self._path(key, response_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._load_index()
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._index[key] = len(audio)
+            self._total_bytes += len(audio)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            directory = os.path.join(self.cache_dir, old_key[:2])
+            try:
+                for name in os.listdir(directory):
+                    if name.startswith(old_key):
+                        os.unlink(os.path.join(directory, name))
+            except OSError as e:
+                logger.warning(f"Failed to evict TTS cache entry {old_key}: {e}")
+        if evicted:
+            logger.info(f"TTS cache evicted {len(evicted)} files")
+
+    async def get_or_synthesize(
+        self,
+        text: str,
+        voice: str,
+        model: str,
+        response_format: str,
+        synthesize: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        """
+        Return cached audio for the phrase, or synthesize and store it.
+
+        Args:
+            text: Text to speak
+            voice: TTS voice
+            model: TTS model
+            response_format: Audio format (part of the key, also the file extension)
+            synthesize: Coroutine factory that calls the TTS API on a miss
+
+        Returns:
+            bytes: Encoded audio
+        """
+        if not self.enabled:
+            return await synthesize()
+
+        key = self.make_key(text, voice, model, response_format)
+        try:
+            audio = await asyncio.to_thread(self._read, key, response_format)
+        except Exception as e:
+            logger.warning(f"TTS cache read failed: {e}")
+            audio = None
+        if audio is not None:
+            self.hits += 1
+            return audio
+
+        inflight = self._inflight.get(key)
+        if inflight is not None and not inflight.done():
+            try:
+                return await asyncio.shield(inflight)
+            except Exception:
+                # The shared synthesis failed or was cancelled; try on our own
+                pass
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            started = time.monotonic()
+            audio = await synthesize()
+            logger.debug(f"TTS cache miss synthesized in {time.monotonic() - started:.2f}s")
+            future.set_result(audio)
+        except asyncio.CancelledError:
+            future.set_exception(Exception("TTS synthesis cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        try:
+            await asyncio.to_thread(self._write, key, response_format, audio)
+        except Exception as e:
+            logger.warning(f"TTS cache write failed: {e}")
+        return audio
+
+
+# Create a singleton instance
+tts_cache = TTSCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES, settings.TTS_CACHE_ENABLED)
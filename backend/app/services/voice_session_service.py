@@ -0,0 +1,165 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pytz
+from sqlalchemy import select
+from starlette.websockets import WebSocket
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.ai_agent_settings import AIAgentSettings
+from app.models.company import Company
+from app.services.voice_stream_service import voice_stream_service
+from app.utils.audio import EnergyVAD, pcm16_to_wav
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceSession:
+    """
+    State for one real-time voice conversation over a WebSocket.
+
+    The company, its AI agent settings and the default (next 7 days) calendar
+    context are loaded once when the session starts; each turn only fetches
+    calendar events again when the caller asks about a specific time. The
+    conversation history is kept so follow-up questions have context.
+    """
+
+    def __init__(
+        self,
+        ai_service: Any,
+        company: Company,
+        ai_settings: AIAgentSettings,
+        sample_rate: int,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+    ):
+        self.ai_service = ai_service
+        self.company = company
+        self.ai_settings = ai_settings
+        self.sample_rate = sample_rate
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.vad = EnergyVAD(
+            sample_rate=sample_rate,
+            energy_threshold=settings.VOICE_VAD_ENERGY_THRESHOLD,
+            silence_ms=settings.VOICE_VAD_SILENCE_MS,
+            min_speech_ms=settings.VOICE_VAD_MIN_SPEECH_MS,
+            max_utterance_seconds=settings.VOICE_VAD_MAX_UTTERANCE_SECONDS,
+        )
+        self.history: List[Dict[str, str]] = []
+        self.default_calendar_context: Optional[str] = None
+
+    @classmethod
+    async def start(
+        cls,
+        ai_service: Any,
+        company_id: int,
+        sample_rate: int,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+    ) -> "VoiceSession":
+        """
+        Load the company context for a new session.
+
+        Raises:
+            Exception: If the company or its AI agent settings do not exist
+        """
+        async with AsyncSessionLocal() as db:
+            company = await db.get(Company, company_id)
+            if not company:
+                raise Exception("Company not found")
+            result = await db.execute(
+                select(AIAgentSettings).where(AIAgentSettings.company_id == company_id)
+            )
+            ai_settings = result.scalars().first()
+            if not ai_settings:
+                raise Exception("AI agent settings not found for company")
+
+        session = cls(ai_service, company, ai_settings, sample_rate, max_tokens, temperature)
+        try:
+            now = datetime.now(pytz.UTC)
+            session.default_calendar_context = await ai_service.get_calendar_context_for_range(
+                company, now, now + timedelta(days=7)
+            )
+        except Exception as e:
+            logger.error(f"Error loading calendar context for voice session (company {company_id}): {str(e)}")
+            session.default_calendar_context = "Unable to fetch calendar events."
+        return session
+
+    async def _calendar_context(self, text: str) -> str:
+        try:
+            time_range = await self.ai_service.resolve_calendar_range(text)
+            if time_range is None:
+                return self.default_calendar_context
+            return await self.ai_service.get_calendar_context_for_range(self.company, *time_range)
+        except Exception as e:
+            logger.error(f"Error getting calendar context for voice turn: {str(e)}")
+            return self.default_calendar_context
+
+    def _build_messages(self, text: str, calendar_context: str) -> List[Dict[str, str]]:
+        system_message, user_message = self.ai_service.build_chat_messages(
+            text,
+            calendar_context,
+            self.ai_settings.dialect,
+            self.company.name,
+            self.ai_settings.goal,
+            self.company.business_category,
+            self.company.terms_of_service
+        )
+        return [system_message] + self.history + [user_message]
+
+    def _remember(self, user_text: str, reply_text: str) -> None:
+        self.history.append({"role": "user", "content": user_text})
+        self.history.append({"role": "assistant", "content": reply_text})
+        max_messages = settings.VOICE_SESSION_MAX_TURNS * 2
+        if len(self.history) > max_messages:
+            self.history = self.history[-max_messages:]
+
+    async def run_turn(self, websocket: WebSocket, pcm: bytes) -> None:
+        """
+        Answer one utterance: transcribe it, stream the spoken reply and record the turn.
+
+        Sends `transcript`, `reply_text` (per sentence) and `reply_end` JSON messages,
+        with the reply audio (MP3) as binary messages in between.
+        """
+        started = time.monotonic()
+        wav = pcm16_to_wav(pcm, self.sample_rate)
+        text = (await self.ai_service.transcribe_bytes(wav, "wav")).strip()
+        if not text:
+            await websocket.send_json({"type": "transcript", "text": ""})
+            return
+        await websocket.send_json({"type": "transcript", "text": text})
+
+        calendar_context = await self._calendar_context(text)
+        messages = self._build_messages(text, calendar_context)
+
+        reply_sentences: List[str] = []
+        unsent: List[str] = []
+
+        def on_sentence(sentence: str) -> None:
+            reply_sentences.append(sentence)
+            unsent.append(sentence)
+
+        async for audio in voice_stream_service.stream_reply_audio(
+            messages,
+            voice=getattr(self.ai_settings.voice_type, "value", self.ai_settings.voice_type),
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            response_format="mp3",
+            on_sentence=on_sentence,
+        ):
+            # Sentences are queued for TTS before their audio is ready
+            while unsent:
+                await websocket.send_json({"type": "reply_text", "text": unsent.pop(0)})
+            await websocket.send_bytes(audio)
+
+        reply_text = " ".join(reply_sentences)
+        self._remember(text, reply_text)
+        await websocket.send_json({
+            "type": "reply_end",
+            "processing_time": time.monotonic() - started,
+            "model_used": voice_stream_service.chat_model,
+        })
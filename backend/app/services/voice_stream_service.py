@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.tts_cache_service import tts_cache
+
+logger = logging.getLogger(__name__)
+
+# (messages, model, max_tokens, temperature) -> async iterator of text deltas
+TokenStreamer = Callable[[List[Dict[str, str]], str, int, float], AsyncIterator[str]]
+# (text, voice, model, response_format) -> encoded audio
+SpeechSynthesizer = Callable[[str, str, str, str], Awaitable[bytes]]
+
+# A sentence ends at . ! ? … (optionally followed by quotes/brackets) and whitespace, or at a newline
+SENTENCE_BOUNDARY = re.compile(r"""([.!?…]+["')\]]*)(\s+)|(\n+)""")
+
+# Abbreviations that end with a dot but do not end a sentence
+ABBREVIATIONS = {"kl", "ca", "nr", "dvs", "osv", "f.eks", "bl.a", "evt", "mr", "mrs", "dr", "etc", "e.g", "i.e", "vs", "st"}
+
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+}
+
+
+class SentenceChunker:
+    """
+    Accumulates streamed LLM tokens and cuts them into sentences for TTS.
+
+    Sentences shorter than `min_chars` are merged with the next one so a short
+    greeting ("Hei!") does not cost a TTS round trip of its own.
+    """
+
+    def __init__(self, min_chars: int = 30):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a token and return any chunks that are now complete."""
+        self._buffer += text
+        chunks: List[str] = []
+        search_from = 0
+        while True:
+            match = SENTENCE_BOUNDARY.search(self._buffer, search_from)
+            if not match:
+                break
+            end = match.end()
+            candidate = self._buffer[:end].strip()
+            last_word = candidate.rstrip('.!?…"\')]').rsplit(None, 1)[-1].lower() if candidate else ""
+            if len(candidate) < self.min_chars or (match.group(1) == "." and last_word in ABBREVIATIONS):
+                search_from = end
+                continue
+            chunks.append(candidate)
+            self._buffer = self._buffer[end:]
+            search_from = 0
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is left once the token stream has ended."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder or None
+
+
+class OpenAIVoiceBackend:
+    """Default LLM/TTS backend using the async OpenAI client."""
+
+    def __init__(self):
+        try:
+            import openai
+        except ImportError:
+            logger.error("OpenAI package not installed. Run 'pip install openai'")
+            raise ImportError("OpenAI package not installed. Run 'pip install openai'")
+        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+
+    async def stream_completion(
+        self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float
+    ) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def synthesize(self, text: str, voice: str, model: str, response_format: str) -> bytes:
+        response = await self.client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=response_format
+        )
+        return response.content
+
+
+class VoiceStreamService:
+    """
+    Streams a spoken reply: LLM tokens are cut at sentence boundaries and each
+    sentence is sent to TTS as soon as it is complete, so the first audio is
+    ready after the first sentence rather than after the whole reply.
+
+    TTS for a sentence runs while the LLM keeps streaming the next one; at most
+    `max_pending` syntheses are in flight, and audio is always yielded in order.
+    The LLM and TTS callables are injectable so the pipeline can be driven by
+    local stubs.
+    """
+
+    def __init__(
+        self,
+        token_streamer: Optional[TokenStreamer] = None,
+        synthesizer: Optional[SpeechSynthesizer] = None,
+        chat_model: str = "gpt-4o-mini",
+        tts_model: str = "tts-1",
+        min_chunk_chars: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self._token_streamer = token_streamer
+        self._synthesizer = synthesizer
+        self.chat_model = chat_model
+        self.tts_model = tts_model
+        self.min_chunk_chars = min_chunk_chars or settings.VOICE_STREAM_MIN_CHUNK_CHARS
+        self.max_pending = max_pending or settings.VOICE_STREAM_MAX_PENDING_TTS
+
+    def _ensure_backend(self) -> None:
+        # The OpenAI client is only created when no stubs were injected
+        if self._token_streamer is None or self._synthesizer is None:
+            backend = OpenAIVoiceBackend()
+            self._token_streamer = self._token_streamer or backend.stream_completion
+            self._synthesizer = self._synthesizer or backend.synthesize
+
+    async def stream_reply_audio(
+        self,
+        messages: List[Dict[str, str]],
+        voice: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        response_format: str = "mp3",
+        on_sentence: Optional[Callable[[str], None]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Generate a reply to `messages` and yield its audio chunk by chunk.
+
+        Args:
+            messages: Chat messages for the LLM (system prompt + user turn)
+            voice: TTS voice
+            max_tokens: Maximum tokens for the reply
+            temperature: Temperature for the reply
+            response_format: TTS audio format; must be a format whose chunks can be
+                concatenated (mp3, opus, aac)
+            on_sentence: Called with each text chunk as it is sent to TTS
+
+        Yields:
+            bytes: Encoded audio for each sentence, in order
+        """
+        self._ensure_backend()
+        started = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        chunker = SentenceChunker(self.min_chunk_chars)
+
+        async def enqueue(sentence: str) -> None:
+            if on_sentence:
+                on_sentence(sentence)
+            task = asyncio.create_task(tts_cache.get_or_synthesize(
+                sentence, voice, self.tts_model, response_format,
+                lambda: self._synthesizer(sentence, voice, self.tts_model, response_format)
+            ))
+            try:
+                await queue.put(task)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+
+        async def produce() -> None:
+            try:
+                async for token in self._token_streamer(messages, self.chat_model, max_tokens, temperature):
+                    for sentence in chunker.feed(token):
+                        await enqueue(sentence)
+                remainder = chunker.flush()
+                if remainder:
+                    await enqueue(remainder)
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        chunk_count = 0
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                audio = await item
+                if chunk_count == 0:
+                    logger.info(f"Voice stream time to first audio: {time.monotonic() - started:.2f}s")
+                chunk_count += 1
+                yield audio
+            logger.info(f"Voice stream finished: {chunk_count} chunks in {time.monotonic() - started:.2f}s")
+        finally:
+            # Client disconnects or errors: stop the LLM stream and any pending syntheses
+            producer.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, asyncio.Task):
+                    item.cancel()
+
+
+# Create a singleton instance
+voice_stream_service = VoiceStreamService()
@@ -14,12 +14,9 @@ def extract_email_address(email_header: str) -> str:
 
 # Function to clean HTML content by removing specific <br> patterns
 def clean_html_content(html_content: str) -> str:
-    print(f"[DEBUG] Cleaning HTML content: {html_content}")
     # Remove <br> tags from specific patterns
     cleaned_content = re.sub(r'</div><br/>', '</div>', html_content)
-    print(f"[DEBUG] Cleaned content after first substitution: {cleaned_content}")
     cleaned_content = re.sub(r'<div><br/></div>', '', cleaned_content)
-    print(f"[DEBUG] Cleaned content after second substitution: {cleaned_content}")
     return cleaned_content
 
 # Utility function to remove HTML parts with specific class.
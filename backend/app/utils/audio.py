@@ -0,0 +1,166 @@
+import io
+import math
+import sys
+import wave
+from array import array
+from collections import deque
+from typing import Deque, List, Optional
+
+SAMPLE_WIDTH = 2  # PCM16
+
+
+def frame_rms(frame: bytes) -> float:
+    """
+    Root mean square energy of a little-endian PCM16 frame.
+
+    Args:
+        frame: Raw PCM16 bytes (an even number of bytes)
+
+    Returns:
+        float: RMS amplitude on the int16 scale (0-32768)
+    """
+    samples = array("h")
+    samples.frombytes(frame)
+    if sys.byteorder != "little":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int, channels: int = 1) -> bytes:
+    """
+    Wrap raw PCM16 audio in a WAV container, in memory.
+
+    Args:
+        pcm: Raw little-endian PCM16 bytes
+        sample_rate: Sample rate in Hz
+        channels: Number of interleaved channels
+
+    Returns:
+        bytes: A complete WAV file
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detector for a continuous mono PCM16 stream.
+
+    Audio is cut into fixed frames; a frame is speech when its RMS is above the
+    threshold, which is the larger of `energy_threshold` and a multiple of the
+    running noise floor. An utterance starts after `min_speech_ms` of speech and
+    ends after `silence_ms` of silence (or when it reaches `max_utterance_seconds`).
+    A short pre-roll is kept so the first syllable is not clipped.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        energy_threshold: int = 500,
+        silence_ms: int = 700,
+        min_speech_ms: int = 250,
+        max_utterance_seconds: int = 30,
+        noise_factor: float = 3.0,
+        pre_roll_ms: int = 300,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.energy_threshold = energy_threshold
+        self.noise_factor = noise_factor
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_utterance_frames = max(1, max_utterance_seconds * 1000 // frame_ms)
+        self.noise_floor: Optional[float] = None
+
+        self._pending = b""
+        self._pre_roll: Deque[bytes] = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._utterance: List[bytes] = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._in_speech = False
+
+    @property
+    def in_speech(self) -> bool:
+        return self._in_speech
+
+    def _is_speech(self, rms: float) -> bool:
+        threshold = float(self.energy_threshold)
+        if self.noise_floor is not None:
+            threshold = max(threshold, self.noise_floor * self.noise_factor)
+        return rms >= threshold
+
+    def _update_noise_floor(self, rms: float) -> None:
+        # Slow moving average over non-speech frames only
+        self.noise_floor = rms if self.noise_floor is None else 0.95 * self.noise_floor + 0.05 * rms
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        """
+        Add audio and return any utterances that have ended.
+
+        Args:
+            pcm: Raw PCM16 bytes of any length
+
+        Returns:
+            list: Raw PCM16 bytes of each completed utterance, in order
+        """
+        completed: List[bytes] = []
+        self._pending += pcm
+        while len(self._pending) >= self.frame_bytes:
+            frame = self._pending[:self.frame_bytes]
+            self._pending = self._pending[self.frame_bytes:]
+            utterance = self._process_frame(frame)
+            if utterance:
+                completed.append(utterance)
+        return completed
+
+    def _process_frame(self, frame: bytes) -> Optional[bytes]:
+        rms = frame_rms(frame)
+        speech = self._is_speech(rms)
+
+        if not self._in_speech:
+            if speech:
+                self._speech_frames += 1
+                self._utterance.append(frame)
+                if self._speech_frames >= self.min_speech_frames:
+                    self._in_speech = True
+                    self._silent_frames = 0
+                return None
+            # A blip shorter than min_speech_ms is treated as noise
+            for noise_frame in self._utterance:
+                self._pre_roll.append(noise_frame)
+            self._utterance = []
+            self._speech_frames = 0
+            self._update_noise_floor(rms)
+            self._pre_roll.append(frame)
+            return None
+
+        self._utterance.append(frame)
+        self._silent_frames = 0 if speech else self._silent_frames + 1
+        if self._silent_frames >= self.silence_frames or len(self._utterance) >= self.max_utterance_frames:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """
+        End the current utterance now (client signalled end of turn or stream closed).
+
+        Returns:
+            bytes: The utterance with its pre-roll, or None if no speech was detected
+        """
+        utterance = None
+        if self._in_speech:
+            utterance = b"".join(self._pre_roll) + b"".join(self._utterance)
+        self._pre_roll.clear()
+        self._utterance = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._in_speech = False
+        return utterance
@@ -0,0 +1,89 @@
+import json
+from typing import Optional
+
+
+def analyze_feedback_satisfaction(feedback_data: dict) -> float:
+    """
+    Analyze structured feedback data to determine satisfaction score (0-100)
+    """
+    score = 50.0  # Neutral starting point
+    
+    # Analyze friendliness feedback
+    friendliness = feedback_data.get("friendliness", "").lower()
+    if friendliness:
+        if any(word in friendliness for word in ["good", "great", "excellent", "perfect", "love", "amazing"]):
+            score += 20
+        elif any(word in friendliness for word in ["bad", "terrible", "awful", "hate", "dislike", "rude"]):
+            score -= 20
+        elif any(word in friendliness for word in ["okay", "fine", "acceptable", "decent"]):
+            score += 5
+    
+    # Analyze length feedback
+    length = feedback_data.get("length", "").lower()
+    if length:
+        if any(word in length for word in ["perfect", "good", "appropriate", "right"]):
+            score += 15
+        elif any(word in length for word in ["too long", "too short", "brief", "verbose"]):
+            score -= 10
+    
+    # Analyze emoji feedback
+    emoji = feedback_data.get("emoji", "").lower()
+    if emoji:
+        if any(word in emoji for word in ["good", "perfect", "love", "appropriate"]):
+            score += 10
+        elif any(word in emoji for word in ["too much", "less", "stop", "annoying"]):
+            score -= 10
+    
+    # Analyze other feedback
+    other = feedback_data.get("other", "").lower()
+    if other:
+        if any(word in other for word in ["good", "great", "excellent", "perfect", "love", "amazing", "helpful"]):
+            score += 15
+        elif any(word in other for word in ["bad", "terrible", "awful", "hate", "dislike", "useless", "unhelpful"]):
+            score -= 15
+    
+    return max(0, min(100, score))
+
+def analyze_text_satisfaction(text: str) -> float:
+    """
+    Analyze plain text feedback to determine satisfaction score (0-100)
+    """
+    text_lower = text.lower()
+    score = 50.0  # Neutral starting point
+    
+    # Positive indicators
+    positive_words = ["good", "great", "excellent", "perfect", "love", "amazing", "helpful", "satisfied", "happy", "pleased"]
+    for word in positive_words:
+        if word in text_lower:
+            score += 10
+    
+    # Negative indicators
+    negative_words = ["bad", "terrible", "awful", "hate", "dislike", "useless", "unhelpful", "dissatisfied", "unhappy", "disappointed"]
+    for word in negative_words:
+        if word in text_lower:
+            score -= 10
+    
+    # Neutral indicators
+    neutral_words = ["okay", "fine", "acceptable", "decent", "average"]
+    for word in neutral_words:
+        if word in text_lower:
+            score += 2
+    
+    return max(0, min(100, score))
+
+
+def feedback_satisfaction(feedback: Optional[str]) -> Optional[float]:
+    """
+    Score a chat's stored feedback (0-100). The frontend stores a JSON object with
+    friendliness, length, emoji and other; anything else is scored as plain text.
+    Returns None when there is no feedback.
+    """
+    if not feedback or not feedback.strip():
+        return None
+    try:
+        data = json.loads(feedback)
+    except ValueError:
+        return analyze_text_satisfaction(feedback)
+    if isinstance(data, dict):
+        return analyze_feedback_satisfaction({k: v for k, v in data.items() if isinstance(v, str)})
+    return analyze_text_satisfaction(feedback)
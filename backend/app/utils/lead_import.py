@@ -0,0 +1,141 @@
+import codecs
+import csv
+import io
+import json
+import re
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+
+# Deliberately loose: rejects obvious garbage without rejecting valid but unusual addresses
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class LeadImportStats:
+    """Counters collected while parsing an import file."""
+
+    def __init__(self):
+        self.received = 0
+        self.invalid = 0
+
+
+def normalize_email(value: Optional[str]) -> Optional[str]:
+    """Trim and lower-case an email address; returns None if it is not a plausible address."""
+    if not value:
+        return None
+    email = value.strip().strip("<>").strip().lower()
+    if len(email) > 320 or not EMAIL_PATTERN.match(email):
+        return None
+    return email
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Return "ndjson" or "csv" from the upload's file name / content type."""
+    if filename and filename.lower().endswith(NDJSON_EXTENSIONS):
+        return "ndjson"
+    if content_type and content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    return "csv"
+
+
+def _iter_csv(text_stream: Iterable[str]) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    reader = csv.reader(text_stream)
+    name_index, email_index = 0, 1
+    first = True
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if first:
+            first = False
+            header = [cell.strip().lower() for cell in row]
+            if "email" in header:
+                email_index = header.index("email")
+                name_index = header.index("name") if "name" in header else None
+                continue
+        if len(row) == 1:
+            # A single column is a plain list of addresses
+            yield None, row[0]
+            continue
+        name = row[name_index] if name_index is not None and name_index < len(row) else None
+        email = row[email_index] if email_index < len(row) else None
+        yield name, email
+
+
+def _iter_ndjson(text_stream: Iterable[str]) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None, None
+            continue
+        if not isinstance(record, dict):
+            yield None, None
+            continue
+        yield record.get("name"), record.get("email")
+
+
+def iter_lead_rows(
+    file: BinaryIO, file_format: str, stats: LeadImportStats
+) -> Iterator[Tuple[str, str]]:
+    """
+    Parse an uploaded CSV or NDJSON file incrementally into (name, email) rows.
+
+    CSV files may have a header with `name` and `email` columns (in any order);
+    without a header the columns are read as name, email. NDJSON lines are objects
+    with `name` and `email`. Emails are normalized; rows without a valid email are
+    counted in `stats.invalid` and skipped. A missing name defaults to the email's
+    local part.
+    """
+    text_stream = codecs.getreader("utf-8-sig")(file, errors="replace")
+    rows = _iter_ndjson(text_stream) if file_format == "ndjson" else _iter_csv(text_stream)
+    for name, email in rows:
+        stats.received += 1
+        normalized = normalize_email(email if isinstance(email, str) else None)
+        if not normalized:
+            stats.invalid += 1
+            continue
+        name = name.strip() if isinstance(name, str) else ""
+        yield (name or normalized.split("@", 1)[0])[:255], normalized
+
+
+def iter_csv_chunks(rows: Iterable[Tuple[str, ...]], batch_size: int = 1000) -> Iterator[bytes]:
+    """Encode rows as CSV bytes in batches (the input of a COPY ... FROM STDIN)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue().encode("utf-8")
+
+
+class IteratorReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (for psycopg2 copy_expert)."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
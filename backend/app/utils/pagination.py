@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+SortValue = Union[datetime, float, int]
+
+
+def encode_cursor(sort_value: SortValue, row_id: int) -> str:
+    """
+    Encode a keyset position (sort value, id) as an opaque URL-safe cursor.
+
+    Args:
+        sort_value: Value of the sort column of the last row on the page
+            (a timestamp, or a number such as a search rank)
+        row_id: Id of the last row on the page
+
+    Returns:
+        str: Cursor to pass back for the next page
+    """
+    if isinstance(sort_value, datetime):
+        payload = [sort_value.isoformat(), row_id]
+    else:
+        payload = [sort_value, row_id, "n"]
+    encoded = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(encoded.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[SortValue, int]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (sort_value, row_id), or None if no cursor was given
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if len(payload) == 3 and payload[2] == "n":
+            return float(payload[0]), int(payload[1])
+        sort_value, row_id = payload
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,220 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+import pytz
+
+WEEKDAYS = {
+    "monday": 0, "mandag": 0,
+    "tuesday": 1, "tirsdag": 1,
+    "wednesday": 2, "onsdag": 2,
+    "thursday": 3, "torsdag": 3,
+    "friday": 4, "fredag": 4,
+    "saturday": 5, "lørdag": 5, "lordag": 5,
+    "sunday": 6, "søndag": 6, "sondag": 6,
+}
+
+MONTHS = {
+    "january": 1, "januar": 1, "jan": 1,
+    "february": 2, "februar": 2, "feb": 2,
+    "march": 3, "mars": 3, "mar": 3,
+    "april": 4, "apr": 4,
+    "may": 5, "mai": 5,
+    "june": 6, "juni": 6, "jun": 6,
+    "july": 7, "juli": 7, "jul": 7,
+    "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oktober": 10, "oct": 10, "okt": 10,
+    "november": 11, "nov": 11,
+    "december": 12, "desember": 12, "dec": 12, "des": 12,
+}
+
+NUMBER_WORDS = {
+    "one": 1, "en": 1, "ett": 1, "a": 1,
+    "two": 2, "to": 2,
+    "three": 3, "tre": 3,
+    "four": 4, "fire": 4,
+    "five": 5, "fem": 5,
+    "six": 6, "seks": 6,
+    "seven": 7, "sju": 7, "syv": 7,
+    "eight": 8, "åtte": 8,
+    "nine": 9, "ni": 9,
+    "ten": 10, "ti": 10,
+    "fourteen": 14, "fjorten": 14,
+}
+
+_WEEKDAY_PATTERN = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH_PATTERN = "|".join(sorted(MONTHS, key=len, reverse=True))
+_NUMBER_PATTERN = r"\d{1,3}|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+
+# Words that suggest the query refers to a specific time even when no rule below matched
+_TIME_HINT = re.compile(
+    rf"\d|\b(?:{_MONTH_PATTERN})\b|uke|week|måned|month|helg|weekend|\bår\b|year|dager|days|dato|date",
+    re.IGNORECASE,
+)
+
+
+_NUMERIC_DATE = re.compile(
+    r"(?:\b(kl|klokka|klokken|at)\.?\s*)?\b(\d{1,2})[./](\d{1,2})(?:[./](\d{4}))?\b(?![.:/]?\d)"
+)
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def _day_range(day: date, days: int = 1) -> Tuple[date, date]:
+    return day, day + timedelta(days=days)
+
+
+def _next_weekday(today: date, weekday: int, skip_this_week: bool = False) -> date:
+    delta = (weekday - today.weekday()) % 7
+    if skip_this_week and delta == 0:
+        delta = 7
+    return today + timedelta(days=delta)
+
+
+def _resolve_date(year: Optional[int], month: int, day: int, today: date) -> Optional[date]:
+    """Build a date, rolling a year-less date that has already passed into next year."""
+    try:
+        resolved = date(year or today.year, month, day)
+    except ValueError:
+        return None
+    if year is None and resolved < today:
+        try:
+            resolved = date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    return resolved
+
+
+def _parse_day_range(text: str, today: date) -> Optional[Tuple[date, date]]:
+    # Explicit dates: 2024-03-20, 20.03(.2024), 20. mars, march 20th
+    match = re.search(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", text)
+    if match:
+        resolved = _resolve_date(int(match.group(1)), int(match.group(2)), int(match.group(3)), today)
+        if resolved:
+            return _day_range(resolved)
+
+    match = re.search(rf"\b(\d{{1,2}})\.?\s*(?:of\s+)?({_MONTH_PATTERN})\b\.?(?:\s+(\d{{4}}))?", text)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        resolved = _resolve_date(year, MONTHS[match.group(2)], int(match.group(1)), today)
+        if resolved:
+            return _day_range(resolved)
+
+    match = re.search(rf"\b({_MONTH_PATTERN})\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(\d{{4}}))?", text)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        resolved = _resolve_date(year, MONTHS[match.group(1)], int(match.group(2)), today)
+        if resolved:
+            return _day_range(resolved)
+
+    # Relative days, before numeric dates so "i morgen kl 10.05" is not read as 10 May
+    if re.search(r"\b(?:day after tomorrow|i ?overmorgen|overmorgen)\b", text):
+        return _day_range(today + timedelta(days=2))
+    if re.search(r"\b(?:tomorrow|i ?morgen)\b", text):
+        return _day_range(today + timedelta(days=1))
+    if re.search(r"\b(?:yesterday|i ?går)\b", text):
+        return _day_range(today - timedelta(days=1))
+    if re.search(r"\b(?:today|tonight|this (?:morning|afternoon|evening)|i ?dag|i ?kveld|i ?ettermiddag)\b", text):
+        return _day_range(today)
+
+    # Numeric dates (20.03, 20/3/2024). Numbers after a clock word are times: "kl 10.05", "at 10.12"
+    for match in _NUMERIC_DATE.finditer(text):
+        first, second = int(match.group(2)), int(match.group(3))
+        if match.group(1) and first <= 23 and second <= 59:
+            continue
+        year = int(match.group(4)) if match.group(4) else None
+        resolved = _resolve_date(year, second, first, today)
+        if resolved:
+            return _day_range(resolved)
+
+    # "in 3 days", "next two weeks", "om to uker", "de neste 5 dagene"
+    match = re.search(
+        rf"\b(?:in|within|next|om|innen|neste|de neste|the next)\s+({_NUMBER_PATTERN})\s+"
+        r"(days?|dager|dagene|døgn|weeks?|uker|ukene)\b",
+        text,
+    )
+    if match:
+        amount = _number(match.group(1))
+        unit_days = 7 if match.group(2).startswith(("week", "uke")) else 1
+        return today, today + timedelta(days=amount * unit_days)
+
+    # Weekends
+    if re.search(r"\b(?:next weekend|neste helg)\b", text):
+        saturday = _next_weekday(today, 5, skip_this_week=True)
+        if today.weekday() < 5:
+            saturday += timedelta(days=7)
+        return _day_range(saturday, 2)
+    if re.search(r"\b(?:this weekend|the weekend|i helgen|i helga|denne helgen|til helgen|til helga)\b", text):
+        if today.weekday() == 6:
+            return _day_range(today)
+        return _day_range(_next_weekday(today, 5), 2)
+
+    # Weeks
+    if re.search(r"\b(?:next week|neste uke|til uka|til uken)\b", text):
+        monday = today + timedelta(days=7 - today.weekday())
+        return _day_range(monday, 7)
+    if re.search(r"\b(?:this week|denne uken|denne uka|i uke|i uka|resten av uken|rest of the week)\b", text):
+        return today, today + timedelta(days=7 - today.weekday())
+
+    # Months
+    if re.search(r"\b(?:next month|neste måned)\b", text):
+        first = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return first, (first + timedelta(days=32)).replace(day=1)
+    if re.search(r"\b(?:this month|denne måneden|i måned|resten av måneden)\b", text):
+        return today, (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    # Weekdays: "next friday", "neste fredag", "on friday", "på fredag"
+    match = re.search(rf"\b(next|neste|this|denne|on|på)?\s*({_WEEKDAY_PATTERN})\b", text)
+    if match:
+        skip = match.group(1) in ("next", "neste")
+        return _day_range(_next_weekday(today, WEEKDAYS[match.group(2)], skip_this_week=skip))
+
+    return None
+
+
+def parse_time_range(
+    text: str,
+    now: Optional[datetime] = None,
+    timezone_name: str = "Europe/Oslo",
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Resolve a Norwegian or English relative date phrase into a time range.
+
+    Handles phrases like "i morgen", "tomorrow", "neste uke", "this weekend",
+    "om 3 dager", "neste fredag", "20. mars" and "2024-03-20".
+
+    Args:
+        text: The user's query
+        now: Reference time (defaults to the current time)
+        timezone_name: Time zone the phrases are interpreted in
+
+    Returns:
+        tuple: (start, end) as timezone-aware datetimes with end exclusive,
+        or None if no supported phrase was found
+    """
+    if not text:
+        return None
+    tz = pytz.timezone(timezone_name)
+    local_now = (now or datetime.now(pytz.UTC)).astimezone(tz)
+    day_range = _parse_day_range(text.lower(), local_now.date())
+    if day_range is None:
+        return None
+
+    start_day, end_day = day_range
+    start = tz.localize(datetime.combine(start_day, datetime.min.time()))
+    end = tz.localize(datetime.combine(end_day, datetime.min.time()))
+    # Ranges that start today begin now rather than at midnight
+    if start_day == local_now.date():
+        start = local_now
+    return start, end
+
+
+def mentions_time(text: str) -> bool:
+    """
+    Check whether a query looks like it refers to a specific date or period.
+    Used to decide if a query parse_time_range could not resolve should go to the LLM.
+    """
+    return bool(text and _TIME_HINT.search(text))
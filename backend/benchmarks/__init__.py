@@ -0,0 +1 @@
+"""Offline benchmarks: local fake provider APIs, tenant seeding and the runner (`python -m benchmarks.run`)."""
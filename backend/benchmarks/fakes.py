@@ -0,0 +1,654 @@
+"""
+Local fake servers for the provider APIs the monitors and the AI service call:
+Gmail, Microsoft Graph, the Facebook/Instagram Graph APIs and OpenAI.
+
+Each fake is a small threaded HTTP server on 127.0.0.1 that answers the
+endpoints the services actually use, counts calls per endpoint, and can add
+latency (with jitter) and fail a fraction of requests with an error status.
+Tenants are told apart by the access token the seeded credentials carry.
+"""
+import base64
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+Response = Tuple[int, Any]
+
+CUSTOMER_NAMES = [
+    "Kari Nordmann", "Ola Hansen", "Ingrid Berg", "Lars Johansen", "Sofie Larsen",
+    "Emma Nilsen", "Jonas Pedersen", "Nora Kristiansen", "Henrik Olsen", "Maja Andersen",
+]
+
+# Customer messages; several are near-duplicates on purpose, as real inboxes are
+QUESTIONS = [
+    ("Åpningstider", "Hei! Hva er åpningstidene deres denne uken?"),
+    ("Åpningstider i helgen", "Hei, har dere åpent på lørdag og søndag?"),
+    ("Booking", "Hei, kan jeg bestille time til neste tirsdag etter klokken 16?"),
+    ("Booking", "Jeg vil gjerne booke en time for to personer på fredag."),
+    ("Pris", "Hva koster en vanlig konsultasjon hos dere?"),
+    ("Pris", "Hei! Hva er prisen for en time?"),
+    ("Avbestilling", "Jeg må dessverre avbestille timen min i morgen klokken 10."),
+    ("Flytte time", "Kan jeg flytte timen min fra onsdag til torsdag?"),
+    ("Parkering", "Finnes det parkering i nærheten av dere?"),
+    ("Gavekort", "Har dere gavekort? Jeg vil gi et i bursdagsgave."),
+    ("Opening hours", "Hi, what are your opening hours on Sunday?"),
+    ("Appointment", "Hello, could I book an appointment for next Monday morning?"),
+    ("Klage", "Jeg var ikke fornøyd med behandlingen i går og vil snakke med noen."),
+    ("Faktura", "Jeg har fått en faktura jeg ikke kjenner igjen, kan dere sjekke?"),
+]
+# Messages the monitors' rule filters drop
+NEWSLETTERS = [
+    ("Ukens tilbud", "Se ukens beste tilbud! Klikk her for å unsubscribe fra nyhetsbrevet."),
+]
+
+
+def graph_time(value: datetime) -> str:
+    """Facebook/Instagram Graph timestamp format."""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+def b64url(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+class Faults:
+    """Latency and error injection for one fake."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_seconds(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+        }
+
+
+class InboundMessage:
+    """A customer message as the fakes hand it out."""
+
+    def __init__(self, message_id: str, tenant: int, thread_id: str, sender_name: str,
+                 sender_email: str, subject: str, text: str, created_at: datetime):
+        self.id = message_id
+        self.tenant = tenant
+        self.thread_id = thread_id
+        self.sender_name = sender_name
+        self.sender_email = sender_email
+        self.subject = subject
+        self.text = text
+        self.created_at = created_at
+
+
+class MessageFactory:
+    """
+    Deterministic source of customer messages. A fraction continue an earlier
+    thread of the same tenant and a fraction are newsletters the filters drop.
+    Timestamps are strictly increasing by at least a second, because the Graph
+    APIs only have second resolution and the monitors compare against watermarks.
+    """
+
+    def __init__(self, seed: int = 0, thread_reuse: float = 0.3, newsletter_rate: float = 0.05):
+        self._rng = random.Random(seed)
+        self.thread_reuse = thread_reuse
+        self.newsletter_rate = newsletter_rate
+        self._ids = itertools.count(1)
+        self._threads: Dict[Tuple[str, int], List[Tuple[str, str, str, str]]] = {}
+        self._last_time = datetime.now(timezone.utc) - timedelta(seconds=1)
+        self._lock = threading.Lock()
+
+    def _next_time(self) -> datetime:
+        self._last_time = max(datetime.now(timezone.utc).replace(microsecond=0), self._last_time + timedelta(seconds=1))
+        return self._last_time
+
+    def make(self, provider: str, tenant: int) -> InboundMessage:
+        with self._lock:
+            number = next(self._ids)
+            threads = self._threads.setdefault((provider, tenant), [])
+            if threads and self._rng.random() < self.thread_reuse:
+                thread_id, name, email, subject = self._rng.choice(threads)
+                _, text = self._rng.choice(QUESTIONS)
+                subject = subject if subject.startswith("Re: ") else f"Re: {subject}"
+            else:
+                name = self._rng.choice(CUSTOMER_NAMES)
+                email = f"{name.split()[0].lower()}.{number}@example.com"
+                pool = NEWSLETTERS if self._rng.random() < self.newsletter_rate else QUESTIONS
+                subject, text = self._rng.choice(pool)
+                thread_id = f"bench-{provider}-t{number}"
+                threads.append((thread_id, name, email, subject))
+            return InboundMessage(
+                message_id=f"bench-{provider}-m{number}",
+                tenant=tenant,
+                thread_id=thread_id,
+                sender_name=name,
+                sender_email=email,
+                subject=subject,
+                text=text,
+                created_at=self._next_time(),
+            )
+
+
+def _make_handler(server: "FakeServer"):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            status, payload = server.dispatch(self.command, self.path, self.headers, raw)
+            body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class FakeServer(ABC):
+    """Route table, call counting and fault injection shared by the fakes."""
+
+    name = "fake"
+
+    def __init__(self, faults: Optional[Faults] = None):
+        self.faults = faults or Faults()
+        self.calls: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+        self.base_url = ""
+        self._routes: List[Tuple[str, "re.Pattern[str]", str, Callable[..., Response]]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def route(self, method: str, pattern: str, name: str, handler: Callable[..., Response]) -> None:
+        self._routes.append((method, re.compile(pattern), name, handler))
+
+    def start(self) -> str:
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self._thread.start()
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def dispatch(self, method: str, target: str, headers, raw: bytes) -> Response:
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for route_method, pattern, name, handler in self._routes:
+            match = pattern.fullmatch(url.path) if route_method == method else None
+            if match is None:
+                continue
+            with self._lock:
+                self.calls[name] += 1
+            delay = self.faults.delay_seconds()
+            if delay:
+                time.sleep(delay)
+            if self.faults.should_fail():
+                with self._lock:
+                    self.injected_errors[name] += 1
+                return self.faults.error_status, {"error": {"message": "Injected failure", "code": self.faults.error_status}}
+            body: Any = None
+            if raw:
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    body = raw
+            with self._lock:
+                return handler(match, query, headers, body)
+        with self._lock:
+            self.calls["unmatched"] += 1
+        return 404, {"error": {"message": f"No fake route for {method} {url.path}"}}
+
+    @abstractmethod
+    def deliver(self, message: InboundMessage) -> None:
+        """Put an inbound customer message where the monitor will find it."""
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.injected_errors.clear()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "faults": self.faults.describe(),
+            "calls": dict(sorted(self.calls.items())),
+            "total_calls": sum(self.calls.values()),
+            "injected_errors": dict(sorted(self.injected_errors.items())),
+        }
+
+
+def _bearer_tenant(headers, prefix: str) -> Optional[int]:
+    match = re.search(rf"{re.escape(prefix)}(\d+)", headers.get("Authorization") or "")
+    return int(match.group(1)) if match else None
+
+
+class FakeGmail(FakeServer):
+    """Gmail API v1: messages.list/get/send and threads.get. Tokens are "gmail-<tenant>"."""
+
+    name = "gmail"
+
+    def __init__(self, faults: Optional[Faults] = None):
+        super().__init__(faults)
+        self.inbox: Dict[int, List[str]] = {}
+        self.threads: Dict[str, List[str]] = {}
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.sent = 0
+        prefix = r"/gmail/v1/users/me"
+        self.route("GET", prefix + r"/messages", "messages.list", self._list)
+        self.route("POST", prefix + r"/messages/send", "messages.send", self._send)
+        self.route("GET", prefix + r"/messages/([^/]+)", "messages.get", self._get)
+        self.route("POST", prefix + r"/messages/([^/]+)/modify", "messages.modify", self._modify)
+        self.route("GET", prefix + r"/threads/([^/]+)", "threads.get", self._get_thread)
+
+    def deliver(self, message: InboundMessage) -> None:
+        html = f"<div dir=\"ltr\">{message.text}</div>"
+        self.messages[message.id] = {
+            "id": message.id,
+            "threadId": message.thread_id,
+            "labelIds": ["INBOX", "UNREAD"],
+            "snippet": message.text[:100],
+            "payload": {
+                "mimeType": "multipart/alternative",
+                "headers": [
+                    {"name": "From", "value": f"{message.sender_name} <{message.sender_email}>"},
+                    {"name": "To", "value": f"inbox{message.tenant}@bench.example"},
+                    {"name": "Subject", "value": message.subject},
+                    {"name": "Date", "value": format_datetime(message.created_at)},
+                    {"name": "Message-ID", "value": f"<{message.id}@mail.example.com>"},
+                ],
+                "parts": [
+                    {"mimeType": "text/plain", "body": {"data": b64url(message.text)}},
+                    {"mimeType": "text/html", "body": {"data": b64url(html)}},
+                ],
+            },
+        }
+        self.inbox.setdefault(message.tenant, []).append(message.id)
+        self.threads.setdefault(message.thread_id, []).append(message.id)
+
+    def _list(self, match, query, headers, body) -> Response:
+        tenant = _bearer_tenant(headers, "gmail-")
+        limit = int(query.get("maxResults", 100))
+        ids = list(reversed(self.inbox.get(tenant, [])))[:limit]
+        return 200, {
+            "messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in ids],
+            "resultSizeEstimate": len(ids),
+        }
+
+    def _get(self, match, query, headers, body) -> Response:
+        message = self.messages.get(match.group(1))
+        return (200, message) if message else (404, {"error": {"code": 404, "message": "Not Found"}})
+
+    def _get_thread(self, match, query, headers, body) -> Response:
+        ids = self.threads.get(match.group(1))
+        if not ids:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        return 200, {"id": match.group(1), "messages": [self.messages[i] for i in ids]}
+
+    def _modify(self, match, query, headers, body) -> Response:
+        message = self.messages.get(match.group(1))
+        if not message:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        labels = set(message["labelIds"]) | set((body or {}).get("addLabelIds", []))
+        message["labelIds"] = sorted(labels - set((body or {}).get("removeLabelIds", [])))
+        return 200, message
+
+    def _send(self, match, query, headers, body) -> Response:
+        self.sent += 1
+        message_id = f"bench-gmail-sent{self.sent}"
+        thread_id = (body or {}).get("threadId") or f"bench-gmail-st{self.sent}"
+        tenant = _bearer_tenant(headers, "gmail-")
+        self.messages[message_id] = {
+            "id": message_id,
+            "threadId": thread_id,
+            "labelIds": ["SENT"],
+            "payload": {
+                "mimeType": "text/plain",
+                "headers": [
+                    {"name": "From", "value": f"inbox{tenant}@bench.example"},
+                    {"name": "Date", "value": format_datetime(datetime.now(timezone.utc))},
+                    {"name": "Message-ID", "value": f"<{message_id}@bench.example>"},
+                ],
+                "body": {"data": b64url("(reply)")},
+            },
+        }
+        self.threads.setdefault(thread_id, []).append(message_id)
+        return 200, {"id": message_id, "threadId": thread_id, "labelIds": ["SENT"]}
+
+
+class FakeGraph(FakeServer):
+    """
+    Microsoft Graph v1.0: inbox delta query (with paging), $batch, createReply
+    and send. Tokens are JWT-shaped "bench.outlook-<tenant>.sig".
+    """
+
+    name = "graph"
+
+    def __init__(self, faults: Optional[Faults] = None):
+        super().__init__(faults)
+        self.inbox: Dict[int, List[Dict[str, Any]]] = {}
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.sent = 0
+        self.route("GET", r"/v1\.0/me/mailFolders/inbox/messages/delta", "messages.delta", self._delta)
+        self.route("POST", r"/v1\.0/\$batch", "batch", self._batch)
+        self.route("POST", r"/v1\.0/me/messages/([^/]+)/createReply", "messages.createReply", self._create_reply)
+        self.route("POST", r"/v1\.0/me/messages/([^/]+)/send", "messages.send", self._send)
+        self.route("GET", r"/v1\.0/me/mailFolders/SentItems/messages", "sentItems.list", self._sent_items)
+        self.route("GET", r"/v1\.0/me", "me", self._me)
+
+    def deliver(self, message: InboundMessage) -> None:
+        item = {
+            "id": message.id,
+            "subject": message.subject,
+            "from": {"emailAddress": {"name": message.sender_name, "address": message.sender_email}},
+            "toRecipients": [{"emailAddress": {"address": f"outlook{message.tenant}@bench.example"}}],
+            "receivedDateTime": message.created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "body": {"contentType": "html", "content": f"<html><body><p>{message.text}</p></body></html>"},
+            "isRead": False,
+            "conversationId": message.thread_id,
+            "internetMessageId": f"<{message.id}@mail.example.com>",
+        }
+        self.inbox.setdefault(message.tenant, []).append(item)
+        self.by_id[message.id] = item
+
+    def _delta(self, match, query, headers, body) -> Response:
+        tenant = _bearer_tenant(headers, "outlook-")
+        items = self.inbox.get(tenant, [])
+        start = int(query.get("$skiptoken") or query.get("$deltatoken") or 0)
+        page_size = 50
+        prefer = re.search(r"odata\.maxpagesize=(\d+)", headers.get("Prefer") or "")
+        if prefer:
+            page_size = int(prefer.group(1))
+        page = items[start:start + page_size]
+        end = start + len(page)
+        link = f"{self.base_url}/v1.0/me/mailFolders/inbox/messages/delta"
+        payload: Dict[str, Any] = {"value": page}
+        if end < len(items):
+            payload["@odata.nextLink"] = f"{link}?$skiptoken={end}"
+        else:
+            payload["@odata.deltaLink"] = f"{link}?$deltatoken={end}"
+        return 200, payload
+
+    def _batch(self, match, query, headers, body) -> Response:
+        responses = []
+        for request in (body or {}).get("requests", []):
+            message_id = request["url"].split("?")[0].rsplit("/", 1)[-1]
+            item = self.by_id.get(message_id)
+            responses.append({"id": request["id"], "status": 200 if item else 404, "body": item or {}})
+        return 200, {"responses": responses}
+
+    def _create_reply(self, match, query, headers, body) -> Response:
+        self.sent += 1
+        return 201, {"id": f"bench-outlook-draft{self.sent}"}
+
+    def _send(self, match, query, headers, body) -> Response:
+        return 202, None
+
+    def _sent_items(self, match, query, headers, body) -> Response:
+        return 200, {"value": []}
+
+    def _me(self, match, query, headers, body) -> Response:
+        tenant = _bearer_tenant(headers, "outlook-")
+        return 200, {"id": f"user-{tenant}", "mail": f"outlook{tenant}@bench.example"}
+
+
+class FakeMeta(FakeServer):
+    """
+    Facebook Graph v18.0 (page inbox, conversation paging, Send API) and the
+    Instagram Graph v23.0 (conversations, conversation messages) on one server.
+    Page IDs are "bench-page-<tenant>", Instagram tokens "ig-<tenant>".
+    """
+
+    name = "meta"
+
+    def __init__(self, faults: Optional[Faults] = None):
+        super().__init__(faults)
+        # provider -> tenant -> conversation id -> {"updated_time", "participant", "messages" (oldest first)}
+        self.conversations: Dict[str, Dict[int, Dict[str, Dict[str, Any]]]] = {"facebook": {}, "instagram": {}}
+        self.conversation_tenant: Dict[str, Tuple[str, int]] = {}
+        self.sent = 0
+        self.route("GET", r"/v23\.0/me/conversations", "instagram.conversations", self._ig_conversations)
+        self.route("GET", r"/v23\.0/([^/]+)", "instagram.conversation", self._ig_conversation)
+        self.route("POST", r"/v18\.0/([^/]+)/messages", "facebook.send", self._fb_send)
+        self.route("GET", r"/v18\.0/([^/]+)/messages", "facebook.conversation_messages", self._fb_conversation_messages)
+        self.route("GET", r"/v18\.0/([^/]+)", "facebook.page_inbox", self._fb_page_inbox)
+
+    def deliver(self, message: InboundMessage) -> None:
+        provider = message.id.split("-")[1]
+        conversations = self.conversations[provider].setdefault(message.tenant, {})
+        conversation = conversations.setdefault(message.thread_id, {
+            "participant": {"name": message.sender_name, "id": f"psid-{message.thread_id}"},
+            "messages": [],
+        })
+        conversation["updated_time"] = message.created_at
+        conversation["messages"].append(message)
+        self.conversation_tenant[message.thread_id] = (provider, message.tenant)
+
+    def _page(self, items: List[Any], limit: int, offset: int, next_url: str) -> Dict[str, Any]:
+        page: Dict[str, Any] = {"data": items[offset:offset + limit]}
+        if offset + limit < len(items):
+            page["paging"] = {"next": f"{next_url}after={offset + limit}&limit={limit}"}
+        return page
+
+    # Facebook
+
+    def _fb_message(self, message: InboundMessage, conversation: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": message.id,
+            "message": message.text,
+            "from": conversation["participant"],
+            "created_time": graph_time(message.created_at),
+        }
+
+    def _fb_page_inbox(self, match, query, headers, body) -> Response:
+        tenant = int(match.group(1).rsplit("-", 1)[-1]) if match.group(1).startswith("bench-page-") else None
+        limit = int((re.search(r"conversations\.limit\((\d+)\)", query.get("fields", "")) or [0, 25])[1])
+        conversations = sorted(
+            self.conversations["facebook"].get(tenant, {}).items(),
+            key=lambda item: item[1]["updated_time"], reverse=True,
+        )
+        token = query.get("access_token", "")
+        data = []
+        for conv_id, conversation in conversations[:limit]:
+            messages = [self._fb_message(m, conversation) for m in reversed(conversation["messages"])]
+            data.append({
+                "id": conv_id,
+                "updated_time": graph_time(conversation["updated_time"]),
+                "participants": {"data": [conversation["participant"], {"name": f"Bench Page {tenant}", "id": match.group(1)}]},
+                "messages": self._page(messages, limit, 0, f"{self.base_url}/v18.0/{conv_id}/messages?access_token={token}&"),
+            })
+        inbox: Dict[str, Any] = {"id": match.group(1), "conversations": {"data": data}, "posts": {"data": []}}
+        if len(conversations) > limit:
+            # Conversations past the first page are not paged by the fake
+            inbox["conversations"]["paging"] = {}
+        return 200, inbox
+
+    def _fb_conversation_messages(self, match, query, headers, body) -> Response:
+        provider, tenant = self.conversation_tenant.get(match.group(1), ("facebook", None))
+        conversation = self.conversations[provider].get(tenant, {}).get(match.group(1))
+        if conversation is None:
+            return 404, {"error": {"message": "Unknown conversation", "code": 100}}
+        messages = [self._fb_message(m, conversation) for m in reversed(conversation["messages"])]
+        token = query.get("access_token", "")
+        return 200, self._page(messages, int(query.get("limit", 25)), int(query.get("after", 0)),
+                               f"{self.base_url}/v18.0/{match.group(1)}/messages?access_token={token}&")
+
+    def _fb_send(self, match, query, headers, body) -> Response:
+        self.sent += 1
+        recipient = ((body or {}).get("recipient") or {}).get("id")
+        return 200, {"recipient_id": recipient, "message_id": f"bench-meta-sent{self.sent}"}
+
+    # Instagram
+
+    def _ig_conversations(self, match, query, headers, body) -> Response:
+        token = re.fullmatch(r"ig-(\d+)", query.get("access_token", ""))
+        tenant = int(token.group(1)) if token else None
+        conversations = sorted(
+            self.conversations["instagram"].get(tenant, {}).items(),
+            key=lambda item: item[1]["updated_time"], reverse=True,
+        )
+        data = [{"id": conv_id, "updated_time": graph_time(c["updated_time"])} for conv_id, c in conversations]
+        return 200, self._page(data, int(query.get("limit", 25)), int(query.get("after", 0)),
+                               f"{self.base_url}/v23.0/me/conversations?access_token={query.get('access_token', '')}&fields=id,updated_time&")
+
+    def _ig_conversation(self, match, query, headers, body) -> Response:
+        provider, tenant = self.conversation_tenant.get(match.group(1), ("instagram", None))
+        conversation = self.conversations["instagram"].get(tenant, {}).get(match.group(1))
+        if conversation is None:
+            return 404, {"error": {"message": "Unknown conversation", "code": 100}}
+        limit = int((re.search(r"messages\.limit\((\d+)\)", query.get("fields", "")) or [0, 25])[1])
+        messages = [
+            {
+                "id": m.id,
+                "from": {"username": m.sender_name.split()[0].lower(), "id": conversation["participant"]["id"]},
+                "to": {"data": [{"username": f"bench_ig_{tenant}"}]},
+                "created_time": graph_time(m.created_at),
+                "message": m.text,
+            }
+            for m in reversed(conversation["messages"])
+        ]
+        return 200, {"id": match.group(1), "messages": self._page(messages, limit, 0, f"{self.base_url}/v23.0/{match.group(1)}?")}
+
+
+class FakeOpenAI(FakeServer):
+    """
+    OpenAI chat completions and embeddings. JSON-mode completions (the action
+    analysis) flag `action_rate` of messages as needing a human; other
+    completions return a short reply. Embeddings are hashed bags of words, so
+    near-identical messages get near-identical vectors.
+    """
+
+    name = "openai"
+    EMBEDDING_DIMENSIONS = 256
+
+    def __init__(self, faults: Optional[Faults] = None, action_rate: float = 0.2, seed: int = 0):
+        super().__init__(faults)
+        self.action_rate = action_rate
+        self.tokens: Counter = Counter()
+        self._rng = random.Random(seed)
+        self.route("POST", r"(?:/v1)?/chat/completions", "chat.completions", self._chat)
+        self.route("POST", r"(?:/v1)?/embeddings", "embeddings", self._embeddings)
+
+    def deliver(self, message: InboundMessage) -> None:
+        pass
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+    def _chat(self, match, query, headers, body) -> Response:
+        body = body or {}
+        if body.get("stream"):
+            return 400, {"error": {"message": "Streaming is not supported by the fake"}}
+        prompt = "".join(
+            part if isinstance(part, str) else json.dumps(part)
+            for message in body.get("messages", [])
+            for part in [message.get("content") or ""]
+        )
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            action_required = self._rng.random() < self.action_rate
+            content = json.dumps({
+                "action_required": action_required,
+                "reason": "Customer asks for something only staff can do" if action_required else "",
+                "action_type": "manual_follow_up" if action_required else "none",
+                "urgency": "medium" if action_required else "none",
+            })
+        else:
+            content = (
+                "Hei! Takk for meldingen. Vi har åpent mandag til fredag 09-17 og lørdag 10-15. "
+                "Du kan bestille time direkte her, så finner vi et tidspunkt som passer. Vennlig hilsen"
+            )
+        usage = {"prompt_tokens": self._count_tokens(prompt), "completion_tokens": self._count_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.tokens["prompt"] += usage["prompt_tokens"]
+        self.tokens["completion"] += usage["completion_tokens"]
+        return 200, {
+            "id": f"chatcmpl-bench{sum(self.calls.values())}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.EMBEDDING_DIMENSIONS
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.EMBEDDING_DIMENSIONS
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _embeddings(self, match, query, headers, body) -> Response:
+        body = body or {}
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = self._embed(str(text))
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(self._count_tokens(str(text)) for text in inputs)
+        self.tokens["embedding"] += tokens
+        return 200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def reset_counts(self) -> None:
+        super().reset_counts()
+        self.tokens.clear()
+
+    def report(self) -> Dict[str, Any]:
+        report = super().report()
+        report["tokens"] = dict(self.tokens)
+        return report
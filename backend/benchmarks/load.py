@@ -0,0 +1,339 @@
+"""
+Load test of the dashboard API against a running server.
+
+Seeds benchmark tenants (companies, one verified user each, chat history with
+a share of unread messages) into the server's database, logs the users in and
+drives the routes the frontend calls most: the channels list, analytics,
+unread notifications and marking messages read. Virtual users run
+concurrently in a closed loop for a fixed duration; the report has
+p50/p95/p99 latency, throughput and errors per scenario. Thresholds make the
+run exit non-zero, so it can gate a deploy.
+
+    uvicorn main:app --port 8000 &
+    python -m benchmarks.load --tenants 10 --history 2000 --users 50 --duration 60 --output load.json
+    python -m benchmarks.load --threshold "channels.p95=800,*.p99=2000,errors=0.01" --compare load.json
+
+Seeding uses DATABASE_URL from the environment/.env, which must be the
+database the server under test uses.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+from benchmarks.run import git_commit, percentiles
+
+REPORT_VERSION = 1
+PASSWORD = "bench-password"
+API = "/api/v1"
+# Relative weights; roughly how often the dashboard issues each call
+DEFAULT_WEIGHTS = "channels=4,analytics=1,unread_count=6,unread=3,mark_read=3,chat_mark_read=1"
+
+
+class VirtualUser:
+    """One logged-in dashboard user and what it has seen so far."""
+
+    def __init__(self, number: int, email: str, rng: random.Random):
+        self.number = number
+        self.email = email
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.company_id: Optional[int] = None
+        self.message_ids: List[str] = []
+        self.channel_ids: List[str] = []
+        # Last notification_read sent per message, so mark_read alternates and unread counts stay level
+        self.read_state: Dict[str, bool] = {}
+
+
+class Scenarios:
+    """Requests per scenario name. Each returns the response, after learning ids from it."""
+
+    def __init__(self, client: httpx.AsyncClient, analytics_days: int):
+        self.client = client
+        self.analytics_days = analytics_days
+
+    async def channels(self, user: VirtualUser) -> httpx.Response:
+        response = await self.client.get(
+            f"{API}/companies/{user.company_id}/gmail/channels",
+            params={"page": user.rng.randint(1, 3), "page_size": 30}, headers=user.headers,
+        )
+        if response.status_code == 200:
+            user.channel_ids = [channel["id"] for channel in response.json().get("channels", [])] or user.channel_ids
+        return response
+
+    async def analytics(self, user: VirtualUser) -> httpx.Response:
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=self.analytics_days)
+        return await self.client.post(
+            f"{API}/analytics/ai-handled-requests",
+            json={"startDate": start.isoformat().replace("+00:00", "Z"), "endDate": end.isoformat().replace("+00:00", "Z")},
+            headers=user.headers,
+        )
+
+    async def unread_count(self, user: VirtualUser) -> httpx.Response:
+        return await self.client.get(f"{API}/notifications/unread-count", headers=user.headers)
+
+    async def unread(self, user: VirtualUser) -> httpx.Response:
+        response = await self.client.get(f"{API}/notifications/unread", params={"limit": 50}, headers=user.headers)
+        if response.status_code == 200:
+            ids = [item["message_id"] for item in response.json()["notifications"]]
+            user.message_ids = ids or user.message_ids
+        return response
+
+    async def mark_read(self, user: VirtualUser) -> Optional[httpx.Response]:
+        if not user.message_ids:
+            return None
+        message_id = user.rng.choice(user.message_ids)
+        read = not user.read_state.get(message_id, False)
+        user.read_state[message_id] = read
+        return await self.client.put(
+            f"{API}/notifications/{message_id}/mark-read", json={"notification_read": read}, headers=user.headers,
+        )
+
+    async def chat_mark_read(self, user: VirtualUser) -> Optional[httpx.Response]:
+        if not user.channel_ids:
+            return None
+        channel_id = user.rng.choice(user.channel_ids)
+        return await self.client.put(f"{API}/companies/chats/{channel_id}/mark-as-read", headers=user.headers)
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if not hasattr(Scenarios, name) or name.startswith("_"):
+            raise SystemExit(f"Unknown scenario {name!r}")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def parse_thresholds(values: List[str]) -> List[Tuple[str, str, float]]:
+    """
+    Parse "channels.p95=800,*.p99=2000,errors=0.01" into (scenario, metric, limit).
+    Latencies are in ms; "errors" is the error fraction, overall or per scenario.
+    """
+    thresholds = []
+    for value in values:
+        for item in value.split(","):
+            key, _, limit = item.partition("=")
+            scenario, _, metric = key.strip().rpartition(".")
+            if metric not in ("p50", "p95", "p99", "max", "mean", "errors") or not limit:
+                raise SystemExit(f"Invalid threshold {item!r}")
+            thresholds.append((scenario or "all", metric, float(limit)))
+    return thresholds
+
+
+async def login(client: httpx.AsyncClient, user: VirtualUser) -> None:
+    response = await client.post(f"{API}/auth/login", data={"username": user.email, "password": PASSWORD})
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    me = await client.get(f"{API}/users/me", headers=user.headers)
+    me.raise_for_status()
+    user.company_id = me.json()["company_id"]
+
+
+async def drive(args, emails: List[str]) -> Dict[str, Any]:
+    weights = parse_weights(args.scenarios)
+    names, shares = list(weights), list(weights.values())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    errors: Dict[str, Counter] = defaultdict(Counter)
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        scenarios = Scenarios(client, args.analytics_days)
+        users = [VirtualUser(n, emails[n % len(emails)], random.Random(args.seed * 100003 + n)) for n in range(args.users)]
+        # Log each tenant in once and share the token between its virtual users
+        sessions: Dict[str, VirtualUser] = {}
+        for user in users:
+            if user.email not in sessions:
+                await login(client, user)
+                await scenarios.unread(user)
+                await scenarios.channels(user)
+                sessions[user.email] = user
+            shared = sessions[user.email]
+            user.headers, user.company_id = shared.headers, shared.company_id
+            user.message_ids, user.channel_ids = list(shared.message_ids), list(shared.channel_ids)
+
+        measure_from = time.perf_counter() + args.warmup
+        deadline = measure_from + args.duration
+
+        async def loop(user: VirtualUser) -> None:
+            while time.perf_counter() < deadline:
+                name = user.rng.choices(names, weights=shares)[0]
+                started = time.perf_counter()
+                try:
+                    response = await getattr(scenarios, name)(user)
+                except httpx.HTTPError as e:
+                    response = None
+                    if started >= measure_from:
+                        errors[name][type(e).__name__] += 1
+                        latencies[name].append((time.perf_counter() - started) * 1000)
+                else:
+                    if response is not None and started >= measure_from:
+                        latencies[name].append((time.perf_counter() - started) * 1000)
+                        statuses[name][response.status_code] += 1
+                        if response.status_code >= 400:
+                            errors[name][f"HTTP {response.status_code}"] += 1
+                if args.think_ms:
+                    await asyncio.sleep(user.rng.uniform(0, 2 * args.think_ms) / 1000)
+
+        await asyncio.gather(*(loop(user) for user in users))
+
+    results = {}
+    for name in names:
+        count = len(latencies[name])
+        failed = sum(errors[name].values())
+        results[name] = {
+            "requests": count,
+            "requests_per_second": round(count / args.duration, 3),
+            "errors": failed,
+            "error_rate": round(failed / count, 5) if count else None,
+            "error_kinds": dict(errors[name]),
+            "status_codes": {str(code): n for code, n in sorted(statuses[name].items())},
+            "latency_ms": percentiles(latencies[name]),
+        }
+    everything = [value for name in names for value in latencies[name]]
+    total_errors = sum(result["errors"] for result in results.values())
+    results["all"] = {
+        "requests": len(everything),
+        "requests_per_second": round(len(everything) / args.duration, 3),
+        "errors": total_errors,
+        "error_rate": round(total_errors / len(everything), 5) if everything else None,
+        "latency_ms": percentiles(everything),
+    }
+    return results
+
+
+def check_thresholds(results: Dict[str, Any], thresholds: List[Tuple[str, str, float]]) -> List[str]:
+    """Breached thresholds as readable lines; "*" applies a threshold to every scenario."""
+    breaches = []
+    for scenario, metric, limit in thresholds:
+        targets = [name for name in results if name != "all"] if scenario == "*" else [scenario]
+        for name in targets:
+            result = results.get(name)
+            if result is None:
+                breaches.append(f"{name}: no such scenario in this run")
+                continue
+            value = result["error_rate"] if metric == "errors" else result["latency_ms"][metric]
+            if value is not None and value > limit:
+                breaches.append(f"{name}.{metric} = {value} > {limit}")
+    return breaches
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        parts = []
+        for metric in ("p50", "p95", "p99"):
+            new, old = current["latency_ms"][metric], previous["latency_ms"][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if new is not None and old else "n/a"
+            parts.append(f"{metric} {new}ms ({change})")
+        lines.append(f"{name}: " + ", ".join(parts) + f", errors {current['errors']} (was {previous['errors']})")
+    return lines
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    print(f"{'scenario':<16}{'req':>8}{'req/s':>9}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}", file=sys.stderr)
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        cells = [latency[key] if latency[key] is not None else float("nan") for key in ("p50", "p95", "p99", "max")]
+        print(
+            f"{name:<16}{result['requests']:>8}{result['requests_per_second']:>9.1f}{result['errors']:>6}"
+            + "".join(f"{cell:>9.1f}" for cell in cells),
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard API of a running server")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Server under test")
+    parser.add_argument("--tenants", type=int, default=5, help="Benchmark companies (one login each)")
+    parser.add_argument("--history", type=int, default=1000, help="Customer messages seeded per tenant")
+    parser.add_argument("--unread-rate", type=float, default=0.1, help="Fraction of seeded messages left unread")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse tenants left by an earlier --keep-data run")
+    parser.add_argument("--keep-data", action="store_true", help="Leave the benchmark tenants in the database")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users, spread over the tenants")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--scenarios", default=DEFAULT_WEIGHTS, help="Scenario weights, e.g. 'channels=1,unread=1'")
+    parser.add_argument("--analytics-days", type=int, default=30, help="Date range of the analytics request")
+    parser.add_argument("--threshold", action="append", default=[],
+                        help="Fail when exceeded, e.g. 'channels.p95=800,*.p99=2000,errors=0.01' (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for data and request mix")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    args = parser.parse_args()
+    thresholds = parse_thresholds(args.threshold)
+
+    emails = [f"bench-user-{tenant}@bench.example" for tenant in range(args.tenants)]
+    if not args.no_seed:
+        from app.db.session import SessionLocal
+        from benchmarks import seed
+        with SessionLocal() as db:
+            seed.reset(db)
+            company_ids = seed.seed(db, args.tenants, args.history, ["gmail", "outlook"], seed=args.seed,
+                                    unread_rate=args.unread_rate, days=args.analytics_days)
+            emails = seed.seed_users(db, company_ids, PASSWORD)
+
+    try:
+        results = asyncio.run(drive(args, emails))
+    finally:
+        if not args.no_seed and not args.keep_data:
+            with SessionLocal() as db:
+                seed.reset(db)
+
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "parameters": {
+            "base_url": args.base_url,
+            "tenants": args.tenants,
+            "history": args.history,
+            "unread_rate": args.unread_rate,
+            "users": args.users,
+            "duration": args.duration,
+            "think_ms": args.think_ms,
+            "scenarios": parse_weights(args.scenarios),
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    print_table(results)
+    if args.compare:
+        for line in compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8"))):
+            print(line, file=sys.stderr)
+    breaches = check_thresholds(results, thresholds)
+    for line in breaches:
+        print(f"threshold exceeded: {line}", file=sys.stderr)
+    if breaches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
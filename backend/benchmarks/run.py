@@ -0,0 +1,339 @@
+"""
+Offline benchmark of the inbox monitors.
+
+Starts local fakes for Gmail, Microsoft Graph, the Facebook/Instagram Graph
+APIs and OpenAI, points the app at them, seeds Postgres with N benchmark
+tenants and M history messages each, then runs poll sweeps of the real
+monitor code while the fakes deliver new messages. The JSON report has sweep
+times, messages/second, reply latency percentiles, per-stage timings and
+API-call counts, and can be compared against an earlier report.
+
+    python -m benchmarks.run --tenants 20 --history 200 --rounds 3 --output bench.json
+    python -m benchmarks.run --latency openai=400,gmail=80 --error-rate graph=0.05 --compare bench.json
+
+Only DATABASE_URL is needed (a disposable database is best; pass --migrate for
+a fresh one). No request leaves the machine.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_root))
+
+from benchmarks.fakes import FakeGmail, FakeGraph, FakeMeta, FakeOpenAI, Faults, MessageFactory
+
+REPORT_VERSION = 1
+PROVIDERS = ["gmail", "outlook", "facebook", "instagram"]
+# Which fake serves each provider's inbox
+PROVIDER_FAKE = {"gmail": "gmail", "outlook": "graph", "facebook": "meta", "instagram": "meta"}
+
+logger = logging.getLogger("benchmarks")
+
+
+def parse_mapping(value: str, names: List[str]) -> Dict[str, float]:
+    """Parse "gmail=50,openai=300" (or a bare number for every fake) into {name: value}."""
+    if not value:
+        return {}
+    if "=" not in value:
+        return {name: float(value) for name in names}
+    mapping = {}
+    for item in value.split(","):
+        name, _, setting = item.partition("=")
+        name = name.strip()
+        if name not in names:
+            raise SystemExit(f"Unknown fake {name!r}, expected one of {', '.join(names)}")
+        mapping[name] = float(setting)
+    return mapping
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max/mean (nearest rank) of `values`, rounded to microseconds."""
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))], 3)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(fakes: Dict[str, Any], workdir: str) -> None:
+    """Point the app at the fakes. Must run before anything under `app` is imported."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{fakes['openai'].base_url}/v1",
+        "GMAIL_API_ENDPOINT": f"{fakes['gmail'].base_url}/",
+        "MICROSOFT_GRAPH_BASE_URL": fakes["graph"].base_url,
+        "FACEBOOK_GRAPH_BASE_URL": fakes["meta"].base_url,
+        "INSTAGRAM_GRAPH_BASE_URL": fakes["meta"].base_url,
+        "LOG_FILE": "",
+        "TRACE_FILE": "",
+        "TRACE_MEMORY_TRACES": "1000000",
+        "CONTEXT_INDEX_DIR": os.path.join(workdir, "context_index"),
+        "FEW_SHOT_INDEX_DIR": os.path.join(workdir, "few_shot_index"),
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts_cache"),
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+
+def metric_value(name: str, provider: str) -> float:
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(name, {"provider": provider}) or 0.0
+
+
+def trace_metrics(traces: List[Dict[str, Any]], provider: str) -> Dict[str, Any]:
+    """Reply latency, per-stage timings, outcomes and LLM calls from the monitors' traces."""
+    reply_latency, message_latency = [], []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    outcomes: Counter = Counter()
+    llm_calls: Counter = Counter()
+    for trace in traces:
+        if trace["attributes"].get("provider") != provider:
+            continue
+        attributes = trace["attributes"]
+        outcomes["error" if trace["status"] == "error" else attributes.get("outcome", "unknown")] += 1
+        message_latency.append(trace["duration_ms"])
+        for step in trace["spans"]:
+            if step["name"].startswith("openai."):
+                llm_calls[step["name"]] += 1
+            elif " " not in step["name"]:
+                # Provider HTTP attempts are named "<METHOD> <host>"; the fakes count those
+                stages[step["name"]].append(step["duration_ms"])
+        if attributes.get("replied"):
+            sends = [step for step in trace["spans"] if step["name"] == "send"]
+            if sends:
+                reply_latency.append(sends[-1]["offset_ms"] + sends[-1]["duration_ms"])
+    return {
+        "outcomes": dict(sorted(outcomes.items())),
+        "message_latency_ms": percentiles(message_latency),
+        "reply_latency_ms": percentiles(reply_latency),
+        "stages_ms": {name: percentiles(values) for name, values in sorted(stages.items())},
+        "llm_calls": dict(sorted(llm_calls.items())),
+    }
+
+
+async def run_benchmark(args, fakes: Dict[str, Any], factory: MessageFactory) -> Dict[str, Any]:
+    from app.core import tasks
+    from app.core.tracing import trace_exporter
+    from app.db.session import SessionLocal, async_engine
+    from app.core.http_client import provider_http_client
+    from benchmarks import seed
+
+    runners = {
+        "gmail": tasks.run_gmail_monitor_service,
+        "outlook": tasks.run_outlook_monitor_service,
+        "facebook": tasks.run_facebook_monitor_service,
+        "instagram": tasks.run_instagram_monitor_service,
+    }
+
+    with SessionLocal() as db:
+        removed = seed.reset(db)
+        if removed:
+            logger.warning("Removed %s benchmark tenants left by an earlier run", removed)
+        started = time.perf_counter()
+        seed.seed(db, args.tenants, args.history, args.providers, seed=args.seed)
+        seed_seconds = time.perf_counter() - started
+
+    results: Dict[str, Any] = {}
+    try:
+        for provider in args.providers:
+            run = runners[provider]
+            fake = fakes[PROVIDER_FAKE[provider]]
+            # First sweep with empty inboxes sets up watermarks and delta links
+            await run()
+            for each in fakes.values():
+                each.reset_counts()
+            trace_exporter.clear()
+            ingested_before = metric_value("ciri_messages_ingested_total", provider)
+            replied_before = metric_value("ciri_messages_replied_total", provider)
+
+            sweeps, delivered = [], 0
+            for _ in range(args.rounds):
+                for tenant in range(args.tenants):
+                    for _ in range(args.new_per_round):
+                        fake.deliver(factory.make(provider, tenant))
+                        delivered += 1
+                started = time.perf_counter()
+                await run()
+                sweeps.append(time.perf_counter() - started)
+                logger.info("%s sweep %s: %.2fs", provider, len(sweeps), sweeps[-1])
+
+            ingested = metric_value("ciri_messages_ingested_total", provider) - ingested_before
+            replied = metric_value("ciri_messages_replied_total", provider) - replied_before
+            sweep_total = sum(sweeps)
+            results[provider] = {
+                "delivered": delivered,
+                "ingested": int(ingested),
+                "replied": int(replied),
+                "sweep_seconds": {
+                    "total": round(sweep_total, 4),
+                    **{key: (value / 1000 if value is not None else None)
+                       for key, value in percentiles([s * 1000 for s in sweeps]).items() if key != "count"},
+                },
+                "messages_per_second": round(ingested / sweep_total, 3) if sweep_total else None,
+                **trace_metrics(trace_exporter.recent(), provider),
+                "api_calls": {name: fakes[name].report() for name in sorted({PROVIDER_FAKE[provider], "openai"})},
+            }
+    finally:
+        if not args.keep_data:
+            with SessionLocal() as db:
+                seed.reset(db)
+        await provider_http_client.aclose()
+        await async_engine.dispose()
+
+    return {"seed_seconds": round(seed_seconds, 4), "providers": results}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Percentage change of the headline numbers against a baseline report."""
+    def delta(new, old) -> str:
+        if new is None or old in (None, 0):
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = []
+    if baseline.get("parameters") != report.get("parameters"):
+        lines.append("warning: parameters differ from the baseline, numbers are not directly comparable")
+    for provider, current in report["providers"].items():
+        previous = baseline.get("providers", {}).get(provider)
+        if not previous:
+            lines.append(f"{provider}: not in baseline")
+            continue
+        lines.append(
+            f"{provider}: sweep total {current['sweep_seconds']['total']:.2f}s "
+            f"({delta(current['sweep_seconds']['total'], previous['sweep_seconds']['total'])}), "
+            f"msg/s {current['messages_per_second']} ({delta(current['messages_per_second'], previous['messages_per_second'])}), "
+            f"reply p95 {current['reply_latency_ms']['p95']}ms "
+            f"({delta(current['reply_latency_ms']['p95'], previous['reply_latency_ms']['p95'])}), "
+            f"API calls {sum(f['total_calls'] for f in current['api_calls'].values())} "
+            f"({delta(sum(f['total_calls'] for f in current['api_calls'].values()), sum(f['total_calls'] for f in previous['api_calls'].values()))})"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inbox monitors against local fake provider APIs")
+    parser.add_argument("--tenants", type=int, default=10, help="Benchmark companies to seed")
+    parser.add_argument("--history", type=int, default=100, help="Earlier chat messages seeded per tenant")
+    parser.add_argument("--new-per-round", type=int, default=3, help="New messages per tenant before each sweep")
+    parser.add_argument("--rounds", type=int, default=3, help="Poll sweeps per provider")
+    parser.add_argument("--providers", default=",".join(PROVIDERS), help="Comma-separated providers to benchmark")
+    parser.add_argument("--latency", default="", help="Added latency in ms, e.g. 'openai=300,gmail=50' or '20' for all fakes")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter added to every latency")
+    parser.add_argument("--error-rate", default="", help="Fraction of failed requests, e.g. 'graph=0.05'")
+    parser.add_argument("--action-rate", type=float, default=0.2, help="Fraction of messages the fake LLM escalates")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for messages, latency and errors")
+    parser.add_argument("--database-url", help="Overrides DATABASE_URL")
+    parser.add_argument("--migrate", action="store_true", help="Run Alembic migrations first")
+    parser.add_argument("--keep-data", action="store_true", help="Leave the benchmark tenants in the database")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Log each sweep")
+    args = parser.parse_args()
+
+    args.providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+    unknown = set(args.providers) - set(PROVIDERS)
+    if unknown:
+        parser.error(f"unknown providers: {', '.join(sorted(unknown))}")
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    names = ["gmail", "graph", "meta", "openai"]
+    latency = parse_mapping(args.latency, names)
+    error_rate = parse_mapping(args.error_rate, names)
+    faults = {
+        name: Faults(latency.get(name, 0.0), args.jitter_ms if latency.get(name) else 0.0,
+                     error_rate.get(name, 0.0), seed=args.seed + index)
+        for index, name in enumerate(names)
+    }
+    fakes = {
+        "gmail": FakeGmail(faults["gmail"]),
+        "graph": FakeGraph(faults["graph"]),
+        "meta": FakeMeta(faults["meta"]),
+        "openai": FakeOpenAI(faults["openai"], action_rate=args.action_rate, seed=args.seed),
+    }
+    for fake in fakes.values():
+        fake.start()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="ciri-bench-") as workdir:
+            configure_environment(fakes, workdir)
+            from app.core.logging_config import setup_logging, stop_logging
+            setup_logging()
+            if args.verbose:
+                logger.setLevel(logging.INFO)
+            if args.migrate:
+                from scripts.run_migrations import run_migrations
+                run_migrations()
+
+            started = time.perf_counter()
+            measured = asyncio.run(run_benchmark(args, fakes, MessageFactory(seed=args.seed)))
+            stop_logging()
+    finally:
+        for fake in fakes.values():
+            fake.stop()
+
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "tenants": args.tenants,
+            "history": args.history,
+            "new_per_round": args.new_per_round,
+            "rounds": args.rounds,
+            "providers": args.providers,
+            "action_rate": args.action_rate,
+            "seed": args.seed,
+            "faults": {name: fault.describe() for name, fault in faults.items()},
+        },
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        **measured,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Seed and remove benchmark tenants. Every row created here is recognisable:
+companies use a `bench-<n>@bench.example` business email and every channel id
+the fakes hand out starts with "bench-".
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import app.db.base  # noqa: F401 - registers every model, so Company's relationships resolve
+from app.core.security import get_password_hash
+from app.models.chat import Chat
+from app.models.company import Company
+from app.models.company_context import CompanyContext
+from app.models.user import User
+from benchmarks.fakes import QUESTIONS, CUSTOMER_NAMES
+
+BENCH_EMAIL_PATTERN = "bench-%@bench.example"
+
+COMPANY_CONTEXT = """Bench Klinikk AS er en klinikk i Oslo sentrum.
+Åpningstider: mandag til fredag 09:00-17:00, lørdag 10:00-15:00, søndag stengt.
+Priser: vanlig konsultasjon 650 kr, oppfølging 450 kr, gavekort fra 500 kr.
+Avbestilling må skje senest 24 timer før timen, ellers faktureres 50 %.
+Parkering: Q-Park Vaterland, fem minutters gange. Timebestilling via e-post eller chat.
+"""
+
+REPLY_TEXT = "Hei! Takk for meldingen. Vi har åpent mandag til fredag 09-17. Vennlig hilsen Bench Klinikk"
+
+
+def reset(db: Session) -> int:
+    """Delete every benchmark tenant and its rows. Returns the number of companies removed."""
+    company_ids = [row[0] for row in db.execute(
+        text("SELECT id FROM companies WHERE business_email LIKE :pattern"), {"pattern": BENCH_EMAIL_PATTERN},
+    )]
+    if company_ids:
+        params = {"ids": company_ids}
+        for table in ("chat", "channel_context", "company_context", "ai_agent_settings", "leads", "users"):
+            db.execute(text(f"DELETE FROM {table} WHERE company_id = ANY(:ids)"), params)
+        db.execute(text("DELETE FROM companies WHERE id = ANY(:ids)"), params)
+    db.execute(text("DELETE FROM channel_auto_reply_settings WHERE channel_id LIKE 'bench-%'"))
+    db.commit()
+    return len(company_ids)
+
+
+def _credentials(tenant: int, providers: Iterable[str]) -> Dict[str, object]:
+    """Company columns for the selected providers; tokens identify the tenant to the fakes."""
+    fields: Dict[str, object] = {}
+    if "gmail" in providers:
+        # No refresh_token, so the monitor uses the access token as is
+        fields.update(gmail_box_credentials={"access_token": f"gmail-{tenant}"},
+                      gmail_box_email=f"inbox{tenant}@bench.example", gmail_box_username=f"Bench {tenant}")
+    if "outlook" in providers:
+        fields.update(outlook_box_credentials={"access_token": f"bench.outlook-{tenant}.sig"},
+                      outlook_box_email=f"outlook{tenant}@bench.example", outlook_box_username=f"Bench {tenant}")
+    if "facebook" in providers or "instagram" in providers:
+        # Instagram replies go out through the page's Send API
+        fields.update(facebook_box_page_id=f"bench-page-{tenant}", facebook_box_page_name=f"Bench Page {tenant}",
+                      facebook_box_credentials={"page_access_token": f"fb-{tenant}", "access_token": f"fb-{tenant}"})
+    if "instagram" in providers:
+        fields.update(instagram_credentials={"access_token": f"ig-{tenant}"},
+                      instagram_username=f"bench_ig_{tenant}", instagram_page_id=f"bench-page-{tenant}")
+    return fields
+
+
+def seed(db: Session, tenants: int, history: int, providers: List[str], seed: int = 0,
+         unread_rate: float = 0.0, days: int = 30) -> List[int]:
+    """
+    Create `tenants` companies with credentials for `providers`, a company
+    context and `history` earlier chat rows each (customer message plus reply),
+    spread over the selected providers and the last `days` days. A fraction
+    `unread_rate` of the customer messages is left unread. Returns the company
+    ids in tenant order.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    companies = [
+        Company(
+            name=f"Bench Klinikk {tenant}",
+            business_email=f"bench-{tenant}@bench.example",
+            business_category="Clinic",
+            terms_of_service="Benchmark tenant",
+            **_credentials(tenant, providers),
+        )
+        for tenant in range(tenants)
+    ]
+    db.add_all(companies)
+    db.flush()
+
+    db.add_all(CompanyContext(company_id=company.id, text_context=COMPANY_CONTEXT) for company in companies)
+
+    rows = []
+    for tenant, company in enumerate(companies):
+        for number in range(history):
+            provider = providers[number % len(providers)]
+            name = rng.choice(CUSTOMER_NAMES)
+            subject, question = rng.choice(QUESTIONS)
+            channel_id = f"bench-{provider}-h{tenant}-{number // 2}"
+            sent_at = now - timedelta(days=days) + timedelta(seconds=days * 86400 * number / max(history, 1))
+            unread = rng.random() < unread_rate
+            customer = f"{name.split()[0].lower()}.h{number}@example.com"
+            rows.append(dict(
+                company_id=company.id, channel_id=channel_id, message_id=f"bench-{provider}-hm{tenant}-{number}",
+                from_email=customer, to_email=company.business_email, subject=subject, body_text=question,
+                sent_at=sent_at, is_read=not unread, notification_read=not unread, email_provider=provider,
+            ))
+            if unread:
+                # Waiting for a human: no reply yet
+                continue
+            rows.append(dict(
+                company_id=company.id, channel_id=channel_id, message_id=f"bench-{provider}-hr{tenant}-{number}",
+                from_email=company.business_email, to_email=customer, subject=f"Re: {subject}", body_text=REPLY_TEXT,
+                sent_at=sent_at + timedelta(minutes=1), is_read=True, notification_read=True, replied=True,
+                email_provider=provider,
+            ))
+    if rows:
+        db.bulk_insert_mappings(Chat, rows)
+    db.commit()
+    return [company.id for company in companies]
+
+
+def seed_users(db: Session, company_ids: List[int], password: str) -> List[str]:
+    """Create one active, verified user per benchmark company. Returns their emails in tenant order."""
+    hashed_password = get_password_hash(password)
+    emails = [f"bench-user-{tenant}@bench.example" for tenant in range(len(company_ids))]
+    db.add_all(
+        User(email=email, hashed_password=hashed_password, is_active=True, is_verified=True, company_id=company_id)
+        for email, company_id in zip(emails, company_ids)
+    )
+    db.commit()
+    return emails
@@ -2,7 +2,7 @@ import uvicorn
 import asyncio
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi import WebSocket, WebSocketDisconnect
@@ -11,40 +11,39 @@ import json
 
 from app.api.routes import api_router
 from app.core.config import settings
+from app.core.logging_config import setup_logging
 from app.core.tasks import run_periodic_tasks
+from app.core.http_client import provider_http_client
+from app.core.loop_watchdog import loop_watchdog
+from app.core.metrics import METRICS_CONTENT_TYPE, WS_CONNECTIONS, MetricsMiddleware, render_latest
 from app.core.broadcast import broadcast_new_email
 from app.core.ws_clients import company_email_ws_clients
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log')
-    ]
-)
+# Configure logging: records are queued and written by a background thread
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("[DEBUG] Lifespan startup called")
     """
     Lifespan event handler for FastAPI application.
     This replaces the deprecated @app.on_event("startup") and @app.on_event("shutdown").
     """
+    logger.debug("Lifespan startup called")
     # Startup
+    loop_watchdog.start()
     try:
         asyncio.create_task(run_periodic_tasks())
-        print("[DEBUG] run_periodic_tasks task created")
+        logger.debug("run_periodic_tasks task created")
     except Exception as e:
-        print(f"[DEBUG] Failed to create run_periodic_tasks: {e}")
+        logger.error("Failed to create run_periodic_tasks: %s", e)
     yield
-    print("[DEBUG] Lifespan shutdown called")
+    logger.debug("Lifespan shutdown called")
     # Shutdown
-    # Add any cleanup code here if needed
+    await loop_watchdog.stop()
+    await provider_http_client.aclose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -63,6 +62,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so DB time is attributed to the route and full request time is measured
+app.add_middleware(MetricsMiddleware)
+
 # Mount static files for uploaded logos
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -74,22 +76,30 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_latest(), media_type=METRICS_CONTENT_TYPE)
+
 @app.websocket("/ws/company/{company_id}/email")
 async def company_email_ws(websocket: WebSocket, company_id: int):
-    print(f"[DEBUG] WebSocket client connected for company {company_id}")
+    logger.debug("WebSocket client connected for company %s", company_id)
     await websocket.accept()
     company_id = int(company_id)
     if company_id not in company_email_ws_clients:
         company_email_ws_clients[company_id] = []
     company_email_ws_clients[company_id].append(websocket)
+    WS_CONNECTIONS.inc()
     try:
         while True:
             await asyncio.sleep(10)  # Keep the connection alive
     except WebSocketDisconnect:
-        print(f"[DEBUG] WebSocket client disconnected for company {company_id}")
+        logger.debug("WebSocket client disconnected for company %s", company_id)
         company_email_ws_clients[company_id].remove(websocket)
         if not company_email_ws_clients[company_id]:
             del company_email_ws_clients[company_id]
+    finally:
+        WS_CONNECTIONS.dec()
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
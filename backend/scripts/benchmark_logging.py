@@ -0,0 +1,104 @@
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_root))
+
+# A typical inbound email: the old monitor printed the body and HTML several times
+BODY = "Hei, jeg lurer på åpningstidene deres i romjulen og om dere har ledig time neste uke. " * 20
+HTML = "<div>" + BODY + "</div><br/>" * 5
+
+
+def sweep_before(logger: logging.Logger, messages: int) -> None:
+    """The logging a poll sweep did before: prints plus eager f-string logs, including bodies."""
+    for i in range(messages):
+        print(f"[DEBUG] Processing message {i} from: kunde{i}@example.com")
+        print(f"[DEBUG] Cleaning HTML content: {HTML}")
+        print(f"[DEBUG] Cleaned content after first substitution: {HTML}")
+        print(f"[DEBUG] Cleaned content after second substitution: {HTML}")
+        print(f"[DEBUG] Cleaned HTML content: {HTML}")
+        print(f"[DEBUG] Message {i} content length: {len(BODY)}")
+        print(f"[DEBUG] Action analysis for message {i}: action_required=False, type=none, urgency=none")
+        print(f"[DEBUG] Prompt length: {BODY * 3}")
+        logger.info(f"[DEBUG] Polling company 1 - Example AS")
+        logger.info(f"[DEBUG] Broadcasting new email for company 1: {{'bodies': [{BODY!r}]}}")
+
+
+def sweep_after(logger: logging.Logger, messages: int) -> None:
+    """The same sweep with the lazy debug calls the monitors use now."""
+    for i in range(messages):
+        logger.debug("Processing message %s from: %s", i, f"kunde{i}@example.com")
+        logger.debug("Cleaned HTML content length: %s", len(HTML))
+        logger.debug("Message %s content length: %s", i, len(BODY))
+        logger.debug("Action analysis for message %s: action_required=%s, type=%s, urgency=%s", i, False, "none", "none")
+        logger.debug("Email reply prompt length: %d", len(BODY) * 3)
+        logger.debug("Polling company %s - %s", 1, "Example AS")
+        logger.debug("Broadcasting new email for company %s: thread %s, %s messages", 1, "t1", 1)
+
+
+def measure(label: str, sweep, logger: logging.Logger, messages: int, rounds: int) -> float:
+    sink = io.StringIO()
+    best = float("inf")
+    for _ in range(rounds):
+        sink.seek(0)
+        sink.truncate()
+        started = time.thread_time()
+        with redirect_stdout(sink):
+            sweep(logger, messages)
+        best = min(best, time.thread_time() - started)
+    print(f"{label:<48} {best * 1000:9.2f} ms CPU on the polling thread ({messages} messages)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the logging CPU cost of a poll sweep before and after the queue-based setup")
+    parser.add_argument("--messages", type=int, default=500, help="Messages per simulated sweep")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per variant (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Before: basicConfig with a synchronous StreamHandler + FileHandler
+        root = logging.getLogger()
+        stream = logging.StreamHandler(open(os.devnull, "w"))
+        file_handler = logging.FileHandler(os.path.join(tmp, "before.log"))
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        for handler in (stream, file_handler):
+            handler.setFormatter(formatter)
+            root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        before = measure("before (print + sync FileHandler)", sweep_before, logging.getLogger("bench"), args.messages, args.rounds)
+        for handler in (stream, file_handler):
+            root.removeHandler(handler)
+            handler.close()
+
+        # After: queue handler, listener thread, JSON lines
+        from app.core import logging_config
+        logging_config.settings.LOG_FILE = os.path.join(tmp, "after.log")
+        # Keep the listener's stream output out of the report
+        with redirect_stdout(open(os.devnull, "w")):
+            logging_config.setup_logging()
+        after = measure("after (queue, DEBUG off)", sweep_after, logging.getLogger("bench"), args.messages, args.rounds)
+
+        logging.getLogger("bench").setLevel(logging.DEBUG)
+        debug_on = measure("after (queue, DEBUG on)", sweep_after, logging.getLogger("bench"), args.messages, args.rounds)
+
+        sampler = logging_config.DebugSamplingFilter({"bench": 0.1})
+        handler = logging.getLogger().handlers[0]
+        handler.addFilter(sampler)
+        sampled = measure("after (queue, DEBUG sampled at 10%)", sweep_after, logging.getLogger("bench"), args.messages, args.rounds)
+        handler.removeFilter(sampler)
+        logging_config.stop_logging()
+
+    print(f"\nspeedup with DEBUG off: {before / after:.1f}x, DEBUG on: {before / debug_on:.1f}x, sampled: {before / sampled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytz
+
+from app.services import calendar_service as calendar_module
+from app.services.calendar_service import CalendarService
+
+NOW = datetime.now(pytz.UTC).replace(microsecond=0)
+COMPANY = SimpleNamespace(id=1)
+
+
+def event(event_id, start, hours=1, status="confirmed"):
+    return {
+        "id": event_id,
+        "status": status,
+        "summary": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(hours=hours)).isoformat()},
+    }
+
+
+class FakeCalendar:
+    """Stands in for the `service` built by googleapiclient; records every events.list call."""
+
+    def __init__(self):
+        self.calls = []
+        self.responses = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.calls.append(params)
+        response = self.responses.pop(0)
+        return SimpleNamespace(execute=lambda: response)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeCalendar()
+    monkeypatch.setattr(calendar_module, "build", lambda *args, **kwargs: fake)
+    monkeypatch.setattr(CalendarService, "_get_credentials", lambda self, company: object())
+    return fake
+
+
+def get_events(service, start=NOW, end=None):
+    response = asyncio.run(service.get_company_calendar_events(None, COMPANY, start, end or start + timedelta(days=7)))
+    return [item.id for item in response.events]
+
+
+def expire(service):
+    service._cache[COMPANY.id].synced_at -= calendar_module.settings.CALENDAR_CACHE_TTL_SECONDS + 1
+
+
+def test_full_sync_is_unbounded_and_filtered_locally(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = CalendarService()
+    fake.responses = [
+        {"items": [event("old", NOW - timedelta(days=400)), event("soon", NOW + timedelta(days=1))], "nextPageToken": "p2"},
+        {"items": [event("far", NOW + timedelta(days=400))], "nextSyncToken": "sync-1"},
+    ]
+
+    assert get_events(service) == ["soon"]
+    assert all("timeMin" not in call and "timeMax" not in call and "syncToken" not in call for call in fake.calls)
+    assert fake.calls[1]["pageToken"] == "p2"
+    assert set(service._cache[COMPANY.id].events) == {"soon"}
+
+
+def test_cache_is_served_then_refreshed_with_the_sync_token(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = CalendarService()
+    fake.responses = [{"items": [event("a", NOW + timedelta(hours=2)), event("b", NOW + timedelta(hours=5))],
+                       "nextSyncToken": "sync-1"}]
+    assert get_events(service) == ["a", "b"]
+
+    # Within the TTL nothing is fetched
+    assert get_events(service) == ["a", "b"]
+    assert len(fake.calls) == 1
+
+    expire(service)
+    fake.responses = [{"items": [event("a", NOW, status="cancelled"), event("c", NOW + timedelta(hours=1))],
+                       "nextSyncToken": "sync-2"}]
+    assert get_events(service) == ["c", "b"]
+    assert fake.calls[-1]["syncToken"] == "sync-1"
+    assert service._cache[COMPANY.id].sync_token == "sync-2"
+
+
+def test_without_a_sync_token_the_cache_falls_back_to_the_ttl(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = CalendarService()
+    fake.responses = [{"items": [event("a", NOW + timedelta(hours=2))]}]
+    assert get_events(service) == ["a"]
+    assert get_events(service) == ["a"]
+    assert len(fake.calls) == 1
+
+    expire(service)
+    fake.responses = [{"items": [event("b", NOW + timedelta(hours=3))]}]
+    assert get_events(service) == ["b"]
+    assert len(fake.calls) == 2
+    assert "syncToken" not in fake.calls[-1]
+
+
+def test_request_outside_the_window_runs_a_full_sync(fake, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = CalendarService()
+    later = NOW + timedelta(days=calendar_module.settings.CALENDAR_CACHE_WINDOW_DAYS + 10)
+    fake.responses = [{"items": [event("later", later + timedelta(hours=1))], "nextSyncToken": "sync-1"}]
+    assert get_events(service) == []
+
+    fake.responses = [{"items": [event("later", later + timedelta(hours=1))], "nextSyncToken": "sync-2"}]
+    assert get_events(service, later) == ["later"]
+    assert "syncToken" not in fake.calls[-1]
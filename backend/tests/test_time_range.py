@@ -0,0 +1,44 @@
+from datetime import date, datetime
+
+import pytest
+import pytz
+
+from app.utils.time_range import parse_time_range
+
+OSLO = pytz.timezone("Europe/Oslo")
+# Monday
+NOW = OSLO.localize(datetime(2026, 10, 19, 9, 0))
+
+
+def day_range(text):
+    result = parse_time_range(text, now=NOW)
+    return result and (result[0].date(), result[1].date())
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Clock times are not dates
+    ("i morgen kl 10.05", (date(2026, 10, 20), date(2026, 10, 21))),
+    ("i dag klokka 12.10", (date(2026, 10, 19), date(2026, 10, 20))),
+    ("can we meet at 10.12?", None),
+    ("kl. 14.30 på fredag", (date(2026, 10, 23), date(2026, 10, 24))),
+    ("har dere åpent at 24.12?", (date(2026, 12, 24), date(2026, 12, 25))),
+    # Numeric and named dates
+    ("har dere ledig 20.03?", (date(2027, 3, 20), date(2027, 3, 21))),
+    ("20/3/2027", (date(2027, 3, 20), date(2027, 3, 21))),
+    ("møte 10.12 kl 10.05", (date(2026, 12, 10), date(2026, 12, 11))),
+    ("2024-03-20", (date(2024, 3, 20), date(2024, 3, 21))),
+    ("20. mars", (date(2027, 3, 20), date(2027, 3, 21))),
+    # Relative phrases
+    ("tomorrow", (date(2026, 10, 20), date(2026, 10, 21))),
+    ("i overmorgen", (date(2026, 10, 21), date(2026, 10, 22))),
+    ("neste uke", (date(2026, 10, 26), date(2026, 11, 2))),
+    ("om 3 dager", (date(2026, 10, 19), date(2026, 10, 22))),
+    ("neste fredag", (date(2026, 10, 23), date(2026, 10, 24))),
+])
+def test_parse_time_range(text, expected):
+    assert day_range(text) == expected
+
+
+def test_range_starting_today_begins_now():
+    start, _ = parse_time_range("i dag", now=NOW)
+    assert start == NOW
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.services.tts_cache_service import tts_cache
+from app.services.voice_stream_service import SentenceChunker, VoiceStreamService
+
+REPLY = "Hei! Vi har åpent kl. 10 i dag. Velkommen innom når det passer deg. Ha en fin dag videre!"
+
+
+@pytest.fixture(autouse=True)
+def no_tts_cache(monkeypatch):
+    # Every sentence goes to the stub synthesizer
+    monkeypatch.setattr(tts_cache, "enabled", False)
+
+
+def tokens(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def chunk(text, min_chars=30):
+    chunker = SentenceChunker(min_chars)
+    chunks = [sentence for token in tokens(text) for sentence in chunker.feed(token)]
+    remainder = chunker.flush()
+    return chunks + ([remainder] if remainder else [])
+
+
+def test_chunker_merges_short_sentences_and_skips_abbreviations():
+    assert chunk(REPLY) == [
+        "Hei! Vi har åpent kl. 10 i dag.",
+        "Velkommen innom når det passer deg.",
+        "Ha en fin dag videre!",
+    ]
+
+
+def test_chunker_cuts_every_sentence_without_min_chars():
+    assert chunk("Hei! Hvordan går det? Bra.", min_chars=1) == ["Hei!", "Hvordan går det?", "Bra."]
+
+
+def test_chunker_cuts_at_newlines():
+    assert chunk("Åpningstider\nMandag til fredag 09-17", min_chars=1) == ["Åpningstider", "Mandag til fredag 09-17"]
+
+
+def make_streamer(text, gate=None):
+    async def stream(messages, model, max_tokens, temperature):
+        parts = tokens(text)
+        for index, token in enumerate(parts):
+            if gate is not None and index == len(parts) - 1:
+                await gate.wait()
+            await asyncio.sleep(0)
+            yield token
+    return stream
+
+
+async def synthesize(text, voice, model, response_format):
+    # The first sentence is the slowest, so out-of-order completion would show
+    await asyncio.sleep(0.05 if text.startswith("Hei") else 0.001)
+    return f"{voice}:{text}".encode()
+
+
+async def collect(service, **kwargs):
+    return [audio async for audio in service.stream_reply_audio([{"role": "user", "content": "?"}], "alloy", **kwargs)]
+
+
+def test_audio_is_yielded_in_sentence_order():
+    service = VoiceStreamService(make_streamer(REPLY), synthesize, min_chunk_chars=30, max_pending=3)
+    sentences = []
+    audio = asyncio.run(collect(service, on_sentence=sentences.append))
+    assert sentences == chunk(REPLY)
+    assert audio == [f"alloy:{sentence}".encode() for sentence in sentences]
+
+
+def test_first_audio_arrives_before_the_llm_stream_ends():
+    async def run():
+        # The LLM holds back its last token until the first audio has been received,
+        # so a pipeline that waited for the whole reply would time out
+        gate = asyncio.Event()
+        service = VoiceStreamService(make_streamer(REPLY, gate), synthesize, min_chunk_chars=30)
+        stream = service.stream_reply_audio([{"role": "user", "content": "?"}], "alloy")
+        first = await asyncio.wait_for(stream.__anext__(), timeout=2)
+        gate.set()
+        rest = [audio async for audio in stream]
+        return first, rest
+
+    first, rest = asyncio.run(run())
+    assert first == b"alloy:Hei! Vi har \xc3\xa5pent kl. 10 i dag."
+    assert len(rest) == 2
+
+
+def test_llm_errors_are_raised_to_the_caller():
+    async def failing(messages, model, max_tokens, temperature):
+        yield "Hei! Vi har åpent kl. 10 i dag. "
+        raise RuntimeError("LLM down")
+
+    service = VoiceStreamService(failing, synthesize, min_chunk_chars=30)
+    with pytest.raises(RuntimeError, match="LLM down"):
+        asyncio.run(collect(service))